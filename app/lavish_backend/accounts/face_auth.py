@@ -21,6 +21,7 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from accounts.models import CustomUser, FacialIdentity
+from accounts.face_gallery import face_gallery
 
 # Note: This module uses the face_detection package from the project root
 # If you're getting import errors, make sure the face_detection directory 
@@ -374,26 +375,12 @@ def authenticate_with_face(require_username=False, username=None, headless=False
         print("🔹 Loading face detection model...")
         face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
         
-        # Set up face recognition comparison
-        face_images = []
-        face_users = []
+        # Bring the in-memory gallery up to date; only changed images are read from disk
+        face_gallery.sync(FacialIdentity.objects.filter(enabled=True))
+        candidate_ids = set(facial_users.values_list('user_id', flat=True))
+        print(f"🔹 {len(face_gallery)} registered faces loaded for comparison")
         
-        # Load all registered face images for comparison
-        print(f"🔹 Loading {facial_users.count()} registered face images for comparison...")
-        for facial_id in facial_users:
-            user = facial_id.user
-            full_path = os.path.join(settings.MEDIA_ROOT, facial_id.face_image_path)
-            
-            if os.path.exists(full_path):
-                # Load the registered face image
-                registered_img = cv2.imread(full_path)
-                if registered_img is not None:
-                    # Convert to grayscale
-                    registered_gray = cv2.cvtColor(registered_img, cv2.COLOR_BGR2GRAY)
-                    face_images.append(registered_gray)
-                    face_users.append(user)
-        
-        if len(face_images) == 0:
+        if len(face_gallery) == 0:
             logger.error("No valid face images found for comparison")
             print("❌ No valid face images found in database")
             camera.release()
@@ -457,32 +444,11 @@ def authenticate_with_face(require_username=False, username=None, headless=False
                 
                 # Resize for comparison if needed
                 if face_roi.size > 0:
-                    # Compare with registered faces
-                    # Here we're using a simple approach for demo purposes
-                    # For production, consider using a more sophisticated face recognition algorithm
+                    # Score the probe against every registered face in one operation
                     best_match = None
-                    best_score = 0
-                    
-                    for i, registered_face in enumerate(face_images):
-                        # Resize to match for comparison
-                        if face_roi.shape[0] > 0 and face_roi.shape[1] > 0 and registered_face.shape[0] > 0 and registered_face.shape[1] > 0:
-                            # Resize to common size for comparison
-                            common_size = (100, 100)
-                            face_roi_resized = cv2.resize(face_roi, common_size)
-                            registered_face_resized = cv2.resize(registered_face, common_size)
-                            
-                            # Calculate structural similarity
-                            try:
-                                # Using normalized cross-correlation as a simple similarity measure
-                                # For a real system, use a more sophisticated algorithm
-                                result = cv2.matchTemplate(face_roi_resized, registered_face_resized, cv2.TM_CCORR_NORMED)
-                                similarity = result[0][0]
-                                
-                                if similarity > best_score:
-                                    best_score = similarity
-                                    best_match = face_users[i]
-                            except Exception as e:
-                                logger.error(f"Error comparing faces: {str(e)}")
+                    best_user_id, best_score = face_gallery.match(face_roi, user_ids=candidate_ids)
+                    if best_user_id is not None and best_score >= face_confidence_threshold:
+                        best_match = User.objects.filter(pk=best_user_id).first()
                     
                     # Display confidence
                     cv2.putText(
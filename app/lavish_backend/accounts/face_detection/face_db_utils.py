@@ -5,6 +5,7 @@ import cv2
 import numpy as np
 from datetime import datetime
 import os
+import threading
 
 def create_db_tables():
     """Create SQLite database tables if they don't exist"""
@@ -289,27 +290,67 @@ def save_face_to_memory(face_data, person_name=None):
     
     return face_filename
 
+def _face_vector(face_img):
+    """Resize, grayscale and equalize a face into the flat vector face_distance compares"""
+    face_resized = cv2.resize(face_img, (100, 100))
+    face_gray = cv2.cvtColor(face_resized, cv2.COLOR_BGR2GRAY)
+    return cv2.equalizeHist(face_gray).astype(np.float32).ravel()
+
+def _mse_scores(matrix, probe):
+    """Per-row MSE against a probe, saturating each squared difference at 255 like cv2.multiply on uint8"""
+    diff = matrix - probe
+    return np.minimum(diff * diff, 255).mean(axis=1)
+
 def face_distance(face1, face2):
     """Calculate Mean Squared Error between two face images as a distance metric"""
-    # Resize images to same dimensions for comparison
-    face1_resized = cv2.resize(face1, (100, 100))
-    face2_resized = cv2.resize(face2, (100, 100))
-    
-    # Convert to grayscale for more robust comparison
-    face1_gray = cv2.cvtColor(face1_resized, cv2.COLOR_BGR2GRAY)
-    face2_gray = cv2.cvtColor(face2_resized, cv2.COLOR_BGR2GRAY)
-    
-    # Equalize histograms for better lighting invariance
-    face1_eq = cv2.equalizeHist(face1_gray)
-    face2_eq = cv2.equalizeHist(face2_gray)
-    
-    # Calculate Mean Squared Error
-    diff = cv2.absdiff(face1_eq, face2_eq)
-    diff_square = cv2.multiply(diff, diff)
-    mse = np.mean(diff_square)
-    
     # Normalize score (lower is better match)
-    return mse
+    return float(_mse_scores(_face_vector(face1)[np.newaxis, :], _face_vector(face2))[0])
+
+class StoredFaceGallery:
+    """
+    Comparison vectors of the database faces, stacked into one matrix
+
+    Each image is decoded once; ``load`` only reads faces that are new or
+    whose path changed, and restacks the matrix only when the set changes.
+    Safe to share between request threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (face id, image path) -> vector, or None for images that don't load
+        self._vectors = {}
+        self._listing = None
+        self._rows = []
+        self._matrix = None
+
+    def load(self, db_faces):
+        """Return (rows, matrix) for the database faces whose images load"""
+        wanted = [(face_id, name, img_path) for face_id, name, img_path in db_faces]
+        with self._lock:
+            if self._listing == wanted:
+                return self._rows, self._matrix
+
+            live_keys = set()
+            rows = []
+            for face_id, name, img_path in wanted:
+                key = (face_id, img_path)
+                live_keys.add(key)
+                if key not in self._vectors:
+                    stored_face = cv2.imread(img_path) if os.path.exists(img_path) else None
+                    self._vectors[key] = _face_vector(stored_face) if stored_face is not None else None
+                if self._vectors[key] is not None:
+                    rows.append((face_id, name, img_path, key))
+
+            for key in [key for key in self._vectors if key not in live_keys]:
+                del self._vectors[key]
+
+            # A new matrix each time, so callers can keep using the one they were given
+            self._matrix = np.stack([self._vectors[row[3]] for row in rows]) if rows else None
+            self._rows = rows
+            self._listing = wanted
+            return self._rows, self._matrix
+
+stored_faces = StoredFaceGallery()
 
 def find_matching_face(face_img):
     """Find a matching face in the database using face similarity"""
@@ -334,25 +375,15 @@ def find_matching_face(face_img):
     # Extra strict threshold for potentially confusable names
     strict_threshold = 700  # For names that are similar (Emmanuel/Emily)
     
-    for face_id, name, img_path in db_faces:
-        if not os.path.exists(img_path):
-            continue
-            
-        # Load the stored face image
-        stored_face = cv2.imread(img_path)
-        if stored_face is None:
-            continue
-            
-        # Calculate similarity using MSE
-        score = face_distance(face_img, stored_face)
-        
-        # Print comparison details for debugging
-        print(f"Comparing with {name} (ID: {face_id}), Score: {score}")
-        
-        # Update best match if better score found
-        if score < best_score:
-            best_score = score
-            best_match = (face_id, name, img_path, score)
+    # Score the probe against every stored face at once
+    rows, matrix = stored_faces.load(db_faces)
+    if rows:
+        scores = _mse_scores(matrix, _face_vector(face_img))
+        best = int(np.argmin(scores))
+        best_score = float(scores[best])
+        face_id, name, img_path, _ = rows[best]
+        best_match = (face_id, name, img_path, best_score)
+        print(f"Compared with {len(rows)} stored faces, best {name} (ID: {face_id}), Score: {best_score}")
     
     # If best match is below threshold, consider it a match
     if best_match and best_score < similarity_threshold:
@@ -0,0 +1,166 @@
+"""
+In-memory gallery of registered faces for facial login
+
+Every enabled FacialIdentity image is decoded once, reduced to a fixed-size,
+histogram-equalized grayscale vector and kept as one row of a contiguous
+float32 matrix. A probe face is scored against all rows in a single matrix
+product, so a login neither touches the disk nor loops over users in Python.
+Rows are refreshed one at a time when a FacialIdentity changes.
+"""
+import logging
+import os
+import threading
+
+try:
+    import cv2
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Faces are compared at this size, matching the original per-pair comparison
+FACE_SIZE = (100, 100)
+
+
+def face_vector(gray):
+    """
+    Reduce a grayscale face to a unit-length vector of its equalized pixels
+
+    The dot product of two such vectors equals cv2.TM_CCORR_NORMED on the images.
+    """
+    resized = cv2.resize(gray, FACE_SIZE)
+    vector = cv2.equalizeHist(resized).astype(np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class FaceGallery:
+    """
+    Registered face vectors, one matrix row per enabled FacialIdentity
+
+    The gallery loads lazily; ``sync`` reconciles it with the database by
+    primary key and image path, reading only the images that changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._matrix = None
+        self._size = 0
+        # FacialIdentity pk -> row, and row -> (pk, user_id, image path)
+        self._rows = {}
+        self._entries = []
+
+    def __len__(self):
+        return self._size
+
+    def _load(self, image_path):
+        full_path = os.path.join(settings.MEDIA_ROOT, image_path)
+        image = cv2.imread(full_path, cv2.IMREAD_GRAYSCALE) if os.path.exists(full_path) else None
+        if image is None or image.size == 0:
+            logger.warning(f"Face image {image_path} is missing or unreadable")
+            return None
+        return face_vector(image)
+
+    def _put(self, pk, user_id, image_path, vector):
+        row = self._rows.get(pk)
+        if row is None:
+            if self._matrix is None:
+                self._matrix = np.empty((8, vector.size), dtype=np.float32)
+            elif self._size == len(self._matrix):
+                # Grow geometrically so appends stay amortised O(1)
+                grown = np.empty((self._size * 2, vector.size), dtype=np.float32)
+                grown[:self._size] = self._matrix[:self._size]
+                self._matrix = grown
+            row = self._size
+            self._size += 1
+            self._rows[pk] = row
+            self._entries.append(None)
+        self._matrix[row] = vector
+        self._entries[row] = (pk, user_id, image_path)
+
+    def _drop(self, pk):
+        row = self._rows.pop(pk, None)
+        if row is None:
+            return
+        # Move the last row into the gap to keep the matrix dense
+        last = self._size - 1
+        if row != last:
+            self._matrix[row] = self._matrix[last]
+            self._entries[row] = self._entries[last]
+            self._rows[self._entries[row][0]] = row
+        self._entries.pop()
+        self._size = last
+
+    def refresh(self, identity):
+        """Reload one FacialIdentity's row, or remove it if login is disabled"""
+        if not CV2_AVAILABLE:
+            return
+        with self._lock:
+            if self._matrix is None and not self._rows:
+                # Not loaded yet; the first sync picks the change up
+                return
+            vector = self._load(identity.face_image_path) if identity.enabled and identity.face_image_path else None
+            if vector is None:
+                self._drop(identity.pk)
+            else:
+                self._put(identity.pk, identity.user_id, identity.face_image_path, vector)
+
+    def discard(self, pk):
+        with self._lock:
+            self._drop(pk)
+
+    def sync(self, identities):
+        """
+        Reconcile the gallery with the enabled identities
+
+        Args:
+            identities: FacialIdentity queryset of the identities to match against
+        """
+        rows = identities.values_list('pk', 'user_id', 'face_image_path')
+        with self._lock:
+            wanted = {}
+            for pk, user_id, image_path in rows:
+                if image_path:
+                    wanted[pk] = (user_id, image_path)
+
+            for pk in [pk for pk in self._rows if pk not in wanted]:
+                self._drop(pk)
+            for pk, (user_id, image_path) in wanted.items():
+                row = self._rows.get(pk)
+                if row is not None and self._entries[row][1:] == (user_id, image_path):
+                    continue
+                vector = self._load(image_path)
+                if vector is None:
+                    self._drop(pk)
+                else:
+                    self._put(pk, user_id, image_path, vector)
+
+    def match(self, gray_face, user_ids=None):
+        """
+        Score a grayscale probe face against every gallery row
+
+        Args:
+            gray_face: Grayscale face region
+            user_ids: Optional set restricting the candidates
+
+        Returns:
+            tuple: (user_id, score) of the best match, or (None, 0.0)
+        """
+        probe = face_vector(gray_face)
+        with self._lock:
+            if not self._size:
+                return None, 0.0
+            scores = self._matrix[:self._size] @ probe
+            if user_ids is not None:
+                allowed = np.fromiter((entry[1] in user_ids for entry in self._entries), dtype=bool, count=self._size)
+                scores = np.where(allowed, scores, -1.0)
+            best = int(np.argmax(scores))
+            if scores[best] < 0:
+                return None, 0.0
+            return self._entries[best][1], float(scores[best])
+
+
+face_gallery = FaceGallery()
@@ -400,3 +400,21 @@ class CompanySite(models.Model):
         ordering = ['company', 'name']
         verbose_name = "Company Site"
         verbose_name_plural = "Company Sites"
+
+
+# Keep the in-memory face gallery in step with registered faces
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+@receiver(post_save, sender=FacialIdentity)
+def refresh_face_gallery(sender, instance, update_fields=None, **kwargs):
+    """Reload the changed face, skipping saves that only touch bookkeeping fields"""
+    if update_fields and set(update_fields) <= {'last_used'}:
+        return
+    from accounts.face_gallery import face_gallery
+    face_gallery.refresh(instance)
+
+@receiver(post_delete, sender=FacialIdentity)
+def discard_face_gallery_entry(sender, instance, **kwargs):
+    from accounts.face_gallery import face_gallery
+    face_gallery.discard(instance.pk)
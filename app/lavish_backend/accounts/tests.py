@@ -1,3 +1,150 @@
-from django.test import TestCase
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest.mock import patch
 
-# Create your tests here.
+import cv2
+import numpy as np
+from django.test import TestCase, override_settings
+
+from accounts.face_detection import face_db_utils
+from accounts.face_gallery import FaceGallery, face_vector
+from accounts.models import CustomUser, FacialIdentity
+
+
+class FaceGalleryTests(TestCase):
+    """In-memory face gallery used by facial login"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.rng = np.random.default_rng(7)
+
+    def _face(self, name):
+        image = self.rng.integers(0, 255, (120, 110), dtype=np.uint8)
+        os.makedirs(os.path.join(self.media_root, 'face_images'), exist_ok=True)
+        path = f'face_images/{name}.png'
+        cv2.imwrite(os.path.join(self.media_root, path), image)
+        return image, path
+
+    def _identity(self, username, path):
+        user = CustomUser.objects.create_user(username=username, email=f'{username}@example.com', password='x')
+        return FacialIdentity.objects.create(user=user, face_id=1, face_name=username, face_image_path=path)
+
+    def test_scores_match_normalized_template_correlation(self):
+        probe, _ = self._face('probe')
+        other, _ = self._face('other')
+        expected = cv2.matchTemplate(
+            cv2.equalizeHist(cv2.resize(probe, (100, 100))),
+            cv2.equalizeHist(cv2.resize(other, (100, 100))),
+            cv2.TM_CCORR_NORMED,
+        )[0][0]
+        self.assertAlmostEqual(float(face_vector(probe) @ face_vector(other)), float(expected), places=4)
+
+    def test_sync_matches_and_refreshes_incrementally(self):
+        gallery = FaceGallery()
+        faces = {}
+        for name in ('alice', 'bob', 'carol'):
+            image, path = self._face(name)
+            faces[name] = (image, self._identity(name, path))
+
+        gallery.sync(FacialIdentity.objects.filter(enabled=True))
+        self.assertEqual(len(gallery), 3)
+        image, identity = faces['bob']
+        user_id, score = gallery.match(image)
+        self.assertEqual(user_id, identity.user_id)
+        self.assertAlmostEqual(score, 1.0, places=4)
+
+        # Restricting candidates excludes the exact match
+        user_id, _ = gallery.match(image, user_ids={faces['alice'][1].user_id})
+        self.assertEqual(user_id, faces['alice'][1].user_id)
+
+        # Disabling one identity drops its row; the rest keep matching
+        identity.enabled = False
+        gallery.refresh(identity)
+        self.assertEqual(len(gallery), 2)
+        carol_image, carol = faces['carol']
+        self.assertEqual(gallery.match(carol_image)[0], carol.user_id)
+
+        # A sync with unchanged rows reads no images
+        os.remove(os.path.join(self.media_root, carol.face_image_path))
+        identity.save()
+        gallery.sync(FacialIdentity.objects.filter(enabled=True))
+        self.assertEqual(gallery.match(carol_image)[0], carol.user_id)
+
+
+def loop_face_distance(face1, face2):
+    """The per-pair MSE find_matching_face computed before it scored the stored faces as one matrix"""
+    face1_eq = cv2.equalizeHist(cv2.cvtColor(cv2.resize(face1, (100, 100)), cv2.COLOR_BGR2GRAY))
+    face2_eq = cv2.equalizeHist(cv2.cvtColor(cv2.resize(face2, (100, 100)), cv2.COLOR_BGR2GRAY))
+    diff = cv2.absdiff(face1_eq, face2_eq)
+    return np.mean(cv2.multiply(diff, diff))
+
+
+class FindMatchingFaceTests(TestCase):
+    """Vectorized MSE matching of the face detection tool's stored faces"""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        # The tool keeps detection.db in its working directory
+        cwd = os.getcwd()
+        os.chdir(self.workdir)
+        self.addCleanup(os.chdir, cwd)
+        face_db_utils.create_db_tables()
+        self.rng = np.random.default_rng(11)
+        self.faces = {}
+        gallery = face_db_utils.StoredFaceGallery()
+        patcher = patch.object(face_db_utils, 'stored_faces', gallery)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _store(self, name, image=None):
+        if image is None:
+            image = self.rng.integers(0, 255, (90, 80, 3), dtype=np.uint8)
+        path = os.path.join(self.workdir, f'{name}.png')
+        cv2.imwrite(path, image)
+        conn = sqlite3.connect('detection.db')
+        conn.execute("INSERT INTO faces (name, image_path, face_hash) VALUES (?, ?, ?)", (name, path, name))
+        conn.commit()
+        conn.close()
+        self.faces[name] = image
+        return image
+
+    def _loop_best(self, probe):
+        scores = {name: loop_face_distance(probe, image) for name, image in self.faces.items()}
+        best = min(scores, key=scores.get)
+        return best, scores[best]
+
+    def test_vectorized_scores_pick_the_same_best_match_as_the_loop(self):
+        for name in ('ada', 'grace', 'linus', 'barbara'):
+            self._store(name)
+        # A probe close to one stored face, and unrelated probes
+        near = np.clip(self.faces['linus'].astype(int) + self.rng.integers(-20, 20, (90, 80, 3)), 0, 255)
+        probes = [near.astype(np.uint8)] + [self.rng.integers(0, 255, (70, 75, 3), dtype=np.uint8) for _ in range(5)]
+
+        for probe in probes:
+            result = face_db_utils.find_matching_face(probe)
+            name, score = self._loop_best(probe)
+            self.assertTrue(result['exists'])
+            self.assertEqual(result['name'], name)
+            self.assertAlmostEqual(result['score'], float(score), places=3)
+            self.assertAlmostEqual(face_db_utils.face_distance(probe, self.faces[name]), float(score), places=3)
+        self.assertEqual(face_db_utils.find_matching_face(probes[0])['name'], 'linus')
+
+    def test_images_are_read_once_and_new_faces_are_picked_up(self):
+        self._store('ada')
+        probe = self._store('grace')
+
+        with patch.object(face_db_utils.cv2, 'imread', wraps=cv2.imread) as imread:
+            self.assertEqual(face_db_utils.find_matching_face(probe)['score'], 0.0)
+            face_db_utils.find_matching_face(probe)
+            self.assertEqual(imread.call_count, 2)
+
+            self._store('linus')
+            self.assertEqual(face_db_utils.find_matching_face(self.faces['linus'])['name'], 'linus')
+            self.assertEqual(imread.call_count, 3)
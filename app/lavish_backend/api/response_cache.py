@@ -0,0 +1,145 @@
+"""
+Versioned response cache for the storefront API
+
+The theme requests the same product and location JSON on every page view,
+while the data behind it only changes when a sync runs or an admin edits a
+record. Responses are cached as rendered bytes under a key made of the
+endpoint, its query parameters and a version counter per data set:
+
+- ``catalog``: products, variants, images and inventory
+- ``locations``: countries, states and cities
+
+Saves and deletes of those models (see their models.py) and Shopify sync runs
+bump the counter, so stale entries are never read again and simply expire.
+Each entry carries an ETag, and requests whose ``If-None-Match`` still matches
+are answered with 304 Not Modified.
+
+Counters live in the ``shared`` cache (Redis or a database table, see
+settings.CACHES) so bumps made by sync commands and other workers reach every
+process. Each process keeps a copy in its default cache and re-reads the
+shared counter at most every API_RESPONSE_VERSION_TTL seconds, so renders and
+checkout quotes don't pay a round trip per call; its own bumps are seen at
+once, other processes' within the TTL. If the shared cache is unavailable
+(e.g. migrations haven't run) versions are only kept per process.
+"""
+import hashlib
+import logging
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger(__name__)
+
+CATALOG = 'catalog'
+LOCATIONS = 'locations'
+
+# Entries of superseded versions are unreachable; this only bounds how long they linger
+RESPONSE_TIMEOUT = 24 * 60 * 60
+VERSION_KEY = 'api:response-version:{}'
+# This process's copy of a counter, kept in the default cache
+LOCAL_VERSION_KEY = 'api:local-response-version:{}'
+VERSION_CACHE = 'shared'
+# Seconds a process trusts the counters it last read, overridable with API_RESPONSE_VERSION_TTL
+DEFAULT_VERSION_TTL = 2
+
+
+def _new_version(previous=None):
+    # A timestamp, so neither an evicted counter nor a bump lost with a rolled-back
+    # transaction brings back a version an earlier entry used
+    version = time.time_ns() // 1000
+    return max(version, previous + 1) if previous is not None else version
+
+
+def _remember(namespace, version):
+    cache.set(LOCAL_VERSION_KEY.format(namespace), version,
+              getattr(settings, 'API_RESPONSE_VERSION_TTL', DEFAULT_VERSION_TTL))
+    return version
+
+
+def get_version(namespace):
+    """Current version of a data set"""
+    version = cache.get(LOCAL_VERSION_KEY.format(namespace))
+    if version is not None:
+        return version
+
+    key = VERSION_KEY.format(namespace)
+    shared = caches[VERSION_CACHE]
+    try:
+        version = shared.get(key)
+        if version is None:
+            shared.add(key, _new_version(), None)
+            version = shared.get(key)
+    except Exception as e:
+        logger.warning(f"Could not read response version {namespace}: {e}")
+    if version is None:
+        version = _new_version()
+    return _remember(namespace, version)
+
+
+def bump_version(*namespaces):
+    """Invalidate every cached response built from the given data sets"""
+    for namespace in namespaces:
+        version = _new_version(cache.get(LOCAL_VERSION_KEY.format(namespace)))
+        try:
+            caches[VERSION_CACHE].set(VERSION_KEY.format(namespace), version, None)
+        except Exception as e:
+            logger.warning(f"Could not share response version {namespace}: {e}")
+        _remember(namespace, version)
+
+
+def _cache_key(namespace, request):
+    params = sorted((name, value) for name in request.query_params for value in request.query_params.getlist(name))
+    fingerprint = hashlib.sha1(repr((request.path, params)).encode('utf-8')).hexdigest()
+    return f'api:response:{namespace}:{get_version(namespace)}:{fingerprint}'
+
+
+def _not_modified(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags
+
+
+def _respond(request, etag, content):
+    if _not_modified(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+
+def cache_response(namespace):
+    """
+    Cache a read-only viewset method's JSON responses until ``namespace`` changes
+
+    Only successful responses rendered as JSON are cached; requests for the
+    browsable API and error responses go through the view every time.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != 'GET' or getattr(request.accepted_renderer, 'format', None) != 'json':
+                return method(self, request, *args, **kwargs)
+
+            key = _cache_key(namespace, request)
+            entry = cache.get(key)
+            if entry is not None:
+                return _respond(request, *entry)
+
+            response = method(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+            content = JSONRenderer().render(response.data)
+            etag = f'"{hashlib.sha1(content).hexdigest()}"'
+            cache.set(key, (etag, content), RESPONSE_TIMEOUT)
+            return _respond(request, etag, content)
+        return wrapper
+    return decorator
@@ -3,6 +3,8 @@ API Serializers for Shopify Data
 Exposes Django backend data to Shopify theme frontend
 """
 
+from django.db.models import Exists, IntegerField, Min, OuterRef, Prefetch, Subquery, Sum
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
 from products.models import ShopifyProduct, ShopifyProductVariant, ShopifyProductImage
 from inventory.models import ShopifyInventoryLevel, ShopifyInventoryItem, ShopifyLocation
@@ -45,6 +47,7 @@ class ProductImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShopifyProductImage
         fields = ['id', 'src', 'alt', 'position', 'width', 'height']
+        extra_kwargs = {'alt': {'source': 'alt_text'}}
 
 
 class InventoryLevelSerializer(serializers.ModelSerializer):
@@ -56,6 +59,14 @@ class InventoryLevelSerializer(serializers.ModelSerializer):
         fields = ['location_name', 'available', 'committed', 'incoming', 'on_hand']
 
 
+def variant_available_inventory():
+    """Subquery summing the available inventory of the outer variant across all locations"""
+    levels = ShopifyInventoryLevel.objects.filter(
+        inventory_item__variant=OuterRef('pk'),
+    ).values('inventory_item').annotate(total=Sum('available')).values('total')
+    return Coalesce(Subquery(levels, output_field=IntegerField()), 0)
+
+
 class ProductVariantSerializer(serializers.ModelSerializer):
     """Serializer for product variants with inventory"""
     inventory_quantity = serializers.SerializerMethodField()
@@ -69,8 +80,15 @@ class ProductVariantSerializer(serializers.ModelSerializer):
             'inventory_quantity', 'in_stock', 'available'
         ]
     
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Annotate variants with their summed available inventory"""
+        return queryset.annotate(available_inventory=variant_available_inventory())
+    
     def get_inventory_quantity(self, obj):
         """Get total available inventory across all locations"""
+        if hasattr(obj, 'available_inventory'):
+            return obj.available_inventory
         if hasattr(obj, 'inventory_item') and obj.inventory_item:
             levels = obj.inventory_item.levels.all()
             return sum(level.available for level in levels)
@@ -94,18 +112,49 @@ class ProductListSerializer(serializers.ModelSerializer):
             'vendor', 'image_url', 'price', 'in_stock', 'status'
         ]
     
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Annotate products with their first image, lowest price and stock status
+        
+        Each page is then serialized from the product query alone, however
+        many images, variants and inventory levels the products have.
+        """
+        first_image = ShopifyProductImage.objects.filter(
+            product=OuterRef('pk'),
+        ).order_by('position', 'pk').values('src')[:1]
+        min_price = ShopifyProductVariant.objects.filter(
+            product=OuterRef('pk'),
+        ).values('product').annotate(lowest=Min('price')).values('lowest')
+        # A product is in stock when any variant has inventory available across its locations
+        stocked_variant = ShopifyInventoryLevel.objects.filter(
+            inventory_item__variant__product=OuterRef('pk'),
+        ).values('inventory_item').annotate(total=Sum('available')).filter(total__gt=0)
+        return queryset.annotate(
+            first_image_src=Subquery(first_image),
+            min_price=Subquery(min_price),
+            has_stock=Exists(stocked_variant),
+        )
+    
     def get_image_url(self, obj):
         """Get first product image"""
+        if hasattr(obj, 'first_image_src'):
+            return obj.first_image_src
         image = obj.images.first()
         return image.src if image else None
     
     def get_price(self, obj):
-        """Get price from first variant"""
-        variant = obj.variants.first()
-        return str(variant.price) if variant else "0.00"
+        """Get the lowest variant price"""
+        if hasattr(obj, 'min_price'):
+            price = obj.min_price
+        else:
+            price = min((variant.price for variant in obj.variants.all()), default=None)
+        return str(price) if price is not None else "0.00"
     
     def get_in_stock(self, obj):
         """Check if any variant is in stock"""
+        if hasattr(obj, 'has_stock'):
+            return obj.has_stock
         for variant in obj.variants.all():
             if hasattr(variant, 'inventory_item') and variant.inventory_item:
                 levels = variant.inventory_item.levels.all()
@@ -126,6 +175,16 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             'product_type', 'vendor', 'tags', 'status', 
             'images', 'variants', 'created_at', 'updated_at'
         ]
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Prefetch images and inventory-annotated variants: one query each per page"""
+        return queryset.prefetch_related(
+            Prefetch('images', queryset=ShopifyProductImage.objects.order_by('position', 'pk')),
+            Prefetch('variants', queryset=ProductVariantSerializer.setup_eager_loading(
+                ShopifyProductVariant.objects.order_by('position', 'pk')
+            )),
+        )
 
 
 class CarrierServiceSerializer(serializers.ModelSerializer):
@@ -1,3 +1,196 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.response_cache import CATALOG, LOCAL_VERSION_KEY, VERSION_CACHE, bump_version
+from inventory.models import ShopifyInventoryItem, ShopifyInventoryLevel, ShopifyLocation
+from locations.models import Country, State
+from products.models import ShopifyProduct, ShopifyProductImage, ShopifyProductVariant
+
+
+class ProductCatalogQueryTestCase(TestCase):
+    """Test cases for the query count of the product catalog endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.location = ShopifyLocation.objects.create(shopify_id='gid://shopify/Location/1', name='Warehouse')
+        self.products = 0
+
+    def _add_products(self, count):
+        for _ in range(count):
+            self.products += 1
+            number = self.products
+            product = ShopifyProduct.objects.create(
+                shopify_id=f'gid://shopify/Product/{number}',
+                title=f'Product {number}',
+                handle=f'product-{number}',
+                status='active',
+            )
+            for position in (2, 1):
+                ShopifyProductImage.objects.create(
+                    product=product,
+                    src=f'https://cdn.example.com/{number}-{position}.jpg',
+                    position=position,
+                )
+            # Products are created with a default variant; price it and add a cheaper one
+            product.variants.update(price='20.00')
+            variants = [
+                (product.variants.get(), 0),
+                (ShopifyProductVariant.objects.create(
+                    product=product,
+                    shopify_id=f'gid://shopify/ProductVariant/{number}',
+                    title='Small',
+                    price='12.50',
+                    position=2,
+                ), number % 2),
+            ]
+            for variant, available in variants:
+                item = ShopifyInventoryItem.objects.create(
+                    shopify_id=f'gid://shopify/InventoryItem/{variant.pk}',
+                    variant=variant,
+                )
+                ShopifyInventoryLevel.objects.create(
+                    inventory_item=item,
+                    location=self.location,
+                    available=available,
+                    updated_at=timezone.now(),
+                )
+
+    def _get(self, path):
+        """GET ``path``, returning the response and the catalog queries it ran"""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        # The locale middleware saves the visitor's session on every request; only count catalog queries
+        queries = [
+            query['sql'] for query in context.captured_queries
+            if 'django_session' not in query['sql'] and 'SAVEPOINT' not in query['sql']
+        ]
+        return response, queries
+
+    def test_list_query_count_is_independent_of_catalog_size(self):
+        """A product page costs the same queries for 3 or 30 products"""
+        self._add_products(3)
+        _, small = self._get('/api/products/')
+
+        self._add_products(27)
+        response, large = self._get('/api/products/')
+        # One count and one page query, whatever the catalog size
+        self.assertEqual(len(small), 2)
+        self.assertEqual(len(large), 2)
+        results = response.json()['results']
+        self.assertEqual(len(results), 30)
+
+        first = next(row for row in results if row['handle'] == 'product-1')
+        self.assertEqual(first['image_url'], 'https://cdn.example.com/1-1.jpg')
+        self.assertEqual(Decimal(first['price']), Decimal('12.50'))
+        self.assertTrue(first['in_stock'])
+        second = next(row for row in results if row['handle'] == 'product-2')
+        self.assertFalse(second['in_stock'])
+
+        response, queries = self._get('/api/products/featured/')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(response.json()), 12)
+
+    def test_detail_query_count(self):
+        """A product detail costs one query each for the product, images and variants"""
+        self._add_products(3)
+        product = ShopifyProduct.objects.get(handle='product-3')
+        response, queries = self._get(f'/api/products/{product.pk}/')
+        self.assertEqual(len(queries), 3)
+        data = response.json()
+        self.assertEqual([image['position'] for image in data['images']], [1, 2])
+        self.assertEqual([variant['inventory_quantity'] for variant in data['variants']], [0, 1])
+        self.assertEqual([variant['in_stock'] for variant in data['variants']], [False, True])
+
+        response, queries = self._get('/api/products/by-handle/product-3/')
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(response.json()['id'], product.pk)
+
+
+class ResponseCacheTestCase(TestCase):
+    """Test cases for the versioned storefront response cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.product = ShopifyProduct.objects.create(
+            shopify_id='gid://shopify/Product/1',
+            title='Candle',
+            handle='candle',
+            status='active',
+        )
+
+    def _catalog_queries(self, path, **headers):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path, **headers)
+        queries = [query['sql'] for query in context.captured_queries if 'products_' in query['sql']]
+        return response, queries
+
+    def test_repeat_requests_are_served_from_cache(self):
+        """A second request for the same page reads no catalog rows and keeps its ETag"""
+        first, queries = self._catalog_queries('/api/products/by-handle/candle/')
+        self.assertTrue(queries)
+        second, queries = self._catalog_queries('/api/products/by-handle/candle/')
+        self.assertEqual(queries, [])
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        # Query parameters are part of the key
+        response = self.client.get('/api/products/by_type/', {'type': 'Candles'})
+        self.assertEqual(response.json(), [])
+        self.product.product_type = 'Candles'
+        self.product.save()
+        response = self.client.get('/api/products/by_type/', {'type': 'Candles'})
+        self.assertEqual([row['handle'] for row in response.json()], ['candle'])
+
+    def test_if_none_match(self):
+        """A matching ETag is answered with 304 until the catalog changes"""
+        etag = self.client.get('/api/products/').headers['ETag']
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.product.title = 'Scented candle'
+        self.product.save()
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['title'], 'Scented candle')
+
+    def test_bulk_writes_and_location_edits_invalidate(self):
+        """Writes that send no signals bump the version explicitly; location saves bump their own"""
+        self.client.get('/api/products/')
+        ShopifyProduct.objects.filter(pk=self.product.pk).update(title='Renamed')
+        self.assertEqual(self.client.get('/api/products/').json()['results'][0]['title'], 'Candle')
+        bump_version(CATALOG)
+        self.assertEqual(self.client.get('/api/products/').json()['results'][0]['title'], 'Renamed')
+
+        country = Country.objects.create(name='Australia', iso_code='AU', iso3_code='AUS', phone_code='+61')
+        self.assertEqual(len(self.client.get('/api/locations/countries/').json()), 1)
+        State.objects.create(name='Victoria', country=country)
+        countries = self.client.get('/api/locations/countries/').json()
+        self.assertEqual([state['name'] for state in countries[0]['states']], ['Victoria'])
+
+    def test_bumps_from_other_processes_invalidate(self):
+        """Counters live in the shared cache, so a bump made by a sync command or another worker is seen"""
+        self.assertNotIsInstance(caches[VERSION_CACHE], LocMemCache)
+        self.client.get('/api/products/')
+        ShopifyProduct.objects.filter(pk=self.product.pk).update(title='Renamed')
+
+        # The other process keeps its copy of the counters in its own default cache
+        with patch('api.response_cache.cache', LocMemCache('other-process', {})):
+            bump_version(CATALOG)
 
-# Create your tests here.
+        # Seen once this process's copy expires
+        self.assertEqual(self.client.get('/api/products/').json()['results'][0]['title'], 'Candle')
+        cache.delete(LOCAL_VERSION_KEY.format(CATALOG))
+        self.assertEqual(self.client.get('/api/products/').json()['results'][0]['title'], 'Renamed')
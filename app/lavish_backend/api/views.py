@@ -7,13 +7,14 @@ from rest_framework import viewsets, generics, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from django.db.models import Q, Sum
+from django.db.models import Count, Q, Sum
 from products.models import ShopifyProduct
 from inventory.models import ShopifyInventoryLevel
 from customers.models import ShopifyCustomer
-from orders.models import ShopifyOrder
+from orders.models import OrderDailyRollup, ShopifyOrder
 from shipping.models import ShopifyCarrierService, ShopifyDeliveryMethod
 from locations.models import Country, State, City
+from .response_cache import CATALOG, LOCATIONS, cache_response
 from .serializers import (
     ProductListSerializer, ProductDetailSerializer,
     OrderSerializer, CustomerSerializer,
@@ -37,6 +38,7 @@ class LocationViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Country.objects.all()
     
     @action(detail=False, methods=['get'])
+    @cache_response(LOCATIONS)
     def countries(self, request):
         """Get all countries with their states and cities"""
         countries = Country.objects.prefetch_related('states__cities').all()
@@ -44,6 +46,7 @@ class LocationViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'], url_path='countries/(?P<country_id>[^/.]+)/states')
+    @cache_response(LOCATIONS)
     def country_states(self, request, country_id=None):
         """Get states for a specific country"""
         try:
@@ -55,6 +58,7 @@ class LocationViewSet(viewsets.ReadOnlyModelViewSet):
             return Response({'error': 'Country not found'}, status=404)
     
     @action(detail=False, methods=['get'], url_path='states/(?P<state_id>[^/.]+)/cities')
+    @cache_response(LOCATIONS)
     def state_cities(self, request, state_id=None):
         """Get cities for a specific state"""
         try:
@@ -66,6 +70,7 @@ class LocationViewSet(viewsets.ReadOnlyModelViewSet):
             return Response({'error': 'State not found'}, status=404)
     
     @action(detail=False, methods=['get'])
+    @cache_response(LOCATIONS)
     def phone_codes(self, request):
         """Get phone codes for all countries"""
         countries = Country.objects.all()
@@ -93,7 +98,7 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     - GET /api/products/featured/ - Get featured products
     - GET /api/products/search/?q=query - Search products
     """
-    queryset = ShopifyProduct.objects.filter(status='active').prefetch_related('images', 'variants')
+    queryset = ShopifyProduct.objects.filter(status='active')
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'description', 'product_type', 'vendor', 'tags']
@@ -105,41 +110,55 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
             return ProductDetailSerializer
         return ProductListSerializer
     
+    def get_queryset(self):
+        # Images, prices and stock come from annotations and prefetches, not per-product queries
+        return self.get_serializer_class().setup_eager_loading(super().get_queryset())
+    
+    @cache_response(CATALOG)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @cache_response(CATALOG)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     @action(detail=False, methods=['get'], url_path='by-handle/(?P<handle>[^/.]+)')
+    @cache_response(CATALOG)
     def by_handle(self, request, handle=None):
         """Get product by handle"""
         try:
-            product = self.queryset.get(handle=handle)
+            product = self.get_queryset().get(handle=handle)
             serializer = ProductDetailSerializer(product)
             return Response(serializer.data)
         except ShopifyProduct.DoesNotExist:
             return Response({'error': 'Product not found'}, status=404)
     
     @action(detail=False, methods=['get'])
+    @cache_response(CATALOG)
     def featured(self, request):
         """Get featured products (products with inventory)"""
-        products = self.queryset.filter(
-            variants__inventory_item__levels__available__gt=0
-        ).distinct()[:12]
+        products = self.get_queryset().filter(has_stock=True)[:12]
         serializer = ProductListSerializer(products, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @cache_response(CATALOG)
     def by_type(self, request):
         """Get products by type"""
         product_type = request.query_params.get('type', None)
         if product_type:
-            products = self.queryset.filter(product_type__iexact=product_type)
+            products = self.get_queryset().filter(product_type__iexact=product_type)
             serializer = ProductListSerializer(products, many=True)
             return Response(serializer.data)
         return Response({'error': 'Type parameter required'}, status=400)
     
     @action(detail=False, methods=['get'])
+    @cache_response(CATALOG)
     def by_vendor(self, request):
         """Get products by vendor"""
         vendor = request.query_params.get('vendor', None)
         if vendor:
-            products = self.queryset.filter(vendor__iexact=vendor)
+            products = self.get_queryset().filter(vendor__iexact=vendor)
             serializer = ProductListSerializer(products, many=True)
             return Response(serializer.data)
         return Response({'error': 'Vendor parameter required'}, status=400)
@@ -249,24 +268,29 @@ class StatsView(generics.GenericAPIView):
     
     def get(self, request):
         """Get store statistics"""
+        # One conditional aggregate per table; order counts come from the daily rollups
+        products = ShopifyProduct.objects.aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(status='active')),
+        )
+        orders = OrderDailyRollup.objects.aggregate(
+            total=Sum('order_count'),
+            pending=Sum('order_count', filter=Q(financial_status='pending')),
+            fulfilled=Sum('order_count', filter=Q(fulfillment_status='fulfilled')),
+        )
+        inventory = ShopifyInventoryLevel.objects.aggregate(
+            total_items=Count('id'),
+            low_stock=Count('id', filter=Q(available__lte=10, available__gt=0)),
+            out_of_stock=Count('id', filter=Q(available=0)),
+        )
+        
         stats = {
-            'products': {
-                'total': ShopifyProduct.objects.count(),
-                'active': ShopifyProduct.objects.filter(status='active').count(),
-            },
-            'orders': {
-                'total': ShopifyOrder.objects.count(),
-                'pending': ShopifyOrder.objects.filter(financial_status='pending').count(),
-                'fulfilled': ShopifyOrder.objects.filter(fulfillment_status='fulfilled').count(),
-            },
+            'products': products,
+            'orders': {key: value or 0 for key, value in orders.items()},
             'customers': {
                 'total': ShopifyCustomer.objects.count(),
             },
-            'inventory': {
-                'total_items': ShopifyInventoryLevel.objects.count(),
-                'low_stock': ShopifyInventoryLevel.objects.filter(available__lte=10, available__gt=0).count(),
-                'out_of_stock': ShopifyInventoryLevel.objects.filter(available=0).count(),
-            }
+            'inventory': inventory,
         }
         
         return Response(stats)
@@ -0,0 +1,17 @@
+"""
+Database helpers shared across apps
+"""
+
+import threading
+from contextlib import nullcontext
+
+from django.db import connection
+
+# SQLite allows one writer per database, so every in-process writer thread takes turns on this lock;
+# it is re-entrant so a write made while the lock is held (e.g. a rate limit snapshot) does not deadlock
+sqlite_write_lock = threading.RLock()
+
+
+def sqlite_writer():
+    """Serialize a block of writes when the default database is SQLite; a no-op elsewhere"""
+    return sqlite_write_lock if connection.vendor == 'sqlite' else nullcontext()
@@ -142,6 +142,39 @@ DATABASES = {
 }
 
 
+# Cache
+# The default cache is process-local unless REDIS_URL is set. Version counters
+# that invalidate API responses, currency symbols and the shipping rate table
+# live in the 'shared' cache, so bumps made by sync commands and other workers
+# reach every process: Redis when REDIS_URL is set, otherwise a database table
+# created by the api app's migrations.
+
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+if REDIS_URL:
+    REDIS_CACHE = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': REDIS_URL,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        },
+    }
+    CACHES = {
+        'default': REDIS_CACHE,
+        'shared': REDIS_CACHE,
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'lavish_cache',
+        },
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -11,6 +11,7 @@ from .models import (
     ProductShippingConfig, ShippingCutoffLog
 )
 from .bidirectional_sync import subscription_sync
+from shopify_integration.push_admin import ShopifyPushStatusMixin
 import logging
 
 logger = logging.getLogger('customer_subscriptions')
@@ -66,12 +67,12 @@ class ShippingCutoffLogResource(resources.ModelResource):
 
 
 @admin.register(SellingPlan)
-class SellingPlanAdmin(ImportExportModelAdmin):
+class SellingPlanAdmin(ShopifyPushStatusMixin, ImportExportModelAdmin):
     resource_class = SellingPlanResource
-    list_display = ('name', 'interval_display', 'price_display', 'status_badge', 'created_in_django', 'needs_shopify_push', 'product_count')
+    list_display = ('name', 'interval_display', 'price_display', 'status_badge', 'created_in_django', 'needs_shopify_push', 'push_status_badge', 'product_count')
     list_filter = ('billing_interval', 'is_active', 'created_in_django', 'needs_shopify_push', 'price_adjustment_type')
     search_fields = ('name', 'description', 'shopify_id')
-    readonly_fields = ('shopify_id', 'shopify_selling_plan_group_id', 'created_at', 'updated_at', 'last_pushed_to_shopify', 'shopify_push_error')
+    readonly_fields = ('shopify_id', 'shopify_selling_plan_group_id', 'created_at', 'updated_at', 'last_pushed_to_shopify', 'shopify_push_error', 'push_status_badge')
     filter_horizontal = ('products',)
     
     fieldsets = (
@@ -98,7 +99,7 @@ class SellingPlanAdmin(ImportExportModelAdmin):
             'fields': ('products',)
         }),
         ('Sync Status', {
-            'fields': ('created_in_django', 'needs_shopify_push', 'shopify_push_error', 'last_pushed_to_shopify')
+            'fields': ('created_in_django', 'needs_shopify_push', 'push_status_badge', 'shopify_push_error', 'last_pushed_to_shopify')
         }),
         ('Metadata', {
             'fields': ('store_domain', 'created_at', 'updated_at'),
@@ -108,122 +109,19 @@ class SellingPlanAdmin(ImportExportModelAdmin):
     
     actions = ['push_to_shopify', 'mark_for_push', 'publish_products_to_store']
     
-    def save_model(self, request, obj, form, change):
-        """Auto-push to Shopify on create/update"""
-        super().save_model(request, obj, form, change)
+    def save_related(self, request, form, formsets, change):
+        """Queue the Shopify push once the plan's products are saved too"""
+        super().save_related(request, form, formsets, change)
         
-        # Auto-push to Shopify if flagged
+        # The push also publishes the associated products to the Online Store
+        obj = form.instance
         if obj.needs_shopify_push:
-            result = subscription_sync.create_selling_plan_in_shopify(obj)
-            
-            if result.get('success'):
-                # Refresh to get the real Shopify ID
-                obj.refresh_from_db()
-                self.message_user(request, f"✅ Selling Plan synced to Shopify: {obj.name} (ID: {obj.shopify_id})", level=messages.SUCCESS)
-                
-                # Auto-publish associated products to Online Store
-                published_count = self._publish_products_to_online_store(obj)
-                if published_count > 0:
-                    self.message_user(request, f"✅ Published {published_count} associated product(s) to Online Store", level=messages.SUCCESS)
-            else:
-                self.message_user(request, f"⚠️ Selling Plan saved locally but Shopify sync failed: {result.get('message', 'Unknown error')}", level=messages.WARNING)
+            self.queue_shopify_push(request, [obj])
+            self.message_user(request, f"📤 Selling Plan saved; Shopify push queued: {obj.name}", level=messages.SUCCESS)
     
     def _publish_products_to_online_store(self, selling_plan):
         """Publish all associated products to the Online Store channel"""
-        from shopify_integration.enhanced_client import EnhancedShopifyAPIClient
-        
-        client = EnhancedShopifyAPIClient()
-        published_count = 0
-        
-        # Get Online Store publication ID
-        pub_query = """
-        {
-          publications(first: 10) {
-            edges {
-              node {
-                id
-                name
-              }
-            }
-          }
-        }
-        """
-        
-        pub_result = client.execute_graphql_query(pub_query)
-        
-        if "errors" in pub_result:
-            logger.error(f"Failed to get publications: {pub_result['errors']}")
-            return 0
-        
-        publications = pub_result.get("data", {}).get("publications", {}).get("edges", [])
-        online_store_id = None
-        
-        for pub_edge in publications:
-            pub = pub_edge.get("node", {})
-            if pub.get("name") == "Online Store":
-                online_store_id = pub.get("id")
-                break
-        
-        if not online_store_id:
-            logger.error("Could not find Online Store publication")
-            return 0
-        
-        # Publish each associated product
-        for product in selling_plan.products.all():
-            if not product.shopify_id or product.shopify_id.startswith('temp_'):
-                continue
-            
-            # Check if already published
-            check_query = """
-            query($id: ID!) {
-              product(id: $id) {
-                id
-                publishedAt
-              }
-            }
-            """
-            
-            check_result = client.execute_graphql_query(check_query, {"id": product.shopify_id})
-            
-            if "errors" not in check_result:
-                prod_data = check_result.get("data", {}).get("product", {})
-                if prod_data and prod_data.get("publishedAt"):
-                    # Already published
-                    continue
-            
-            # Publish the product
-            publish_mutation = """
-            mutation publishProduct($id: ID!, $input: [PublicationInput!]!) {
-              publishablePublish(id: $id, input: $input) {
-                publishable {
-                  ... on Product {
-                    id
-                    title
-                    onlineStoreUrl
-                  }
-                }
-                userErrors {
-                  field
-                  message
-                }
-              }
-            }
-            """
-            
-            publish_result = client.execute_graphql_query(publish_mutation, {
-                "id": product.shopify_id,
-                "input": [{"publicationId": online_store_id}]
-            })
-            
-            if "errors" not in publish_result:
-                publish_data = publish_result.get("data", {}).get("publishablePublish", {})
-                user_errors = publish_data.get("userErrors", [])
-                
-                if not user_errors:
-                    published_count += 1
-                    logger.info(f"Published product to Online Store: {product.title}")
-        
-        return published_count
+        return subscription_sync.publish_selling_plan_products(selling_plan)
     
     def interval_display(self, obj):
         return f"Every {obj.billing_interval_count} {obj.billing_interval}(s)"
@@ -249,23 +147,8 @@ class SellingPlanAdmin(ImportExportModelAdmin):
     product_count.short_description = 'Products'
     
     def push_to_shopify(self, request, queryset):
-        """Push selected selling plans to Shopify"""
-        results = {"successful": 0, "failed": 0, "errors": []}
-        
-        for plan in queryset:
-            result = subscription_sync.create_selling_plan_in_shopify(plan)
-            if result.get("success"):
-                results["successful"] += 1
-            else:
-                results["failed"] += 1
-                results["errors"].append(f"{plan.name}: {result.get('message', 'Unknown error')}")
-        
-        if results["successful"] > 0:
-            self.message_user(request, f"✅ Successfully pushed {results['successful']} selling plans to Shopify", level=messages.SUCCESS)
-        
-        if results["failed"] > 0:
-            error_msg = f"❌ Failed to push {results['failed']} plans. Errors: " + "; ".join(results["errors"][:3])
-            self.message_user(request, error_msg, level=messages.ERROR)
+        """Queue pushes of the selected selling plans to Shopify"""
+        self.queue_shopify_push_action(request, queryset, 'push', 'selling plans')
     
     push_to_shopify.short_description = "📤 Push selling plans TO Shopify"
     
@@ -295,12 +178,12 @@ class SellingPlanAdmin(ImportExportModelAdmin):
 
 
 @admin.register(CustomerSubscription)
-class CustomerSubscriptionAdmin(ImportExportModelAdmin):
+class CustomerSubscriptionAdmin(ShopifyPushStatusMixin, ImportExportModelAdmin):
     resource_class = CustomerSubscriptionResource
-    list_display = ('customer_display', 'selling_plan_display', 'status_badge', 'next_billing_date', 'total_price', 'created_in_django', 'needs_shopify_push')
+    list_display = ('customer_display', 'selling_plan_display', 'status_badge', 'next_billing_date', 'total_price', 'created_in_django', 'needs_shopify_push', 'push_status_badge')
     list_filter = ('status', 'created_in_django', 'needs_shopify_push', 'billing_policy_interval', 'next_billing_date')
     search_fields = ('shopify_id', 'customer__email', 'customer__first_name', 'customer__last_name', 'notes')
-    readonly_fields = ('shopify_id', 'contract_created_at', 'contract_updated_at', 'created_at', 'updated_at', 'last_pushed_to_shopify', 'last_synced_from_shopify', 'shopify_push_error', 'billing_cycle_count')
+    readonly_fields = ('shopify_id', 'contract_created_at', 'contract_updated_at', 'created_at', 'updated_at', 'last_pushed_to_shopify', 'last_synced_from_shopify', 'shopify_push_error', 'billing_cycle_count', 'push_status_badge')
     raw_id_fields = ('customer', 'selling_plan')
     
     fieldsets = (
@@ -328,7 +211,7 @@ class CustomerSubscriptionAdmin(ImportExportModelAdmin):
             'classes': ('collapse',)
         }),
         ('Sync Status', {
-            'fields': ('created_in_django', 'needs_shopify_push', 'shopify_push_error', 'last_pushed_to_shopify', 'last_synced_from_shopify')
+            'fields': ('created_in_django', 'needs_shopify_push', 'push_status_badge', 'shopify_push_error', 'last_pushed_to_shopify', 'last_synced_from_shopify')
         }),
         ('Notes & Metadata', {
             'fields': ('notes', 'store_domain', 'created_at', 'updated_at'),
@@ -339,28 +222,14 @@ class CustomerSubscriptionAdmin(ImportExportModelAdmin):
     actions = ['push_to_shopify', 'update_in_shopify', 'cancel_in_shopify', 'create_billing_attempt', 'mark_for_push']
     
     def save_model(self, request, obj, form, change):
-        """Auto-push to Shopify on create/update"""
+        """Queue the Shopify create/update after saving"""
         super().save_model(request, obj, form, change)
         
-        # Auto-push to Shopify if flagged
+        # The job creates the contract, or updates it once it has a real Shopify ID
         if obj.needs_shopify_push:
-            # Determine if this is create or update
-            if obj.shopify_id and not obj.shopify_id.startswith('temp_'):
-                # Update existing subscription
-                result = subscription_sync.update_subscription_in_shopify(obj)
-                action = "updated"
-            else:
-                # Create new subscription
-                result = subscription_sync.create_subscription_in_shopify(obj)
-                action = "created"
-            
-            if result.get('success'):
-                # Refresh to get the real Shopify ID
-                obj.refresh_from_db()
-                customer_name = f"{obj.customer.first_name} {obj.customer.last_name}" if obj.customer else "Customer"
-                self.message_user(request, f"✅ Subscription {action} in Shopify for {customer_name} (ID: {obj.shopify_id})", level=messages.SUCCESS)
-            else:
-                self.message_user(request, f"⚠️ Subscription saved locally but Shopify sync failed: {result.get('message', 'Unknown error')}", level=messages.WARNING)
+            self.queue_shopify_push(request, [obj])
+            customer_name = f"{obj.customer.first_name} {obj.customer.last_name}" if obj.customer else "Customer"
+            self.message_user(request, f"📤 Subscription saved; Shopify push queued for {customer_name}", level=messages.SUCCESS)
     
     def customer_display(self, obj):
         if obj.customer:
@@ -395,49 +264,20 @@ class CustomerSubscriptionAdmin(ImportExportModelAdmin):
     status_badge.short_description = 'Status'
     
     def push_to_shopify(self, request, queryset):
-        """Push selected subscriptions to Shopify (create new)"""
-        results = {"successful": 0, "failed": 0, "errors": []}
-        
-        for subscription in queryset:
-            result = subscription_sync.create_subscription_in_shopify(subscription)
-            if result.get("success"):
-                results["successful"] += 1
-            else:
-                results["failed"] += 1
-                results["errors"].append(f"Sub {subscription.id}: {result.get('message', 'Unknown error')}")
-        
-        if results["successful"] > 0:
-            self.message_user(request, f"✅ Successfully pushed {results['successful']} subscriptions to Shopify", level=messages.SUCCESS)
-        
-        if results["failed"] > 0:
-            error_msg = f"❌ Failed to push {results['failed']} subscriptions. Errors: " + "; ".join(results["errors"][:3])
-            self.message_user(request, error_msg, level=messages.ERROR)
+        """Queue creation of the selected subscriptions in Shopify"""
+        self.queue_shopify_push_action(request, queryset, 'create', 'subscriptions')
     
     push_to_shopify.short_description = "📤 Push subscriptions TO Shopify (Create)"
     
     def update_in_shopify(self, request, queryset):
-        """Update existing subscriptions in Shopify"""
-        results = {"successful": 0, "failed": 0, "errors": []}
-        
-        for subscription in queryset:
-            if not subscription.shopify_id:
-                results["failed"] += 1
-                results["errors"].append(f"Sub {subscription.id}: No Shopify ID")
-                continue
-            
-            result = subscription_sync.update_subscription_in_shopify(subscription)
-            if result.get("success"):
-                results["successful"] += 1
-            else:
-                results["failed"] += 1
-                results["errors"].append(f"Sub {subscription.id}: {result.get('message', 'Unknown error')}")
-        
-        if results["successful"] > 0:
-            self.message_user(request, f"✅ Successfully updated {results['successful']} subscriptions in Shopify", level=messages.SUCCESS)
-        
-        if results["failed"] > 0:
-            error_msg = f"❌ Failed to update {results['failed']} subscriptions. Errors: " + "; ".join(results["errors"][:3])
+        """Queue updates of the selected subscriptions in Shopify"""
+        missing = [f"Sub {subscription.id}" for subscription in queryset if not subscription.shopify_id]
+        if missing:
+            error_msg = f"❌ {len(missing)} subscriptions have no Shopify ID: " + "; ".join(missing[:3])
             self.message_user(request, error_msg, level=messages.ERROR)
+        
+        with_id = [subscription for subscription in queryset if subscription.shopify_id]
+        self.queue_shopify_push_action(request, with_id, 'update', 'subscriptions')
     
     update_in_shopify.short_description = "🔄 Update subscriptions IN Shopify"
     
@@ -15,6 +15,7 @@ from typing import Dict, List, Optional
 from django.utils import timezone
 from django.db import transaction
 from shopify_integration.enhanced_client import EnhancedShopifyAPIClient
+from shopify_integration.push_executor import PushExecutor, push_metrics
 from datetime import datetime, date
 
 logger = logging.getLogger('customer_subscriptions')
@@ -220,6 +221,109 @@ class SubscriptionBidirectionalSync:
                 "message": f"Failed to create selling plan: {e}"
             }
     
+    def publish_selling_plan_products(self, selling_plan) -> int:
+        """
+        Publish a selling plan's products to the Online Store channel
+        
+        Args:
+            selling_plan: SellingPlan instance
+            
+        Returns:
+            Number of products newly published
+        """
+        client = self.client
+        published_count = 0
+        
+        # Get Online Store publication ID
+        pub_query = """
+        {
+          publications(first: 10) {
+            edges {
+              node {
+                id
+                name
+              }
+            }
+          }
+        }
+        """
+        
+        pub_result = client.execute_graphql_query(pub_query)
+        
+        if "errors" in pub_result:
+            logger.error(f"Failed to get publications: {pub_result['errors']}")
+            return 0
+        
+        publications = pub_result.get("data", {}).get("publications", {}).get("edges", [])
+        online_store_id = None
+        
+        for pub_edge in publications:
+            pub = pub_edge.get("node", {})
+            if pub.get("name") == "Online Store":
+                online_store_id = pub.get("id")
+                break
+        
+        if not online_store_id:
+            logger.error("Could not find Online Store publication")
+            return 0
+        
+        # Publish each associated product
+        for product in selling_plan.products.all():
+            if not product.shopify_id or product.shopify_id.startswith('temp_'):
+                continue
+            
+            # Check if already published
+            check_query = """
+            query($id: ID!) {
+              product(id: $id) {
+                id
+                publishedAt
+              }
+            }
+            """
+            
+            check_result = client.execute_graphql_query(check_query, {"id": product.shopify_id})
+            
+            if "errors" not in check_result:
+                prod_data = check_result.get("data", {}).get("product", {})
+                if prod_data and prod_data.get("publishedAt"):
+                    # Already published
+                    continue
+            
+            # Publish the product
+            publish_mutation = """
+            mutation publishProduct($id: ID!, $input: [PublicationInput!]!) {
+              publishablePublish(id: $id, input: $input) {
+                publishable {
+                  ... on Product {
+                    id
+                    title
+                    onlineStoreUrl
+                  }
+                }
+                userErrors {
+                  field
+                  message
+                }
+              }
+            }
+            """
+            
+            publish_result = client.execute_graphql_query(publish_mutation, {
+                "id": product.shopify_id,
+                "input": [{"publicationId": online_store_id}]
+            })
+            
+            if "errors" not in publish_result:
+                publish_data = publish_result.get("data", {}).get("publishablePublish", {})
+                user_errors = publish_data.get("userErrors", [])
+                
+                if not user_errors:
+                    published_count += 1
+                    logger.info(f"Published product to Online Store: {product.title}")
+        
+        return published_count
+    
     # ==================== SUBSCRIPTION CONTRACT SYNC ====================
     
     def create_subscription_in_shopify(self, subscription) -> Dict:
@@ -759,39 +863,48 @@ class SubscriptionBidirectionalSync:
     
     # ==================== BULK OPERATIONS ====================
     
-    def sync_pending_subscriptions(self) -> Dict:
+    def _push_subscription(self, subscription) -> Dict:
+        if subscription.shopify_id:
+            return self.update_subscription_in_shopify(subscription)
+        return self.create_subscription_in_shopify(subscription)
+    
+    def sync_pending_subscriptions(self, workers: Optional[int] = None) -> Dict:
         """
         Sync all subscriptions marked for push to Shopify
         
+        Subscriptions are pushed concurrently; those of one customer are
+        pushed in order by the same worker.
+        
+        Args:
+            workers: Concurrent pushes (default SHOPIFY_PUSH_SETTINGS)
+        
         Returns:
             Dict with results summary
         """
         from customer_subscriptions.models import CustomerSubscription
         
-        pending = CustomerSubscription.objects.filter(needs_shopify_push=True)
+        pending = CustomerSubscription.objects.filter(needs_shopify_push=True).select_related('customer')
+        report = PushExecutor(
+            self._push_subscription,
+            key=lambda subscription: subscription.customer_id,
+            workers=workers,
+            label='subscriptions',
+        ).run(pending)
         
         results = {
-            "total": pending.count(),
-            "successful": 0,
-            "failed": 0,
-            "errors": []
-        }
-        
-        for subscription in pending:
-            if subscription.shopify_id:
-                result = self.update_subscription_in_shopify(subscription)
-            else:
-                result = self.create_subscription_in_shopify(subscription)
-            
-            if result.get("success"):
-                results["successful"] += 1
-            else:
-                results["failed"] += 1
-                results["errors"].append({
+            "total": report["total"],
+            "successful": report["successful"],
+            "failed": report["failed"],
+            "errors": [
+                {
                     "subscription_id": subscription.id,
                     "customer": str(subscription.customer),
                     "error": result.get("message", "Unknown error")
-                })
+                }
+                for subscription, result in report["results"] if not result.get("success")
+            ],
+        }
+        results.update(push_metrics(report))
         
         logger.info(f"Bulk sync completed: {results['successful']}/{results['total']} successful")
         return results
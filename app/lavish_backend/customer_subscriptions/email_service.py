@@ -2,10 +2,10 @@
 Email notification services for subscription management
 """
 import logging
-from django.template import Template, Context
 from django.utils import timezone
 from email_manager.models import EmailTemplate, EmailConfiguration, EmailHistory
 from email_manager.utils import send_email
+from email_manager.template_cache import template_cache
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
@@ -62,13 +62,7 @@ class SubscriptionEmailService:
             }
             
             # Render template
-            html_template = Template(template.html_content)
-            plain_template = Template(template.plain_text_content)
-            subject_template = Template(template.subject)
-            
-            html_content = html_template.render(Context(context))
-            plain_content = plain_template.render(Context(context))
-            subject = subject_template.render(Context(context))
+            subject, html_content, plain_content = template_cache.render(template, context)
             
             # Get email config
             config = template.configuration or EmailConfiguration.get_default()
@@ -140,13 +134,7 @@ class SubscriptionEmailService:
             }
             
             # Render template
-            html_template = Template(template.html_content)
-            plain_template = Template(template.plain_text_content)
-            subject_template = Template(template.subject)
-            
-            html_content = html_template.render(Context(context))
-            plain_content = plain_template.render(Context(context))
-            subject = subject_template.render(Context(context))
+            subject, html_content, plain_content = template_cache.render(template, context)
             
             # Get email config
             config = template.configuration or EmailConfiguration.get_default()
@@ -218,13 +206,7 @@ class SubscriptionEmailService:
             }
             
             # Render template
-            html_template = Template(template.html_content)
-            plain_template = Template(template.plain_text_content)
-            subject_template = Template(template.subject)
-            
-            html_content = html_template.render(Context(context))
-            plain_content = plain_template.render(Context(context))
-            subject = subject_template.render(Context(context))
+            subject, html_content, plain_content = template_cache.render(template, context)
             
             # Get email config
             config = template.configuration or EmailConfiguration.get_default()
@@ -285,13 +267,7 @@ class SubscriptionEmailService:
             }
             
             # Render template
-            html_template = Template(template.html_content)
-            plain_template = Template(template.plain_text_content)
-            subject_template = Template(template.subject)
-            
-            html_content = html_template.render(Context(context))
-            plain_content = plain_template.render(Context(context))
-            subject = subject_template.render(Context(context))
+            subject, html_content, plain_content = template_cache.render(template, context)
             
             # Get email config
             config = template.configuration or EmailConfiguration.get_default()
@@ -339,13 +315,7 @@ class SubscriptionEmailService:
             context = template.variables
             
             # Render template
-            html_template = Template(template.html_content)
-            plain_template = Template(template.plain_text_content)
-            subject_template = Template(template.subject)
-            
-            html_content = html_template.render(Context(context))
-            plain_content = plain_template.render(Context(context))
-            subject = subject_template.render(Context(context))
+            subject, html_content, plain_content = template_cache.render(template, context)
             
             # Get email config
             config = template.configuration or EmailConfiguration.get_default()
@@ -12,11 +12,12 @@ Required Webhooks:
 - subscription_billing_attempts/failure
 - customer_payment_methods/create
 - customer_payment_methods/revoke
+
+Each endpoint only verifies and queues the delivery (shopify_integration.webhook_queue);
+the process_* functions below run on the webhook workers.
 """
 
-import json
 import logging
-from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.db import transaction
@@ -25,15 +26,15 @@ from datetime import datetime, date
 from .models import CustomerSubscription, SubscriptionBillingAttempt
 from customers.models import ShopifyCustomer
 from shopify_integration.enhanced_client import EnhancedShopifyAPIClient
+from shopify_integration.webhook_queue import enqueue_webhook
 
 logger = logging.getLogger('customer_subscriptions.webhooks')
 
 
 def verify_shopify_webhook(request):
-    """Verify webhook is from Shopify (implement HMAC verification)"""
-    # TODO: Add HMAC verification for production
-    # For now, we'll trust the request
-    return True
+    """Verify webhook is from Shopify using the X-Shopify-Hmac-Sha256 header"""
+    from shopify_integration.client import ShopifyWebhookHandler
+    return ShopifyWebhookHandler().verify_webhook(request)
 
 
 @csrf_exempt
@@ -45,95 +46,95 @@ def subscription_contract_create_webhook(request):
     Fired when: Customer purchases a subscription product
     Action: Sync subscription contract to Django
     """
-    if not verify_shopify_webhook(request):
-        return HttpResponse('Unauthorized', status=401)
+    return enqueue_webhook(request, 'subscription_contracts/create')
+
+
+def process_subscription_contract_create(data: dict) -> dict:
+    """
+    Process subscription_contracts/create webhook
+    
+    Fired when: Customer purchases a subscription product
+    Action: Sync subscription contract to Django
+    """
+    contract_id = data.get('admin_graphql_api_id')
+    customer_data = data.get('customer', {})
+    customer_id = customer_data.get('admin_graphql_api_id')
     
+    logger.info(f"📥 Received subscription contract create: {contract_id}")
+    
+    # Get or create customer
     try:
-        data = json.loads(request.body)
-        
-        contract_id = data.get('admin_graphql_api_id')
-        customer_data = data.get('customer', {})
-        customer_id = customer_data.get('admin_graphql_api_id')
-        
-        logger.info(f"📥 Received subscription contract create: {contract_id}")
-        
-        # Get or create customer
-        try:
-            customer = ShopifyCustomer.objects.get(shopify_id=customer_id)
-        except ShopifyCustomer.DoesNotExist:
-            logger.warning(f"Customer {customer_id} not found, syncing from Shopify...")
-            # Sync customer from Shopify
-            from customers.realtime_sync import sync_single_customer
-            customer = sync_single_customer(customer_id)
-            if not customer:
-                logger.error(f"Failed to sync customer {customer_id}")
-                return JsonResponse({'status': 'error', 'message': 'Customer sync failed'}, status=400)
-        
-        # Parse billing and delivery policies
-        billing_policy = data.get('billing_policy', {})
-        delivery_policy = data.get('delivery_policy', {})
-        
-        # Get line items
-        lines = data.get('lines', [])
-        line_items = []
-        for line in lines:
-            line_items.append({
-                'variant_id': line.get('variant_id'),
-                'product_id': line.get('product_id'),
-                'quantity': line.get('quantity'),
-                'current_price': str(line.get('line_price', '0')),
-                'title': line.get('title'),
-                'variant_title': line.get('variant_title')
-            })
-        
-        # Parse delivery address
-        delivery_address = {}
-        if 'delivery_method' in data and 'address' in data['delivery_method']:
-            addr = data['delivery_method']['address']
-            delivery_address = {
-                'first_name': addr.get('first_name', ''),
-                'last_name': addr.get('last_name', ''),
-                'address1': addr.get('address1', ''),
-                'address2': addr.get('address2', ''),
-                'city': addr.get('city', ''),
-                'province': addr.get('province', ''),
-                'country': addr.get('country', ''),
-                'zip': addr.get('zip', '')
-            }
-        
-        # Create or update subscription in Django
-        with transaction.atomic():
-            subscription, created = CustomerSubscription.objects.update_or_create(
-                shopify_id=contract_id,
-                defaults={
-                    'customer': customer,
-                    'status': data.get('status', 'ACTIVE'),
-                    'currency': data.get('currency_code', 'USD'),
-                    'next_billing_date': datetime.fromisoformat(data['next_billing_date'].replace('Z', '+00:00')).date() if data.get('next_billing_date') else None,
-                    'billing_policy_interval': billing_policy.get('interval', 'MONTH'),
-                    'billing_policy_interval_count': billing_policy.get('interval_count', 1),
-                    'delivery_policy_interval': delivery_policy.get('interval', 'MONTH'),
-                    'delivery_policy_interval_count': delivery_policy.get('interval_count', 1),
-                    'line_items': line_items,
-                    'delivery_address': delivery_address,
-                    'contract_created_at': timezone.now(),
-                    'last_synced_from_shopify': timezone.now(),
-                    'needs_shopify_push': False,
-                }
-            )
-        
-        action = "Created" if created else "Updated"
-        logger.info(f"✅ {action} subscription in Django: {contract_id}")
-        
-        return JsonResponse({
-            'status': 'success',
-            'message': f'Subscription {action.lower()} in Django',
-            'subscription_id': subscription.id
+        customer = ShopifyCustomer.objects.get(shopify_id=customer_id)
+    except ShopifyCustomer.DoesNotExist:
+        logger.warning(f"Customer {customer_id} not found, syncing from Shopify...")
+        # Sync customer from Shopify
+        from customers.realtime_sync import sync_single_customer
+        customer = sync_single_customer(customer_id)
+        if not customer:
+            # Raised so the queue retries the delivery
+            raise ValueError(f"Failed to sync customer {customer_id}")
+    
+    # Parse billing and delivery policies
+    billing_policy = data.get('billing_policy', {})
+    delivery_policy = data.get('delivery_policy', {})
+    
+    # Get line items
+    lines = data.get('lines', [])
+    line_items = []
+    for line in lines:
+        line_items.append({
+            'variant_id': line.get('variant_id'),
+            'product_id': line.get('product_id'),
+            'quantity': line.get('quantity'),
+            'current_price': str(line.get('line_price', '0')),
+            'title': line.get('title'),
+            'variant_title': line.get('variant_title')
         })
-        
-    except Exception as e:
-        logger.error(f"❌ Error handling subscription create webhook: {e}")
-        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+    
+    # Parse delivery address
+    delivery_address = {}
+    if 'delivery_method' in data and 'address' in data['delivery_method']:
+        addr = data['delivery_method']['address']
+        delivery_address = {
+            'first_name': addr.get('first_name', ''),
+            'last_name': addr.get('last_name', ''),
+            'address1': addr.get('address1', ''),
+            'address2': addr.get('address2', ''),
+            'city': addr.get('city', ''),
+            'province': addr.get('province', ''),
+            'country': addr.get('country', ''),
+            'zip': addr.get('zip', '')
+        }
+    
+    # Create or update subscription in Django
+    with transaction.atomic():
+        subscription, created = CustomerSubscription.objects.update_or_create(
+            shopify_id=contract_id,
+            defaults={
+                'customer': customer,
+                'status': data.get('status', 'ACTIVE'),
+                'currency': data.get('currency_code', 'USD'),
+                'next_billing_date': datetime.fromisoformat(data['next_billing_date'].replace('Z', '+00:00')).date() if data.get('next_billing_date') else None,
+                'billing_policy_interval': billing_policy.get('interval', 'MONTH'),
+                'billing_policy_interval_count': billing_policy.get('interval_count', 1),
+                'delivery_policy_interval': delivery_policy.get('interval', 'MONTH'),
+                'delivery_policy_interval_count': delivery_policy.get('interval_count', 1),
+                'line_items': line_items,
+                'delivery_address': delivery_address,
+                'contract_created_at': timezone.now(),
+                'last_synced_from_shopify': timezone.now(),
+                'needs_shopify_push': False,
+            }
+        )
+    
+    action = "Created" if created else "Updated"
+    logger.info(f"✅ {action} subscription in Django: {contract_id}")
+    
+    return {
+        'status': 'success',
+        'message': f'Subscription {action.lower()} in Django',
+        'subscription_id': subscription.id
+    }
 
 
 @csrf_exempt
@@ -145,47 +146,47 @@ def subscription_contract_update_webhook(request):
     Fired when: Customer updates subscription in Shopify
     Action: Sync changes to Django
     """
-    if not verify_shopify_webhook(request):
-        return HttpResponse('Unauthorized', status=401)
+    return enqueue_webhook(request, 'subscription_contracts/update')
+
+
+def process_subscription_contract_update(data: dict) -> dict:
+    """
+    Process subscription_contracts/update webhook
+    
+    Fired when: Customer updates subscription in Shopify
+    Action: Sync changes to Django
+    """
+    contract_id = data.get('admin_graphql_api_id')
+    
+    logger.info(f"📥 Received subscription contract update: {contract_id}")
     
+    # Update subscription in Django
     try:
-        data = json.loads(request.body)
+        subscription = CustomerSubscription.objects.get(shopify_id=contract_id)
         
-        contract_id = data.get('admin_graphql_api_id')
+        with transaction.atomic():
+            subscription.status = data.get('status', subscription.status)
+            if data.get('next_billing_date'):
+                subscription.next_billing_date = datetime.fromisoformat(
+                    data['next_billing_date'].replace('Z', '+00:00')
+                ).date()
+            
+            subscription.contract_updated_at = timezone.now()
+            subscription.last_synced_from_shopify = timezone.now()
+            subscription.needs_shopify_push = False
+            subscription.save()
         
-        logger.info(f"📥 Received subscription contract update: {contract_id}")
+        logger.info(f"✅ Updated subscription in Django: {contract_id}")
         
-        # Update subscription in Django
-        try:
-            subscription = CustomerSubscription.objects.get(shopify_id=contract_id)
-            
-            with transaction.atomic():
-                subscription.status = data.get('status', subscription.status)
-                if data.get('next_billing_date'):
-                    subscription.next_billing_date = datetime.fromisoformat(
-                        data['next_billing_date'].replace('Z', '+00:00')
-                    ).date()
-                
-                subscription.contract_updated_at = timezone.now()
-                subscription.last_synced_from_shopify = timezone.now()
-                subscription.needs_shopify_push = False
-                subscription.save()
-            
-            logger.info(f"✅ Updated subscription in Django: {contract_id}")
-            
-            return JsonResponse({
-                'status': 'success',
-                'message': 'Subscription updated in Django'
-            })
-            
-        except CustomerSubscription.DoesNotExist:
-            logger.warning(f"Subscription {contract_id} not found in Django, creating...")
-            # Fall back to create handler
-            return subscription_contract_create_webhook(request)
+        return {
+            'status': 'success',
+            'message': 'Subscription updated in Django'
+        }
         
-    except Exception as e:
-        logger.error(f"❌ Error handling subscription update webhook: {e}")
-        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+    except CustomerSubscription.DoesNotExist:
+        logger.warning(f"Subscription {contract_id} not found in Django, creating...")
+        # Fall back to create handler
+        return process_subscription_contract_create(data)
 
 
 @csrf_exempt
@@ -197,69 +198,69 @@ def subscription_billing_attempt_success_webhook(request):
     Fired when: Billing attempt succeeds and order is created
     Action: Update billing attempt status, update next billing date
     """
-    if not verify_shopify_webhook(request):
-        return HttpResponse('Unauthorized', status=401)
+    return enqueue_webhook(request, 'subscription_billing_attempts/success')
+
+
+def process_subscription_billing_attempt_success(data: dict) -> dict:
+    """
+    Process subscription_billing_attempts/success webhook
+    
+    Fired when: Billing attempt succeeds and order is created
+    Action: Update billing attempt status, update next billing date
+    """
+    attempt_id = data.get('admin_graphql_api_id')
+    contract_id = data.get('subscription_contract_id')
+    order_id = data.get('order_id')
+    
+    logger.info(f"📥 Billing attempt succeeded: {attempt_id}")
     
+    # Update subscription
     try:
-        data = json.loads(request.body)
-        
-        attempt_id = data.get('admin_graphql_api_id')
-        contract_id = data.get('subscription_contract_id')
-        order_id = data.get('order_id')
-        
-        logger.info(f"📥 Billing attempt succeeded: {attempt_id}")
+        subscription = CustomerSubscription.objects.get(shopify_id=contract_id)
         
-        # Update subscription
-        try:
-            subscription = CustomerSubscription.objects.get(shopify_id=contract_id)
+        with transaction.atomic():
+            # Update billing attempt if it exists
+            if attempt_id:
+                SubscriptionBillingAttempt.objects.filter(
+                    shopify_id=attempt_id
+                ).update(
+                    status='SUCCESS',
+                    shopify_order_id=order_id,
+                    completed_at=timezone.now()
+                )
+            
+            # Update subscription
+            subscription.billing_cycle_count += 1
             
-            with transaction.atomic():
-                # Update billing attempt if it exists
-                if attempt_id:
-                    SubscriptionBillingAttempt.objects.filter(
-                        shopify_id=attempt_id
-                    ).update(
-                        status='SUCCESS',
-                        shopify_order_id=order_id,
-                        completed_at=timezone.now()
-                    )
-                
-                # Update subscription
-                subscription.billing_cycle_count += 1
-                
-                # Calculate next billing date
-                from dateutil.relativedelta import relativedelta
-                
-                interval_map = {
-                    'DAY': 'days',
-                    'WEEK': 'weeks',
-                    'MONTH': 'months',
-                    'YEAR': 'years'
-                }
-                
-                interval_type = interval_map.get(subscription.billing_policy_interval, 'months')
-                kwargs = {interval_type: subscription.billing_policy_interval_count}
-                
-                if subscription.next_billing_date:
-                    subscription.next_billing_date = subscription.next_billing_date + relativedelta(**kwargs)
-                
-                subscription.save()
+            # Calculate next billing date
+            from dateutil.relativedelta import relativedelta
+            
+            interval_map = {
+                'DAY': 'days',
+                'WEEK': 'weeks',
+                'MONTH': 'months',
+                'YEAR': 'years'
+            }
             
-            logger.info(f"✅ Updated subscription after successful billing: {contract_id}")
+            interval_type = interval_map.get(subscription.billing_policy_interval, 'months')
+            kwargs = {interval_type: subscription.billing_policy_interval_count}
             
-            return JsonResponse({
-                'status': 'success',
-                'message': 'Billing success processed',
-                'order_id': order_id
-            })
+            if subscription.next_billing_date:
+                subscription.next_billing_date = subscription.next_billing_date + relativedelta(**kwargs)
             
-        except CustomerSubscription.DoesNotExist:
-            logger.warning(f"Subscription {contract_id} not found for billing attempt")
-            return JsonResponse({'status': 'warning', 'message': 'Subscription not found'}, status=404)
+            subscription.save()
+        
+        logger.info(f"✅ Updated subscription after successful billing: {contract_id}")
+        
+        return {
+            'status': 'success',
+            'message': 'Billing success processed',
+            'order_id': order_id
+        }
         
-    except Exception as e:
-        logger.error(f"❌ Error handling billing success webhook: {e}")
-        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+    except CustomerSubscription.DoesNotExist:
+        logger.warning(f"Subscription {contract_id} not found for billing attempt")
+        return {'status': 'warning', 'message': 'Subscription not found'}
 
 
 @csrf_exempt
@@ -271,58 +272,58 @@ def subscription_billing_attempt_failure_webhook(request):
     Fired when: Billing attempt fails
     Action: Log error, retry logic, notify customer
     """
-    if not verify_shopify_webhook(request):
-        return HttpResponse('Unauthorized', status=401)
+    return enqueue_webhook(request, 'subscription_billing_attempts/failure')
+
+
+def process_subscription_billing_attempt_failure(data: dict) -> dict:
+    """
+    Process subscription_billing_attempts/failure webhook
+    
+    Fired when: Billing attempt fails
+    Action: Log error, retry logic, notify customer
+    """
+    attempt_id = data.get('admin_graphql_api_id')
+    contract_id = data.get('subscription_contract_id')
+    error_message = data.get('error_message', '')
+    error_code = data.get('error_code', '')
+    
+    logger.error(f"📥 Billing attempt failed: {attempt_id} - {error_message}")
     
+    # Update subscription
     try:
-        data = json.loads(request.body)
+        subscription = CustomerSubscription.objects.get(shopify_id=contract_id)
         
-        attempt_id = data.get('admin_graphql_api_id')
-        contract_id = data.get('subscription_contract_id')
-        error_message = data.get('error_message', '')
-        error_code = data.get('error_code', '')
+        with transaction.atomic():
+            # Update billing attempt
+            if attempt_id:
+                SubscriptionBillingAttempt.objects.filter(
+                    shopify_id=attempt_id
+                ).update(
+                    status='FAILED',
+                    error_message=error_message,
+                    error_code=error_code,
+                    completed_at=timezone.now()
+                )
+            
+            # Update subscription
+            subscription.shopify_push_error = f"Billing failed: {error_message}"
+            subscription.save()
         
-        logger.error(f"📥 Billing attempt failed: {attempt_id} - {error_message}")
+        # TODO: Implement retry logic
+        # TODO: Send notification to customer
+        # TODO: If max retries exceeded, pause subscription
         
-        # Update subscription
-        try:
-            subscription = CustomerSubscription.objects.get(shopify_id=contract_id)
-            
-            with transaction.atomic():
-                # Update billing attempt
-                if attempt_id:
-                    SubscriptionBillingAttempt.objects.filter(
-                        shopify_id=attempt_id
-                    ).update(
-                        status='FAILED',
-                        error_message=error_message,
-                        error_code=error_code,
-                        completed_at=timezone.now()
-                    )
-                
-                # Update subscription
-                subscription.shopify_push_error = f"Billing failed: {error_message}"
-                subscription.save()
-            
-            # TODO: Implement retry logic
-            # TODO: Send notification to customer
-            # TODO: If max retries exceeded, pause subscription
-            
-            logger.info(f"✅ Logged billing failure for subscription: {contract_id}")
-            
-            return JsonResponse({
-                'status': 'success',
-                'message': 'Billing failure logged',
-                'error': error_message
-            })
-            
-        except CustomerSubscription.DoesNotExist:
-            logger.warning(f"Subscription {contract_id} not found for billing failure")
-            return JsonResponse({'status': 'warning', 'message': 'Subscription not found'}, status=404)
+        logger.info(f"✅ Logged billing failure for subscription: {contract_id}")
         
-    except Exception as e:
-        logger.error(f"❌ Error handling billing failure webhook: {e}")
-        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+        return {
+            'status': 'success',
+            'message': 'Billing failure logged',
+            'error': error_message
+        }
+        
+    except CustomerSubscription.DoesNotExist:
+        logger.warning(f"Subscription {contract_id} not found for billing failure")
+        return {'status': 'warning', 'message': 'Subscription not found'}
 
 
 @csrf_exempt
@@ -334,45 +335,45 @@ def customer_payment_method_create_webhook(request):
     Fired when: Customer adds a payment method
     Action: Link payment method to subscriptions
     """
-    if not verify_shopify_webhook(request):
-        return HttpResponse('Unauthorized', status=401)
+    return enqueue_webhook(request, 'customer_payment_methods/create')
+
+
+def process_customer_payment_method_create(data: dict) -> dict:
+    """
+    Process customer_payment_methods/create webhook
+    
+    Fired when: Customer adds a payment method
+    Action: Link payment method to subscriptions
+    """
+    payment_method_id = data.get('admin_graphql_api_id')
+    customer_id = data.get('customer_id')  # Numeric ID
+    customer_gid = f"gid://shopify/Customer/{customer_id}"
+    
+    logger.info(f"📥 New payment method added: {payment_method_id}")
     
+    # Find customer
     try:
-        data = json.loads(request.body)
+        customer = ShopifyCustomer.objects.get(shopify_id=customer_gid)
         
-        payment_method_id = data.get('admin_graphql_api_id')
-        customer_id = data.get('customer_id')  # Numeric ID
-        customer_gid = f"gid://shopify/Customer/{customer_id}"
+        # Update subscriptions without payment methods
+        subscriptions = CustomerSubscription.objects.filter(
+            customer=customer,
+            payment_method_id__in=['', None],
+            status='ACTIVE'
+        )
         
-        logger.info(f"📥 New payment method added: {payment_method_id}")
+        count = subscriptions.update(payment_method_id=payment_method_id)
         
-        # Find customer
-        try:
-            customer = ShopifyCustomer.objects.get(shopify_id=customer_gid)
-            
-            # Update subscriptions without payment methods
-            subscriptions = CustomerSubscription.objects.filter(
-                customer=customer,
-                payment_method_id__in=['', None],
-                status='ACTIVE'
-            )
-            
-            count = subscriptions.update(payment_method_id=payment_method_id)
-            
-            logger.info(f"✅ Linked payment method to {count} subscriptions")
-            
-            return JsonResponse({
-                'status': 'success',
-                'message': f'Linked payment method to {count} subscriptions'
-            })
-            
-        except ShopifyCustomer.DoesNotExist:
-            logger.warning(f"Customer {customer_gid} not found")
-            return JsonResponse({'status': 'warning', 'message': 'Customer not found'}, status=404)
+        logger.info(f"✅ Linked payment method to {count} subscriptions")
+        
+        return {
+            'status': 'success',
+            'message': f'Linked payment method to {count} subscriptions'
+        }
         
-    except Exception as e:
-        logger.error(f"❌ Error handling payment method create webhook: {e}")
-        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+    except ShopifyCustomer.DoesNotExist:
+        logger.warning(f"Customer {customer_gid} not found")
+        return {'status': 'warning', 'message': 'Customer not found'}
 
 
 @csrf_exempt
@@ -384,44 +385,44 @@ def customer_payment_method_revoke_webhook(request):
     Fired when: Payment method is revoked (expired, removed, etc.)
     Action: Clear payment method from subscriptions, notify customer
     """
-    if not verify_shopify_webhook(request):
-        return HttpResponse('Unauthorized', status=401)
+    return enqueue_webhook(request, 'customer_payment_methods/revoke')
+
+
+def process_customer_payment_method_revoke(data: dict) -> dict:
+    """
+    Process customer_payment_methods/revoke webhook
     
-    try:
-        data = json.loads(request.body)
-        
-        payment_method_id = data.get('admin_graphql_api_id')
-        
-        logger.warning(f"📥 Payment method revoked: {payment_method_id}")
-        
-        # Find subscriptions using this payment method
-        subscriptions = CustomerSubscription.objects.filter(
-            payment_method_id=payment_method_id,
-            status='ACTIVE'
-        )
-        
-        count = 0
-        for subscription in subscriptions:
-            subscription.payment_method_id = ''
-            subscription.status = 'PAUSED'  # Pause until customer adds new payment
-            subscription.shopify_push_error = "Payment method revoked - customer must add new payment method"
-            subscription.save()
-            count += 1
-            
-            # TODO: Send email to customer to add new payment method
-            logger.warning(f"⚠️ Paused subscription {subscription.id} due to revoked payment")
-        
-        logger.info(f"✅ Paused {count} subscriptions due to revoked payment method")
-        
-        return JsonResponse({
-            'status': 'success',
-            'message': f'Paused {count} subscriptions',
-            'action_required': 'customer_must_add_payment'
-        })
-        
-    except Exception as e:
-        logger.error(f"❌ Error handling payment method revoke webhook: {e}")
-        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+    Fired when: Payment method is revoked (expired, removed, etc.)
+    Action: Clear payment method from subscriptions, notify customer
+    """
+    payment_method_id = data.get('admin_graphql_api_id')
+    
+    logger.warning(f"📥 Payment method revoked: {payment_method_id}")
+    
+    # Find subscriptions using this payment method
+    subscriptions = CustomerSubscription.objects.filter(
+        payment_method_id=payment_method_id,
+        status='ACTIVE'
+    )
+    
+    count = 0
+    for subscription in subscriptions:
+        subscription.payment_method_id = ''
+        subscription.status = 'PAUSED'  # Pause until customer adds new payment
+        subscription.shopify_push_error = "Payment method revoked - customer must add new payment method"
+        subscription.save()
+        count += 1
+        
+        # TODO: Send email to customer to add new payment method
+        logger.warning(f"⚠️ Paused subscription {subscription.id} due to revoked payment")
+    
+    logger.info(f"✅ Paused {count} subscriptions due to revoked payment method")
+    
+    return {
+        'status': 'success',
+        'message': f'Paused {count} subscriptions',
+        'action_required': 'customer_must_add_payment'
+    }
 
 
 # Webhook URL mappings
@@ -434,6 +435,16 @@ WEBHOOK_HANDLERS = {
     'customer_payment_methods/revoke': customer_payment_method_revoke_webhook,
 }
 
+# Queued payload processors, run by shopify_integration.webhook_queue
+WEBHOOK_PROCESSORS = {
+    'subscription_contracts/create': process_subscription_contract_create,
+    'subscription_contracts/update': process_subscription_contract_update,
+    'subscription_billing_attempts/success': process_subscription_billing_attempt_success,
+    'subscription_billing_attempts/failure': process_subscription_billing_attempt_failure,
+    'customer_payment_methods/create': process_customer_payment_method_create,
+    'customer_payment_methods/revoke': process_customer_payment_method_revoke,
+}
+
 
 
 
@@ -13,6 +13,7 @@ import logging
 from typing import Dict, Optional
 from django.utils import timezone
 from shopify_integration.enhanced_client import EnhancedShopifyAPIClient
+from shopify_integration.push_executor import PushExecutor, push_metrics
 
 logger = logging.getLogger('customers.bidirectional_sync')
 
@@ -316,10 +317,30 @@ class CustomerAddressBidirectionalSync:
             logger.warning(f"Failed to set default address: {e}")
             return False
     
-    def push_all_pending_addresses(self) -> Dict:
+    def _push_pending_customer(self, addresses):
+        """Push the customer of a chain of addresses first when it has unpushed edits of its own"""
+        from customers.customer_bidirectional_sync import CustomerBidirectionalSync
+        
+        customer = addresses[0].customer
+        if customer.needs_shopify_push or not customer.shopify_id:
+            result = CustomerBidirectionalSync().push_customer_to_shopify(customer)
+            if not result.get("success"):
+                raise ValueError(f"Customer push failed: {result.get('message', 'Unknown error')}")
+        # Every address sees the customer's Shopify ID from this push
+        for address in addresses:
+            address.customer = customer
+    
+    def push_all_pending_addresses(self, workers: Optional[int] = None) -> Dict:
         """
         Push all addresses that need Shopify sync
         
+        Addresses are pushed concurrently; each customer's addresses are
+        pushed in order by one worker, after the customer itself when it is
+        also waiting to be pushed.
+        
+        Args:
+            workers: Concurrent pushes (default SHOPIFY_PUSH_SETTINGS)
+        
         Returns:
             Dict with statistics about the operation
         """
@@ -329,36 +350,40 @@ class CustomerAddressBidirectionalSync:
             needs_shopify_push=True
         ).select_related('customer')
         
-        total = pending_addresses.count()
-        success_count = 0
-        error_count = 0
-        errors = []
+        logger.info("🔄 Starting push of pending addresses...")
         
-        logger.info(f"🔄 Starting push of {total} pending addresses...")
+        report = PushExecutor(
+            self.push_address_to_shopify,
+            key=lambda address: address.customer_id,
+            before_chain=self._push_pending_customer,
+            workers=workers,
+            label='addresses',
+        ).run(pending_addresses)
         
-        for address in pending_addresses:
-            result = self.push_address_to_shopify(address)
-            
-            if result["success"]:
-                success_count += 1
-            else:
-                error_count += 1
-                errors.append({
-                    "address_id": address.id,
-                    "customer_email": address.customer.email,
-                    "city": address.city,
-                    "error": result.get("message", "Unknown error")
-                })
+        errors = [
+            {
+                "address_id": address.id,
+                "customer_email": address.customer.email,
+                "city": address.city,
+                "error": result.get("message", "Unknown error")
+            }
+            for address, result in report["results"] if not result.get("success")
+        ]
+        success_count = report["successful"]
+        error_count = report["failed"]
+        total = report["total"]
         
         logger.info(f"✅ Address push completed: {success_count} success, {error_count} errors out of {total} total")
         
-        return {
+        results = {
             "success": error_count == 0,
             "total": total,
             "success_count": success_count,
             "error_count": error_count,
             "errors": errors
         }
+        results.update(push_metrics(report))
+        return results
 
 
 # Convenience functions
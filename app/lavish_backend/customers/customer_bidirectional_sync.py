@@ -8,6 +8,7 @@ from typing import Dict, List, Optional
 from django.utils import timezone
 from django.db import transaction
 from shopify_integration.enhanced_client import EnhancedShopifyAPIClient
+from shopify_integration.push_executor import PushExecutor, push_metrics
 
 logger = logging.getLogger('customers')
 
@@ -292,36 +293,35 @@ class CustomerBidirectionalSync:
                 "customer_id": customer.id
             }
     
-    def push_all_pending_customers(self) -> Dict:
+    def push_all_pending_customers(self, workers: Optional[int] = None) -> Dict:
         """
         Push all customers that need syncing to Shopify
         
+        Args:
+            workers: Concurrent pushes (default SHOPIFY_PUSH_SETTINGS)
+        
         Returns:
             Dict with statistics
         """
         from customers.models import ShopifyCustomer
         
         pending_customers = ShopifyCustomer.objects.filter(needs_shopify_push=True)
+        report = PushExecutor(self.push_customer_to_shopify, workers=workers, label='customers').run(pending_customers)
         
         results = {
-            "total": pending_customers.count(),
-            "success_count": 0,
-            "error_count": 0,
-            "errors": []
-        }
-        
-        for customer in pending_customers:
-            result = self.push_customer_to_shopify(customer)
-            
-            if result.get("success"):
-                results["success_count"] += 1
-            else:
-                results["error_count"] += 1
-                results["errors"].append({
+            "total": report["total"],
+            "success_count": report["successful"],
+            "error_count": report["failed"],
+            "errors": [
+                {
                     "customer_id": customer.id,
                     "email": customer.email,
                     "error": result.get("message", "Unknown error")
-                })
+                }
+                for customer, result in report["results"] if not result.get("success")
+            ],
+        }
+        results.update(push_metrics(report))
         
         logger.info(f"Pushed {results['success_count']}/{results['total']} customers to Shopify")
         return results
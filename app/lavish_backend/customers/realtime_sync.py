@@ -7,11 +7,12 @@ import logging
 from typing import Dict, List, Optional
 from datetime import datetime
 from django.utils.dateparse import parse_datetime
-from django.db import transaction
 from django.conf import settings
 
 from .models import ShopifyCustomer, ShopifyCustomerAddress
 from shopify_integration.enhanced_client import EnhancedShopifyAPIClient
+from shopify_integration.bulk_operations import ShopifyBulkOperationImporter
+from shopify_integration.incremental_sync import sync_resource
 
 logger = logging.getLogger('customers.realtime_sync')
 
@@ -26,41 +27,48 @@ class RealtimeCustomerSyncService:
         self.client = EnhancedShopifyAPIClient()
         self.store_domain = settings.SHOPIFY_STORE_URL
     
-    def sync_all_customers(self, limit: Optional[int] = None) -> Dict:
+    def sync_all_customers(self, limit: Optional[int] = None, bulk: bool = False,
+                           full: Optional[bool] = None) -> Dict:
         """
         Sync all customers from Shopify with real-time data refresh
+        
+        Each GraphQL page is upserted as soon as it arrives, so only one page is held
+        in memory and an interrupted sync keeps every page already written.
+        
+        Without ``limit`` only customers updated since the last sync are fetched, with a
+        periodic full reconcile that also removes customers deleted in Shopify (``full``
+        forces or skips it; see shopify_integration.incremental_sync).
+        
+        With ``bulk`` the customers are exported through a Shopify bulk operation instead of
+        cursor pagination, which suits very large stores; it always runs as a full
+        reconcile and ``limit`` does not apply.
         """
         logger.info("🔄 Starting real-time customer sync...")
         
         try:
-            # Fetch customers using enhanced client
-            customers_data = self.client.fetch_all_customers(limit=limit)
+            pages = ShopifyBulkOperationImporter(self.client).iter_customers() if bulk else None
+            stats = sync_resource(
+                self.client, 'customers', self.store_domain,
+                limit=limit, full=full, pages=pages,
+            )
             
-            if not customers_data:
+            if not stats['pages'] and stats['mode'] != 'incremental':
                 return {
                     'success': False,
-                    'message': 'No customers retrieved from Shopify',
+                    'message': stats.get('error') or 'No customers retrieved from Shopify',
                     'stats': {'total': 0, 'created': 0, 'updated': 0, 'errors': 0}
                 }
             
-            # Process customers in batches
-            stats = {'total': 0, 'created': 0, 'updated': 0, 'errors': 0}
-            
-            with transaction.atomic():
-                for customer_data in customers_data:
-                    try:
-                        result = self._sync_single_customer(customer_data)
-                        stats['total'] += 1
-                        
-                        if result['created']:
-                            stats['created'] += 1
-                        else:
-                            stats['updated'] += 1
-                            
-                    except Exception as e:
-                        logger.error(f"Error syncing customer {customer_data.get('id', 'unknown')}: {e}")
-                        stats['errors'] += 1
-                        continue
+            if not stats['complete']:
+                # Pages already written stay written, but deletes and the watermark were skipped
+                reason = stats.get('error') or 'the listing did not finish'
+                logger.warning(f"⚠️ Customer sync incomplete: {reason}")
+                return {
+                    'success': False,
+                    'partial': stats['total'] > 0,
+                    'message': f"Customer sync incomplete after {stats['total']} customers: {reason}",
+                    'stats': stats
+                }
             
             logger.info(f"✅ Customer sync completed: {stats}")
             
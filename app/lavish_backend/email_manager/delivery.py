@@ -0,0 +1,331 @@
+"""
+Pooled SMTP delivery for scheduled emails and newsletters
+
+Opening an SMTP session costs a TCP connect, TLS handshake, EHLO and login
+before the first message, so sending every message on its own connection
+spends most of the time on setup. The delivery engine groups queued messages
+by EmailConfiguration, keeps a small pool of authenticated sessions per
+configuration and sends many messages per session from a bounded set of
+worker threads, capped per SMTP host. Outcomes are written back in batches.
+"""
+import logging
+import math
+import smtplib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, LifoQueue
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.mail import EmailMultiAlternatives
+from django.utils import timezone
+
+from shopify_integration.throttle import TokenBucket
+
+from .models import EmailConfiguration, EmailHistory, NewsletterSubscriber
+from .template_cache import template_cache
+from .utils import get_email_backend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_CONNECTIONS_PER_CONFIG = 2
+# Many providers end a session after ~100 messages; reconnect before they do
+DEFAULT_MESSAGES_PER_CONNECTION = 100
+DEFAULT_TIMEOUT = 30
+HISTORY_BATCH_SIZE = 500
+
+
+def _delivery_settings():
+    """Engine defaults, overridable with EMAIL_DELIVERY_SETTINGS"""
+    return getattr(settings, 'EMAIL_DELIVERY_SETTINGS', {})
+
+
+class OutgoingEmail:
+    """A rendered message queued for delivery, and its outcome once sent"""
+
+    def __init__(self, config, subject, body, recipients, html_body=None, from_email=None,
+                 email_type='other', related_object=None):
+        self.config = config
+        self.subject = subject
+        self.body = body
+        self.html_body = html_body
+        self.recipients = list(recipients)
+        self.from_email = from_email or config.default_from_email
+        self.email_type = email_type
+        self.related_object = related_object
+        self.sent = False
+        self.error = None
+
+    def build_message(self):
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email,
+            to=self.recipients,
+        )
+        if self.html_body:
+            message.attach_alternative(self.html_body, 'text/html')
+        return message
+
+
+class SMTPConnectionPool:
+    """Open, authenticated SMTP sessions for one EmailConfiguration"""
+
+    def __init__(self, config, size=DEFAULT_CONNECTIONS_PER_CONFIG,
+                 messages_per_connection=DEFAULT_MESSAGES_PER_CONNECTION, timeout=DEFAULT_TIMEOUT):
+        self.config = config
+        self.messages_per_connection = messages_per_connection
+        self.timeout = timeout
+        self.opened = 0
+        self._idle = LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take an idle session or open a new one; blocks while ``size`` sessions are in use"""
+        self._slots.acquire()
+        try:
+            try:
+                return self._idle.get_nowait()
+            except Empty:
+                pass
+            connection = get_email_backend(config=self.config, timeout=self.timeout)
+            connection.open()
+            connection.messages_sent = 0
+            with self._lock:
+                self.opened += 1
+            return connection
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, connection, broken=False):
+        """Return a session to the pool, closing it if it failed or has sent its quota"""
+        try:
+            if broken or connection.messages_sent >= self.messages_per_connection:
+                self._close(connection)
+            else:
+                self._idle.put(connection)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except Empty:
+                return
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception as e:
+            logger.debug(f"Error closing SMTP connection: {e}")
+
+
+class SMTPDeliveryEngine:
+    """
+    Sends OutgoingEmails over pooled SMTP sessions
+
+    Usage:
+        engine = SMTPDeliveryEngine()
+        stats = engine.deliver(outgoing)
+        record_history(outgoing)
+    """
+
+    def __init__(self, workers=None, connections_per_config=None, messages_per_connection=None,
+                 host_rate_limits=None, timeout=None):
+        options = _delivery_settings()
+        self.workers = workers or options.get('workers', DEFAULT_WORKERS)
+        self.connections_per_config = connections_per_config or options.get(
+            'connections_per_config', DEFAULT_CONNECTIONS_PER_CONFIG)
+        self.messages_per_connection = messages_per_connection or options.get(
+            'messages_per_connection', DEFAULT_MESSAGES_PER_CONNECTION)
+        self.timeout = timeout or options.get('timeout', DEFAULT_TIMEOUT)
+        # Messages per second allowed per SMTP host, e.g. {'smtp.gmail.com': 5}
+        rate_limits = host_rate_limits if host_rate_limits is not None else options.get('host_rate_limits', {})
+        self._host_buckets = {host: TokenBucket(rate, rate) for host, rate in rate_limits.items()}
+
+    def deliver(self, outgoing):
+        """
+        Send every message, recording ``sent``/``error`` on each
+
+        Returns:
+            dict: sent, failed, connections, seconds and messages_per_second
+        """
+        started = time.perf_counter()
+        groups = OrderedDict()
+        for item in outgoing:
+            groups.setdefault(item.config.pk or id(item.config), []).append(item)
+
+        pools = {}
+        work = []
+        for key, items in groups.items():
+            pool = SMTPConnectionPool(items[0].config, self.connections_per_config,
+                                      self.messages_per_connection, self.timeout)
+            pools[key] = pool
+            # Split each configuration's messages into one run per session, up to the session quota
+            streams = min(self.connections_per_config, len(items))
+            chunk = min(self.messages_per_connection, math.ceil(len(items) / streams))
+            work.extend((pool, items[start:start + chunk]) for start in range(0, len(items), chunk))
+
+        try:
+            if self.workers > 1 and len(work) > 1:
+                with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='smtp-delivery') as executor:
+                    list(executor.map(lambda unit: self._send_run(*unit), work))
+            else:
+                for unit in work:
+                    self._send_run(*unit)
+        finally:
+            for pool in pools.values():
+                pool.close()
+
+        elapsed = time.perf_counter() - started
+        sent = sum(1 for item in outgoing if item.sent)
+        return {
+            'sent': sent,
+            'failed': len(outgoing) - sent,
+            'connections': sum(pool.opened for pool in pools.values()),
+            'seconds': elapsed,
+            'messages_per_second': sent / elapsed if elapsed else 0.0,
+        }
+
+    def _throttle(self, host):
+        bucket = self._host_buckets.get(host)
+        if bucket is not None:
+            bucket.acquire(1)
+
+    def _send_run(self, pool, items):
+        """Send a run of messages, reusing one session and reconnecting once if it drops"""
+        connection = None
+        try:
+            for item in items:
+                for attempt in range(2):
+                    if connection is None:
+                        try:
+                            connection = pool.acquire()
+                        except Exception as e:
+                            item.error = f"Could not connect to {pool.config.email_host}: {e}"
+                            break
+
+                    self._throttle(pool.config.email_host)
+                    message = item.build_message()
+                    message.connection = connection
+                    try:
+                        connection.send_messages([message])
+                    except smtplib.SMTPServerDisconnected as e:
+                        broken = e
+                    except smtplib.SMTPException as e:
+                        # Rejected message (bad recipient, ...): the session is still usable
+                        item.error = str(e)
+                        break
+                    except OSError as e:
+                        broken = e
+                    else:
+                        broken = None
+
+                    if broken is not None:
+                        # Dropped session: retry the message once on a fresh one
+                        pool.release(connection, broken=True)
+                        connection = None
+                        item.error = str(broken)
+                        continue
+
+                    connection.messages_sent += 1
+                    item.sent, item.error = True, None
+                    if connection.messages_sent >= pool.messages_per_connection:
+                        pool.release(connection)
+                        connection = None
+                    break
+        finally:
+            if connection is not None:
+                pool.release(connection)
+
+
+def record_history(outgoing, batch_size=HISTORY_BATCH_SIZE):
+    """Write one EmailHistory row per recipient of every delivered or failed message"""
+    content_types = {}
+    rows = []
+    for item in outgoing:
+        content_type = object_id = None
+        if item.related_object is not None:
+            model = type(item.related_object)
+            if model not in content_types:
+                content_types[model] = ContentType.objects.get_for_model(model)
+            content_type, object_id = content_types[model], item.related_object.pk
+
+        for recipient in item.recipients:
+            rows.append(EmailHistory(
+                email_type=item.email_type,
+                recipient_email=recipient,
+                subject=item.subject[:255],
+                body=item.body,
+                html_body=item.html_body,
+                status='success' if item.sent else 'failed',
+                error_message=item.error,
+                content_type=content_type,
+                object_id=object_id,
+            ))
+    EmailHistory.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def send_newsletter(newsletter, engine=None):
+    """
+    Render and deliver a newsletter to every active subscriber
+
+    The newsletter's template is used when set, otherwise its own subject and
+    content are rendered as templates; either way each source is compiled once.
+
+    Returns:
+        dict: Delivery stats from SMTPDeliveryEngine.deliver
+    """
+    source = newsletter.template or newsletter
+    config = (newsletter.configuration
+              or (newsletter.template.configuration if newsletter.template else None)
+              or EmailConfiguration.get_default())
+    if config is None:
+        raise ValueError("No email configuration found for sending")
+
+    subscribers = list(NewsletterSubscriber.objects.filter(is_active=True).only('pk', 'email', 'name'))
+    newsletter.status = 'sending'
+    newsletter.total_recipients = len(subscribers)
+    newsletter.save(update_fields=['status', 'total_recipients', 'updated_at'])
+
+    outgoing = []
+    for subscriber in subscribers:
+        subject, html_body, plain_body = template_cache.render(source, {
+            'newsletter': newsletter,
+            'subscriber': subscriber,
+            'unsubscribe_url': f'/unsubscribe/{newsletter.id}/',
+        })
+        outgoing.append(OutgoingEmail(
+            config, subject, plain_body, [subscriber.email], html_body=html_body,
+            email_type='newsletter', related_object=newsletter,
+        ))
+
+    stats = (engine or SMTPDeliveryEngine()).deliver(outgoing)
+    record_history(outgoing)
+
+    now = timezone.now()
+    delivered = [subscriber.pk for subscriber, item in zip(subscribers, outgoing) if item.sent]
+    for start in range(0, len(delivered), HISTORY_BATCH_SIZE):
+        NewsletterSubscriber.objects.filter(pk__in=delivered[start:start + HISTORY_BATCH_SIZE]).update(
+            last_sent_newsletter=now
+        )
+
+    newsletter.status = 'sent'
+    newsletter.sent_time = now
+    newsletter.successful_sends = stats['sent']
+    newsletter.failed_sends = stats['failed']
+    newsletter.save(update_fields=['status', 'sent_time', 'successful_sends', 'failed_sends', 'updated_at'])
+
+    logger.info(
+        f"Newsletter {newsletter.pk} sent to {stats['sent']}/{len(outgoing)} subscribers over "
+        f"{stats['connections']} SMTP sessions ({stats['messages_per_second']:.1f} msg/s)"
+    )
+    return stats
@@ -3,9 +3,9 @@ Email sending utilities for ENDEVOPS
 Integrates email_manager with existing forms
 """
 from django.core.mail import EmailMultiAlternatives
-from django.template import Template, Context
 from django.utils import timezone
 from .models import EmailConfiguration, EmailTemplate, EmailHistory
+from .template_cache import template_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -47,14 +47,7 @@ def send_template_email(template_name, recipient_email, context_data, config_ema
             return {'success': False, 'message': f'Template {template_name} not found'}
         
         # Render the subject and body with context
-        subject_template = Template(email_template.subject)
-        html_template = Template(email_template.html_content)
-        plain_template = Template(email_template.plain_text_content)
-        
-        context = Context(context_data)
-        subject = subject_template.render(context)
-        html_body = html_template.render(context)
-        plain_body = plain_template.render(context)
+        subject, html_body, plain_body = template_cache.render(email_template, context_data)
         
         # Create the email message
         email = EmailMultiAlternatives(
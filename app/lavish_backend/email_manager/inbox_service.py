@@ -4,16 +4,28 @@ Service for handling IMAP/POP3 email fetching and inbox management
 import imaplib
 import poplib
 import email
+import re
+from concurrent.futures import ThreadPoolExecutor
 from email.header import decode_header
 from email.utils import parseaddr
 import logging
+from django.conf import settings
+from django.db import connections
 from django.utils import timezone
 from .models import IncomingMailConfiguration, EmailInbox, EmailMessage, EmailAttachment
+from .services import EmailGuardianService
 from django.core.files.base import ContentFile
+from core.db import sqlite_writer
 import ssl
 
 logger = logging.getLogger(__name__)
 
+# UIDs requested per FETCH round trip
+FETCH_CHUNK_SIZE = 50
+DEFAULT_FETCH_WORKERS = 4
+
+UID_PATTERN = re.compile(rb'UID (\d+)')
+
 
 class EmailFetchService:
     """Service for fetching emails from IMAP/POP3 servers"""
@@ -21,6 +33,7 @@ class EmailFetchService:
     def __init__(self, incoming_config):
         self.config = incoming_config
         self.connection = None
+        self._guardian = None
     
     def connect(self):
         """Establish connection to mail server"""
@@ -108,82 +121,74 @@ class EmailFetchService:
             self.disconnect()
     
     def _fetch_imap_emails(self, inbox, limit=50):
-        """Fetch emails from IMAP server"""
+        """
+        Fetch new emails from IMAP server by UID
+        
+        Only UIDs above the configuration's last_uid are requested. When the
+        folder's UIDVALIDITY changes, the stored UIDs no longer identify the same
+        messages, so the latest ``limit`` messages are fetched again and deduplicated
+        by Message-ID.
+        """
         messages_saved = 0
         
         try:
             # Select inbox folder
-            self.connection.select(self.config.inbox_folder)
+            status, _ = self.connection.select(self.config.inbox_folder)
+            if status != 'OK':
+                logger.error(f"Failed to select folder {self.config.inbox_folder}")
+                return 0
             
-            # Search for all emails
-            status, message_ids = self.connection.search(None, 'ALL')
+            uid_validity = self._uid_validity()
+            last_uid = self.config.last_uid
+            if last_uid is not None and uid_validity != self.config.uid_validity:
+                logger.warning(
+                    f"UIDVALIDITY of {self.config.inbox_folder} changed "
+                    f"({self.config.uid_validity} -> {uid_validity}); resyncing"
+                )
+                last_uid = None
+            
+            if last_uid is None:
+                status, data = self.connection.uid('SEARCH', None, 'ALL')
+            else:
+                status, data = self.connection.uid('SEARCH', None, f'UID {last_uid + 1}:*')
             
             if status != 'OK':
                 logger.error("Failed to search emails")
                 return 0
             
-            # Get list of email IDs
-            email_ids = message_ids[0].split()
-            
-            # Fetch only the latest 'limit' emails
-            email_ids = email_ids[-limit:] if len(email_ids) > limit else email_ids
+            uids = sorted(int(uid) for uid in data[0].split())
+            if last_uid is None:
+                # First sync: fetch only the latest 'limit' emails
+                uids = uids[-limit:]
+            else:
+                # "n:*" always matches the highest UID, even when it is below n;
+                # take new mail oldest first so an interrupted run resumes where it stopped
+                uids = [uid for uid in uids if uid > last_uid][:limit]
             
-            for email_id in email_ids:
-                try:
-                    # Fetch email
-                    status, msg_data = self.connection.fetch(email_id, '(RFC822)')
-                    
-                    if status != 'OK':
-                        continue
-                    
-                    # Parse email
-                    raw_email = msg_data[0][1]
-                    email_message = email.message_from_bytes(raw_email)
-                    
-                    # Check if message already exists
-                    message_id = email_message.get('Message-ID', '')
-                    if EmailMessage.objects.filter(inbox=inbox, message_id=message_id).exists():
-                        continue
-                    
-                    # Extract email details
-                    subject = self._decode_header(email_message.get('Subject', 'No Subject'))
-                    from_email = parseaddr(email_message.get('From', ''))[1]
-                    to_emails = self._parse_addresses(email_message.get('To', ''))
-                    cc_emails = self._parse_addresses(email_message.get('Cc', ''))
-                    date = email_message.get('Date', '')
-                    
-                    # Extract body
-                    body_text, body_html = self._extract_body(email_message)
-                    
-                    # Create EmailMessage object
-                    email_obj = EmailMessage.objects.create(
-                        inbox=inbox,
-                        message_id=message_id,
-                        uid=email_id.decode(),
-                        subject=subject,
-                        body=body_text or 'No content',
-                        html_body=body_html,
-                        raw_content=raw_email.decode('utf-8', errors='ignore'),
-                        from_email=from_email,
-                        to_emails=to_emails,
-                        cc_emails=cc_emails,
-                        status='received',
-                        received_at=timezone.now(),
-                    )
-                    
-                    # Extract attachments
-                    self._extract_attachments(email_message, email_obj)
-                    
-                    messages_saved += 1
-                    logger.info(f"Saved email: {subject}")
-                    
-                except Exception as e:
-                    logger.error(f"Error processing email ID {email_id}: {str(e)}")
-                    continue
+            if uids:
+                known_ids = set(
+                    EmailMessage.objects.filter(inbox=inbox)
+                    .exclude(message_id__isnull=True)
+                    .values_list('message_id', flat=True)
+                )
+                
+                for start in range(0, len(uids), FETCH_CHUNK_SIZE):
+                    chunk = uids[start:start + FETCH_CHUNK_SIZE]
+                    saved, handled_uid = self._fetch_imap_chunk(inbox, chunk, known_ids)
+                    messages_saved += saved
+                    if handled_uid is not None:
+                        last_uid = max(last_uid or 0, handled_uid)
+                        self._save_sync_state(last_uid, uid_validity)
+                    if handled_uid != chunk[-1]:
+                        # The next run retries from the first message that was not stored
+                        logger.warning(f"Stopped fetching {self.config.inbox_folder} after UID {last_uid}")
+                        break
             
             # Update last fetched time
+            self.config.last_uid = last_uid
+            self.config.uid_validity = uid_validity
             self.config.last_fetched = timezone.now()
-            self.config.save()
+            self.config.save(update_fields=['last_uid', 'uid_validity', 'last_fetched'])
             
             return messages_saved
             
@@ -191,6 +196,162 @@ class EmailFetchService:
             logger.error(f"Error in IMAP fetch: {str(e)}")
             raise
     
+    def _uid_validity(self):
+        """UIDVALIDITY reported when the folder was selected"""
+        _, data = self.connection.response('UIDVALIDITY')
+        try:
+            return int(data[-1]) if data and data[-1] else None
+        except (TypeError, ValueError):
+            return None
+    
+    def _save_sync_state(self, last_uid, uid_validity):
+        IncomingMailConfiguration.objects.filter(pk=self.config.pk).update(
+            last_uid=last_uid, uid_validity=uid_validity
+        )
+    
+    def _fetch_imap_chunk(self, inbox, uids, known_ids):
+        """
+        Fetch one chunk of UIDs: one FETCH for the Message-IDs, one for the bodies of unseen messages
+        
+        Messages are stored in UID order, stopping at the first one that could not
+        be fetched or saved. A UID missing from the FETCH answers is only passed
+        over once a UID SEARCH confirms it was expunged.
+        
+        Returns:
+            tuple: (messages saved, highest UID up to which every message was saved or
+            already known; None when that holds for none of them)
+        """
+        uid_set = ','.join(str(uid) for uid in uids)
+        status, data = self.connection.uid('FETCH', uid_set, '(UID BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])')
+        if status != 'OK':
+            logger.error(f"Failed to fetch headers for UIDs {uid_set}")
+            return 0, None
+        
+        wanted = set()
+        answered = set()
+        for uid, header in self._parse_fetch(data):
+            answered.add(uid)
+            message_id = email.message_from_bytes(header).get('Message-ID', '').strip()
+            if message_id and message_id in known_ids:
+                continue
+            wanted.add(uid)
+        
+        bodies = {}
+        if wanted:
+            status, data = self.connection.uid('FETCH', ','.join(str(uid) for uid in sorted(wanted)), '(UID RFC822)')
+            if status != 'OK':
+                logger.error(f"Failed to fetch UIDs {sorted(wanted)}")
+                return 0, max((uid for uid in uids if uid < min(wanted)), default=None)
+            bodies = dict(self._parse_fetch(data))
+        
+        unanswered = [uid for uid in uids if uid not in answered or (uid in wanted and uid not in bodies)]
+        expunged = set(unanswered) - self._existing_uids(unanswered) if unanswered else set()
+        
+        saved = 0
+        handled_uid = None
+        # Inboxes are fetched concurrently; SQLite takes one writer at a time
+        with sqlite_writer():
+            for uid in uids:
+                if uid in expunged:
+                    pass
+                elif uid not in answered or (uid in wanted and uid not in bodies):
+                    # Still on the server, so the next run retries it rather than skipping it
+                    logger.warning(f"UID {uid} missing from the FETCH response")
+                    break
+                elif uid in wanted:
+                    try:
+                        saved += self._save_message(inbox, bodies[uid], str(uid), known_ids)
+                    except Exception as e:
+                        logger.error(f"Error processing email UID {uid}: {str(e)}")
+                        break
+                handled_uid = uid
+        return saved, handled_uid
+    
+    def _existing_uids(self, uids):
+        """UIDs still in the folder; all of them when the server cannot say"""
+        status, data = self.connection.uid('SEARCH', None, f"UID {','.join(str(uid) for uid in uids)}")
+        if status != 'OK':
+            return set(uids)
+        return {int(uid) for uid in data[0].split()}
+    
+    @staticmethod
+    def _parse_fetch(data):
+        """(uid, payload) pairs from an imaplib FETCH response"""
+        results = []
+        for index, item in enumerate(data):
+            if not isinstance(item, tuple):
+                continue
+            match = UID_PATTERN.search(item[0])
+            if not match and index + 1 < len(data) and isinstance(data[index + 1], bytes):
+                # Servers may send the UID after the literal, e.g. b' UID 12)'
+                match = UID_PATTERN.search(data[index + 1])
+            if match:
+                results.append((int(match.group(1)), item[1]))
+        return results
+    
+    def _save_message(self, inbox, raw_email, uid, known_ids):
+        """
+        Store one raw email unless its Message-ID is already known
+        
+        Returns:
+            int: 1 if saved, 0 if already known; errors propagate to the caller
+        """
+        # Parse email
+        email_message = email.message_from_bytes(raw_email)
+        
+        # Check if message already exists
+        message_id = email_message.get('Message-ID', '')
+        if message_id and message_id.strip() in known_ids:
+            return 0
+        
+        # Extract email details
+        subject = self._decode_header(email_message.get('Subject', 'No Subject'))
+        from_email = parseaddr(email_message.get('From', ''))[1]
+        to_emails = self._parse_addresses(email_message.get('To', ''))
+        cc_emails = self._parse_addresses(email_message.get('Cc', ''))
+        
+        # Extract body
+        body_text, body_html = self._extract_body(email_message)
+        
+        # Create EmailMessage object
+        email_obj = EmailMessage.objects.create(
+            inbox=inbox,
+            message_id=message_id,
+            uid=uid,
+            subject=subject,
+            body=body_text or 'No content',
+            html_body=body_html,
+            raw_content=raw_email.decode('utf-8', errors='ignore'),
+            from_email=from_email,
+            to_emails=to_emails,
+            cc_emails=cc_emails,
+            status='received',
+            received_at=timezone.now(),
+        )
+        
+        # Extract attachments
+        self._extract_attachments(email_message, email_obj)
+        
+        # Scan with the compiled guardian rules while the message is at hand
+        self._scan_message(email_obj)
+        
+        if message_id:
+            known_ids.add(message_id.strip())
+        logger.info(f"Saved email: {subject}")
+        return 1
+    
+    def _scan_message(self, email_obj):
+        """Run the guardian rules over a newly stored message; never fails ingestion"""
+        if not getattr(settings, 'EMAIL_GUARDIAN_SCAN_ON_FETCH', True):
+            return
+        try:
+            if self._guardian is None:
+                # Rules are compiled once per fetch run, and only recompiled when one changes
+                self._guardian = EmailGuardianService()
+            self._guardian.scan_email(email_obj)
+        except Exception as e:
+            logger.error(f"Guardian scan failed for message {email_obj.pk}: {str(e)}")
+    
     def _fetch_pop3_emails(self, inbox, limit=50):
         """Fetch emails from POP3 server"""
         messages_saved = 0
@@ -202,48 +363,18 @@ class EmailFetchService:
             # Fetch only the latest 'limit' emails
             start = max(1, num_messages - limit + 1)
             
+            known_ids = set(
+                EmailMessage.objects.filter(inbox=inbox)
+                .exclude(message_id__isnull=True)
+                .values_list('message_id', flat=True)
+            )
+            
             for i in range(start, num_messages + 1):
                 try:
                     # Fetch email
                     response, lines, octets = self.connection.retr(i)
                     raw_email = b'\r\n'.join(lines)
-                    email_message = email.message_from_bytes(raw_email)
-                    
-                    # Check if message already exists
-                    message_id = email_message.get('Message-ID', '')
-                    if EmailMessage.objects.filter(inbox=inbox, message_id=message_id).exists():
-                        continue
-                    
-                    # Extract email details
-                    subject = self._decode_header(email_message.get('Subject', 'No Subject'))
-                    from_email = parseaddr(email_message.get('From', ''))[1]
-                    to_emails = self._parse_addresses(email_message.get('To', ''))
-                    cc_emails = self._parse_addresses(email_message.get('Cc', ''))
-                    
-                    # Extract body
-                    body_text, body_html = self._extract_body(email_message)
-                    
-                    # Create EmailMessage object
-                    email_obj = EmailMessage.objects.create(
-                        inbox=inbox,
-                        message_id=message_id,
-                        uid=str(i),
-                        subject=subject,
-                        body=body_text or 'No content',
-                        html_body=body_html,
-                        raw_content=raw_email.decode('utf-8', errors='ignore'),
-                        from_email=from_email,
-                        to_emails=to_emails,
-                        cc_emails=cc_emails,
-                        status='received',
-                        received_at=timezone.now(),
-                    )
-                    
-                    # Extract attachments
-                    self._extract_attachments(email_message, email_obj)
-                    
-                    messages_saved += 1
-                    logger.info(f"Saved email: {subject}")
+                    messages_saved += self._save_message(inbox, raw_email, str(i), known_ids)
                     
                 except Exception as e:
                     logger.error(f"Error processing POP3 email {i}: {str(e)}")
@@ -383,28 +514,31 @@ class EmailFetchService:
             logger.error(f"Error disconnecting: {str(e)}")
 
 
-def fetch_all_inboxes():
-    """Fetch emails for all active inboxes"""
-    from .models import EmailInbox
-    
-    results = {}
-    inboxes = EmailInbox.objects.filter(is_active=True, incoming_config__isnull=False)
+def _fetch_inbox(inbox):
+    """Fetch one inbox in a worker thread"""
+    try:
+        service = EmailFetchService(inbox.incoming_config)
+        count = service.fetch_emails(inbox)
+        logger.info(f"Fetched {count} emails for {inbox.email_address}")
+        return {'success': True, 'count': count}
+    except Exception as e:
+        logger.error(f"Failed to fetch emails for {inbox.email_address}: {str(e)}")
+        return {'success': False, 'error': str(e)}
+    finally:
+        connections.close_all()
+
+
+def fetch_all_inboxes(workers=DEFAULT_FETCH_WORKERS):
+    """Fetch emails for all active inboxes, several mail servers at a time"""
+    inboxes = [
+        inbox for inbox in
+        EmailInbox.objects.filter(is_active=True, incoming_config__isnull=False).select_related('incoming_config')
+        if inbox.incoming_config.is_active
+    ]
+    if not inboxes:
+        return {}
     
-    for inbox in inboxes:
-        if inbox.incoming_config and inbox.incoming_config.is_active:
-            try:
-                service = EmailFetchService(inbox.incoming_config)
-                count = service.fetch_emails(inbox)
-                results[inbox.email_address] = {
-                    'success': True,
-                    'count': count
-                }
-                logger.info(f"Fetched {count} emails for {inbox.email_address}")
-            except Exception as e:
-                results[inbox.email_address] = {
-                    'success': False,
-                    'error': str(e)
-                }
-                logger.error(f"Failed to fetch emails for {inbox.email_address}: {str(e)}")
+    with ThreadPoolExecutor(max_workers=min(workers, len(inboxes)), thread_name_prefix='inbox-fetch') as executor:
+        outcomes = list(executor.map(_fetch_inbox, inboxes))
     
-    return results
+    return {inbox.email_address: outcome for inbox, outcome in zip(inboxes, outcomes)}
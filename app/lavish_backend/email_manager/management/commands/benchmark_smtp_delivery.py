@@ -0,0 +1,144 @@
+"""
+Django Management Command to benchmark pooled SMTP delivery
+Compares messages per second of one SMTP connection per message (how scheduled
+emails used to be sent) with the pooled delivery engine, against a local SMTP stub
+"""
+import socket
+import socketserver
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from email_manager.delivery import OutgoingEmail, SMTPDeliveryEngine
+from email_manager.models import EmailConfiguration
+from email_manager.utils import get_email_backend
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    """Accepts every message, answering each command after the configured latency"""
+
+    def reply(self, line):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+        self.wfile.flush()
+
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reply('220 stub ESMTP ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip().upper()
+
+            if command.startswith('EHLO'):
+                self.reply('250-stub')
+                self.reply('250 8BITMIME')
+            elif command.startswith('DATA'):
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                with self.server.lock:
+                    self.server.received += 1
+                self.reply('250 OK queued')
+            elif command.startswith('QUIT'):
+                self.reply('221 Bye')
+                return
+            else:
+                # HELO, MAIL, RCPT, RSET, NOOP
+                self.reply('250 OK')
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency):
+        super().__init__(('127.0.0.1', 0), StubSMTPHandler)
+        self.latency = latency
+        self.received = 0
+        self.lock = threading.Lock()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark pooled SMTP delivery against per-message connections using a local SMTP stub'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=300,
+            help='Messages to send per strategy (default: 300)',
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=2.0,
+            help='Simulated round trip per SMTP reply in milliseconds (default: 2)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Delivery engine worker threads (default: 4)',
+        )
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        server = StubSMTPServer(options['latency'] / 1000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        # Unsaved configuration pointing at the stub: plain SMTP, no login
+        config = EmailConfiguration(
+            name='Benchmark stub',
+            email_host='127.0.0.1',
+            email_port=server.server_address[1],
+            email_host_user='',
+            email_host_password='',
+            email_use_tls=False,
+            email_use_ssl=False,
+            default_from_email='benchmark@example.com',
+        )
+
+        try:
+            unpooled = self._per_message(config, count)
+            engine = SMTPDeliveryEngine(workers=options['workers'])
+            stats = engine.deliver(self._outgoing(config, count))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        pooled = stats['messages_per_second']
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(self.style.SUCCESS(
+            f"SMTP DELIVERY THROUGHPUT ({count} messages each, {options['latency']:g} ms per reply)"
+        ))
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(f'Connection per message:  {unpooled:.1f} msg/s')
+        self.stdout.write(
+            f"Pooled delivery engine:  {pooled:.1f} msg/s "
+            f"({stats['connections']} connections, {options['workers']} workers, {stats['failed']} failed)"
+        )
+        self.stdout.write(self.style.SUCCESS(f'Speed-up: {pooled / unpooled:.1f}x'))
+
+    def _outgoing(self, config, count):
+        return [
+            OutgoingEmail(
+                config,
+                f'Benchmark message {index}',
+                'Plain text body',
+                [f'recipient{index}@example.com'],
+                html_body='<p>HTML body</p>',
+            )
+            for index in range(count)
+        ]
+
+    def _per_message(self, config, count):
+        """Messages per second when each message opens, authenticates and closes its own session"""
+        messages = [outgoing.build_message() for outgoing in self._outgoing(config, count)]
+        started = time.perf_counter()
+        for message in messages:
+            get_email_backend(config=config).send_messages([message])
+        return count / (time.perf_counter() - started)
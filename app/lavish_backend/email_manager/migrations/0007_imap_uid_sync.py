@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email_manager', '0006_incomingmailconfiguration_emailinbox_description_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incomingmailconfiguration',
+            name='last_uid',
+            field=models.PositiveBigIntegerField(blank=True, help_text='Highest IMAP UID already fetched', null=True),
+        ),
+        migrations.AddField(
+            model_name='incomingmailconfiguration',
+            name='uid_validity',
+            field=models.PositiveBigIntegerField(blank=True, help_text='IMAP UIDVALIDITY the last_uid belongs to', null=True),
+        ),
+    ]
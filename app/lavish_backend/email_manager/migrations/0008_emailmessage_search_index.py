@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def install_search_index(apps, schema_editor):
+    from email_manager.search import install_search_index
+    install_search_index(schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    from email_manager.search import drop_search_index
+    drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email_manager', '0007_imap_uid_sync'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, drop_search_index),
+    ]
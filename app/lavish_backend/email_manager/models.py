@@ -121,6 +121,11 @@ class IncomingMailConfiguration(models.Model):
     is_active = models.BooleanField(default=True, help_text='Whether this configuration is active')
     last_fetched = models.DateTimeField(null=True, blank=True, help_text='Last time emails were fetched')
     
+    # IMAP incremental sync state: only UIDs above last_uid are fetched while the
+    # folder's UIDVALIDITY is unchanged
+    last_uid = models.PositiveBigIntegerField(null=True, blank=True, help_text='Highest IMAP UID already fetched')
+    uid_validity = models.PositiveBigIntegerField(null=True, blank=True, help_text='IMAP UIDVALIDITY the last_uid belongs to')
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,177 @@
+"""
+Full-text search over email messages
+
+Searching the inbox with ``icontains`` on subject, body and sender scans every
+stored message. Messages are instead indexed by the database itself:
+
+- SQLite: an FTS5 table over subject, sender and body, kept in step with
+  ``email_manager_emailmessage`` by triggers, so every insert (including
+  messages stored by EmailFetchService) is indexed as it is written.
+- PostgreSQL: a GIN index on a weighted ``tsvector`` of the same fields.
+
+Other backends fall back to the ``icontains`` filter. Results are ranked with
+subject matches above sender matches above body matches, and the last word of
+every search term matches as a prefix, so ``invo`` finds "invoice".
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+FTS_TABLE = 'email_manager_emailmessage_fts'
+MESSAGE_TABLE = 'email_manager_emailmessage'
+PG_INDEX_NAME = 'email_msg_search_gin'
+
+# Relative weight of a hit in each indexed column, in index column order
+COLUMN_WEIGHTS = (('subject', 10.0, 'A'), ('from_email', 5.0, 'B'), ('body', 1.0, 'C'))
+
+TERM_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+SQLITE_SETUP = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        subject, from_email, body,
+        content='{MESSAGE_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {MESSAGE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, subject, from_email, body)
+        VALUES (new.id, new.subject, new.from_email, new.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {MESSAGE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, subject, from_email, body)
+        VALUES ('delete', old.id, old.subject, old.from_email, old.body);
+    END
+    """,
+    # Flag, folder and status changes rewrite the row; only re-index when indexed text changes
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF subject, from_email, body ON {MESSAGE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, subject, from_email, body)
+        VALUES ('delete', old.id, old.subject, old.from_email, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, subject, from_email, body)
+        VALUES (new.id, new.subject, new.from_email, new.body);
+    END
+    """,
+    # Index the messages stored before the table existed
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_TEARDOWN = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def _search_vector():
+    from django.contrib.postgres.search import SearchVector
+
+    vector = None
+    for field, _, label in COLUMN_WEIGHTS:
+        part = SearchVector(field, weight=label, config='simple')
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def install_search_index(schema_editor):
+    """Create the backend's search index; called from the email_manager migrations"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for statement in SQLITE_SETUP:
+            schema_editor.execute(statement)
+    elif vendor == 'postgresql':
+        from django.contrib.postgres.indexes import GinIndex
+
+        from .models import EmailMessage
+        schema_editor.add_index(EmailMessage, GinIndex(_search_vector(), name=PG_INDEX_NAME))
+
+
+def drop_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for statement in SQLITE_TEARDOWN:
+            schema_editor.execute(statement)
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {PG_INDEX_NAME}')
+
+
+def parse_query(query):
+    """
+    Split a search box query into terms of word tokens
+
+    Quoted text is kept together as one phrase; any other whitespace-separated
+    word is its own term. Punctuation separates tokens, so ``john@example.com``
+    becomes the phrase john, example, com.
+
+    Returns:
+        list: One list of tokens per term
+    """
+    terms = []
+    for quoted, word in TERM_PATTERN.findall(query or ''):
+        tokens = TOKEN_PATTERN.findall(quoted or word)
+        if tokens:
+            terms.append([token.lower() for token in tokens])
+    return terms
+
+
+def _fts5_expression(terms):
+    # Every term must match; the last token of each term matches as a prefix
+    return ' '.join(f'''"{' '.join(tokens)}" *''' for tokens in terms)
+
+
+def _tsquery_expression(terms):
+    return ' & '.join(' <-> '.join(tokens) + ':*' for tokens in terms)
+
+
+def search_messages(queryset, query):
+    """
+    Filter EmailMessages to those matching a search query, best match first
+
+    Args:
+        queryset: EmailMessage queryset to search within
+        query: Text typed into a search box
+
+    Returns:
+        QuerySet: Matching messages. With an index they are annotated with
+        ``search_rank`` (higher is better) and ordered by it, newest first
+        among equal ranks; the fallback filter leaves ordering to the caller
+    """
+    terms = parse_query(query)
+    if not terms:
+        return queryset
+
+    vendor = connection.vendor
+    if vendor == 'sqlite':
+        # Join the FTS table so the MATCH drives the query, then the message rows by primary key
+        weights = ', '.join(str(weight) for _, weight, _ in COLUMN_WEIGHTS)
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {MESSAGE_TABLE}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[_fts5_expression(terms)],
+            # bm25() is lower for better matches; negate it so higher ranks sort first everywhere
+            select={'search_rank': f'-bm25({FTS_TABLE}, {weights})'},
+        ).order_by('-search_rank', '-received_at', '-created_at')
+
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        search_query = SearchQuery(_tsquery_expression(terms), search_type='raw', config='simple')
+        vector = _search_vector()
+        return queryset.annotate(
+            search_vector=vector,
+            search_rank=SearchRank(vector, search_query),
+        ).filter(search_vector=search_query).order_by('-search_rank', '-received_at', '-created_at')
+
+    condition = Q()
+    for quoted, word in TERM_PATTERN.findall(query):
+        text = (quoted or word).strip()
+        if text:
+            condition &= Q(subject__icontains=text) | Q(body__icontains=text) | Q(from_email__icontains=text)
+    return queryset.filter(condition)
+
@@ -1,62 +1,160 @@
+import logging
 import re
+import threading
 from django.conf import settings
 from .models import EmailGuardianRule, EmailScanResult, EmailMessage
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
+# Patterns that cannot share one combined regex: numbered or named backreferences,
+# their own named groups, or global inline flags
+STANDALONE_PATTERN = re.compile(r'\\[1-9]|\(\?P[<=]|^\(\?[aiLmsux]+\)')
+
+TEXT_ATTACHMENT_EXTENSIONS = ('.txt', '.html', '.htm')
+
+
+class CompiledRuleSet:
+    """
+    Active guardian rules compiled once and scanned together
+    
+    Each rule becomes a named lookahead in one alternation, so a single pass over a
+    text finds every position where any rule matches. At those positions only the
+    rules not yet matched are tried individually, which catches rules whose match
+    starts where an earlier alternative also matches.
+    """
+    
+    def __init__(self, rules):
+        self.rules = []
+        self._patterns = {}
+        standalone = []
+        alternatives = []
+        
+        for rule in rules:
+            try:
+                compiled = re.compile(rule.pattern, re.IGNORECASE)
+            except re.error as e:
+                logger.error(f"Skipping guardian rule {rule.pk} ({rule.name}): invalid pattern: {e}")
+                continue
+            self.rules.append(rule)
+            self._patterns[rule.pk] = compiled
+            if compiled.groupindex or STANDALONE_PATTERN.search(rule.pattern):
+                standalone.append(rule.pk)
+            else:
+                alternatives.append(f'(?=(?P<r{rule.pk}>{rule.pattern}))')
+        
+        self._combined = None
+        if alternatives:
+            try:
+                self._combined = re.compile('|'.join(alternatives), re.IGNORECASE)
+            except re.error as e:
+                logger.warning(f"Guardian rules could not be combined, scanning individually: {e}")
+                standalone = list(self._patterns)
+        self._standalone = standalone
+    
+    def scan(self, text, candidates):
+        """
+        Find the first match of each candidate rule in ``text``
+        
+        Args:
+            text: Text to scan
+            candidates: Set of rule pks still unmatched
+        
+        Returns:
+            dict: rule pk -> matched text
+        """
+        found = {}
+        if not text or not candidates:
+            return found
+        
+        if self._combined is not None:
+            for match in self._combined.finditer(text):
+                pending = [pk for pk in candidates if pk not in found and pk not in self._standalone]
+                if not pending:
+                    break
+                position = match.start()
+                for pk in pending:
+                    rule_match = self._patterns[pk].match(text, position)
+                    if rule_match:
+                        found[pk] = rule_match.group(0)
+        
+        for pk in self._standalone:
+            if pk in candidates and pk not in found:
+                rule_match = self._patterns[pk].search(text)
+                if rule_match:
+                    found[pk] = rule_match.group(0)
+        return found
+
+
+_rule_set = None
+_rule_set_key = None
+_rule_set_lock = threading.Lock()
+
+
+def get_compiled_rules():
+    """
+    The compiled set of active rules, rebuilt when a rule is added, removed,
+    toggled or edited (any of which changes the pk/updated_at signature)
+    """
+    global _rule_set, _rule_set_key
+    
+    key = tuple(EmailGuardianRule.objects.filter(is_active=True).order_by('pk').values_list('pk', 'updated_at'))
+    with _rule_set_lock:
+        if _rule_set is None or key != _rule_set_key:
+            _rule_set = CompiledRuleSet(EmailGuardianRule.objects.filter(is_active=True).order_by('pk'))
+            _rule_set_key = key
+        return _rule_set
+
+
 class EmailGuardianService:
     def __init__(self):
-        self.rules = EmailGuardianRule.objects.filter(is_active=True)
+        self.rule_set = get_compiled_rules()
+        self.rules = self.rule_set.rules
         
     def scan_email(self, email_message):
         """
         Scan an email message against all active guardian rules
         Returns a list of scan results
+        
+        The subject, the body and each attachment are scanned once for all rules;
+        a rule matching the subject is not looked for in the body, and so on.
         """
         scan_results = []
+        if not self.rules:
+            return scan_results
         
-        for rule in self.rules:
-            # Check subject
-            subject_match = re.search(rule.pattern, email_message.subject, re.IGNORECASE)
-            if subject_match:
-                result = self._create_scan_result(email_message, rule, subject_match.group(0))
-                scan_results.append(result)
-                continue
-                
-            # Check body
-            body_match = re.search(rule.pattern, email_message.body, re.IGNORECASE)
-            if body_match:
-                result = self._create_scan_result(email_message, rule, body_match.group(0))
-                scan_results.append(result)
-                continue
-                
-            # Check attachments
+        remaining = {rule.pk for rule in self.rules}
+        matches = {}
+        
+        # Check subject, then body
+        for text in (email_message.subject, email_message.body):
+            found = self.rule_set.scan(text, remaining)
+            matches.update((pk, (content, None)) for pk, content in found.items())
+            remaining -= found.keys()
+        
+        # Check attachments
+        if remaining:
             for attachment in email_message.attachments.all():
-                if attachment.file:
+                if not remaining:
+                    break
+                if not attachment.file:
+                    continue
+                if attachment.file.name.endswith(TEXT_ATTACHMENT_EXTENSIONS):
                     # For text files, check content
-                    if attachment.file.name.endswith(('.txt', '.html', '.htm')):
-                        content = attachment.file.read().decode('utf-8', errors='ignore')
-                        content_match = re.search(rule.pattern, content, re.IGNORECASE)
-                        if content_match:
-                            result = self._create_scan_result(
-                                email_message, 
-                                rule, 
-                                content_match.group(0),
-                                attachment=attachment
-                            )
-                            scan_results.append(result)
-                            break
-                    else:
-                        # For binary files, check filename
-                        filename_match = re.search(rule.pattern, attachment.file.name, re.IGNORECASE)
-                        if filename_match:
-                            result = self._create_scan_result(
-                                email_message, 
-                                rule, 
-                                attachment.file.name,
-                                attachment=attachment
-                            )
-                            scan_results.append(result)
-                            break
+                    with attachment.file.open('rb') as handle:
+                        content = handle.read().decode('utf-8', errors='ignore')
+                    found = self.rule_set.scan(content, remaining)
+                    matches.update((pk, (text, attachment)) for pk, text in found.items())
+                else:
+                    # For binary files, check filename
+                    found = self.rule_set.scan(attachment.file.name, remaining)
+                    matches.update((pk, (attachment.file.name, attachment)) for pk in found)
+                remaining -= found.keys()
+        
+        for rule in self.rules:
+            if rule.pk in matches:
+                matched_content, attachment = matches[rule.pk]
+                scan_results.append(self._create_scan_result(email_message, rule, matched_content, attachment=attachment))
         
         return scan_results
     
@@ -1,7 +1,7 @@
 from celery import shared_task
-from django.utils import timezone
 from .models import ScheduledEmail, Newsletter
-from .utils import process_scheduled_emails, send_template_email
+from .utils import process_scheduled_emails
+from .delivery import send_newsletter as deliver_newsletter
 
 @shared_task
 def process_pending_emails():
@@ -10,34 +10,11 @@ def process_pending_emails():
 
 @shared_task
 def send_newsletter(newsletter_id):
-    """Send a newsletter to all active subscribers."""
+    """Send a newsletter to all active subscribers over pooled SMTP connections."""
+    newsletter = None
     try:
-        newsletter = Newsletter.objects.get(id=newsletter_id)
-        
-        # Get active subscribers
-        subscribers = newsletter.subscribers.filter(is_active=True)
-        
-        # Prepare context
-        context = {
-            'newsletter': newsletter,
-            'unsubscribe_url': f'/unsubscribe/{newsletter.id}/'
-        }
-        
-        # Send to each subscriber
-        for subscriber in subscribers:
-            context['subscriber'] = subscriber
-            send_template_email(
-                template_name='newsletter',
-                recipient_list=[subscriber.email],
-                context=context,
-                email_type='newsletter',
-                related_object=newsletter
-            )
-        
-        # Update newsletter status
-        newsletter.status = 'sent'
-        newsletter.sent_at = timezone.now()
-        newsletter.save()
+        newsletter = Newsletter.objects.select_related('template', 'configuration').get(id=newsletter_id)
+        deliver_newsletter(newsletter)
         
     except Newsletter.DoesNotExist:
         return False
@@ -0,0 +1,109 @@
+"""
+Compiled email template cache
+
+Parsing an EmailTemplate's subject, HTML and plain-text sources is the costly
+part of rendering, and a scheduled batch or newsletter renders the same
+template for every recipient. Compiled templates are kept in a process-wide
+LRU keyed by template id and ``updated_at``, so an edited template is simply
+compiled again under its new key while the stale entry ages out.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.template import Context, Engine
+
+# Compiled sources kept per process; override with EMAIL_TEMPLATE_CACHE_SIZE
+DEFAULT_MAX_SIZE = 256
+
+
+class CompiledTemplateCache:
+    """Thread-safe LRU of compiled django.template.Template objects"""
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or getattr(settings, 'EMAIL_TEMPLATE_CACHE_SIZE', DEFAULT_MAX_SIZE)
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def compile(self, key, source):
+        """Return the compiled template cached under ``key``, compiling ``source`` on a miss"""
+        with self._lock:
+            compiled = self._templates.get(key)
+            if compiled is not None:
+                self._templates.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+
+        # Compile outside the lock; a concurrent miss on the same key just compiles twice
+        compiled = Engine.get_default().from_string(source)
+
+        with self._lock:
+            self._templates[key] = compiled
+            self._templates.move_to_end(key)
+            while len(self._templates) > self.max_size:
+                self._templates.popitem(last=False)
+                self.evictions += 1
+        return compiled
+
+    def get(self, template, field, prefix=''):
+        """
+        Compiled version of one field of an EmailTemplate
+
+        Args:
+            template: EmailTemplate, or any model with the same content fields
+                such as Newsletter
+            field: 'subject', 'html_content' or 'plain_text_content'
+            prefix: Source prepended before compiling, e.g. '{% load static %}\\n'
+        """
+        key = (template._meta.label, template.pk, template.updated_at, field, prefix)
+        return self.compile(key, prefix + (getattr(template, field) or ''))
+
+    def get_string(self, source):
+        """Compiled version of a free-standing source such as a subject override"""
+        return self.compile(('source', source), source)
+
+    def render(self, template, context, subject=None, prefix=''):
+        """
+        Render an EmailTemplate's subject, HTML and plain text
+
+        Args:
+            template: EmailTemplate instance
+            context: dict of template variables
+            subject: Subject source to use instead of the template's
+            prefix: Source prepended to the HTML and plain-text bodies
+
+        Returns:
+            tuple: (subject, html_content, plain_text_content)
+        """
+        ctx = context if isinstance(context, Context) else Context(context or {})
+        subject_template = self.get_string(subject) if subject else self.get(template, 'subject')
+        return (
+            subject_template.render(ctx),
+            self.get(template, 'html_content', prefix).render(ctx),
+            self.get(template, 'plain_text_content', prefix).render(ctx),
+        )
+
+    def stats(self):
+        """Hit/miss counters for logging and monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._templates),
+                'max_size': self.max_size,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+template_cache = CompiledTemplateCache()
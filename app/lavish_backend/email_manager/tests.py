@@ -0,0 +1,499 @@
+import re
+import smtplib
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .delivery import OutgoingEmail, SMTPDeliveryEngine, send_newsletter
+from .email_sender import send_template_email
+from .inbox_service import EmailFetchService
+from .models import (
+    EmailConfiguration, EmailGuardianRule, EmailHistory, EmailInbox, EmailMessage, EmailScanResult, EmailTemplate,
+    IncomingMailConfiguration, Newsletter, NewsletterSubscriber, ScheduledEmail,
+)
+from .search import parse_query, search_messages
+from .services import CompiledRuleSet, EmailGuardianService, get_compiled_rules
+from .template_cache import CompiledTemplateCache, template_cache
+
+
+def email_configuration(name='Default', host='smtp.example.com', is_default=True):
+    return EmailConfiguration.objects.create(
+        name=name, email_host=host, email_port=587,
+        email_host_user='info@example.com', email_host_password='secret',
+        default_from_email='info@example.com', is_default=is_default,
+    )
+
+
+class FakeSMTPConnection:
+    """SMTP backend double recording which session sent each message"""
+
+    def __init__(self, server):
+        self.server = server
+        self.number = len(server.connections) + 1
+        server.connections.append(self)
+        self.closed = False
+
+    def open(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def send_messages(self, messages):
+        for message in messages:
+            recipient = message.to[0]
+            if recipient in self.server.drop_once:
+                self.server.drop_once.discard(recipient)
+                raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+            if recipient in self.server.reject:
+                raise smtplib.SMTPRecipientsRefused({recipient: (550, b'No such user')})
+            self.server.sent.append((self.number, recipient, message.subject))
+        return len(messages)
+
+
+class FakeSMTPServer:
+    def __init__(self, drop_once=(), reject=()):
+        self.connections = []
+        self.sent = []
+        self.drop_once = set(drop_once)
+        self.reject = set(reject)
+
+    def backend(self, config=None, timeout=None):
+        return FakeSMTPConnection(self)
+
+
+class TemplateCacheTestCase(TestCase):
+    """Test cases for the compiled email template cache"""
+
+    def setUp(self):
+        template_cache.clear()
+        self.template = EmailTemplate.objects.create(
+            name='Welcome',
+            template_type='welcome',
+            subject='Hello {{ name }}',
+            html_content='<p>Welcome, {{ name }}</p>',
+            plain_text_content='Welcome, {{ name }}',
+        )
+
+    def test_templates_are_compiled_once_per_version(self):
+        cache = CompiledTemplateCache(max_size=10)
+        self.assertEqual(cache.render(self.template, {'name': 'Ada'}),
+                         ('Hello Ada', '<p>Welcome, Ada</p>', 'Welcome, Ada'))
+        self.assertEqual(cache.render(self.template, {'name': 'Grace'})[0], 'Hello Grace')
+        self.assertEqual((cache.stats()['misses'], cache.stats()['hits']), (3, 3))
+
+        # An edited template gets a new key and is compiled again
+        self.template.subject = 'Hi {{ name }}'
+        self.template.save()
+        self.assertEqual(cache.render(self.template, {'name': 'Ada'})[0], 'Hi Ada')
+        self.assertEqual(cache.stats()['misses'], 6)
+
+        # A subject override is compiled on its own and reused
+        cache.render(self.template, {'name': 'Ada'}, subject='Re: {{ name }}')
+        cache.render(self.template, {'name': 'Ada'}, subject='Re: {{ name }}')
+        self.assertEqual(cache.stats()['misses'], 7)
+
+    def test_least_recently_used_templates_are_evicted(self):
+        cache = CompiledTemplateCache(max_size=2)
+        cache.get_string('a')
+        cache.get_string('b')
+        cache.get_string('a')
+        cache.get_string('c')
+
+        stats = cache.stats()
+        self.assertEqual((stats['size'], stats['evictions']), (2, 1))
+        cache.get_string('a')
+        self.assertEqual(cache.stats()['hits'], 2)
+        cache.get_string('b')
+        self.assertEqual(cache.stats()['misses'], 4)
+
+    def test_sends_render_through_the_shared_cache(self):
+        EmailConfiguration.objects.create(
+            name='Default', email_host='smtp.example.com', email_port=587,
+            email_host_user='info@example.com', email_host_password='secret',
+            default_from_email='info@example.com', is_default=True,
+        )
+
+        with patch('email_manager.email_sender.get_email_connection',
+                   side_effect=lambda config: get_connection('django.core.mail.backends.locmem.EmailBackend')):
+            for name in ('Ada', 'Grace'):
+                result = send_template_email('Welcome', f'{name.lower()}@example.com', {'name': name})
+                self.assertTrue(result['success'], result['message'])
+
+        self.assertEqual([message.subject for message in mail.outbox], ['Hello Ada', 'Hello Grace'])
+        self.assertEqual((template_cache.stats()['misses'], template_cache.stats()['hits']), (3, 3))
+
+
+class PooledDeliveryTestCase(TestCase):
+    """Test cases for scheduled emails and newsletters sent over pooled SMTP sessions"""
+
+    def setUp(self):
+        template_cache.clear()
+        self.config = email_configuration()
+        self.server = FakeSMTPServer()
+        patcher = patch('email_manager.delivery.get_email_backend', side_effect=self._backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _backend(self, config=None, timeout=None):
+        return self.server.backend(config, timeout)
+
+    def outgoing(self, count, config=None):
+        return [OutgoingEmail(config or self.config, f'Message {n}', 'Body', [f'user{n}@example.com'])
+                for n in range(count)]
+
+    def test_sessions_are_reused_up_to_their_quota(self):
+        engine = SMTPDeliveryEngine(workers=1, connections_per_config=1, messages_per_connection=2)
+        stats = engine.deliver(self.outgoing(5))
+
+        self.assertEqual((stats['sent'], stats['failed'], stats['connections']), (5, 0, 3))
+        self.assertEqual([number for number, _, _ in self.server.sent], [1, 1, 2, 2, 3])
+        self.assertTrue(all(connection.closed for connection in self.server.connections))
+
+        # Each configuration gets its own sessions
+        self.server.sent.clear()
+        other = email_configuration('Support', 'smtp.other.example.com', is_default=False)
+        stats = SMTPDeliveryEngine(workers=1).deliver(self.outgoing(3) + self.outgoing(3, other))
+        self.assertEqual((stats['sent'], stats['connections']), (6, 2))
+        self.assertEqual([number for number, _, _ in self.server.sent], [4, 4, 4, 5, 5, 5])
+
+    def test_dropped_session_retries_once_and_rejections_keep_the_session(self):
+        self.server.drop_once = {'user1@example.com'}
+        self.server.reject = {'user2@example.com'}
+        outgoing = self.outgoing(4)
+
+        stats = SMTPDeliveryEngine(workers=1, connections_per_config=1).deliver(outgoing)
+
+        self.assertEqual((stats['sent'], stats['failed'], stats['connections']), (3, 1, 2))
+        self.assertEqual([item.sent for item in outgoing], [True, True, False, True])
+        self.assertIn('No such user', outgoing[2].error)
+        self.assertIsNone(outgoing[1].error)
+        self.assertEqual([(number, recipient) for number, recipient, _ in self.server.sent],
+                         [(1, 'user0@example.com'), (2, 'user1@example.com'), (2, 'user3@example.com')])
+
+    def test_newsletter_renders_each_subscriber_and_records_outcomes(self):
+        NewsletterSubscriber.objects.bulk_create([
+            NewsletterSubscriber(email=f'reader{n}@example.com', name=f'Reader {n}') for n in range(3)
+        ] + [NewsletterSubscriber(email='inactive@example.com', is_active=False)])
+        self.server.reject = {'reader2@example.com'}
+        newsletter = Newsletter.objects.create(
+            title='October', subject='News for {{ subscriber.name }}',
+            html_content='<p>{{ newsletter.title }}</p>', plain_text_content='{{ newsletter.title }}',
+        )
+
+        stats = send_newsletter(newsletter, engine=SMTPDeliveryEngine(workers=1))
+
+        self.assertEqual((stats['sent'], stats['failed']), (2, 1))
+        newsletter.refresh_from_db()
+        self.assertEqual((newsletter.status, newsletter.successful_sends, newsletter.failed_sends), ('sent', 2, 1))
+        self.assertIn((1, 'reader0@example.com', 'News for Reader 0'), self.server.sent)
+        self.assertEqual(
+            sorted(EmailHistory.objects.values_list('recipient_email', 'status')),
+            [('reader0@example.com', 'success'), ('reader1@example.com', 'success'),
+             ('reader2@example.com', 'failed')],
+        )
+        self.assertEqual(NewsletterSubscriber.objects.filter(last_sent_newsletter__isnull=False).count(), 2)
+        # Three subscribers, one compile per template field
+        self.assertEqual(template_cache.stats()['misses'], 3)
+
+    def test_scheduled_emails_are_delivered_in_one_engine_run(self):
+        template = EmailTemplate.objects.create(
+            name='Reminder', subject='Hi {{ name }}', html_content='<p>{{ name }}</p>',
+            plain_text_content='{{ name }}',
+        )
+        due = timezone.now() - timedelta(minutes=1)
+        emails = [
+            ScheduledEmail.objects.create(template=template, recipients=[f'user{n}@example.com'],
+                                          variables_data={'name': f'User {n}'}, scheduled_time=due)
+            for n in range(3)
+        ]
+        ScheduledEmail.objects.create(template=template, recipients=['later@example.com'],
+                                      scheduled_time=timezone.now() + timedelta(days=1))
+        self.server.reject = {'user1@example.com'}
+
+        out = StringIO()
+        call_command('send_scheduled_emails', '--workers', '1', stdout=out)
+
+        self.assertIn('Processed 3 emails: 2 sent successfully, 1 failed', out.getvalue())
+        self.assertEqual(len(self.server.connections), 1)
+        statuses = [ScheduledEmail.objects.get(pk=email.pk) for email in emails]
+        self.assertEqual([(email.status, email.attempts) for email in statuses],
+                         [('sent', 0), ('pending', 1), ('sent', 0)])
+        self.assertEqual(EmailHistory.objects.filter(status='success').count(), 2)
+
+
+def raw_email(number):
+    return (
+        f'Message-ID: <{number}@example.com>\r\nSubject: Message {number}\r\n'
+        f'From: sender@example.com\r\nTo: inbox@example.com\r\n\r\nBody {number}'
+    ).encode()
+
+
+class FakeIMAPConnection:
+    """IMAP double serving a folder of {uid: raw message}, with optional FETCH failures"""
+
+    def __init__(self, messages, uid_validity=1):
+        self.messages = messages
+        self.uid_validity = uid_validity
+        self.failing_uids = set()
+        # Left out of FETCH answers although still in the folder
+        self.unanswered_uids = set()
+        self.uid_after_literal = False
+
+    def select(self, folder):
+        return 'OK', [str(len(self.messages)).encode()]
+
+    def response(self, code):
+        return code, [str(self.uid_validity).encode()]
+
+    def logout(self):
+        pass
+
+    def uid(self, command, *args):
+        if command == 'SEARCH':
+            uids = sorted(self.messages)
+            if args[1].endswith(':*'):
+                first = int(args[1].split()[1].split(':')[0])
+                # Like real servers, n:* always matches the highest UID
+                uids = [uid for uid in uids if uid >= first] or uids[-1:]
+            elif args[1] != 'ALL':
+                uids = [uid for uid in uids if str(uid) in args[1].split()[1].split(',')]
+            return 'OK', [' '.join(str(uid) for uid in uids).encode()]
+
+        uids = [int(uid) for uid in args[0].split(',')]
+        headers_only = 'HEADER.FIELDS' in args[1]
+        if not headers_only and self.failing_uids.intersection(uids):
+            return 'NO', [b'FETCH failed']
+        data = []
+        for uid in uids:
+            if uid in self.messages and uid not in self.unanswered_uids:
+                payload = self.messages[uid]
+                if headers_only:
+                    payload = payload.split(b'\r\n')[0] + b'\r\n\r\n'
+                if self.uid_after_literal:
+                    data.extend([(f'{uid} (BODY[] {{{len(payload)}}}'.encode(), payload), f' UID {uid})'.encode()])
+                else:
+                    data.extend([(f'{uid} (UID {uid} BODY[] {{{len(payload)}}}'.encode(), payload), b')'])
+        return 'OK', data
+
+
+class IMAPIncrementalFetchTestCase(TestCase):
+    """Test cases for UID-based IMAP fetching"""
+
+    def setUp(self):
+        self.config = IncomingMailConfiguration.objects.create(
+            name='Support', email_address='inbox@example.com', mail_server='imap.example.com',
+            mail_port=993, username='inbox@example.com', password='secret',
+        )
+        self.inbox = EmailInbox.objects.create(
+            name='Support', email_address='inbox@example.com',
+            configuration=email_configuration(), incoming_config=self.config,
+        )
+        self.server = FakeIMAPConnection({uid: raw_email(uid) for uid in range(10, 14)})
+
+    def fetch(self):
+        service = EmailFetchService(self.config)
+        service.connection = self.server
+        saved = service.fetch_emails(self.inbox)
+        self.config.refresh_from_db()
+        return saved
+
+    def subjects(self):
+        return sorted(EmailMessage.objects.values_list('subject', flat=True))
+
+    def test_failed_fetch_keeps_last_uid(self):
+        self.assertEqual(self.fetch(), 4)
+        self.assertEqual(self.config.last_uid, 13)
+
+        self.server.messages.update({14: raw_email(14), 15: raw_email(15)})
+        self.server.failing_uids = {14}
+        self.assertEqual(self.fetch(), 0)
+        self.assertEqual(self.config.last_uid, 13)
+
+        self.server.failing_uids = set()
+        self.assertEqual(self.fetch(), 2)
+        self.assertEqual(self.config.last_uid, 15)
+        self.assertEqual(EmailMessage.objects.count(), 6)
+
+    def test_resume_after_partial_chunk(self):
+        save_message = EmailFetchService._save_message
+
+        def failing_save(service, inbox, raw, uid, known_ids):
+            if uid == '12':
+                raise ValueError('database unavailable')
+            return save_message(service, inbox, raw, uid, known_ids)
+
+        with patch.object(EmailFetchService, '_save_message', failing_save):
+            self.assertEqual(self.fetch(), 2)
+        self.assertEqual(self.config.last_uid, 11)
+        self.assertEqual(self.subjects(), ['Message 10', 'Message 11'])
+
+        self.assertEqual(self.fetch(), 2)
+        self.assertEqual(self.config.last_uid, 13)
+        self.assertEqual(self.subjects(), ['Message 10', 'Message 11', 'Message 12', 'Message 13'])
+
+    def test_unanswered_uids_are_retried_unless_expunged(self):
+        self.server.unanswered_uids = {12}
+        self.assertEqual(self.fetch(), 2)
+        self.assertEqual(self.config.last_uid, 11)
+
+        self.server.unanswered_uids = set()
+        self.server.uid_after_literal = True
+        self.assertEqual(self.fetch(), 2)
+        self.assertEqual(self.config.last_uid, 13)
+
+        # UID 14 was expunged between SEARCH and FETCH
+        self.server.messages.update({14: raw_email(14), 15: raw_email(15)})
+        self.server.uid = self.expunge_before_fetch(self.server.uid, 14)
+        self.assertEqual(self.fetch(), 1)
+        self.assertEqual(self.config.last_uid, 15)
+        self.assertEqual(self.subjects(), [f'Message {n}' for n in (10, 11, 12, 13, 15)])
+
+    def expunge_before_fetch(self, uid, expunged):
+        def command(name, *args):
+            if name == 'FETCH':
+                self.server.messages.pop(expunged, None)
+            return uid(name, *args)
+        return command
+
+    def test_uidvalidity_reset_refetches_and_deduplicates(self):
+        self.fetch()
+        self.assertEqual((self.config.last_uid, self.config.uid_validity), (13, 1))
+
+        # The folder was rebuilt: same messages under new UIDs, plus one new message
+        self.server.messages = {uid - 9: raw_email(uid) for uid in range(10, 15)}
+        self.server.uid_validity = 2
+        self.assertEqual(self.fetch(), 1)
+        self.assertEqual((self.config.last_uid, self.config.uid_validity), (5, 2))
+        self.assertEqual(EmailMessage.objects.count(), 5)
+
+        self.server.messages[6] = raw_email(15)
+        self.assertEqual(self.fetch(), 1)
+        self.assertEqual(self.config.last_uid, 6)
+
+
+class GuardianRuleSetTestCase(TestCase):
+    """Test cases for scanning against the precompiled guardian rule set"""
+
+    def rule(self, name, pattern, **fields):
+        return EmailGuardianRule.objects.create(
+            name=name, description=name, severity='high', pattern=pattern, action='mark_spam', **fields
+        )
+
+    def test_combined_scan_matches_each_rule_like_a_separate_search(self):
+        rules = [
+            self.rule('bit', r'bit'),
+            self.rule('bitcoin', r'bitcoin\s+wallet'),
+            self.rule('coin', r'coin'),
+            self.rule('repeat', r'(\w)\1{3}'),
+            self.rule('named', r'(?P<amount>\$\d+)'),
+            self.rule('invalid', r'(unclosed'),
+            self.rule('absent', r'lottery'),
+        ]
+        rule_set = CompiledRuleSet(rules)
+        self.assertNotIn(rules[5], rule_set.rules)
+
+        text = 'Send $500 to my BITCOIN   wallet, zzzz fast'
+        expected = {}
+        for rule in rule_set.rules:
+            match = re.search(rule.pattern, text, re.IGNORECASE)
+            if match:
+                expected[rule.pk] = match.group(0)
+        self.assertEqual(rule_set.scan(text, {rule.pk for rule in rule_set.rules}), expected)
+        self.assertEqual(set(expected), {rule.pk for rule in rules[:5]})
+
+        # Only candidate rules are reported
+        self.assertEqual(rule_set.scan(text, {rules[2].pk}), {rules[2].pk: 'COIN'})
+
+    def test_compiled_rules_are_reused_until_a_rule_changes(self):
+        urgent = self.rule('urgent', r'urgent')
+        self.assertIs(get_compiled_rules(), get_compiled_rules())
+
+        rules = get_compiled_rules()
+        urgent.pattern = r'urgent|asap'
+        urgent.save()
+        self.assertIsNot(get_compiled_rules(), rules)
+        self.assertEqual(get_compiled_rules().scan('reply ASAP', {urgent.pk}), {urgent.pk: 'ASAP'})
+
+        urgent.is_active = False
+        urgent.save()
+        self.assertEqual(get_compiled_rules().rules, [])
+
+    def test_scan_email_records_one_result_per_matching_rule(self):
+        inbox = EmailInbox.objects.create(name='Support', email_address='inbox@example.com',
+                                          configuration=email_configuration())
+        message = EmailMessage.objects.create(
+            inbox=inbox, subject='Invoice overdue', body='Pay the invoice via wire transfer',
+            from_email='sender@example.com', to_emails=['inbox@example.com'],
+        )
+        invoice = self.rule('invoice', r'invoice')
+        wire = self.rule('wire', r'wire\s+transfer')
+        self.rule('inactive', r'overdue', is_active=False)
+
+        results = EmailGuardianService().scan_email(message)
+
+        self.assertEqual([result.guardian_rule for result in results], [invoice, wire])
+        # A rule matching the subject is not looked for again in the body
+        self.assertEqual(results[0].matched_content, 'Invoice')
+        self.assertEqual(results[1].matched_content, 'wire transfer')
+        self.assertEqual(EmailScanResult.objects.filter(email=message).count(), 2)
+
+
+class MessageSearchTestCase(TestCase):
+    """Test cases for full-text message search"""
+
+    def setUp(self):
+        self.inbox = EmailInbox.objects.create(name='Support', email_address='inbox@example.com',
+                                               configuration=email_configuration())
+        self.invoice = self.message('Invoice 1042', 'Please find the attached document', 'billing@vendor.com')
+        self.reminder = self.message('Friendly reminder', 'Your invoice is overdue', 'accounts@vendor.com')
+        self.lunch = self.message('Lunch on Friday', 'Shall we meet at noon?', 'invoices-team@example.com')
+
+    def message(self, subject, body, from_email):
+        return EmailMessage.objects.create(inbox=self.inbox, subject=subject, body=body, from_email=from_email,
+                                           to_emails=['inbox@example.com'], received_at=timezone.now())
+
+    def search(self, query):
+        return list(search_messages(EmailMessage.objects.all(), query))
+
+    def test_parse_query_keeps_phrases_and_splits_punctuation(self):
+        self.assertEqual(parse_query('"Wire Transfer" john@example.com  '),
+                         [['wire', 'transfer'], ['john', 'example', 'com']])
+        self.assertEqual(parse_query('  '), [])
+
+    def test_index_ranks_subject_above_sender_above_body_with_prefixes(self):
+        self.assertEqual(self.search('invoice'), [self.invoice, self.lunch, self.reminder])
+        self.assertEqual(self.search('invo'), [self.invoice, self.lunch, self.reminder])
+        self.assertEqual(self.search('noo'), [self.lunch])
+        self.assertEqual(self.search('"friendly reminder"'), [self.reminder])
+        self.assertEqual(self.search('reminder friendly invoice'), [self.reminder])
+        self.assertEqual(self.search('"reminder friendly"'), [])
+        self.assertEqual(len(self.search('')), 3)
+
+    def test_triggers_keep_the_index_current(self):
+        self.reminder.subject = 'Final notice'
+        self.reminder.body = 'Account suspended'
+        self.reminder.save()
+        self.assertEqual(self.search('suspended'), [self.reminder])
+        self.assertEqual(self.search('overdue'), [])
+
+        # Saving unindexed fields leaves the entry in place
+        EmailMessage.objects.filter(pk=self.invoice.pk).update(is_read=True)
+        self.assertEqual(self.search('1042'), [self.invoice])
+
+        self.invoice.delete()
+        self.assertEqual(self.search('1042'), [])
+        self.assertEqual(self.search('invoice'), [self.lunch])
+
+    def test_other_databases_fall_back_to_icontains(self):
+        with patch('email_manager.search.connection', SimpleNamespace(vendor='mysql')):
+            results = search_messages(EmailMessage.objects.order_by('pk'), 'invoice vendor')
+            self.assertEqual(list(results), [self.invoice, self.reminder])
+            self.assertNotIn('search_rank', results.query.annotations)
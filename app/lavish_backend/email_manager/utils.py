@@ -8,10 +8,11 @@ from django.core.mail.message import EmailMessage
 from django.core.mail import get_connection
 from django.utils import timezone
 from .models import EmailConfiguration, EmailHistory, EmailTemplate, ScheduledEmail
+from .template_cache import template_cache
 import ssl
 import time
 import os
-from django.template import Template, Context
+from django.template import Context
 from django.contrib.contenttypes.models import ContentType
 
 logger = logging.getLogger(__name__)
@@ -291,8 +292,8 @@ def send_template_email(
         if context is None:
             context = {}
         
-        # Render template - use Template directly since we have template content, not a path
-        template_obj = Template(template.html_content)
+        # Render template from the compiled template cache
+        template_obj = template_cache.get(template, 'html_content')
         ctx_obj = Context(context)
         html_message = template_obj.render(ctx_obj)
         plain_message = strip_tags(html_message)
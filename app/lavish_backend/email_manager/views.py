@@ -5,7 +5,6 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.core.paginator import Paginator
 from django.utils import timezone
-from django.db.models import Q
 from .models import (
     EmailConfiguration,
     EmailTemplate,
@@ -23,6 +22,7 @@ from .models import (
     EmailLabel,
     MessageLabel
 )
+from .search import search_messages
 from .forms import (
     EmailConfigurationForm,
     EmailTemplateForm,
@@ -88,15 +88,10 @@ def inbox_list(request):
     if folder_id:
         email_messages = email_messages.filter(folder_id=folder_id)
     
-    if search_query:
-        email_messages = email_messages.filter(
-            Q(subject__icontains=search_query) |
-            Q(body__icontains=search_query) |
-            Q(from_email__icontains=search_query)
-        )
-    
-    # Order by received date
+    # Order by received date, or by relevance when searching
     email_messages = email_messages.order_by('-received_at', '-created_at')
+    if search_query:
+        email_messages = search_messages(email_messages, search_query)
     
     paginator = Paginator(email_messages, 20)
     page = request.GET.get('page')
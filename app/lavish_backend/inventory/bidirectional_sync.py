@@ -10,14 +10,43 @@ Supports:
 """
 
 import logging
+from collections import defaultdict
 from typing import Dict, List, Optional
 from django.utils import timezone
 from django.db import transaction
-from shopify_integration.enhanced_client import EnhancedShopifyAPIClient
+from shopify_integration.enhanced_client import EnhancedShopifyAPIClient, INVENTORY_SET_QUANTITIES_LIMIT
 from datetime import datetime
 
 logger = logging.getLogger('inventory.bidirectional_sync')
 
+# Pending levels sent per inventorySetQuantities call
+PUSH_BATCH_SIZE = INVENTORY_SET_QUANTITIES_LIMIT
+# A rejected batch is resent without its failing rows at most this many times
+PUSH_BATCH_RETRIES = 2
+# Rows written per flag update
+FLAG_UPDATE_BATCH_SIZE = 500
+
+
+def _shopify_gid(resource: str, shopify_id: Optional[str]) -> Optional[str]:
+    """Global ID for a numeric legacy ID; GIDs pass through unchanged"""
+    if shopify_id and shopify_id.isdigit():
+        return f"gid://shopify/{resource}/{shopify_id}"
+    return shopify_id
+
+
+def _is_placeholder(shopify_id: str) -> bool:
+    return shopify_id.startswith('test_') or shopify_id.startswith('temp_')
+
+
+def _quantity_index(field) -> Optional[int]:
+    """Position in the input quantities a userError field such as ["input", "quantities", "3", "locationId"] points at"""
+    if field and len(field) >= 3 and field[0] == 'input' and field[1] == 'quantities':
+        try:
+            return int(field[2])
+        except (TypeError, ValueError):
+            return None
+    return None
+
 
 class InventoryBidirectionalSync:
     """Service for syncing inventory levels between Django and Shopify"""
@@ -177,39 +206,87 @@ class InventoryBidirectionalSync:
                 "inventory_level_id": inventory_level.id
             }
     
-    def push_all_pending_inventory(self) -> Dict:
+    def push_all_pending_inventory(self, batch_size: int = PUSH_BATCH_SIZE) -> Dict:
         """
         Push all inventory levels that need Shopify sync
         
+        Levels are sent in batches of up to ``batch_size`` quantities per
+        inventorySetQuantities call. Location GIDs are resolved once for the
+        run and userErrors are mapped back to the rows they name. Failed rows
+        get their errors in one bulk_update; pushed rows are only cleared while
+        they still hold the quantity that was sent, so a level edited during
+        the run stays flagged for the next one.
+        
         Returns:
             Dict with statistics about the operation
         """
-        from inventory.models import ShopifyInventoryLevel
+        from inventory.models import ShopifyInventoryLevel, ShopifyLocation
         
-        pending_levels = ShopifyInventoryLevel.objects.filter(
+        pending_levels = list(ShopifyInventoryLevel.objects.filter(
             needs_shopify_push=True
-        ).select_related('inventory_item', 'location')
-        
-        total = pending_levels.count()
-        success_count = 0
-        error_count = 0
-        errors = []
+        ).select_related('inventory_item'))
+        total = len(pending_levels)
         
         logger.info(f"🔄 Starting push of {total} pending inventory levels...")
         
+        locations = {
+            pk: (name, shopify_id)
+            for pk, name, shopify_id in ShopifyLocation.objects.filter(
+                pk__in={level.location_id for level in pending_levels}
+            ).values_list('pk', 'name', 'shopify_id')
+        }
+        
+        ready = []
         for level in pending_levels:
-            result = self.push_inventory_to_shopify(level)
-            
-            if result["success"]:
-                success_count += 1
+            item_id = level.inventory_item.shopify_id
+            location_id = locations[level.location_id][1]
+            if not item_id:
+                level.shopify_push_error = "Inventory item has no Shopify ID"
+            elif _is_placeholder(item_id):
+                level.shopify_push_error = f"Cannot push inventory with test/temp ID: {item_id}"
+            elif not location_id:
+                level.shopify_push_error = "Location has no Shopify ID"
+            elif _is_placeholder(location_id):
+                level.shopify_push_error = f"Cannot push inventory with test/temp location ID: {location_id}"
             else:
-                error_count += 1
-                errors.append({
-                    "inventory_level_id": level.id,
-                    "sku": level.inventory_item.sku,
-                    "location": level.location.name,
-                    "error": result.get("message", "Unknown error")
-                })
+                ready.append((level, {
+                    "inventoryItemId": _shopify_gid('InventoryItem', item_id),
+                    "locationId": _shopify_gid('Location', location_id),
+                    "quantity": level.available,
+                }))
+        
+        pushed_at = timezone.now()
+        for start in range(0, len(ready), batch_size):
+            self._push_batch(ready[start:start + batch_size], pushed_at)
+        
+        failed = [level for level in pending_levels if level.needs_shopify_push]
+        ShopifyInventoryLevel.objects.bulk_update(failed, ['shopify_push_error'], batch_size=FLAG_UPDATE_BATCH_SIZE)
+        
+        pushed_by_quantity = defaultdict(list)
+        for level in pending_levels:
+            if not level.needs_shopify_push:
+                pushed_by_quantity[level.available].append(level.pk)
+        cleared = 0
+        for quantity, ids in pushed_by_quantity.items():
+            for start in range(0, len(ids), FLAG_UPDATE_BATCH_SIZE):
+                cleared += ShopifyInventoryLevel.objects.filter(
+                    pk__in=ids[start:start + FLAG_UPDATE_BATCH_SIZE], available=quantity,
+                ).update(needs_shopify_push=False, shopify_push_error='', last_pushed_to_shopify=pushed_at)
+        changed = total - len(failed) - cleared
+        if changed:
+            logger.info(f"🔁 {changed} inventory levels changed during the push and stay queued")
+        
+        errors = [
+            {
+                "inventory_level_id": level.id,
+                "sku": level.inventory_item.sku,
+                "location": locations[level.location_id][0],
+                "error": level.shopify_push_error or "Unknown error"
+            }
+            for level in pending_levels if level.needs_shopify_push
+        ]
+        success_count = total - len(errors)
+        error_count = len(errors)
         
         logger.info(f"✅ Inventory push completed: {success_count} success, {error_count} errors out of {total} total")
         
@@ -221,6 +298,49 @@ class InventoryBidirectionalSync:
             "errors": errors
         }
     
+    def _push_batch(self, batch, pushed_at):
+        """
+        Push one batch of (level, quantity) pairs, recording the outcome on each level
+        
+        Shopify applies nothing from a call that returns userErrors, so rows
+        named by an error are taken out and the rest are sent again.
+        """
+        for attempt in range(PUSH_BATCH_RETRIES + 1):
+            result = self.client.set_inventory_quantities([quantity for _, quantity in batch])
+            
+            if result.get("success"):
+                for level, _ in batch:
+                    level.needs_shopify_push = False
+                    level.shopify_push_error = ""
+                    level.last_pushed_to_shopify = pushed_at
+                return
+            
+            row_errors = {}
+            batch_errors = []
+            for error in result.get("errors") or []:
+                message = f"{error.get('field')}: {error.get('message')}"
+                index = _quantity_index(error.get('field'))
+                if index is not None and index < len(batch):
+                    row_errors.setdefault(index, []).append(message)
+                else:
+                    batch_errors.append(message)
+            
+            if batch_errors or not row_errors:
+                error_msg = "; ".join(batch_errors) or result.get("message", "Unknown error")
+                logger.error(f"❌ Inventory batch push failed: {error_msg}")
+                for level, _ in batch:
+                    level.shopify_push_error = error_msg
+                return
+            
+            for index, messages in row_errors.items():
+                batch[index][0].shopify_push_error = "; ".join(messages)
+            batch = [row for index, row in enumerate(batch) if index not in row_errors]
+            if not batch:
+                return
+        
+        for level, _ in batch:
+            level.shopify_push_error = "Not pushed: the batch kept being rejected"
+    
     def pull_inventory_from_shopify(self, inventory_item_id: Optional[str] = None) -> Dict:
         """
         Pull inventory levels from Shopify
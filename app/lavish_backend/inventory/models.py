@@ -237,3 +237,16 @@ class InventorySyncLog(models.Model):
     
     def __str__(self):
         return f"{self.operation_type} - {self.status} ({self.started_at})"
+
+
+# Retire cached storefront API responses built from inventory
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+@receiver(post_save, sender=ShopifyInventoryItem)
+@receiver(post_delete, sender=ShopifyInventoryItem)
+@receiver(post_save, sender=ShopifyInventoryLevel)
+@receiver(post_delete, sender=ShopifyInventoryLevel)
+def invalidate_catalog_responses(sender, **kwargs):
+    from api.response_cache import CATALOG, bump_version
+    bump_version(CATALOG)
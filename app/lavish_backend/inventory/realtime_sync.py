@@ -7,11 +7,11 @@ import logging
 from typing import Dict, List, Optional
 from datetime import datetime
 from django.utils.dateparse import parse_datetime
-from django.db import transaction
 from django.conf import settings
 
 from .models import ShopifyLocation, ShopifyInventoryItem, ShopifyInventoryLevel, InventoryAdjustment, InventorySyncLog
 from shopify_integration.enhanced_client import EnhancedShopifyAPIClient
+from shopify_integration.incremental_sync import sync_resource
 
 logger = logging.getLogger('inventory.realtime_sync')
 
@@ -26,43 +26,39 @@ class RealtimeInventorySyncService:
         self.client = EnhancedShopifyAPIClient()
         self.store_domain = settings.SHOPIFY_STORE_URL
     
-    def sync_all_inventory(self, limit: Optional[int] = None) -> Dict:
+    def sync_all_inventory(self, limit: Optional[int] = None, full: Optional[bool] = None) -> Dict:
         """
         Sync all inventory items from Shopify with real-time data refresh
+        
+        Each GraphQL page is upserted as soon as it arrives, so only one page is held
+        in memory and an interrupted sync keeps every page already written.
+        
+        Without ``limit`` only items updated since the last sync are fetched, with a
+        periodic full reconcile that also removes items deleted in Shopify (``full``
+        forces or skips it; see shopify_integration.incremental_sync).
         """
         logger.info("🔄 Starting real-time inventory sync...")
         
         try:
-            # Fetch inventory items using enhanced client
-            inventory_data = self.client.fetch_all_inventory_items(limit=limit)
+            stats = sync_resource(self.client, 'inventory', self.store_domain, limit=limit, full=full)
             
-            if not inventory_data:
+            if not stats['pages'] and stats['mode'] != 'incremental':
                 return {
                     'success': False,
-                    'message': 'No inventory items retrieved from Shopify',
+                    'message': stats.get('error') or 'No inventory items retrieved from Shopify',
                     'stats': {'total': 0, 'created': 0, 'updated': 0, 'errors': 0}
                 }
             
-            # Process inventory items in batches
-            stats = {'total': 0, 'created': 0, 'updated': 0, 'errors': 0, 'levels': 0, 'locations': 0}
-            
-            with transaction.atomic():
-                for item_data in inventory_data:
-                    try:
-                        result = self._sync_single_inventory_item(item_data)
-                        stats['total'] += 1
-                        stats['levels'] += result['levels_synced']
-                        stats['locations'] += result['locations_synced']
-                        
-                        if result['created']:
-                            stats['created'] += 1
-                        else:
-                            stats['updated'] += 1
-                            
-                    except Exception as e:
-                        logger.error(f"Error syncing inventory item {item_data.get('id', 'unknown')}: {e}")
-                        stats['errors'] += 1
-                        continue
+            if not stats['complete']:
+                # Pages already written stay written, but deletes and the watermark were skipped
+                reason = stats.get('error') or 'the listing did not finish'
+                logger.warning(f"⚠️ Inventory sync incomplete: {reason}")
+                return {
+                    'success': False,
+                    'partial': stats['total'] > 0,
+                    'message': f"Inventory sync incomplete after {stats['total']} inventory items: {reason}",
+                    'stats': stats
+                }
             
             logger.info(f"✅ Inventory sync completed: {stats}")
             
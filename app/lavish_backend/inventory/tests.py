@@ -1,3 +1,110 @@
 from django.test import TestCase
+from django.utils import timezone
 
-# Create your tests here.
+from .bidirectional_sync import InventoryBidirectionalSync
+from .models import ShopifyInventoryItem, ShopifyInventoryLevel, ShopifyLocation
+
+
+class FakeInventoryClient:
+    """Records inventorySetQuantities batches and rejects the configured inventory items"""
+
+    def __init__(self, rejected=(), on_call=None):
+        self.rejected = set(rejected)
+        self.on_call = on_call
+        self.batches = []
+
+    def set_inventory_quantities(self, quantities):
+        self.batches.append(quantities)
+        if self.on_call:
+            self.on_call()
+        errors = [
+            {'field': ['input', 'quantities', str(index), 'inventoryItemId'], 'message': 'Inventory item not found'}
+            for index, quantity in enumerate(quantities) if quantity['inventoryItemId'] in self.rejected
+        ]
+        if errors:
+            return {'success': False, 'errors': errors, 'message': 'Validation errors occurred'}
+        return {'success': True, 'adjustment': {'id': 'gid://shopify/InventoryAdjustmentGroup/1'}}
+
+
+class InventoryBatchPushTestCase(TestCase):
+    """Test cases for pushing pending inventory levels in batches"""
+
+    def setUp(self):
+        self.location = ShopifyLocation.objects.create(shopify_id='71234', name='Warehouse')
+
+    def _level(self, item_id, available):
+        item = ShopifyInventoryItem.objects.create(shopify_id=item_id, sku=f'SKU-{item_id[-1]}')
+        return ShopifyInventoryLevel.objects.create(
+            inventory_item=item, location=self.location, available=available, updated_at=timezone.now(),
+        )
+
+    def _push(self, client, batch_size):
+        service = InventoryBidirectionalSync()
+        service.client = client
+        return service.push_all_pending_inventory(batch_size=batch_size)
+
+    def test_levels_are_pushed_in_batches(self):
+        """Pending levels share calls, and location IDs are sent as GIDs"""
+        levels = [self._level(f'gid://shopify/InventoryItem/{n}', n * 10) for n in range(1, 6)]
+        client = FakeInventoryClient()
+
+        result = self._push(client, batch_size=2)
+
+        self.assertEqual([len(batch) for batch in client.batches], [2, 2, 1])
+        self.assertEqual(client.batches[0][0], {
+            'inventoryItemId': 'gid://shopify/InventoryItem/1',
+            'locationId': 'gid://shopify/Location/71234',
+            'quantity': 10,
+        })
+        self.assertEqual(result['success_count'], 5)
+        self.assertFalse(ShopifyInventoryLevel.objects.filter(needs_shopify_push=True).exists())
+        self.assertEqual(ShopifyInventoryLevel.objects.filter(last_pushed_to_shopify__isnull=False).count(), len(levels))
+
+    def test_user_errors_are_mapped_to_their_rows(self):
+        """A rejected row keeps its flag and error; the rest of its batch is resent and pushed"""
+        for n in range(1, 4):
+            self._level(f'gid://shopify/InventoryItem/{n}', n)
+        placeholder = self._level('temp_4', 4)
+        client = FakeInventoryClient(rejected={'gid://shopify/InventoryItem/2'})
+
+        result = self._push(client, batch_size=250)
+
+        self.assertEqual(len(client.batches), 2)
+        self.assertEqual([q['inventoryItemId'] for q in client.batches[1]],
+                         ['gid://shopify/InventoryItem/1', 'gid://shopify/InventoryItem/3'])
+        self.assertEqual(result['success_count'], 2)
+        self.assertEqual(result['error_count'], 2)
+
+        rejected = ShopifyInventoryLevel.objects.get(inventory_item__shopify_id='gid://shopify/InventoryItem/2')
+        self.assertTrue(rejected.needs_shopify_push)
+        self.assertIn('Inventory item not found', rejected.shopify_push_error)
+        placeholder.refresh_from_db()
+        self.assertTrue(placeholder.needs_shopify_push)
+        self.assertIn('test/temp ID', placeholder.shopify_push_error)
+
+    def test_levels_edited_during_the_push_stay_queued(self):
+        """A level whose quantity changed while its batch was in flight keeps its flag"""
+        levels = [self._level(f'gid://shopify/InventoryItem/{n}', 10) for n in range(1, 4)]
+
+        def edit():
+            if len(client.batches) == 1:
+                edited = ShopifyInventoryLevel.objects.get(pk=levels[1].pk)
+                edited.available = 7
+                edited.save()
+        client = FakeInventoryClient(on_call=edit)
+
+        result = self._push(client, batch_size=2)
+
+        self.assertEqual(result['success_count'], 3)
+        edited = ShopifyInventoryLevel.objects.get(pk=levels[1].pk)
+        self.assertEqual((edited.available, edited.needs_shopify_push, edited.last_pushed_to_shopify), (7, True, None))
+        self.assertEqual(ShopifyInventoryLevel.objects.filter(needs_shopify_push=False).count(), 2)
+
+        # The next run sends the new quantity
+        self._push(client, batch_size=2)
+        self.assertEqual(client.batches[-1], [{
+            'inventoryItemId': 'gid://shopify/InventoryItem/2',
+            'locationId': 'gid://shopify/Location/71234',
+            'quantity': 7,
+        }])
+        self.assertFalse(ShopifyInventoryLevel.objects.filter(needs_shopify_push=True).exists())
@@ -4,7 +4,7 @@ Makes currency info available in all templates
 """
 
 from django.conf import settings
-from .models import Country
+from .locale_service import currency_symbol
 
 
 def currency_context(request):
@@ -22,21 +22,15 @@ def currency_context(request):
     country = getattr(request, 'country', 'US')
     language = getattr(request, 'LANGUAGE_CODE', 'en')
     
-    # Get currency symbol from Country model
-    currency_symbol = '$'
-    try:
-        country_obj = Country.objects.filter(currency=currency).first()
-        if country_obj:
-            currency_symbol = country_obj.currency_symbol
-    except:
-        pass
+    # Currency symbols come from the Country table, loaded once and kept in memory
+    symbol = currency_symbol(currency)
     
     # Supported currencies from settings
     supported = getattr(settings, 'SUPPORTED_CURRENCIES', ['USD', 'EUR', 'GBP', 'CAD', 'AUD'])
     
     return {
         'current_currency': currency,
-        'currency_symbol': currency_symbol,
+        'currency_symbol': symbol,
         'supported_currencies': supported,
         'current_country': country,
         'current_language': language,
@@ -0,0 +1,135 @@
+"""
+Locale resolution for LocaleMiddleware and the currency context processor
+
+Resolving a visitor's country and currency used to reopen the MaxMind
+database on every request without a session country, sometimes twice, and
+every template render queried Country for the currency symbol. Here:
+
+- One GeoIP reader is opened per process, memory-mapped and shared by all
+  threads (the reader is thread-safe). A database that cannot be opened is
+  not retried on every request.
+- IP → (country, currency) lookups are kept in a bounded LRU.
+- Currency symbols are loaded from Country once, and reloaded after a
+  country changes (the ``locations`` version bumped by locations/models.py).
+
+GeoIP needs the ``geoip2`` package and a GeoLite2/GeoIP2 Country database at
+GEOIP_PATH (the file, or the directory holding GEOIP_COUNTRY). Without them
+visitors resolve to DEFAULT_COUNTRY.
+"""
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+
+try:
+    import geoip2.database
+    import geoip2.errors
+except ImportError:  # pragma: no cover - optional dependency
+    geoip2 = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COUNTRY = 'US'
+DEFAULT_CURRENCY = 'USD'
+DEFAULT_CURRENCY_SYMBOL = '$'
+IP_CACHE_SIZE = 10000
+
+COUNTRY_CURRENCIES = {
+    'US': 'USD', 'CA': 'CAD', 'GB': 'GBP', 'AU': 'AUD',
+    'NZ': 'NZD', 'JP': 'JPY', 'CN': 'CNY', 'CH': 'CHF',
+    'SE': 'SEK', 'NO': 'NOK', 'DK': 'DKK',
+    # EU countries
+    'DE': 'EUR', 'FR': 'EUR', 'IT': 'EUR', 'ES': 'EUR',
+    'NL': 'EUR', 'BE': 'EUR', 'AT': 'EUR', 'IE': 'EUR',
+    'PT': 'EUR', 'FI': 'EUR', 'GR': 'EUR',
+}
+
+_reader = None
+_reader_opened = False
+_reader_lock = threading.Lock()
+
+
+def _database_path() -> Optional[str]:
+    path = getattr(settings, 'GEOIP_PATH', None)
+    if not path:
+        return None
+    path = os.fspath(path)
+    if os.path.isdir(path):
+        path = os.path.join(path, getattr(settings, 'GEOIP_COUNTRY', 'GeoLite2-Country.mmdb'))
+    return path
+
+
+def geoip_reader():
+    """The process-wide GeoIP reader, or None when GeoIP is not available"""
+    global _reader, _reader_opened
+    if _reader_opened:
+        return _reader
+    with _reader_lock:
+        if not _reader_opened:
+            path = _database_path()
+            if geoip2 is None or not path:
+                logger.info("GeoIP not configured; visitors default to %s", DEFAULT_COUNTRY)
+            else:
+                try:
+                    _reader = geoip2.database.Reader(path, mode=geoip2.database.MODE_MMAP)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Could not open GeoIP database {path}: {e}")
+            _reader_opened = True
+    return _reader
+
+
+def country_to_currency(country_code: str) -> str:
+    """Map country code to currency"""
+    return COUNTRY_CURRENCIES.get(country_code, DEFAULT_CURRENCY)
+
+
+@lru_cache(maxsize=IP_CACHE_SIZE)
+def locale_for_ip(ip: Optional[str]) -> Tuple[str, str]:
+    """(country, currency) of a client IP, DEFAULT_COUNTRY when it cannot be located"""
+    country = None
+    reader = geoip_reader()
+    if reader is not None and ip:
+        try:
+            country = reader.country(ip).country.iso_code
+        except (geoip2.errors.AddressNotFoundError, ValueError):
+            pass
+        except Exception as e:
+            logger.debug(f"GeoIP lookup failed for {ip}: {e}")
+    country = country or DEFAULT_COUNTRY
+    return country, country_to_currency(country)
+
+
+_symbols = (None, {})
+_symbols_lock = threading.Lock()
+
+
+def _load_symbols() -> Dict[str, str]:
+    from .models import Country
+
+    symbols = {}
+    for currency, symbol in Country.objects.exclude(currency='').values_list('currency', 'currency_symbol'):
+        # Several countries share a currency; the first in Country ordering wins, as before
+        symbols.setdefault(currency, symbol)
+    return symbols
+
+
+def currency_symbol(currency: str) -> str:
+    """Symbol of a currency from the Country table, loaded once per locations version"""
+    global _symbols
+    from api.response_cache import LOCATIONS, get_version
+
+    version = get_version(LOCATIONS)
+    loaded_version, symbols = _symbols
+    if loaded_version != version:
+        with _symbols_lock:
+            if _symbols[0] != version:
+                try:
+                    _symbols = (version, _load_symbols())
+                except Exception as e:
+                    logger.warning(f"Could not load currency symbols: {e}")
+                    _symbols = (version, {})
+            symbols = _symbols[1]
+    return symbols.get(currency) or DEFAULT_CURRENCY_SYMBOL
@@ -45,3 +45,18 @@ class City(models.Model):
     
     def __str__(self):
         return f"{self.name}, {self.state.name}, {self.state.country.name}"
+
+
+# Retire cached storefront API responses built from countries, states and cities
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+@receiver(post_save, sender=Country)
+@receiver(post_delete, sender=Country)
+@receiver(post_save, sender=State)
+@receiver(post_delete, sender=State)
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+def invalidate_location_responses(sender, **kwargs):
+    from api.response_cache import LOCATIONS, bump_version
+    bump_version(LOCATIONS)
@@ -3,7 +3,6 @@ Shopify Currency and Locale Service
 Handles multi-currency support and locale detection
 """
 
-import requests
 import logging
 from decimal import Decimal
 from typing import Dict, Optional
@@ -11,6 +10,10 @@ from django.conf import settings
 from django.core.cache import cache
 from django.utils import translation
 
+from shopify_integration.http_pool import get_session
+from shopify_integration.throttle import graphql_budget, query_key, settle_graphql
+from .locale_service import country_to_currency, locale_for_ip
+
 logger = logging.getLogger(__name__)
 
 
@@ -37,6 +40,8 @@ class ShopifyCurrencyService:
         self.shop_domain = shop_domain
         self.access_token = access_token
         self.graphql_url = f"https://{shop_domain}/admin/api/2024-10/graphql.json"
+        self.cost_budget = graphql_budget(shop_domain)
+        self.session = get_session('shopify')
     
     def get_shop_currencies(self) -> Dict:
         """
@@ -237,7 +242,7 @@ class ShopifyCurrencyService:
             api_key = getattr(settings, 'EXCHANGE_RATE_API_KEY', None)
             
             if api_key:
-                response = requests.get(
+                response = self.session.get(
                     f'https://v6.exchangerate-api.com/v6/{api_key}/pair/{from_currency}/{to_currency}',
                     timeout=3
                 )
@@ -292,16 +297,25 @@ class ShopifyCurrencyService:
             if variables:
                 payload['variables'] = variables
             
-            response = requests.post(
-                self.graphql_url,
-                json=payload,
-                headers=headers,
-                timeout=10
-            )
+            key = query_key(query)
+            reserved = self.cost_budget.reserve(key)
+            try:
+                response = self.session.post(
+                    self.graphql_url,
+                    json=payload,
+                    headers=headers,
+                    timeout=10
+                )
+            except Exception:
+                self.cost_budget.settle(key, reserved, None)
+                raise
             
             if response.status_code == 200:
-                return response.json()
+                result = response.json()
+                settle_graphql(self.shop_domain, self.cost_budget, key, reserved, result)
+                return result
             
+            self.cost_budget.settle(key, reserved, None)
             logger.error(f"GraphQL request failed: {response.status_code}")
             return None
             
@@ -333,6 +347,10 @@ class ShopifyCurrencyService:
 class LocaleMiddleware:
     """
     Django middleware to detect and set user locale and currency
+    
+    GeoIP lookups go through the shared reader and IP cache of
+    locations.locale_service, and the session is only written when the
+    detected currency or country differs from what it holds.
     """
     
     def __init__(self, get_response):
@@ -353,15 +371,18 @@ class LocaleMiddleware:
         translation.activate(language)
         request.LANGUAGE_CODE = language
         
-        # 2. Currency detection
-        currency = self._detect_currency(request)
-        request.currency = currency
-        request.session['currency'] = currency
-        
-        # 3. Country detection
+        # 2. Country detection
         country = self._detect_country(request)
         request.country = country
-        request.session['country'] = country
+        
+        # 3. Currency detection
+        currency = self._detect_currency(request, country)
+        request.currency = currency
+        
+        # Assigning to the session marks it modified and costs a save, so only store changes
+        for key, value in (('currency', currency), ('country', country)):
+            if request.session.get(key) != value:
+                request.session[key] = value
     
     def _detect_language(self, request) -> str:
         """Detect user's preferred language"""
@@ -381,8 +402,8 @@ class LocaleMiddleware:
         # Default
         return getattr(settings, 'LANGUAGE_CODE', 'en')
     
-    def _detect_currency(self, request) -> str:
-        """Detect user's preferred currency"""
+    def _detect_currency(self, request, country: Optional[str] = None) -> str:
+        """Detect user's preferred currency; ``country`` saves detecting it again"""
         # Check URL parameter
         if 'currency' in request.GET:
             return request.GET['currency'].upper()
@@ -392,8 +413,7 @@ class LocaleMiddleware:
             return request.session['currency']
         
         # Check GeoIP or country detection
-        country = self._detect_country(request)
-        return self._country_to_currency(country)
+        return self._country_to_currency(country or self._detect_country(request))
     
     def _detect_country(self, request) -> str:
         """Detect user's country"""
@@ -405,32 +425,13 @@ class LocaleMiddleware:
         if 'country' in request.session:
             return request.session['country']
         
-        # Try GeoIP (if configured)
-        try:
-            from django.contrib.gis.geoip2 import GeoIP2
-            g = GeoIP2()
-            ip = self._get_client_ip(request)
-            country = g.country_code(ip)
-            if country:
-                return country
-        except:
-            pass
-        
-        # Default
-        return 'US'
+        # Try GeoIP (if configured), falling back to the default country
+        country, _ = locale_for_ip(self._get_client_ip(request))
+        return country
     
     def _country_to_currency(self, country_code: str) -> str:
         """Map country code to currency"""
-        mapping = {
-            'US': 'USD', 'CA': 'CAD', 'GB': 'GBP', 'AU': 'AUD',
-            'NZ': 'NZD', 'JP': 'JPY', 'CN': 'CNY', 'CH': 'CHF',
-            'SE': 'SEK', 'NO': 'NOK', 'DK': 'DKK',
-            # EU countries
-            'DE': 'EUR', 'FR': 'EUR', 'IT': 'EUR', 'ES': 'EUR',
-            'NL': 'EUR', 'BE': 'EUR', 'AT': 'EUR', 'IE': 'EUR',
-            'PT': 'EUR', 'FI': 'EUR', 'GR': 'EUR',
-        }
-        return mapping.get(country_code, 'USD')
+        return country_to_currency(country_code)
     
     def _get_client_ip(self, request) -> str:
         """Get client IP address"""
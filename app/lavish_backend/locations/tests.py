@@ -1,3 +1,93 @@
-from django.test import TestCase
+from types import SimpleNamespace
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from .context_processors import currency_context
+from .locale_service import locale_for_ip
+from .models import Country
+from .shopify_currency_service import LocaleMiddleware
+
+
+class FakeGeoIPReader:
+    """Counts lookups and locates every address in the configured country"""
+
+    def __init__(self, countries):
+        self.countries = countries
+        self.lookups = []
+
+    def country(self, ip):
+        self.lookups.append(ip)
+        return SimpleNamespace(country=SimpleNamespace(iso_code=self.countries.get(ip)))
+
+
+class LocaleMiddlewareTestCase(TestCase):
+    """Test cases for GeoIP locale detection"""
+
+    def setUp(self):
+        locale_for_ip.cache_clear()
+        self.reader = FakeGeoIPReader({'203.0.113.5': 'AU', '198.51.100.7': 'DE'})
+        patcher = patch('locations.locale_service.geoip_reader', return_value=self.reader)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.middleware = LocaleMiddleware(lambda request: None)
+
+    def _request(self, ip, session=None):
+        request = RequestFactory().get('/', REMOTE_ADDR=ip)
+        request.session = session if session is not None else SessionStore()
+        self.middleware.process_request(request)
+        return request
+
+    def test_addresses_are_looked_up_once(self):
+        """One lookup per new address serves both country and currency"""
+        request = self._request('203.0.113.5')
+        self.assertEqual((request.country, request.currency), ('AU', 'AUD'))
+        self.assertEqual(self._request('203.0.113.5').currency, 'AUD')
+        self.assertEqual(self._request('198.51.100.7').currency, 'EUR')
+        self.assertEqual(self.reader.lookups, ['203.0.113.5', '198.51.100.7'])
+
+        # Unknown addresses fall back to the default country
+        self.assertEqual(self._request('192.0.2.1').country, 'US')
+
+    def test_session_is_only_written_when_values_change(self):
+        session = SessionStore()
+        self.assertTrue(self._request('203.0.113.5', session).session.modified)
+
+        session.modified = False
+        request = self._request('203.0.113.5', session)
+        self.assertFalse(request.session.modified)
+        self.assertEqual(self.reader.lookups, ['203.0.113.5'])
+
+        request = RequestFactory().get('/', {'currency': 'usd'}, REMOTE_ADDR='203.0.113.5')
+        request.session = session
+        self.middleware.process_request(request)
+        self.assertTrue(session.modified)
+        self.assertEqual(session['currency'], 'USD')
+
+
+class CurrencyContextTestCase(TestCase):
+    """Test cases for the currency template context"""
+
+    def setUp(self):
+        cache.clear()
+        Country.objects.create(name='Austria', iso_code='AT', iso3_code='AUT', phone_code='43',
+                               currency='EUR', currency_symbol='€')
+        self.australia = Country.objects.create(name='Australia', iso_code='AU', iso3_code='AUS', phone_code='61',
+                                                currency='AUD', currency_symbol='A$')
+
+    def _symbol(self, currency):
+        request = RequestFactory().get('/')
+        request.currency = currency
+        return currency_context(request)['currency_symbol']
+
+    def test_symbols_are_loaded_once(self):
+        self.assertEqual(self._symbol('AUD'), 'A$')
+        with self.assertNumQueries(0):
+            self.assertEqual(self._symbol('EUR'), '€')
+            self.assertEqual(self._symbol('XYZ'), '$')
+
+        self.australia.currency_symbol = 'AU$'
+        self.australia.save()
+        self.assertEqual(self._symbol('AUD'), 'AU$')
@@ -0,0 +1,31 @@
+"""
+Django Management Command to backfill the daily order rollups
+Recomputes OrderDailyRollup from the orders table, for every day or a recent window
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.rollups import rebuild_order_rollups, refresh_order_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily order rollups used by the order statistics endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Only recompute this many most recent days (default: rebuild everything)',
+        )
+
+    def handle(self, *args, **options):
+        if options['days']:
+            today = timezone.localdate()
+            written = refresh_order_rollups(today - timedelta(days=offset) for offset in range(options['days'] + 1))
+            scope = f"the last {options['days']} days"
+        else:
+            written = rebuild_order_rollups()
+            scope = 'all days'
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} daily order rollup rows for {scope}'))
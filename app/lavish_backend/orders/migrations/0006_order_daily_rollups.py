@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0005_add_phone_help_text'),
+        ('orders', '0005_alter_shopifyorder_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text="Order creation date in the store's time zone")),
+                ('financial_status', models.CharField(max_length=20)),
+                ('fulfillment_status', models.CharField(blank=True, help_text='Blank for orders without one', max_length=20)),
+                ('currency_code', models.CharField(max_length=10)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('shipping', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='shopifyorder',
+            index=models.Index(fields=['created_at'], name='orders_shop_created_d70227_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderdailyrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'financial_status', 'fulfillment_status', 'currency_code'), name='order_rollup_unique_key'),
+        ),
+    ]
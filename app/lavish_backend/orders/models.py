@@ -88,6 +88,7 @@ class ShopifyOrder(models.Model):
             models.Index(fields=['financial_status']),
             models.Index(fields=['fulfillment_status']),
             models.Index(fields=['customer']),
+            models.Index(fields=['created_at']),
         ]
     
     def __str__(self):
@@ -204,3 +205,45 @@ class OrderSyncLog(models.Model):
     
     def __str__(self):
         return f"{self.operation_type} - {self.status} ({self.started_at})"
+
+
+class OrderDailyRollup(models.Model):
+    """
+    Order totals per day, status pair and currency
+    
+    Maintained by orders.rollups as orders are synced, so statistics endpoints
+    read a few rollup rows instead of aggregating every order.
+    """
+    
+    date = models.DateField(help_text="Order creation date in the store's time zone")
+    financial_status = models.CharField(max_length=20)
+    fulfillment_status = models.CharField(max_length=20, blank=True, help_text="Blank for orders without one")
+    currency_code = models.CharField(max_length=10)
+    
+    order_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    shipping = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'financial_status', 'fulfillment_status', 'currency_code'],
+                name='order_rollup_unique_key',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} {self.financial_status}/{self.fulfillment_status} {self.currency_code}: {self.order_count}"
+
+
+# Keep the daily rollups in step with individually saved or deleted orders
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+@receiver(post_save, sender=ShopifyOrder)
+@receiver(post_delete, sender=ShopifyOrder)
+def refresh_order_rollup(sender, instance, **kwargs):
+    from orders.rollups import order_changed
+    order_changed(instance)
@@ -7,11 +7,13 @@ import logging
 from typing import Dict, List, Optional
 from datetime import datetime
 from django.utils.dateparse import parse_datetime
-from django.db import transaction
 from django.conf import settings
 
 from .models import ShopifyOrder, ShopifyOrderLineItem, ShopifyOrderAddress, OrderSyncLog
+from .rollups import collect_order_rollups
 from shopify_integration.enhanced_client import EnhancedShopifyAPIClient
+from shopify_integration.bulk_operations import ShopifyBulkOperationImporter
+from shopify_integration.incremental_sync import sync_resource
 
 logger = logging.getLogger('orders.realtime_sync')
 
@@ -26,42 +28,48 @@ class RealtimeOrderSyncService:
         self.client = EnhancedShopifyAPIClient()
         self.store_domain = settings.SHOPIFY_STORE_URL
     
-    def sync_all_orders(self, limit: Optional[int] = None) -> Dict:
+    def sync_all_orders(self, limit: Optional[int] = None, bulk: bool = False,
+                        full: Optional[bool] = None) -> Dict:
         """
         Sync all orders from Shopify with real-time data refresh
+        
+        Each GraphQL page is upserted as soon as it arrives, so only one page is held
+        in memory and an interrupted sync keeps every page already written.
+        
+        Without ``limit`` only orders updated since the last sync are fetched, with a
+        periodic full reconcile that also removes orders deleted in Shopify (``full``
+        forces or skips it; see shopify_integration.incremental_sync).
+        
+        With ``bulk`` the orders are exported through a Shopify bulk operation instead of
+        cursor pagination, which suits very large stores; it always runs as a full
+        reconcile and ``limit`` does not apply.
         """
         logger.info("🔄 Starting real-time order sync...")
         
         try:
-            # Fetch orders using enhanced client
-            orders_data = self.client.fetch_all_orders(limit=limit)
+            pages = ShopifyBulkOperationImporter(self.client).iter_orders() if bulk else None
+            stats = sync_resource(
+                self.client, 'orders', self.store_domain,
+                limit=limit, full=full, pages=pages,
+            )
             
-            if not orders_data:
+            if not stats['pages'] and stats['mode'] != 'incremental':
                 return {
                     'success': False,
-                    'message': 'No orders retrieved from Shopify',
+                    'message': stats.get('error') or 'No orders retrieved from Shopify',
                     'stats': {'total': 0, 'created': 0, 'updated': 0, 'errors': 0}
                 }
             
-            # Process orders in batches
-            stats = {'total': 0, 'created': 0, 'updated': 0, 'errors': 0, 'line_items': 0}
-            
-            with transaction.atomic():
-                for order_data in orders_data:
-                    try:
-                        result = self._sync_single_order(order_data)
-                        stats['total'] += 1
-                        stats['line_items'] += result['line_items_synced']
-                        
-                        if result['created']:
-                            stats['created'] += 1
-                        else:
-                            stats['updated'] += 1
-                            
-                    except Exception as e:
-                        logger.error(f"Error syncing order {order_data.get('id', 'unknown')}: {e}")
-                        stats['errors'] += 1
-                        continue
+            if not stats['complete']:
+                # Pages already written stay written, but deletes and the watermark were skipped
+                reason = stats.get('error') or 'the listing did not finish'
+                logger.warning(f"⚠️ Order sync incomplete: {reason}")
+                return {
+                    'success': False,
+                    'partial': stats['total'] > 0,
+                    'message': f"Order sync incomplete after {stats['total']} orders: {reason}",
+                    'stats': stats
+                }
             
             logger.info(f"✅ Order sync completed: {stats}")
             
@@ -97,25 +105,26 @@ class RealtimeOrderSyncService:
         currency = shop_money.get('currencyCode', 'USD')
         
         # Create or update order
-        order, created = ShopifyOrder.objects.update_or_create(
-            shopify_id=shopify_id,
-            defaults={
-                'name': order_data.get('name', ''),
-                'email': order_data.get('email', ''),
-                'total_price': total_price,
-                'currency': currency,
-                'financial_status': order_data.get('displayFinancialStatus', 'PENDING'),
-                'fulfillment_status': order_data.get('displayFulfillmentStatus', 'UNFULFILLED'),
-                'tags': order_data.get('tags', []),
-                'note': order_data.get('note', ''),
-                'customer_shopify_id': order_data.get('customer', {}).get('id', '') if order_data.get('customer') else '',
-                'created_at': created_at,
-                'updated_at': updated_at,
-                'processed_at': processed_at,
-                'store_domain': self.store_domain,
-                'last_synced': datetime.now(),
-            }
-        )
+        with collect_order_rollups(ShopifyOrder.objects.filter(shopify_id=shopify_id)):
+            order, created = ShopifyOrder.objects.update_or_create(
+                shopify_id=shopify_id,
+                defaults={
+                    'name': order_data.get('name', ''),
+                    'email': order_data.get('email', ''),
+                    'total_price': total_price,
+                    'currency': currency,
+                    'financial_status': order_data.get('displayFinancialStatus', 'PENDING'),
+                    'fulfillment_status': order_data.get('displayFulfillmentStatus', 'UNFULFILLED'),
+                    'tags': order_data.get('tags', []),
+                    'note': order_data.get('note', ''),
+                    'customer_shopify_id': order_data.get('customer', {}).get('id', '') if order_data.get('customer') else '',
+                    'created_at': created_at,
+                    'updated_at': updated_at,
+                    'processed_at': processed_at,
+                    'store_domain': self.store_domain,
+                    'last_synced': datetime.now(),
+                }
+            )
         
         # Sync shipping address
         shipping_address = order_data.get('shippingAddress')
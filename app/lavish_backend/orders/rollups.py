@@ -0,0 +1,206 @@
+"""
+Daily order rollups
+
+Order statistics used to aggregate the orders table once per day of the
+requested window and once more per status. OrderDailyRollup keeps order
+count, revenue, tax and shipping per day x financial status x fulfillment
+status x currency instead. Whenever orders change, each affected day is
+recomputed from its orders, so the rollup stays exact without tracking deltas.
+
+Single saves and deletes refresh their day through the ShopifyOrder signals.
+Bulk writes, which send no signals, run inside ``collect_order_rollups``; it
+also batches the signal-driven refreshes into one refresh per day.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import OrderDailyRollup, ShopifyOrder
+
+logger = logging.getLogger('orders.rollups')
+
+# Days recomputed per query
+REFRESH_CHUNK_DAYS = 100
+BATCH_SIZE = 500
+
+ROLLUP_KEY = ('date', 'financial_status', 'fulfillment_status', 'currency_code')
+ROLLUP_TOTALS = ('order_count', 'revenue', 'tax', 'shipping')
+
+_collecting = threading.local()
+
+
+def order_day(created_at):
+    """Rollup date of an order created at ``created_at``, in the current time zone"""
+    if created_at is None:
+        return None
+    if settings.USE_TZ and timezone.is_aware(created_at):
+        created_at = timezone.localtime(created_at)
+    return created_at.date()
+
+
+def _start_of(day):
+    start = datetime.combine(day, time.min)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def _grouped(queryset):
+    """
+    Rollup rows for the orders in ``queryset``, one aggregate query
+
+    A status or currency that is NULL is grouped with the empty string, so
+    orders without a fulfillment status share one '' row whether Shopify sent
+    null or "". Grouping them apart would yield two rows for one rollup key.
+    """
+    rows = queryset.annotate(
+        day=TruncDate('created_at'),
+        financial=Coalesce('financial_status', Value('')),
+        fulfillment=Coalesce('fulfillment_status', Value('')),
+        currency=Coalesce('currency_code', Value('')),
+    ).values(
+        'day', 'financial', 'fulfillment', 'currency',
+    ).annotate(
+        order_count=Count('id'),
+        revenue=Sum('total_price'),
+        tax=Sum('total_tax'),
+        shipping=Sum('total_shipping_price'),
+    ).order_by()
+
+    for row in rows:
+        if row['day'] is None:
+            continue
+        yield OrderDailyRollup(
+            date=row['day'],
+            financial_status=row['financial'],
+            fulfillment_status=row['fulfillment'],
+            currency_code=row['currency'],
+            order_count=row['order_count'],
+            revenue=row['revenue'] or 0,
+            tax=row['tax'] or 0,
+            shipping=row['shipping'] or 0,
+        )
+
+
+def _save(rollups):
+    OrderDailyRollup.objects.bulk_create(
+        rollups,
+        batch_size=BATCH_SIZE,
+        # A concurrent refresh of the same day may have inserted first; both computed the same totals
+        update_conflicts=True,
+        unique_fields=list(ROLLUP_KEY),
+        update_fields=list(ROLLUP_TOTALS),
+    )
+
+
+def refresh_order_rollups(days):
+    """
+    Recompute the rollup rows of the given days from their orders
+
+    Args:
+        days: Iterable of dates; None entries are ignored
+
+    Returns:
+        int: Rollup rows written
+    """
+    days = sorted({day for day in days if day is not None})
+    written = 0
+    with transaction.atomic():
+        for start in range(0, len(days), REFRESH_CHUNK_DAYS):
+            chunk = days[start:start + REFRESH_CHUNK_DAYS]
+
+            # Contiguous days become one created_at range so the index is used
+            ranges = []
+            for day in chunk:
+                if ranges and day == ranges[-1][1] + timedelta(days=1):
+                    ranges[-1][1] = day
+                else:
+                    ranges.append([day, day])
+            condition = Q()
+            for first, last in ranges:
+                condition |= Q(created_at__gte=_start_of(first), created_at__lt=_start_of(last + timedelta(days=1)))
+
+            wanted = set(chunk)
+            rollups = [rollup for rollup in _grouped(ShopifyOrder.objects.filter(condition)) if rollup.date in wanted]
+            OrderDailyRollup.objects.filter(date__in=chunk).delete()
+            _save(rollups)
+            written += len(rollups)
+    return written
+
+
+def rebuild_order_rollups():
+    """Replace every rollup row with totals recomputed from all orders; returns rows written"""
+    with transaction.atomic():
+        OrderDailyRollup.objects.all().delete()
+        rollups = list(_grouped(ShopifyOrder.objects.all()))
+        _save(rollups)
+    logger.info(f"Rebuilt {len(rollups)} daily order rollup rows")
+    return len(rollups)
+
+
+def _days_of(orders):
+    return set(orders.annotate(day=TruncDate('created_at')).values_list('day', flat=True).order_by().distinct())
+
+
+@contextmanager
+def collect_order_rollups(orders=None):
+    """
+    Refresh the rollups once for every order change made inside the block
+
+    Saves and deletes inside the block only note their day; the days are
+    recomputed together when the outermost block exits without an error.
+
+    Args:
+        orders: Optional ShopifyOrder queryset about to be bulk written. The
+            days of those orders before and after the block are refreshed,
+            covering writes such as bulk_update that send no signals.
+    """
+    outer = getattr(_collecting, 'days', None)
+    days = set() if outer is None else outer
+    if orders is not None:
+        days |= _days_of(orders)
+
+    _collecting.days = days
+    try:
+        yield days
+    finally:
+        if outer is None:
+            _collecting.days = None
+
+    if orders is not None:
+        days |= _days_of(orders)
+    if outer is None:
+        refresh_order_rollups(days)
+
+
+def order_changed(order):
+    """Note a saved or deleted order; called from the ShopifyOrder signals"""
+    day = order_day(order.created_at)
+    collecting = getattr(_collecting, 'days', None)
+    if collecting is not None:
+        collecting.add(day)
+    else:
+        refresh_order_rollups([day])
+
+
+def read_order_rollups(start_date, end_date, status=None):
+    """
+    Rollup rows between two dates inclusive, in one query
+
+    Args:
+        start_date: First date
+        end_date: Last date
+        status: Optional financial or fulfillment status the rows must have
+
+    Returns:
+        list: Dicts of date, statuses, currency and totals, oldest first
+    """
+    queryset = OrderDailyRollup.objects.filter(date__gte=start_date, date__lte=end_date)
+    if status:
+        queryset = queryset.filter(Q(financial_status=status) | Q(fulfillment_status=status))
+    return list(queryset.order_by('date').values(*ROLLUP_KEY, *ROLLUP_TOTALS))
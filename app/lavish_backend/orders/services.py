@@ -11,6 +11,7 @@ from django.db import transaction
 from django.conf import settings
 
 from .models import ShopifyOrder, ShopifyOrderLineItem, ShopifyOrderAddress, OrderSyncLog
+from .rollups import collect_order_rollups
 from shopify_integration.client import ShopifyAPIClient
 
 logger = logging.getLogger('orders.services')
@@ -61,8 +62,8 @@ class OrderSyncService:
             total_price = shop_money.get('amount', '0.00')
             currency = shop_money.get('currency_code', 'USD')
             
-            # Create or update order
-            with transaction.atomic():
+            # Create or update order; the rollups of its old and new day are refreshed once
+            with transaction.atomic(), collect_order_rollups(ShopifyOrder.objects.filter(shopify_id=order_id)):
                 order, created = ShopifyOrder.objects.update_or_create(
                     shopify_id=order_id,
                     defaults={
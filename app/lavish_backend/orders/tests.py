@@ -6,11 +6,13 @@ from django.test import TestCase, Client
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 import json
 from unittest.mock import patch, MagicMock
 
-from orders.models import ShopifyOrder, ShopifyOrderLineItem, ShopifyOrderAddress
+from orders.models import OrderDailyRollup, ShopifyOrder, ShopifyOrderLineItem, ShopifyOrderAddress
+from orders.rollups import read_order_rollups, rebuild_order_rollups
 from shipping.models import ShopifyFulfillmentOrder
 from shopify_integration.client import ShopifyAPIClient
 
@@ -928,3 +930,91 @@ class IntegrationTestCase(TestCase):
         self.assertEqual(data['orders'][0]['name'], '#1001')
         self.assertEqual(data['orders'][0]['financial_status'], 'paid')
         self.assertEqual(data['orders'][0]['fulfillment_status'], 'fulfilled')
+
+
+class OrderDailyRollupTestCase(TestCase):
+    """Test cases for the daily order rollups"""
+    
+    def _order(self, shopify_id, total, financial_status='paid', fulfillment_status='fulfilled'):
+        return ShopifyOrder.objects.create(
+            shopify_id=shopify_id,
+            name=shopify_id,
+            total_price=total,
+            subtotal_price=total,
+            total_tax='1.00',
+            currency_code='AUD',
+            financial_status=financial_status,
+            fulfillment_status=fulfillment_status,
+        )
+    
+    def _snapshot(self):
+        return sorted(
+            OrderDailyRollup.objects.values_list(
+                'date', 'financial_status', 'fulfillment_status', 'currency_code', 'order_count', 'revenue', 'tax'
+            )
+        )
+    
+    def test_saves_and_deletes_keep_rollups_current(self):
+        """Individually saved and deleted orders refresh their day"""
+        first = self._order('gid://shopify/Order/1', '10.00')
+        self._order('gid://shopify/Order/2', '5.50')
+        self._order('gid://shopify/Order/3', '7.00', financial_status='pending', fulfillment_status=None)
+        
+        paid = OrderDailyRollup.objects.get(financial_status='paid')
+        self.assertEqual(paid.order_count, 2)
+        self.assertEqual(paid.revenue, Decimal('15.50'))
+        self.assertEqual(paid.tax, Decimal('2.00'))
+        self.assertEqual(OrderDailyRollup.objects.get(financial_status='pending').fulfillment_status, '')
+        
+        first.financial_status = 'refunded'
+        first.save()
+        ShopifyOrder.objects.filter(pk=first.pk).delete()
+        self.assertEqual(OrderDailyRollup.objects.get(financial_status='paid').order_count, 1)
+        self.assertFalse(OrderDailyRollup.objects.filter(financial_status='refunded').exists())
+        
+        # The incremental rows match a rebuild from scratch
+        incremental = self._snapshot()
+        rebuild_order_rollups()
+        self.assertEqual(self._snapshot(), incremental)
+    
+    def test_null_and_blank_statuses_share_one_row(self):
+        """Orders with a NULL and an empty fulfillment status are counted together under ''"""
+        self._order('gid://shopify/Order/4', '3.00', fulfillment_status=None)
+        self._order('gid://shopify/Order/5', '4.00', fulfillment_status='')
+        self._order('gid://shopify/Order/6', '5.00', fulfillment_status=None)
+        
+        expected = [(timezone.localdate(), 'paid', '', 'AUD', 3, Decimal('12.00'), Decimal('3.00'))]
+        self.assertEqual(self._snapshot(), expected)
+        rebuild_order_rollups()
+        self.assertEqual(self._snapshot(), expected)
+    
+    def test_bulk_upsert_refreshes_old_and_new_days(self):
+        """Bulk-synced pages, which send no signals, still update the rollups"""
+        from shopify_integration.bulk_upsert import upsert_orders
+        
+        def node(shopify_id, amount, created_at, status='PAID'):
+            return {
+                'id': shopify_id,
+                'name': '#1',
+                'displayFinancialStatus': status,
+                'displayFulfillmentStatus': 'FULFILLED',
+                'totalPriceSet': {'shopMoney': {'amount': amount, 'currencyCode': 'AUD'}},
+                'createdAt': created_at,
+                'updatedAt': created_at,
+            }
+        
+        upsert_orders([node('gid://shopify/Order/10', '20.00', '2024-03-01T01:00:00Z'),
+                       node('gid://shopify/Order/11', '30.00', '2024-03-01T02:00:00Z')])
+        self.assertEqual(sum(OrderDailyRollup.objects.values_list('order_count', flat=True)), 2)
+        
+        # The update moves created_at to Shopify's date and changes the status
+        upsert_orders([node('gid://shopify/Order/10', '20.00', '2024-03-01T01:00:00Z', status='REFUNDED'),
+                       node('gid://shopify/Order/11', '30.00', '2024-03-01T02:00:00Z')])
+        incremental = self._snapshot()
+        rebuild_order_rollups()
+        self.assertEqual(self._snapshot(), incremental)
+        self.assertEqual(sum(row[4] for row in incremental), 2)
+        
+        with self.assertNumQueries(1):
+            rows = read_order_rollups(date(2024, 3, 1), date(2024, 3, 1), 'refunded')
+        self.assertEqual([(row['order_count'], row['revenue']) for row in rows], [(1, Decimal('20.00'))])
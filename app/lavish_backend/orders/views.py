@@ -6,12 +6,15 @@ from django.shortcuts import get_object_or_404
 from django.db.models import Q, Count, Sum, Avg
 from django.core.paginator import Paginator
 from django.utils.dateparse import parse_datetime
+from collections import defaultdict
 from datetime import datetime, timedelta
+from decimal import Decimal
 import logging
 
 from .models import ShopifyOrder, ShopifyOrderLineItem, ShopifyOrderAddress
 from shopify_integration.client import ShopifyAPIClient
 from .realtime_sync import RealtimeOrderSyncService
+from .rollups import read_order_rollups
 
 logger = logging.getLogger(__name__)
 
@@ -376,63 +379,56 @@ def order_statistics(request):
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        # Base queryset for the date range
-        queryset = ShopifyOrder.objects.filter(
-            created_at__gte=start_date,
-            created_at__lte=end_date
-        )
-        
-        # Apply status filter if provided
-        if status_filter:
-            queryset = queryset.filter(
-                Q(financial_status=status_filter) | 
-                Q(fulfillment_status=status_filter)
-            )
+        # One read of the daily rollups covers the summary and both breakdowns
+        rollups = read_order_rollups(start_date.date(), end_date.date(), status_filter or None)
+        
+        total_orders = 0
+        total_revenue = Decimal('0')
+        daily_orders = defaultdict(int)
+        daily_revenue = defaultdict(Decimal)
+        financial_counts = defaultdict(int)
+        fulfillment_counts = defaultdict(int)
+        for row in rollups:
+            total_orders += row['order_count']
+            total_revenue += row['revenue']
+            daily_orders[row['date']] += row['order_count']
+            daily_revenue[row['date']] += row['revenue']
+            financial_counts[row['financial_status']] += row['order_count']
+            fulfillment_counts[row['fulfillment_status']] += row['order_count']
         
-        # Calculate statistics
-        stats = queryset.aggregate(
-            total_orders=Count('id'),
-            total_revenue=Sum('total_price'),
-            avg_order_value=Avg('total_price'),
-            pending_orders=Count('id', filter=Q(financial_status='pending')),
-            paid_orders=Count('id', filter=Q(financial_status='paid')),
-            fulfilled_orders=Count('id', filter=Q(fulfillment_status='fulfilled')),
-            unfulfilled_orders=Count('id', filter=Q(fulfillment_status='null')),
-        )
+        stats = {
+            'total_orders': total_orders,
+            'total_revenue': total_revenue if rollups else None,
+            'avg_order_value': (total_revenue / total_orders).quantize(Decimal('0.01')) if total_orders else None,
+            'pending_orders': financial_counts['pending'],
+            'paid_orders': financial_counts['paid'],
+            'fulfilled_orders': fulfillment_counts['fulfilled'],
+            'unfulfilled_orders': fulfillment_counts['null'],
+        }
         
         # Daily breakdown
         daily_stats = []
         current_date = start_date
         while current_date <= end_date:
-            day_stats = queryset.filter(
-                created_at__date=current_date.date()
-            ).aggregate(
-                orders=Count('id'),
-                revenue=Sum('total_price')
-            )
-            
+            day = current_date.date()
             daily_stats.append({
-                'date': current_date.date().isoformat(),
-                'orders': day_stats['orders'] or 0,
-                'revenue': str(day_stats['revenue'] or 0),
+                'date': day.isoformat(),
+                'orders': daily_orders[day],
+                'revenue': str(daily_revenue[day]),
             })
             current_date += timedelta(days=1)
         
         # Status breakdown
-        financial_status_breakdown = {}
-        fulfillment_status_breakdown = {}
-        
-        for status_choice in ShopifyOrder.FINANCIAL_STATUS_CHOICES:
-            status = status_choice[0]
-            count = queryset.filter(financial_status=status).count()
-            if count > 0:
-                financial_status_breakdown[status] = count
-        
-        for status_choice in ShopifyOrder.FULFILLMENT_STATUS_CHOICES:
-            status = status_choice[0]
-            count = queryset.filter(fulfillment_status=status).count()
-            if count > 0:
-                fulfillment_status_breakdown[status] = count
+        financial_status_breakdown = {
+            status: financial_counts[status]
+            for status, _ in ShopifyOrder.FINANCIAL_STATUS_CHOICES
+            if financial_counts.get(status)
+        }
+        fulfillment_status_breakdown = {
+            status: fulfillment_counts[status]
+            for status, _ in ShopifyOrder.FULFILLMENT_STATUS_CHOICES
+            if fulfillment_counts.get(status)
+        }
         
         return Response({
             'success': True,
@@ -11,6 +11,8 @@ from datetime import datetime, timedelta
 from django.utils import timezone
 from decimal import Decimal
 
+from shopify_integration.http_pool import get_session
+
 logger = logging.getLogger(__name__)
 
 
@@ -52,6 +54,9 @@ class AfterpayClient:
         self.timeout_open = 10
         self.timeout_read = 20  # Default, some endpoints require 70s
         
+        # Keep-alive connection pool shared by every Afterpay client in this process
+        self.session = get_session('afterpay')
+        
         logger.info(f"Afterpay client initialized: {environment} environment, {region} region")
     
     def _get_headers(self, content_type: str = 'application/json') -> Dict[str, str]:
@@ -93,11 +98,11 @@ class AfterpayClient:
         
         try:
             if method.upper() == 'GET':
-                response = requests.get(url, headers=headers, timeout=timeout)
+                response = self.session.get(url, headers=headers, timeout=timeout)
             elif method.upper() == 'POST':
-                response = requests.post(url, headers=headers, json=data, timeout=timeout)
+                response = self.session.post(url, headers=headers, json=data, timeout=timeout)
             elif method.upper() == 'PUT':
-                response = requests.put(url, headers=headers, json=data, timeout=timeout)
+                response = self.session.put(url, headers=headers, json=data, timeout=timeout)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
             
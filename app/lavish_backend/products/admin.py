@@ -8,6 +8,7 @@ from import_export import resources
 from .models import ShopifyProduct, ShopifyProductVariant, ShopifyProductImage, ShopifyProductMetafield, ProductSyncLog
 from .realtime_sync import sync_products_realtime, get_product_sync_stats
 from .bidirectional_sync import ProductBidirectionalSync
+from shopify_integration.push_admin import ShopifyPushStatusMixin
 
 
 # Import-Export Resources
@@ -87,12 +88,12 @@ class ShippingConfigInline(admin.StackedInline):
 
 
 @admin.register(ShopifyProduct)
-class ShopifyProductAdmin(ImportExportModelAdmin):
+class ShopifyProductAdmin(ShopifyPushStatusMixin, ImportExportModelAdmin):
     resource_class = ShopifyProductResource
-    list_display = ('title', 'vendor', 'product_type', 'status_badge', 'cutoff_days_display', 'sync_status_badge', 'last_synced')
+    list_display = ('title', 'vendor', 'product_type', 'status_badge', 'cutoff_days_display', 'sync_status_badge', 'push_status_badge', 'last_synced')
     list_filter = ('status', 'vendor', 'product_type', 'created_in_django', 'needs_shopify_push', 'store_domain', 'last_synced')
     search_fields = ('title', 'handle', 'vendor', 'product_type', 'shopify_id')
-    readonly_fields = ('handle', 'created_at', 'updated_at', 'published_at', 'last_synced', 'last_pushed_to_shopify', 'store_domain', 'shopify_push_error')
+    readonly_fields = ('handle', 'created_at', 'updated_at', 'published_at', 'last_synced', 'last_pushed_to_shopify', 'store_domain', 'shopify_push_error', 'push_status_badge')
     inlines = [ShopifyProductVariantInline, ShopifyProductImageInline, ShopifyProductMetafieldInline, ShippingConfigInline]
     
     fieldsets = (
@@ -115,7 +116,7 @@ class ShopifyProductAdmin(ImportExportModelAdmin):
             'classes': ('collapse',)
         }),
         ('Sync Status', {
-            'fields': ('created_in_django', 'needs_shopify_push', 'shopify_push_error', 'sync_status')
+            'fields': ('created_in_django', 'needs_shopify_push', 'push_status_badge', 'shopify_push_error', 'sync_status')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at', 'last_synced', 'last_pushed_to_shopify', 'store_domain'),
@@ -140,27 +141,22 @@ class ShopifyProductAdmin(ImportExportModelAdmin):
         return instances
     
     def save_model(self, request, obj, form, change):
-        """Auto-push to Shopify on create/update"""
-        from django.utils import timezone
-        
+        """Mark new products as created in Django and pending push"""
         # For new products, mark as created in Django
         if not change:
             obj.created_in_django = True
             obj.needs_shopify_push = True
         
         super().save_model(request, obj, form, change)
+    
+    def save_related(self, request, form, formsets, change):
+        """Queue the Shopify push once variants and images are saved too"""
+        super().save_related(request, form, formsets, change)
         
-        # Auto-push to Shopify if flagged
+        obj = form.instance
         if obj.needs_shopify_push:
-            sync_service = ProductBidirectionalSync()
-            result = sync_service.push_product_to_shopify(obj)
-            
-            if result.get('success'):
-                # Refresh to get the real Shopify ID
-                obj.refresh_from_db()
-                self.message_user(request, f"✅ Product synced to Shopify: {obj.title} (ID: {obj.shopify_id})", level=messages.SUCCESS)
-            else:
-                self.message_user(request, f"⚠️ Product saved locally but Shopify sync failed: {result.get('message', 'Unknown error')}", level=messages.WARNING)
+            self.queue_shopify_push(request, [obj])
+            self.message_user(request, f"📤 Product saved; Shopify push queued: {obj.title}", level=messages.SUCCESS)
     
     def save_formset(self, request, form, formset, change):
         """Save variants and auto-push to Shopify"""
@@ -191,15 +187,10 @@ class ShopifyProductAdmin(ImportExportModelAdmin):
         product_title = obj.title
         product_id = obj.shopify_id
         
-        # Try to delete from Shopify if it has a valid Shopify ID
+        # Queue the Shopify delete if it has a valid Shopify ID; it runs once the local delete commits
         if product_id and product_id.startswith('gid://shopify/Product/'):
-            sync_service = ProductBidirectionalSync()
-            result = sync_service.delete_product_from_shopify(obj)
-            
-            if result.get('success'):
-                self.message_user(request, f"✅ Product '{product_title}' deleted from both Django and Shopify", level=messages.SUCCESS)
-            else:
-                self.message_user(request, f"⚠️ Product '{product_title}' deleted from Django but Shopify delete failed: {result.get('message', 'Unknown error')}", level=messages.WARNING)
+            self.queue_shopify_push(request, [obj], 'delete', payload={'shopify_id': product_id})
+            self.message_user(request, f"📤 Product '{product_title}' deleted from Django; Shopify delete queued", level=messages.SUCCESS)
         else:
             self.message_user(request, f"ℹ️ Product '{product_title}' deleted from Django only (temp/no Shopify ID)", level=messages.INFO)
         
@@ -262,59 +253,19 @@ class ShopifyProductAdmin(ImportExportModelAdmin):
     sync_selected_products.short_description = "📥 Sync selected products FROM Shopify"
     
     def push_to_shopify(self, request, queryset):
-        """Push selected products TO Shopify (create new or update existing)"""
-        sync_service = ProductBidirectionalSync()
-        results = {
-            "successful": 0,
-            "failed": 0,
-            "errors": []
-        }
-        
-        for product in queryset:
-            result = sync_service.push_product_to_shopify(product)
-            if result.get("success"):
-                results["successful"] += 1
-            else:
-                results["failed"] += 1
-                results["errors"].append(f"{product.title}: {result.get('message', 'Unknown error')}")
-        
-        if results["successful"] > 0:
-            self.message_user(request, f"✅ Successfully pushed {results['successful']} products to Shopify", level=messages.SUCCESS)
-        
-        if results["failed"] > 0:
-            error_msg = f"❌ Failed to push {results['failed']} products. Errors: " + "; ".join(results["errors"][:3])
-            self.message_user(request, error_msg, level=messages.ERROR)
+        """Queue pushes of the selected products TO Shopify (create new or update existing)"""
+        self.queue_shopify_push_action(request, queryset, 'push', 'products')
     
     push_to_shopify.short_description = "📤 Push selected products TO Shopify (Create/Update)"
     
     def update_in_shopify(self, request, queryset):
-        """Update existing products in Shopify"""
-        sync_service = ProductBidirectionalSync()
-        results = {
-            "successful": 0,
-            "failed": 0,
-            "errors": []
-        }
-        
-        for product in queryset:
-            if not product.shopify_id:
-                results["failed"] += 1
-                results["errors"].append(f"{product.title}: No Shopify ID (use 'Push to Shopify' instead)")
-                continue
-            
-            result = sync_service.push_product_to_shopify(product)
-            if result.get("success"):
-                results["successful"] += 1
-            else:
-                results["failed"] += 1
-                results["errors"].append(f"{product.title}: {result.get('message', 'Unknown error')}")
-        
-        if results["successful"] > 0:
-            self.message_user(request, f"✅ Successfully updated {results['successful']} products in Shopify", level=messages.SUCCESS)
-        
-        if results["failed"] > 0:
-            error_msg = f"❌ Failed to update {results['failed']} products. Errors: " + "; ".join(results["errors"][:3])
+        """Queue updates of the selected products that already exist in Shopify"""
+        missing = [product.title for product in queryset if not product.shopify_id]
+        if missing:
+            error_msg = f"❌ {len(missing)} products have no Shopify ID (use 'Push to Shopify' instead): " + "; ".join(missing[:3])
             self.message_user(request, error_msg, level=messages.ERROR)
+        
+        self.queue_shopify_push_action(request, queryset.exclude(shopify_id=''), 'push', 'products')
     
     update_in_shopify.short_description = "🔄 Update existing products IN Shopify"
     
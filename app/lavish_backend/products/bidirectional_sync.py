@@ -8,6 +8,7 @@ from typing import Dict, List, Optional
 from django.utils import timezone
 from django.db import transaction
 from shopify_integration.enhanced_client import EnhancedShopifyAPIClient
+from shopify_integration.push_executor import PushExecutor, push_metrics
 
 logger = logging.getLogger('products')
 
@@ -113,6 +114,8 @@ class ProductBidirectionalSync:
             shopify_id = shopify_product.get("id", "")
             handle = shopify_product.get("handle", "")
             
+            # Commit the Shopify ID on its own, before the variant calls: if it were rolled
+            # back the next push would create the product in Shopify a second time
             with transaction.atomic():
                 product.shopify_id = shopify_id
                 product.handle = handle
@@ -121,117 +124,117 @@ class ProductBidirectionalSync:
                 product.last_pushed_to_shopify = timezone.now()
                 product.sync_status = 'synced'
                 product.save()
+            
+            # Check if we have custom variants to create
+            django_variants = list(product.variants.all())
+            shopify_variants = shopify_product.get("variants", {}).get("edges", [])
+            
+            # If we have Django variants and they're not just a single default variant
+            if len(django_variants) > 0:
+                # Check if this is a real custom variant or just default
+                needs_custom_variants = len(django_variants) > 1 or (
+                    len(django_variants) == 1 and 
+                    django_variants[0].title not in ['Default', 'Default Title']
+                )
                 
-                # Check if we have custom variants to create
-                django_variants = list(product.variants.all())
-                shopify_variants = shopify_product.get("variants", {}).get("edges", [])
-                
-                # If we have Django variants and they're not just a single default variant
-                if len(django_variants) > 0:
-                    # Check if this is a real custom variant or just default
-                    needs_custom_variants = len(django_variants) > 1 or (
-                        len(django_variants) == 1 and 
-                        django_variants[0].title not in ['Default', 'Default Title']
-                    )
+                if needs_custom_variants:
+                    logger.info(f"Creating {len(django_variants)} custom variants for product {shopify_id}")
+                    
+                    # Shopify automatically creates a "Default Title" variant
+                    # We'll update that one for the first Django variant, and create new ones for the rest
+                    default_variant_id = None
+                    if shopify_variants:
+                        default_variant_id = shopify_variants[0].get("node", {}).get("id")
+                        logger.info(f"Found default variant: {default_variant_id}")
                     
-                    if needs_custom_variants:
-                        logger.info(f"Creating {len(django_variants)} custom variants for product {shopify_id}")
+                    # If we have only 1 Django variant, update the default Shopify variant
+                    # If we have multiple, create the 2nd+ variants and update the first one
+                    variants_to_create = []
+                    if len(django_variants) > 1:
+                        # Create variants for 2nd+  Django variants
+                        variants_to_create = [
+                            {
+                                "title": v.title,
+                                "price": float(v.price)
+                            }
+                            for v in django_variants[1:]  # Skip first variant
+                        ]
+                    
+                    # Update the first Django variant to use the default Shopify variant
+                    if default_variant_id and django_variants:
+                        first_variant = django_variants[0]
+                        first_variant.shopify_id = default_variant_id
+                        first_variant.save()
                         
-                        # Shopify automatically creates a "Default Title" variant
-                        # We'll update that one for the first Django variant, and create new ones for the rest
-                        default_variant_id = None
-                        if shopify_variants:
-                            default_variant_id = shopify_variants[0].get("node", {}).get("id")
-                            logger.info(f"Found default variant: {default_variant_id}")
+                        logger.info(f"Updating default variant {default_variant_id} for {first_variant.title}")
                         
-                        # If we have only 1 Django variant, update the default Shopify variant
-                        # If we have multiple, create the 2nd+ variants and update the first one
-                        variants_to_create = []
-                        if len(django_variants) > 1:
-                            # Create variants for 2nd+  Django variants
-                            variants_to_create = [
-                                {
-                                    "title": v.title,
-                                    "price": float(v.price)
-                                }
-                                for v in django_variants[1:]  # Skip first variant
-                            ]
+                        # Update variant with Django data (price, SKU)
+                        self.client.update_product_variant(
+                            default_variant_id, 
+                            sku=first_variant.sku,
+                            price=float(first_variant.price)
+                        )
                         
-                        # Update the first Django variant to use the default Shopify variant
-                        if default_variant_id and django_variants:
-                            first_variant = django_variants[0]
-                            first_variant.shopify_id = default_variant_id
-                            first_variant.save()
-                            
-                            logger.info(f"Updating default variant {default_variant_id} for {first_variant.title}")
-                            
-                            # Update variant with Django data (price, SKU)
-                            self.client.update_product_variant(
-                                default_variant_id, 
-                                sku=first_variant.sku,
-                                price=float(first_variant.price)
+                        # Update inventory for this variant if it has quantity
+                        if first_variant.inventory_quantity > 0:
+                            self._update_variant_inventory(
+                                default_variant_id,
+                                first_variant.inventory_quantity,
+                                variant_model=first_variant
                             )
-                            
-                            # Update inventory for this variant if it has quantity
-                            if first_variant.inventory_quantity > 0:
-                                self._update_variant_inventory(
-                                    default_variant_id,
-                                    first_variant.inventory_quantity,
-                                    variant_model=first_variant
-                                )
+                    
+                    # Now create additional variants if we have more than 1
+                    if variants_to_create:
+                        create_result = self.client.create_product_variants(shopify_id, variants_to_create)
                         
-                        # Now create additional variants if we have more than 1
-                        if variants_to_create:
-                            create_result = self.client.create_product_variants(shopify_id, variants_to_create)
-                            
-                            if create_result.get("success"):
-                                created_variants = create_result.get("variants", [])
-                                logger.info(f"Successfully created {len(created_variants)} additional variants")
-                                
-                                # Match created variants to Django variants (starting from index 1)
-                                for idx, created_variant in enumerate(created_variants):
-                                    django_idx = idx + 1  # Skip first variant (already handled)
-                                    if django_idx < len(django_variants):
-                                        django_variant = django_variants[django_idx]
-                                        shopify_variant_id = created_variant.get("id")
-                                        django_variant.shopify_id = shopify_variant_id
-                                        django_variant.save()
-                                        
-                                        logger.info(f"Matched Django variant {django_variant.title} to Shopify ID {shopify_variant_id}")
-                                        
-                                        # Update SKU if provided
-                                        if django_variant.sku:
-                                            logger.info(f"Setting SKU for variant {shopify_variant_id}: {django_variant.sku}")
-                                            self.client.update_product_variant(shopify_variant_id, sku=django_variant.sku)
-                                        
-                                        # Update inventory for this variant if it has quantity
-                                        if django_variant.inventory_quantity > 0:
-                                            self._update_variant_inventory(
-                                                shopify_variant_id,
-                                                django_variant.inventory_quantity,
-                                                variant_model=django_variant
-                                            )
-                            else:
-                                logger.error(f"Failed to create additional variants: {create_result.get('message')}")
-                    else:
-                        # Just one default variant - use the one Shopify created
-                        if shopify_variants and django_variants:
-                            django_variant = django_variants[0]
-                            variant_node = shopify_variants[0].get("node", {})
-                            shopify_variant_id = variant_node.get("id", "")
-                            django_variant.shopify_id = shopify_variant_id
-                            django_variant.save()
+                        if create_result.get("success"):
+                            created_variants = create_result.get("variants", [])
+                            logger.info(f"Successfully created {len(created_variants)} additional variants")
                             
-                            if django_variant.inventory_quantity > 0:
-                                self._update_variant_inventory(
-                                    shopify_variant_id,
-                                    django_variant.inventory_quantity,
-                                    variant_model=django_variant
-                                )
+                            # Match created variants to Django variants (starting from index 1)
+                            for idx, created_variant in enumerate(created_variants):
+                                django_idx = idx + 1  # Skip first variant (already handled)
+                                if django_idx < len(django_variants):
+                                    django_variant = django_variants[django_idx]
+                                    shopify_variant_id = created_variant.get("id")
+                                    django_variant.shopify_id = shopify_variant_id
+                                    django_variant.save()
+                                    
+                                    logger.info(f"Matched Django variant {django_variant.title} to Shopify ID {shopify_variant_id}")
+                                    
+                                    # Update SKU if provided
+                                    if django_variant.sku:
+                                        logger.info(f"Setting SKU for variant {shopify_variant_id}: {django_variant.sku}")
+                                        self.client.update_product_variant(shopify_variant_id, sku=django_variant.sku)
+                                    
+                                    # Update inventory for this variant if it has quantity
+                                    if django_variant.inventory_quantity > 0:
+                                        self._update_variant_inventory(
+                                            shopify_variant_id,
+                                            django_variant.inventory_quantity,
+                                            variant_model=django_variant
+                                        )
+                        else:
+                            logger.error(f"Failed to create additional variants: {create_result.get('message')}")
                 else:
-                    # No Django variants - just use Shopify's default
-                    if shopify_variants:
-                        logger.info("No Django variants, using Shopify default variant")
+                    # Just one default variant - use the one Shopify created
+                    if shopify_variants and django_variants:
+                        django_variant = django_variants[0]
+                        variant_node = shopify_variants[0].get("node", {})
+                        shopify_variant_id = variant_node.get("id", "")
+                        django_variant.shopify_id = shopify_variant_id
+                        django_variant.save()
+                        
+                        if django_variant.inventory_quantity > 0:
+                            self._update_variant_inventory(
+                                shopify_variant_id,
+                                django_variant.inventory_quantity,
+                                variant_model=django_variant
+                            )
+            else:
+                # No Django variants - just use Shopify's default
+                if shopify_variants:
+                    logger.info("No Django variants, using Shopify default variant")
             
             logger.info(f"Successfully created product {product.id} in Shopify: {shopify_id}")
             return {
@@ -313,39 +316,41 @@ class ProductBidirectionalSync:
         
         return result
     
-    def bulk_push_products(self, product_ids: List[int]) -> Dict:
+    def bulk_push_products(self, product_ids: List[int], workers: Optional[int] = None) -> Dict:
         """
         Push multiple products to Shopify
         
         Args:
             product_ids: List of ShopifyProduct IDs
+            workers: Concurrent pushes (default SHOPIFY_PUSH_SETTINGS)
             
         Returns:
             Dict with results summary
         """
         from products.models import ShopifyProduct
         
-        products = ShopifyProduct.objects.filter(id__in=product_ids)
+        results = self._push_products(ShopifyProduct.objects.filter(id__in=product_ids), workers)
+        results["total"] = len(product_ids)
+        return results
+    
+    def _push_products(self, products, workers: Optional[int] = None) -> Dict:
+        """Push products concurrently; each product's variants and inventory follow it on the same worker"""
+        report = PushExecutor(self.push_product_to_shopify, workers=workers, label='products').run(products)
         
         results = {
-            "total": len(product_ids),
-            "successful": 0,
-            "failed": 0,
-            "errors": []
-        }
-        
-        for product in products:
-            result = self.push_product_to_shopify(product)
-            if result.get("success"):
-                results["successful"] += 1
-            else:
-                results["failed"] += 1
-                results["errors"].append({
+            "total": report["total"],
+            "successful": report["successful"],
+            "failed": report["failed"],
+            "errors": [
+                {
                     "product_id": product.id,
                     "product_title": product.title,
                     "error": result.get("message", "Unknown error")
-                })
-        
+                }
+                for product, result in report["results"] if not result.get("success")
+            ],
+        }
+        results.update(push_metrics(report))
         return results
     
     def _enable_inventory_tracking(self, inventory_item_id: str) -> Dict:
@@ -575,35 +580,19 @@ class ProductBidirectionalSync:
                 "message": f"Failed to update inventory: {e}"
             }
 
-    def sync_pending_products(self) -> Dict:
+    def sync_pending_products(self, workers: Optional[int] = None) -> Dict:
         """
         Sync all products that need to be pushed to Shopify
         
+        Args:
+            workers: Concurrent pushes (default SHOPIFY_PUSH_SETTINGS)
+        
         Returns:
             Dict with results summary
         """
         from products.models import ShopifyProduct
         
-        pending_products = ShopifyProduct.objects.filter(needs_shopify_push=True)
-        
-        results = {
-            "total": pending_products.count(),
-            "successful": 0,
-            "failed": 0,
-            "errors": []
-        }
-        
-        for product in pending_products:
-            result = self.push_product_to_shopify(product)
-            if result.get("success"):
-                results["successful"] += 1
-            else:
-                results["failed"] += 1
-                results["errors"].append({
-                    "product_id": product.id,
-                    "product_title": product.title,
-                    "error": result.get("message", "Unknown error")
-                })
+        results = self._push_products(ShopifyProduct.objects.filter(needs_shopify_push=True), workers)
         
         logger.info(f"Bulk sync completed: {results['successful']}/{results['total']} successful")
         return results
@@ -337,3 +337,17 @@ class ProductSyncLog(models.Model):
     
     def __str__(self):
         return f"{self.operation_type} - {self.status} ({self.started_at})"
+
+
+# Retire cached storefront API responses built from the product catalog
+from django.db.models.signals import post_delete
+
+@receiver(post_save, sender=ShopifyProduct)
+@receiver(post_delete, sender=ShopifyProduct)
+@receiver(post_save, sender=ShopifyProductVariant)
+@receiver(post_delete, sender=ShopifyProductVariant)
+@receiver(post_save, sender=ShopifyProductImage)
+@receiver(post_delete, sender=ShopifyProductImage)
+def invalidate_catalog_responses(sender, **kwargs):
+    from api.response_cache import CATALOG, bump_version
+    bump_version(CATALOG)
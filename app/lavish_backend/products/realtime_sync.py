@@ -7,11 +7,12 @@ import logging
 from typing import Dict, List, Optional
 from datetime import datetime
 from django.utils.dateparse import parse_datetime
-from django.db import transaction
 from django.conf import settings
 
 from .models import ShopifyProduct, ShopifyProductVariant, ShopifyProductImage, ShopifyProductMetafield, ProductSyncLog
 from shopify_integration.enhanced_client import EnhancedShopifyAPIClient
+from shopify_integration.bulk_operations import ShopifyBulkOperationImporter
+from shopify_integration.incremental_sync import sync_resource
 
 logger = logging.getLogger('products.realtime_sync')
 
@@ -26,43 +27,48 @@ class RealtimeProductSyncService:
         self.client = EnhancedShopifyAPIClient()
         self.store_domain = settings.SHOPIFY_STORE_URL
     
-    def sync_all_products(self, limit: Optional[int] = None) -> Dict:
+    def sync_all_products(self, limit: Optional[int] = None, bulk: bool = False,
+                          full: Optional[bool] = None) -> Dict:
         """
         Sync all products from Shopify with real-time data refresh
+        
+        Each GraphQL page is upserted as soon as it arrives, so only one page is held
+        in memory and an interrupted sync keeps every page already written.
+        
+        Without ``limit`` only products updated since the last sync are fetched, with a
+        periodic full reconcile that also removes products deleted in Shopify (``full``
+        forces or skips it; see shopify_integration.incremental_sync).
+        
+        With ``bulk`` the products are exported through a Shopify bulk operation instead of
+        cursor pagination, which suits very large stores; it always runs as a full
+        reconcile and ``limit`` does not apply.
         """
         logger.info("🔄 Starting real-time product sync...")
         
         try:
-            # Fetch products using enhanced client
-            products_data = self.client.fetch_all_products(limit=limit)
+            pages = ShopifyBulkOperationImporter(self.client).iter_products() if bulk else None
+            stats = sync_resource(
+                self.client, 'products', self.store_domain,
+                limit=limit, full=full, pages=pages,
+            )
             
-            if not products_data:
+            if not stats['pages'] and stats['mode'] != 'incremental':
                 return {
                     'success': False,
-                    'message': 'No products retrieved from Shopify',
+                    'message': stats.get('error') or 'No products retrieved from Shopify',
                     'stats': {'total': 0, 'created': 0, 'updated': 0, 'errors': 0}
                 }
             
-            # Process products in batches
-            stats = {'total': 0, 'created': 0, 'updated': 0, 'errors': 0, 'variants': 0, 'images': 0}
-            
-            with transaction.atomic():
-                for product_data in products_data:
-                    try:
-                        result = self._sync_single_product(product_data)
-                        stats['total'] += 1
-                        stats['variants'] += result['variants_synced']
-                        stats['images'] += result['images_synced']
-                        
-                        if result['created']:
-                            stats['created'] += 1
-                        else:
-                            stats['updated'] += 1
-                            
-                    except Exception as e:
-                        logger.error(f"Error syncing product {product_data.get('id', 'unknown')}: {e}")
-                        stats['errors'] += 1
-                        continue
+            if not stats['complete']:
+                # Pages already written stay written, but deletes and the watermark were skipped
+                reason = stats.get('error') or 'the listing did not finish'
+                logger.warning(f"⚠️ Product sync incomplete: {reason}")
+                return {
+                    'success': False,
+                    'partial': stats['total'] > 0,
+                    'message': f"Product sync incomplete after {stats['total']} products: {reason}",
+                    'stats': stats
+                }
             
             logger.info(f"✅ Product sync completed: {stats}")
             
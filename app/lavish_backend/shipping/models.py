@@ -444,3 +444,20 @@ class FulfillmentTrackingInfo(models.Model):
     def tracking_url_display(self):
         """Get tracking URL for display in admin"""
         return self.get_tracking_url() or "No tracking URL available"
+
+
+# Recompile the checkout rate table when the rates or their zones change
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+@receiver(post_save, sender=ShippingRate)
+@receiver(post_delete, sender=ShippingRate)
+@receiver(post_save, sender=ShopifyDeliveryMethod)
+@receiver(post_delete, sender=ShopifyDeliveryMethod)
+@receiver(post_save, sender=ShopifyDeliveryZone)
+@receiver(post_delete, sender=ShopifyDeliveryZone)
+@receiver(post_save, sender=ShopifyDeliveryProfile)
+@receiver(post_delete, sender=ShopifyDeliveryProfile)
+def invalidate_rate_table(sender, **kwargs):
+    from shipping.quote_engine import invalidate_rate_table
+    invalidate_rate_table()
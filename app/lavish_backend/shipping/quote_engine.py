@@ -0,0 +1,309 @@
+"""
+Shipping rate quote engine for the carrier service callback
+
+Shopify waits a few seconds for checkout rates. Quotes are answered from
+memory wherever possible:
+
+- ShippingRate rows (with their delivery methods and zones) are compiled into
+  an in-process table keyed by destination country and weight band, rebuilt
+  only when a rate, method, zone or profile changes. The table's version is
+  read from the shared default cache, so a change saved by a sync command or
+  another worker recompiles the table in every process.
+- Live carrier quotes and exchange rates go through a process-local LRU in
+  front of the Django cache. Quote keys are bucketed by postal prefix, weight
+  band and value band rather than exact postcode, grams and cents, so nearby
+  carts share an entry.
+- Entries stay servable after they go stale; a stale hit is answered at once
+  and refreshed in the background (stale-while-revalidate). A miss waits at
+  most ``live_quote_wait`` seconds for the carrier before the compiled table
+  answers instead.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in grams; heavier parcels fall in one band past the last
+WEIGHT_BANDS = (250, 500, 1000, 2000, 3000, 5000, 10000, 20000, 30000)
+# Width of a declared value band, in the cart currency
+VALUE_BAND = 50
+POSTAL_PREFIX_LENGTH = 3
+WORLDWIDE = 'WORLDWIDE'
+
+DEFAULT_FRESH_SECONDS = 15 * 60
+DEFAULT_STALE_SECONDS = 6 * 60 * 60
+# Failed lookups are remembered briefly so a carrier outage is not hit on every checkout
+DEFAULT_FAILURE_SECONDS = 60
+DEFAULT_LOCAL_CACHE_SIZE = 2048
+DEFAULT_LIVE_QUOTE_WAIT = 2.0
+DEFAULT_REFRESH_WORKERS = 4
+
+RATE_TABLE_VERSION = 'shipping-rates'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def quote_settings():
+    """Engine defaults, overridable with SHIPPING_QUOTE_SETTINGS"""
+    return getattr(settings, 'SHIPPING_QUOTE_SETTINGS', {})
+
+
+def _refresh_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=quote_settings().get('refresh_workers', DEFAULT_REFRESH_WORKERS),
+                    thread_name_prefix='shipping-quotes',
+                )
+    return _executor
+
+
+def weight_band(grams):
+    """Index of the weight band holding a parcel of ``grams``"""
+    return bisect_left(WEIGHT_BANDS, max(int(grams or 0), 0))
+
+
+def value_band(value):
+    return int(Decimal(value or 0) // VALUE_BAND)
+
+
+def postal_prefix(address):
+    postal_code = (address or {}).get('postal_code') or ''
+    return postal_code.replace(' ', '').upper()[:POSTAL_PREFIX_LENGTH]
+
+
+class LocalLRU:
+    """Bounded, thread-safe in-process cache of the most recently used entries"""
+
+    def __init__(self, size=DEFAULT_LOCAL_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class TieredCache:
+    """
+    Process-local LRU in front of the Django cache, with stale-while-revalidate
+
+    Entries are stored as (value, fresh_until, stale_until). Fresh entries are
+    returned as they are; stale ones are returned too, while one background
+    load per key replaces them.
+    """
+
+    def __init__(self, prefix, fresh_seconds=None, stale_seconds=None, failure_seconds=None, local_size=None):
+        options = quote_settings()
+        self.prefix = prefix
+        self.fresh_seconds = fresh_seconds or options.get('fresh_seconds', DEFAULT_FRESH_SECONDS)
+        self.stale_seconds = stale_seconds or options.get('stale_seconds', DEFAULT_STALE_SECONDS)
+        self.failure_seconds = failure_seconds or options.get('failure_seconds', DEFAULT_FAILURE_SECONDS)
+        self.local = LocalLRU(local_size or options.get('local_cache_size', DEFAULT_LOCAL_CACHE_SIZE))
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def lookup(self, key):
+        """Return (value, fresh); (None, False) when nothing servable is cached"""
+        now = time.time()
+        entry = self.local.get(key)
+        if entry is None or entry[2] <= now:
+            entry = cache.get(self._key(key))
+            if entry is None or entry[2] <= now:
+                return None, False
+            self.local.set(key, entry)
+        value, fresh_until, _ = entry
+        return value, fresh_until > now
+
+    def store(self, key, value, fresh_seconds=None):
+        fresh_seconds = fresh_seconds or self.fresh_seconds
+        now = time.time()
+        entry = (value, now + fresh_seconds, now + max(self.stale_seconds, fresh_seconds))
+        self.local.set(key, entry)
+        cache.set(self._key(key), entry, max(self.stale_seconds, fresh_seconds))
+
+    def refresh(self, key, loader):
+        """Load ``key`` in the background unless a load is already running; returns its future"""
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = _refresh_executor().submit(self._load, key, loader)
+                self._pending[key] = future
+            return future
+
+    def _load(self, key, loader):
+        try:
+            value = loader()
+        except Exception as e:
+            logger.warning(f"Refreshing {self._key(key)} failed: {e}")
+            value = None
+        try:
+            if value is None:
+                # Remember the failure as an empty result, so callers fall back without waiting
+                self.store(key, [], self.failure_seconds)
+            else:
+                self.store(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def get(self, key, loader, wait=None):
+        """
+        Cached value of ``key``, loading it with ``loader`` when missing or stale
+
+        Args:
+            wait: Seconds to wait for a missing value; None waits for the load,
+                0 returns None at once and leaves the load running
+
+        Returns:
+            The cached or loaded value, or None when the load has not finished in time
+        """
+        value, fresh = self.lookup(key)
+        if value is not None:
+            if not fresh:
+                self.refresh(key, loader)
+            return value
+
+        future = self.refresh(key, loader)
+        try:
+            return future.result(timeout=wait)
+        except FutureTimeout:
+            return None
+
+    def clear(self):
+        self.local.clear()
+
+
+class RateTable:
+    """
+    ShippingRate rows compiled into lookups by destination country and weight band
+
+    A rate whose sample weight falls in a band serves parcels up to that band;
+    rates without a sample weight serve every band. For each rate handle a
+    parcel gets the rate of the smallest band that covers it.
+    """
+
+    def __init__(self, rates):
+        self._rates = rates
+
+    @classmethod
+    def compile(cls):
+        from .models import ShippingRate
+
+        rows = ShippingRate.objects.filter(active=True).select_related('delivery_method__zone__profile')
+        by_country = {}
+        for rate in rows:
+            method = rate.delivery_method
+            if method is not None and not method.zone.profile.active:
+                continue
+            # Rates synced without a price carry 0.00; do not offer them as free shipping
+            if not rate.price_amount and 'free' not in rate.title.lower():
+                continue
+            band = None if rate.sample_weight_grams is None else weight_band(rate.sample_weight_grams)
+            country = (rate.destination_country or WORLDWIDE).upper()
+            by_country.setdefault(country, {}).setdefault(rate.handle, []).append((band, rate))
+
+        rates = {}
+        for country, handles in by_country.items():
+            for band in range(len(WEIGHT_BANDS) + 1):
+                chosen = []
+                for candidates in handles.values():
+                    covering = [(b, rate) for b, rate in candidates if b is not None and b >= band]
+                    if covering:
+                        chosen.append(min(covering, key=lambda candidate: candidate[0])[1])
+                    else:
+                        unbanded = [rate for b, rate in candidates if b is None]
+                        if unbanded:
+                            chosen.append(unbanded[0])
+                if chosen:
+                    rates[(country, band)] = [cls._entry(rate) for rate in sorted(chosen, key=lambda r: r.price_amount)]
+        return cls(rates)
+
+    @staticmethod
+    def _entry(rate):
+        return {
+            'handle': rate.handle,
+            'title': rate.title,
+            'amount': rate.price_amount,
+            'currency': rate.price_currency,
+            'description': rate.description,
+            'min_days': rate.min_delivery_days,
+            'max_days': rate.max_delivery_days,
+            'phone_required': rate.phone_required,
+        }
+
+    def lookup(self, country, grams):
+        """Compiled rates for a parcel, falling back to zones without countries"""
+        band = weight_band(grams)
+        return self._rates.get(((country or '').upper(), band)) or self._rates.get((WORLDWIDE, band)) or []
+
+    def __len__(self):
+        return len(self._rates)
+
+
+_rate_table = (None, None)
+_rate_table_lock = threading.Lock()
+
+
+def get_rate_table():
+    """The compiled RateTable, recompiled after any rate, method, zone or profile change"""
+    global _rate_table
+    from api.response_cache import get_version
+
+    version = get_version(RATE_TABLE_VERSION)
+    compiled_version, table = _rate_table
+    if compiled_version == version:
+        return table
+    with _rate_table_lock:
+        if _rate_table[0] != version:
+            _rate_table = (version, RateTable.compile())
+            logger.info(f"Compiled shipping rate table ({len(_rate_table[1])} country/weight entries)")
+        return _rate_table[1]
+
+
+def invalidate_rate_table():
+    from api.response_cache import bump_version
+    bump_version(RATE_TABLE_VERSION)
+
+
+live_quotes = TieredCache('shipping:live-quote')
+exchange_rates = TieredCache('shipping:exchange-rate', fresh_seconds=3600, stale_seconds=24 * 3600)
+
+
+def live_quote_key(origin, destination, grams, value, currency):
+    """Bucketed cache key of a live carrier quote"""
+    return ':'.join(str(part) for part in (
+        (origin.get('country') or '').upper(), postal_prefix(origin),
+        (destination.get('country') or '').upper(), postal_prefix(destination),
+        weight_band(grams), value_band(value), currency,
+    ))
@@ -8,9 +8,14 @@ import logging
 from decimal import Decimal
 from datetime import datetime, timedelta
 from django.conf import settings
-from django.core.cache import cache
 from typing import Dict, List, Optional
 
+from shopify_integration.http_pool import get_session
+
+from .quote_engine import (
+    DEFAULT_LIVE_QUOTE_WAIT, exchange_rates, get_rate_table, live_quote_key, live_quotes, quote_settings,
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -34,6 +39,8 @@ class ShopifyShippingRateCalculator:
         self.shop_domain = shop_domain or getattr(settings, 'SHOPIFY_SHOP_DOMAIN', '7fa66c-ac.myshopify.com')
         self.access_token = access_token or getattr(settings, 'SHOPIFY_ACCESS_TOKEN', '')
         self.base_url = f"https://{self.shop_domain}/admin/api/2024-10"
+        # Keep-alive pool: checkout rate lookups stay within Shopify's carrier-service deadline
+        self.session = get_session('shipping')
         
     def calculate_rates(self, rate_request: Dict) -> List[Dict]:
         """
@@ -53,6 +60,11 @@ class ShopifyShippingRateCalculator:
                 logger.info(f"Retrieved {len(live_rates)} live shipping rates")
                 return live_rates
             
+            # Then the rates synced from Shopify delivery profiles
+            table_rates = self._get_table_rates(rate_request)
+            if table_rates:
+                return table_rates
+            
             # Fallback to static rates
             logger.warning("Live rates unavailable, using static fallback rates")
             return self._get_static_rates(rate_request)
@@ -66,8 +78,15 @@ class ShopifyShippingRateCalculator:
         """
         Fetch live shipping rates from Shopify/Sendal API
         Includes duties and taxes
+        
+        Quotes are cached per postal prefix, weight band and value band; stale
+        quotes are served while a background request refreshes them, and a
+        miss waits at most ``live_quote_wait`` seconds for the carrier.
         """
         try:
+            if not getattr(settings, 'SENDAL_API_ENDPOINT', None):
+                return None
+            
             destination = rate_request['rate']['destination']
             origin = rate_request['rate']['origin']
             items = rate_request['rate']['items']
@@ -85,34 +104,49 @@ class ShopifyShippingRateCalculator:
                 for item in items
             )
             
-            # Build cache key
-            cache_key = self._build_cache_key(
-                origin, destination, total_weight_grams, total_value, currency
+            cache_key = live_quote_key(origin, destination, total_weight_grams, total_value, currency)
+            rates = live_quotes.get(
+                cache_key,
+                lambda: self._fetch_carrier_service_rates(
+                    origin, destination, items, currency, total_weight_grams, total_value
+                ),
+                wait=quote_settings().get('live_quote_wait', DEFAULT_LIVE_QUOTE_WAIT),
             )
-            
-            # Check cache (15 minute expiry as per Shopify docs)
-            cached_rates = cache.get(cache_key)
-            if cached_rates:
-                logger.info("Returning cached shipping rates")
-                return cached_rates
-            
-            # Make API call to Shopify carrier service
-            # This would call your Sendal/shipping plugin endpoint
-            rates = self._fetch_carrier_service_rates(
-                origin, destination, items, currency, total_weight_grams, total_value
-            )
-            
-            if rates:
-                # Cache for 15 minutes
-                cache.set(cache_key, rates, 900)
-                return rates
-            
-            return None
+            return rates or None
             
         except Exception as e:
             logger.error(f"Error fetching live rates: {str(e)}")
             return None
     
+    def _get_table_rates(self, rate_request: Dict) -> List[Dict]:
+        """Rates for the destination and parcel weight from the compiled ShippingRate table"""
+        destination = rate_request['rate']['destination']
+        currency = rate_request['rate'].get('currency', 'USD')
+        total_weight_grams = sum(item['grams'] * item['quantity'] for item in rate_request['rate']['items'])
+        
+        today = datetime.now()
+        rates = []
+        for entry in get_rate_table().lookup(destination.get('country'), total_weight_grams):
+            amount = entry['amount']
+            if entry['currency'] != currency:
+                amount = (amount * self._get_exchange_rate(entry['currency'], currency)).quantize(Decimal('0.01'))
+            rate = {
+                'handle': entry['handle'],
+                'title': entry['title'],
+                'price': {
+                    'amount': str(amount),
+                    'currencyCode': currency
+                },
+                'description': entry['description'],
+                'phone_required': entry['phone_required'],
+            }
+            if entry['min_days'] is not None:
+                rate['min_delivery_date'] = (today + timedelta(days=entry['min_days'])).isoformat()
+            if entry['max_days'] is not None:
+                rate['max_delivery_date'] = (today + timedelta(days=entry['max_days'])).isoformat()
+            rates.append(rate)
+        return rates
+    
     def _fetch_carrier_service_rates(
         self,
         origin: Dict,
@@ -154,7 +188,7 @@ class ShopifyShippingRateCalculator:
                 'include_taxes': True
             }
             
-            response = requests.post(
+            response = self.session.post(
                 sendal_endpoint,
                 json=payload,
                 headers={'Authorization': f'Bearer {getattr(settings, "SENDAL_API_KEY", "")}'},
@@ -267,32 +301,24 @@ class ShopifyShippingRateCalculator:
         """
         Get exchange rate from cache or external API
         Fallback to approximate rates if API unavailable
-        """
-        cache_key = f'exchange_rate_{from_currency}_{to_currency}'
-        cached_rate = cache.get(cache_key)
-        
-        if cached_rate:
-            return Decimal(str(cached_rate))
         
-        try:
-            # Try to fetch from exchange rate API
-            # Example: Using exchangerate-api.com or similar
-            api_key = getattr(settings, 'EXCHANGE_RATE_API_KEY', None)
-            
-            if api_key:
-                response = requests.get(
-                    f'https://v6.exchangerate-api.com/v6/{api_key}/pair/{from_currency}/{to_currency}',
-                    timeout=3
-                )
-                
-                if response.status_code == 200:
-                    rate = Decimal(str(response.json()['conversion_rate']))
-                    # Cache for 1 hour
-                    cache.set(cache_key, float(rate), 3600)
-                    return rate
+        Checkout never waits for the exchange rate API: a missing rate is
+        fetched in the background and the approximate rate is used meanwhile.
+        """
+        if from_currency == to_currency:
+            return Decimal('1')
         
-        except Exception as e:
-            logger.warning(f"Could not fetch exchange rate: {str(e)}")
+        # Try to fetch from exchange rate API
+        # Example: Using exchangerate-api.com or similar
+        api_key = getattr(settings, 'EXCHANGE_RATE_API_KEY', None)
+        if api_key:
+            rate = exchange_rates.get(
+                f'{from_currency}_{to_currency}',
+                lambda: self._fetch_exchange_rate(api_key, from_currency, to_currency),
+                wait=0,
+            )
+            if rate:
+                return Decimal(str(rate))
         
         # Fallback approximate rates
         approximate_rates = {
@@ -306,20 +332,17 @@ class ShopifyShippingRateCalculator:
         
         return approximate_rates.get((from_currency, to_currency), Decimal('1.0'))
     
-    def _build_cache_key(
-        self,
-        origin: Dict,
-        destination: Dict,
-        weight: int,
-        value: Decimal,
-        currency: str
-    ) -> str:
-        """Build cache key for rate lookup"""
-        return (
-            f"shipping_rate_"
-            f"{origin['postal_code']}_{destination['postal_code']}_"
-            f"{weight}_{int(value)}_{currency}"
-        )
+    def _fetch_exchange_rate(self, api_key: str, from_currency: str, to_currency: str) -> Optional[float]:
+        try:
+            response = self.session.get(
+                f'https://v6.exchangerate-api.com/v6/{api_key}/pair/{from_currency}/{to_currency}',
+                timeout=3
+            )
+            if response.status_code == 200:
+                return float(response.json()['conversion_rate'])
+        except Exception as e:
+            logger.warning(f"Could not fetch exchange rate: {str(e)}")
+        return None
 
 
 class ShopifyCarrierServiceWebhook:
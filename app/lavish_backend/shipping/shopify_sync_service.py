@@ -6,8 +6,12 @@ Pulls carrier services, delivery profiles, zones, and shipping rates from Shopif
 import logging
 from typing import Dict, List, Optional
 from datetime import datetime
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.conf import settings
+from shopify_integration.bulk_upsert import bulk_upsert
 from shopify_integration.client import ShopifyAPIClient
 from .models import (
     ShopifyCarrierService,
@@ -22,6 +26,78 @@ from .models import (
 
 logger = logging.getLogger(__name__)
 
+# Orders per nodes(ids:) request; halved while Shopify rejects the query as too costly
+FULFILLMENT_BATCH_SIZE = 25
+OPEN_FULFILLMENT_ORDER_STATUSES = ['open', 'in_progress', 'incomplete']
+# Order fulfillment statuses needing no more work. Orders store REST values ('partial',
+# 'fulfilled', 'null') or lower-cased GraphQL displayFulfillmentStatus values
+# ('unfulfilled', 'partially_fulfilled', 'in_progress', 'on_hold', 'scheduled', ...)
+FINISHED_FULFILLMENT_STATUSES = ['fulfilled', 'restocked']
+
+FULFILLMENT_ORDERS_QUERY = """
+query fulfillmentOrdersForOrders($ids: [ID!]!) {
+    nodes(ids: $ids) {
+        ... on Order {
+            id
+            fulfillmentOrders(first: 10) {
+                edges {
+                    node {
+                        id
+                        status
+                        requestStatus
+                        fulfillAt
+                        fulfillBy
+                        deliveryMethod {
+                            methodType
+                            minDeliveryDateTime
+                            maxDeliveryDateTime
+                        }
+                        internationalDuties {
+                            incoterm
+                        }
+                        assignedLocation {
+                            location {
+                                id
+                                name
+                            }
+                        }
+                        createdAt
+                        updatedAt
+                    }
+                }
+            }
+            fulfillments(first: 10) {
+                trackingInfo {
+                    company
+                    number
+                    url
+                }
+                fulfillmentOrders(first: 5) {
+                    edges {
+                        node {
+                            id
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+
+def _edge_nodes(connection: Optional[Dict]) -> List[Dict]:
+    return [edge['node'] for edge in (connection or {}).get('edges', []) if edge.get('node')]
+
+
+def _max_cost_exceeded(response: Optional[Dict]) -> bool:
+    """True when Shopify refused a query for exceeding the single-query cost limit"""
+    errors = (response or {}).get('errors')
+    if not isinstance(errors, list):
+        return False
+    return any((error.get('extensions') or {}).get('code') == 'MAX_COST_EXCEEDED'
+               for error in errors if isinstance(error, dict))
+
 
 class ShopifyShippingSyncService:
     """
@@ -636,7 +712,8 @@ class ShopifyShippingSyncService:
         }
         return currencies.get(country_code, 'USD')
     
-    def sync_fulfillment_orders(self, order_ids: Optional[List[str]] = None) -> Dict:
+    def sync_fulfillment_orders(self, order_ids: Optional[List[str]] = None,
+                                batch_size: Optional[int] = None) -> Dict:
         """
         Sync fulfillment orders from Shopify orders.
         
@@ -644,15 +721,20 @@ class ShopifyShippingSyncService:
         Each order can have multiple fulfillment orders (split shipments).
         This method pulls fulfillment order data including tracking info.
         
+        Orders are fetched many per request with nodes(ids:), paced by the
+        store's GraphQL cost budget, and each batch is written with bulk
+        upserts, so every order awaiting fulfillment is covered in one run.
+        
         Args:
             order_ids: Optional list of specific Shopify order IDs to sync.
-                      If None, syncs fulfillment orders for all orders in database.
+                      If None, syncs every order awaiting fulfillment.
+            batch_size: Orders per request (default FULFILLMENT_BATCH_SIZE)
         
         Returns:
             Dict with sync statistics
         """
         from orders.models import ShopifyOrder
-        from django.utils.dateparse import parse_datetime
+        from inventory.models import ShopifyLocation
         
         logger.info("Starting fulfillment orders sync from Shopify")
         
@@ -664,6 +746,7 @@ class ShopifyShippingSyncService:
             'tracking_info_created': 0,
             'tracking_info_updated': 0,
             'orders_processed': 0,
+            'requests': 0,
             'errors': []
         }
         
@@ -672,176 +755,49 @@ class ShopifyShippingSyncService:
             if order_ids:
                 orders = ShopifyOrder.objects.filter(shopify_id__in=order_ids)
             else:
-                # Sync for all orders that have fulfillment status (likely to have fulfillment orders)
-                # Limit to 20 to avoid API timeouts
-                orders = ShopifyOrder.objects.exclude(fulfillment_status='null')[:20]
+                orders = self._orders_awaiting_fulfillment()
             
-            logger.info(f"Processing fulfillment orders for {orders.count()} orders")
+            order_pks = dict(orders.values_list('shopify_id', 'pk'))
+            location_pks = dict(ShopifyLocation.objects.values_list('shopify_id', 'pk'))
+            pending_ids = list(order_pks)
+            batch_size = batch_size or FULFILLMENT_BATCH_SIZE
             
-            import time  # For rate limiting
+            logger.info(f"Processing fulfillment orders for {len(pending_ids)} orders")
             
-            for order in orders:
-                try:
-                    results['orders_processed'] += 1
-                    
-                    # Add small delay to avoid overwhelming API
-                    time.sleep(0.5)  # 500ms between requests
-                    
-                    # Extract numeric ID from Shopify GID
-                    numeric_id = order.shopify_id.split('/')[-1]
-                    
-                    # Query Shopify for fulfillment orders
-                    query = """
-                    query getFulfillmentOrders($orderId: ID!) {
-                        order(id: $orderId) {
-                            id
-                            fulfillmentOrders(first: 10) {
-                                edges {
-                                    node {
-                                        id
-                                        status
-                                        requestStatus
-                                        fulfillAt
-                                        fulfillBy
-                                        deliveryMethod {
-                                            methodType
-                                            minDeliveryDateTime
-                                            maxDeliveryDateTime
-                                        }
-                                        internationalDuties {
-                                            incoterm
-                                        }
-                                        assignedLocation {
-                                            location {
-                                                id
-                                                name
-                                            }
-                                        }
-                                        createdAt
-                                        updatedAt
-                                    }
-                                }
-                            }
-                            fulfillments {
-                                trackingInfo {
-                                    company
-                                    number
-                                    url
-                                }
-                            }
-                        }
-                    }
-                    """
-                    
-                    variables = {
-                        'orderId': order.shopify_id
-                    }
-                    
-                    response = self.client.execute_graphql_query(query, variables)
-                    
-                    if not response or 'data' not in response or not response['data'].get('order'):
-                        logger.debug(f"No fulfillment data for order {order.order_number}")
-                        continue
-                    
-                    fulfillment_orders_data = response['data']['order'].get('fulfillmentOrders', {}).get('edges', [])
-                    fulfillments_data = response['data']['order'].get('fulfillments', [])
-                    
-                    if not fulfillment_orders_data:
-                        logger.debug(f"No fulfillment orders for order {order.order_number}")
-                        continue
-                    
-                    # Process each fulfillment order
-                    for edge in fulfillment_orders_data:
-                        node = edge.get('node', {})
-                        
-                        # Parse timestamps
-                        created_at = parse_datetime(node.get('createdAt'))
-                        updated_at = parse_datetime(node.get('updatedAt'))
-                        fulfill_at = parse_datetime(node.get('fulfillAt')) if node.get('fulfillAt') else None
-                        fulfill_by = parse_datetime(node.get('fulfillBy')) if node.get('fulfillBy') else None
-                        
-                        # Get location
-                        location = None
-                        assigned_location = node.get('assignedLocation', {})
-                        if assigned_location and assigned_location.get('location'):
-                            location_id = assigned_location['location'].get('id')
-                            if location_id:
-                                from inventory.models import ShopifyLocation
-                                location = ShopifyLocation.objects.filter(shopify_id=location_id).first()
-                        
-                        # Create or update fulfillment order
-                        fulfillment_order, created = ShopifyFulfillmentOrder.objects.update_or_create(
-                            shopify_id=node['id'],
-                            defaults={
-                                'order': order,
-                                'location': location,
-                                'status': node.get('status', 'open').lower(),
-                                'request_status': node.get('requestStatus', 'unsubmitted').lower(),
-                                'fulfill_at': fulfill_at,
-                                'fulfill_by': fulfill_by,
-                                'international_duties': node.get('internationalDuties'),
-                                'delivery_method': node.get('deliveryMethod'),
-                                'created_at': created_at,
-                                'updated_at': updated_at,
-                                'store_domain': self.shop_domain,
-                            }
-                        )
-                        
-                        results['fulfillment_orders_synced'] += 1
-                        if created:
-                            results['fulfillment_orders_created'] += 1
-                            logger.debug(f"Created fulfillment order {node['id']}")
-                        else:
-                            results['fulfillment_orders_updated'] += 1
-                            logger.debug(f"Updated fulfillment order {node['id']}")
-                    
-                    # Process tracking info from order's fulfillments (not from fulfillment_orders)
-                    for fulfillment in fulfillments_data:
-                        tracking_info_list = fulfillment.get('trackingInfo', [])
-                        
-                        for tracking_info in tracking_info_list:
-                            company = tracking_info.get('company', '')
-                            number = tracking_info.get('number', '')
-                            url = tracking_info.get('url', '')
-                            
-                            if not number:
-                                continue  # Skip if no tracking number
-                            
-                            # Link tracking to the first fulfillment order (most common case)
-                            # In reality, we'd need to match fulfillment to fulfillment_order via line items
-                            if fulfillment_orders_data:
-                                first_fo_node = fulfillment_orders_data[0]['node']
-                                fulfillment_order = ShopifyFulfillmentOrder.objects.filter(
-                                    shopify_id=first_fo_node['id']
-                                ).first()
-                                
-                                if fulfillment_order:
-                                    # Create or update tracking info
-                                    tracking, tracking_created = FulfillmentTrackingInfo.objects.update_or_create(
-                                        fulfillment_order=fulfillment_order,
-                                        number=number,
-                                        defaults={
-                                            'company': company,
-                                            'url': url,
-                                            'is_active': True,
-                                        }
-                                    )
-                                    
-                                    results['tracking_info_synced'] += 1
-                                    if tracking_created:
-                                        results['tracking_info_created'] += 1
-                                        logger.debug(f"Created tracking info: {company} - {number}")
-                                    else:
-                                        results['tracking_info_updated'] += 1
-                                        logger.debug(f"Updated tracking info: {company} - {number}")
+            while pending_ids:
+                batch = pending_ids[:batch_size]
+                response = self.client.execute_graphql_query(FULFILLMENT_ORDERS_QUERY, {'ids': batch})
+                results['requests'] += 1
                 
-                except Exception as e:
-                    error_msg = f"Failed to process order {order.order_number}: {str(e)}"
+                if _max_cost_exceeded(response) and batch_size > 1:
+                    # Too many orders for Shopify's per-query cost limit: retry the batch smaller
+                    batch_size = max(1, batch_size // 2)
+                    logger.info(f"Fulfillment query too costly, retrying with {batch_size} orders per request")
+                    continue
+                
+                pending_ids = pending_ids[len(batch):]
+                results['orders_processed'] += len(batch)
+                
+                data = (response or {}).get('data') or {}
+                if 'nodes' not in data:
+                    error_msg = f"Failed to fetch fulfillment orders for {len(batch)} orders: {(response or {}).get('errors') or (response or {}).get('error')}"
                     logger.error(error_msg)
                     results['errors'].append(error_msg)
                     continue
+                if response.get('errors'):
+                    logger.warning(f"Partial fulfillment data: {response['errors']}")
+                
+                try:
+                    self._save_fulfillment_batch(data['nodes'], order_pks, location_pks, results)
+                except Exception as e:
+                    error_msg = f"Failed to save fulfillment orders for {len(batch)} orders: {str(e)}"
+                    logger.error(error_msg)
+                    results['errors'].append(error_msg)
             
-            logger.info(f"Fulfillment sync complete: {results['fulfillment_orders_synced']} fulfillment orders, {results['tracking_info_synced']} tracking records")
+            logger.info(
+                f"Fulfillment sync complete: {results['fulfillment_orders_synced']} fulfillment orders, "
+                f"{results['tracking_info_synced']} tracking records from {results['requests']} requests"
+            )
             return results
             
         except Exception as e:
@@ -849,3 +805,83 @@ class ShopifyShippingSyncService:
             logger.error(error_msg, exc_info=True)
             results['errors'].append(error_msg)
             return results
+    
+    def _orders_awaiting_fulfillment(self):
+        """Orders not yet fully fulfilled, plus fulfilled orders whose fulfillment orders are still open locally"""
+        from orders.models import ShopifyOrder
+        
+        finished = Q()
+        for status in FINISHED_FULFILLMENT_STATUSES:
+            finished |= Q(fulfillment_status__iexact=status)
+        return ShopifyOrder.objects.filter(
+            ~finished | Q(fulfillment_orders__status__in=OPEN_FULFILLMENT_ORDER_STATUSES)
+        ).distinct()
+    
+    def _save_fulfillment_batch(self, nodes: List[Dict], order_pks: Dict, location_pks: Dict, results: Dict):
+        """Upsert the fulfillment orders and tracking info of one nodes(ids:) response"""
+        fulfillment_order_rows = []
+        tracking = {}
+        
+        for node in nodes:
+            if not node or node.get('id') not in order_pks:
+                continue
+            
+            fulfillment_orders = _edge_nodes(node.get('fulfillmentOrders'))
+            for fo in fulfillment_orders:
+                location_id = ((fo.get('assignedLocation') or {}).get('location') or {}).get('id')
+                fulfillment_order_rows.append({
+                    'shopify_id': fo['id'],
+                    'order_id': order_pks[node['id']],
+                    'location_id': location_pks.get(location_id),
+                    'status': (fo.get('status') or 'open').lower(),
+                    'request_status': (fo.get('requestStatus') or 'unsubmitted').lower(),
+                    'fulfill_at': parse_datetime(fo['fulfillAt']) if fo.get('fulfillAt') else None,
+                    'fulfill_by': parse_datetime(fo['fulfillBy']) if fo.get('fulfillBy') else None,
+                    'international_duties': fo.get('internationalDuties'),
+                    'delivery_method': fo.get('deliveryMethod'),
+                    'created_at': parse_datetime(fo['createdAt']) if fo.get('createdAt') else timezone.now(),
+                    'updated_at': parse_datetime(fo['updatedAt']) if fo.get('updatedAt') else timezone.now(),
+                    'store_domain': self.shop_domain,
+                })
+            
+            if not fulfillment_orders:
+                continue
+            order_fo_ids = [fo['id'] for fo in fulfillment_orders]
+            
+            # Attach tracking to the fulfillment order the fulfillment shipped, else the order's first
+            for fulfillment in node.get('fulfillments') or []:
+                shipped = [fo['id'] for fo in _edge_nodes(fulfillment.get('fulfillmentOrders'))
+                           if fo.get('id') in order_fo_ids]
+                fo_id = shipped[0] if shipped else order_fo_ids[0]
+                for info in fulfillment.get('trackingInfo') or []:
+                    number = info.get('number') or ''
+                    if not number:
+                        continue  # Skip if no tracking number
+                    tracking[(fo_id, number)] = {
+                        'company': info.get('company') or '',
+                        'url': info.get('url') or '',
+                    }
+        
+        with transaction.atomic():
+            fo_result = bulk_upsert(ShopifyFulfillmentOrder, fulfillment_order_rows)
+            tracking_rows = [
+                {
+                    'fulfillment_order_id': fo_result.pk_map[fo_id],
+                    'number': number,
+                    'company': info['company'],
+                    'url': info['url'],
+                    'is_active': True,
+                    'store_domain': self.shop_domain,
+                }
+                for (fo_id, number), info in tracking.items() if fo_id in fo_result.pk_map
+            ]
+            tracking_result = bulk_upsert(
+                FulfillmentTrackingInfo, tracking_rows, key_fields=('fulfillment_order_id', 'number')
+            )
+        
+        results['fulfillment_orders_created'] += fo_result.created
+        results['fulfillment_orders_updated'] += fo_result.updated
+        results['fulfillment_orders_synced'] += fo_result.created + fo_result.updated
+        results['tracking_info_created'] += tracking_result.created
+        results['tracking_info_updated'] += tracking_result.updated
+        results['tracking_info_synced'] += tracking_result.created + tracking_result.updated
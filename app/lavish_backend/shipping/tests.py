@@ -1,3 +1,273 @@
-from django.test import TestCase
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api.response_cache import LOCAL_VERSION_KEY
+from orders.models import ShopifyOrder
+from .models import (
+    FulfillmentTrackingInfo, ShippingRate, ShopifyDeliveryMethod, ShopifyDeliveryProfile, ShopifyDeliveryZone,
+    ShopifyFulfillmentOrder,
+)
+from .quote_engine import (
+    RATE_TABLE_VERSION, TieredCache, get_rate_table, invalidate_rate_table, live_quote_key, live_quotes,
+)
+from .shopify_shipping_service import ShopifyShippingRateCalculator
+from .shopify_sync_service import ShopifyShippingSyncService
+
+
+def rate_request(country='AU', postal_code='3000', grams=800, price=2999, currency='AUD'):
+    return {
+        'rate': {
+            'origin': {'country': 'AU', 'postal_code': '2000'},
+            'destination': {'country': country, 'postal_code': postal_code},
+            'items': [{'grams': grams, 'quantity': 1, 'price': price}],
+            'currency': currency,
+        }
+    }
+
+
+@override_settings(SENDAL_API_ENDPOINT=None)
+class RateTableTestCase(TestCase):
+    """Test cases for the compiled shipping rate table"""
+
+    def setUp(self):
+        cache.clear()
+        profile = ShopifyDeliveryProfile.objects.create(shopify_id='gid://shopify/DeliveryProfile/1', name='General')
+        zone = ShopifyDeliveryZone.objects.create(
+            profile=profile, shopify_id='gid://shopify/DeliveryZone/1', name='Australia', countries=['AU'],
+        )
+        self.method = ShopifyDeliveryMethod.objects.create(
+            zone=zone, shopify_id='gid://shopify/DeliveryMethod/1', name='Standard', method_type='shipping',
+        )
+
+    def _rate(self, handle, amount, country='AU', grams=None, **fields):
+        return ShippingRate.objects.create(
+            delivery_method=self.method, handle=handle, title=handle.title(), price_amount=amount,
+            price_currency='AUD', destination_country=country, sample_weight_grams=grams, **fields
+        )
+
+    def test_lookup_by_country_and_weight_band(self):
+        """Each handle is priced from the smallest weight band covering the parcel"""
+        self._rate('standard', '9.95', grams=500)
+        self._rate('standard', '14.95', grams=5000)
+        self._rate('express', '24.95', min_delivery_days=1, max_delivery_days=2)
+        self._rate('international', '39.95', country='', grams=2000)
+        self._rate('unpriced', '0.00')
+
+        calculator = ShopifyShippingRateCalculator()
+        rates = calculator.calculate_rates(rate_request(grams=400))
+        self.assertEqual([(r['handle'], r['price']['amount']) for r in rates],
+                         [('standard', '9.95'), ('express', '24.95')])
+        self.assertIn('max_delivery_date', rates[1])
+
+        rates = calculator.calculate_rates(rate_request(grams=4000))
+        self.assertEqual([r['price']['amount'] for r in rates], ['14.95', '24.95'])
+
+        # Zones without countries serve every other destination
+        rates = calculator.calculate_rates(rate_request(country='NZ', grams=1500))
+        self.assertEqual([r['handle'] for r in rates], ['international'])
+
+        # Too heavy for every banded rate, and no fallback in the table: static rates
+        rates = calculator.calculate_rates(rate_request(country='NZ', grams=25000))
+        self.assertEqual(rates[0]['handle'], 'standard-shipping')
+
+    def test_table_recompiles_after_changes(self):
+        """Saving a rate or deactivating its profile invalidates the compiled table"""
+        rate = self._rate('standard', '9.95')
+        table = get_rate_table()
+        self.assertIs(get_rate_table(), table)
+        self.assertEqual(table.lookup('AU', 100)[0]['amount'], Decimal('9.95'))
+
+        rate.price_amount = Decimal('11.00')
+        rate.save()
+        self.assertEqual(get_rate_table().lookup('AU', 100)[0]['amount'], Decimal('11.00'))
+
+        profile = self.method.zone.profile
+        profile.active = False
+        profile.save()
+        self.assertEqual(get_rate_table().lookup('AU', 100), [])
+
+    def test_table_recompiles_after_changes_in_another_process(self):
+        """A rate saved by a sync command or another worker invalidates this process's table"""
+        rate = self._rate('standard', '9.95')
+        get_rate_table()
+        ShippingRate.objects.filter(pk=rate.pk).update(price_amount=Decimal('12.50'))
+
+        # The other process keeps its copy of the counters in its own default cache
+        with mock.patch('api.response_cache.cache', LocMemCache('other-process', {})):
+            invalidate_rate_table()
+
+        # Seen once this process's copy expires
+        self.assertEqual(get_rate_table().lookup('AU', 100)[0]['amount'], Decimal('9.95'))
+        cache.delete(LOCAL_VERSION_KEY.format(RATE_TABLE_VERSION))
+        self.assertEqual(get_rate_table().lookup('AU', 100)[0]['amount'], Decimal('12.50'))
+
+
+class TieredCacheTestCase(TestCase):
+    """Test cases for the LRU + Django cache quote store"""
+
+    def setUp(self):
+        cache.clear()
+        live_quotes.clear()
+
+    def test_bucketed_keys(self):
+        """Nearby carts share a live quote key"""
+        origin = {'country': 'AU', 'postal_code': '2000'}
+        self.assertEqual(
+            live_quote_key(origin, {'country': 'AU', 'postal_code': '3000'}, 610, Decimal('29.99'), 'AUD'),
+            live_quote_key(origin, {'country': 'au', 'postal_code': '3004'}, 950, Decimal('41.50'), 'AUD'),
+        )
+        self.assertNotEqual(
+            live_quote_key(origin, {'country': 'AU', 'postal_code': '3000'}, 610, Decimal('29.99'), 'AUD'),
+            live_quote_key(origin, {'country': 'AU', 'postal_code': '3000'}, 1610, Decimal('29.99'), 'AUD'),
+        )
+
+    def test_stale_values_are_served_while_refreshing(self):
+        """A stale hit returns at once and one background load replaces it"""
+        quotes = TieredCache('test:quotes', fresh_seconds=60, stale_seconds=600)
+        self.assertEqual(quotes.get('key', lambda: ['first']), ['first'])
+        self.assertEqual(quotes.get('key', lambda: ['unused']), ['first'])
+
+        # Age the entry past its fresh period
+        value, _, stale_until = quotes.local.get('key')
+        quotes.local.set('key', (value, 0, stale_until))
+
+        release = threading.Event()
+        calls = []
+
+        def slow_loader():
+            calls.append(1)
+            release.wait(5)
+            return ['second']
+
+        self.assertEqual(quotes.get('key', slow_loader), ['first'])
+        self.assertEqual(quotes.get('key', slow_loader), ['first'])
+        future = quotes.refresh('key', slow_loader)
+        release.set()
+        self.assertEqual(future.result(5), ['second'])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(quotes.get('key', slow_loader), ['second'])
+
+        # The Django cache answers a process whose LRU does not hold the key
+        quotes.clear()
+        self.assertEqual(quotes.lookup('key'), (['second'], True))
+
+    def test_slow_carrier_does_not_block_checkout(self):
+        """A live quote miss waits at most live_quote_wait before falling back"""
+        release = threading.Event()
+
+        def slow_fetch(*args):
+            release.wait(5)
+            return [{'handle': 'carrier', 'title': 'Carrier', 'price': {'amount': '5.00', 'currencyCode': 'AUD'}}]
+
+        calculator = ShopifyShippingRateCalculator()
+        with override_settings(SENDAL_API_ENDPOINT='https://carrier.example.com/rates',
+                               SHIPPING_QUOTE_SETTINGS={'live_quote_wait': 0.05}), \
+                mock.patch.object(calculator, '_fetch_carrier_service_rates', side_effect=slow_fetch):
+            rates = calculator.calculate_rates(rate_request())
+            self.assertEqual(rates[0]['handle'], 'standard-shipping')
+
+            release.set()
+            key = live_quote_key({'country': 'AU', 'postal_code': '2000'},
+                                 {'country': 'AU', 'postal_code': '3000'}, 800, Decimal('29.99'), 'AUD')
+            deadline = time.time() + 5
+            while live_quotes.lookup(key)[0] is None and time.time() < deadline:
+                time.sleep(0.01)
+            rates = calculator.calculate_rates(rate_request())
+            self.assertEqual(rates[0]['handle'], 'carrier')
+
+
+class FakeFulfillmentClient:
+    """Answers nodes(ids:) fulfillment queries, refusing batches above max_orders as too costly"""
+
+    def __init__(self, max_orders):
+        self.max_orders = max_orders
+        self.requests = []
+
+    def execute_graphql_query(self, query, variables):
+        ids = variables['ids']
+        self.requests.append(ids)
+        if len(ids) > self.max_orders:
+            return {'errors': [{'message': 'Query cost is too high', 'extensions': {'code': 'MAX_COST_EXCEEDED'}}]}
+        return {'data': {'nodes': [self._order(order_id) for order_id in ids]}}
+
+    @staticmethod
+    def _order(order_id):
+        number = order_id.rsplit('/', 1)[-1]
+        fulfillment_orders = [
+            {'id': f'gid://shopify/FulfillmentOrder/{number}{n}', 'status': status, 'requestStatus': 'UNSUBMITTED',
+             'createdAt': '2025-01-01T00:00:00Z', 'updatedAt': '2025-01-02T00:00:00Z'}
+            for n, status in ((1, 'OPEN'), (2, 'CLOSED'))
+        ]
+        return {
+            'id': order_id,
+            'fulfillmentOrders': {'edges': [{'node': node} for node in fulfillment_orders]},
+            'fulfillments': [{
+                'trackingInfo': [{'company': 'Australia Post', 'number': f'AP{number}', 'url': ''}],
+                'fulfillmentOrders': {'edges': [{'node': {'id': fulfillment_orders[1]['id']}}]},
+            }],
+        }
+
+
+class FulfillmentSyncTestCase(TestCase):
+    """Test cases for the batched fulfillment order sync"""
+
+    def _order(self, number, fulfillment_status):
+        return ShopifyOrder.objects.create(
+            shopify_id=f'gid://shopify/Order/{number}', name=f'#{number}', customer_email='test@example.com',
+            total_price='10.00', subtotal_price='10.00', currency_code='AUD', financial_status='paid',
+            fulfillment_status=fulfillment_status, created_at=timezone.now(), updated_at=timezone.now(),
+        )
+
+    def test_orders_awaiting_fulfillment_are_synced_in_batches(self):
+        """Every unfulfilled order is covered, with batches shrunk to what Shopify accepts"""
+        for number in range(100, 110):
+            self._order(number, 'null')
+        self._order(200, 'fulfilled')
+        shipped = self._order(300, 'fulfilled')
+        ShopifyFulfillmentOrder.objects.create(
+            order=shipped, shopify_id='gid://shopify/FulfillmentOrder/3001', status='open', request_status='unsubmitted',
+        )
+
+        service = ShopifyShippingSyncService()
+        service.client = FakeFulfillmentClient(max_orders=4)
+        results = service.sync_fulfillment_orders(batch_size=8)
+
+        self.assertEqual(results['errors'], [])
+        self.assertEqual(results['orders_processed'], 11)
+        self.assertEqual([len(ids) for ids in service.client.requests], [8, 4, 4, 3])
+        self.assertNotIn('gid://shopify/Order/200', sum(service.client.requests, []))
+        self.assertEqual((results['fulfillment_orders_created'], results['fulfillment_orders_updated']), (21, 1))
+        self.assertEqual(results['tracking_info_created'], 11)
+
+        fulfillment_order = ShopifyFulfillmentOrder.objects.get(shopify_id='gid://shopify/FulfillmentOrder/1002')
+        self.assertEqual(fulfillment_order.status, 'closed')
+        self.assertEqual(fulfillment_order.order.shopify_id, 'gid://shopify/Order/100')
+        # Tracking goes to the fulfillment order the fulfillment shipped
+        self.assertEqual(fulfillment_order.tracking_info.get().number, 'AP100')
+
+        # A rerun only updates
+        service.client = FakeFulfillmentClient(max_orders=25)
+        results = service.sync_fulfillment_orders()
+        self.assertEqual(results['orders_processed'], 11)
+        self.assertEqual(len(service.client.requests), 1)
+        self.assertEqual((results['fulfillment_orders_created'], results['tracking_info_updated']), (0, 11))
+        self.assertEqual(FulfillmentTrackingInfo.objects.count(), 11)
+
+    def test_graphql_fulfillment_statuses_are_awaiting_fulfillment(self):
+        """Lower-cased displayFulfillmentStatus values stored by the bulk sync still count as open"""
+        statuses = ['unfulfilled', 'partially_fulfilled', 'in_progress', 'on_hold', 'scheduled', 'partial', 'null',
+                    '', None, 'fulfilled', 'FULFILLED', 'restocked']
+        for number, status in enumerate(statuses, start=400):
+            self._order(number, status)
+
+        awaiting = ShopifyShippingSyncService()._orders_awaiting_fulfillment()
+
+        self.assertEqual(sorted(order.fulfillment_status or '' for order in awaiting),
+                         sorted(status or '' for status in statuses[:9]))
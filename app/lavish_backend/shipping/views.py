@@ -4,7 +4,7 @@ from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Q, Count
+from django.db.models import Count
 from .shopify_shipping_service import ShopifyCarrierServiceWebhook
 from .shopify_sync_service import ShopifyShippingSyncService
 from .models import ShopifyCarrierService, ShopifyDeliveryProfile, ShopifyDeliveryZone, ShopifyDeliveryMethod
@@ -596,30 +596,35 @@ def fulfillment_statistics(request):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        # Calculate statistics
-        stats = queryset.aggregate(
-            total_fulfillments=Count('id'),
-            open_fulfillments=Count('id', filter=Q(status='open')),
-            in_progress_fulfillments=Count('id', filter=Q(status='in_progress')),
-            closed_fulfillments=Count('id', filter=Q(status='closed')),
-            cancelled_fulfillments=Count('id', filter=Q(status='cancelled')),
-        )
+        # Count every status pair in one grouped query
+        pair_counts = queryset.values('status', 'request_status').annotate(count=Count('id')).order_by()
+        status_counts = {}
+        request_status_counts = {}
+        for row in pair_counts:
+            status_counts[row['status']] = status_counts.get(row['status'], 0) + row['count']
+            request_status_counts[row['request_status']] = request_status_counts.get(row['request_status'], 0) + row['count']
+        
+        stats = {
+            'total_fulfillments': sum(status_counts.values()),
+            'open_fulfillments': status_counts.get('open', 0),
+            'in_progress_fulfillments': status_counts.get('in_progress', 0),
+            'closed_fulfillments': status_counts.get('closed', 0),
+            'cancelled_fulfillments': status_counts.get('cancelled', 0),
+        }
         
         # Status breakdown
-        status_breakdown = {}
-        for status_choice in ShopifyFulfillmentOrder.STATUS_CHOICES:
-            status = status_choice[0]
-            count = queryset.filter(status=status).count()
-            if count > 0:
-                status_breakdown[status] = count
+        status_breakdown = {
+            status: status_counts[status]
+            for status, _ in ShopifyFulfillmentOrder._meta.get_field('status').choices
+            if status_counts.get(status)
+        }
         
         # Request status breakdown
-        request_status_breakdown = {}
-        for status_choice in ShopifyFulfillmentOrder.REQUEST_STATUS_CHOICES:
-            status = status_choice[0]
-            count = queryset.filter(request_status=status).count()
-            if count > 0:
-                request_status_breakdown[status] = count
+        request_status_breakdown = {
+            status: request_status_counts[status]
+            for status, _ in ShopifyFulfillmentOrder._meta.get_field('request_status').choices
+            if request_status_counts.get(status)
+        }
         
         return Response({
             'success': True,
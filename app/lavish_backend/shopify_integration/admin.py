@@ -6,10 +6,11 @@ from django.http import JsonResponse, HttpResponse
 from django.utils.html import format_html
 from django.contrib.admin.views.decorators import staff_member_required
 from django.utils.decorators import method_decorator
-from django.db import models
+from django.db import models, connections
 from django.template.response import TemplateResponse
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Import sync functions
@@ -208,44 +209,49 @@ class ShopifyIntegrationAdminView(admin.ModelAdmin):
             print("INITIATING FULL SHOPIFY SYNC SEQUENCE")
             print("="*80)
             
-            client = EnhancedShopifyAPIClient()
-            
-            # Progress tracking
-            total_steps = 6
-            current_step = 0
+            # Independent resources run concurrently; every client draws from the
+            # shared GraphQL cost budget so the store's rate limit is respected.
+            # Orders wait for products because line items link to product variants.
+            steps = [
+                ("CUSTOMERS", self._sync_customers_data, None),
+                ("PRODUCTS", self._sync_products_data, None),
+                ("INVENTORY", self._sync_inventory_data, None),
+                ("SHIPPING", self._sync_shipping_data, None),
+                ("PAYMENTS", self._sync_payments_data, None),
+                ("ORDERS", self._sync_orders_data, "PRODUCTS"),
+            ]
+            total_steps = len(steps)
+            completed = []
+            progress_lock = threading.Lock()
             
-            # Step 1: Customers
-            current_step += 1
-            self._show_progress("CUSTOMERS", current_step, total_steps)
-            self._sync_customers_data(client)
-            
-            # Step 2: Products
-            current_step += 1
-            self._show_progress("PRODUCTS", current_step, total_steps)
-            self._sync_products_data(client)
-            
-            # Step 3: Orders
-            current_step += 1
-            self._show_progress("ORDERS", current_step, total_steps)
-            self._sync_orders_data(client)
-            
-            # Step 4: Inventory
-            current_step += 1
-            self._show_progress("INVENTORY", current_step, total_steps)
-            self._sync_inventory_data(client)
+            def run_step(name, sync, after):
+                try:
+                    if after:
+                        futures[after].result()
+                    sync(EnhancedShopifyAPIClient())
+                finally:
+                    connections.close_all()
+                    with progress_lock:
+                        completed.append(name)
+                        self._show_progress(name, len(completed), total_steps)
             
-            # Step 5: Shipping
-            current_step += 1
-            self._show_progress("SHIPPING", current_step, total_steps)
-            self._sync_shipping_data(client)
+            futures = {}
+            with ThreadPoolExecutor(max_workers=total_steps, thread_name_prefix='shopify-sync') as executor:
+                for name, sync, after in steps:
+                    futures[name] = executor.submit(run_step, name, sync, after)
             
-            # Step 6: Payments
-            current_step += 1
-            self._show_progress("PAYMENTS", current_step, total_steps)
-            self._sync_payments_data(client)
+            failures = []
+            for name, future in futures.items():
+                error = future.exception()
+                if error:
+                    failures.append(name)
+                    print(f"\n❌ {name} SYNC ERROR: {error}")
             
             print("\n" + "="*80)
-            print("FULL SYNC SEQUENCE COMPLETED SUCCESSFULLY")
+            if failures:
+                print(f"FULL SYNC SEQUENCE COMPLETED WITH ERRORS: {', '.join(failures)}")
+            else:
+                print("FULL SYNC SEQUENCE COMPLETED SUCCESSFULLY")
             print("="*80)
             
         except Exception as e:
@@ -348,419 +354,49 @@ class ShopifyIntegrationAdminView(admin.ModelAdmin):
     # Data sync implementations
     def _sync_customers_data(self, client):
         """Sync customer data with proper field mapping"""
-        from customers.models import ShopifyCustomer, ShopifyCustomerAddress
-        from django.utils.dateparse import parse_datetime
-        from datetime import datetime
+        from .bulk_upsert import upsert_pages, upsert_customers
         
         print("Fetching customers from Shopify API...")
-        customers_data = client.fetch_all_customers()
-        print(f"Retrieved {len(customers_data)} customers from Shopify")
-        print("Saving to database...")
-        
-        created_count = 0
-        updated_count = 0
-        address_count = 0
-        
-        for customer_data in customers_data:
-            try:
-                # Parse timestamps
-                created_at = parse_datetime(customer_data.get('createdAt')) if customer_data.get('createdAt') else datetime.now()
-                updated_at = parse_datetime(customer_data.get('updatedAt')) if customer_data.get('updatedAt') else datetime.now()
-                
-                # Create or update customer with proper field mapping
-                customer, created = ShopifyCustomer.objects.update_or_create(
-                    shopify_id=customer_data['id'],
-                    defaults={
-                        'email': customer_data.get('email') or '',
-                        'first_name': customer_data.get('firstName') or 'N/A',
-                        'last_name': customer_data.get('lastName') or 'N/A',
-                        'phone': customer_data.get('phone') or '',
-                        'state': customer_data.get('state', 'ENABLED'),
-                        'verified_email': customer_data.get('verifiedEmail', False),
-                        'tax_exempt': customer_data.get('taxExempt', False),
-                        'number_of_orders': customer_data.get('numberOfOrders', 0),
-                        'tags': customer_data.get('tags', []),
-                        'accepts_marketing': customer_data.get('acceptsMarketing', False),
-                        'marketing_opt_in_level': customer_data.get('marketingOptInLevel') or '',
-                        'created_at': created_at,
-                        'updated_at': updated_at,
-                        'store_domain': '7fa66c-ac.myshopify.com'
-                    }
-                )
-                
-                if created:
-                    created_count += 1
-                else:
-                    updated_count += 1
-                
-                # Save addresses with correct field mapping
-                if 'addresses' in customer_data:
-                    for address_data in customer_data['addresses']:
-                        ShopifyCustomerAddress.objects.update_or_create(
-                            customer=customer,
-                            shopify_id=address_data.get('id'),
-                            defaults={
-                                'first_name': address_data.get('firstName') or '',
-                                'last_name': address_data.get('lastName') or '',
-                                'company': address_data.get('company') or '',
-                                'address1': address_data.get('address1') or '',
-                                'address2': address_data.get('address2') or '',
-                                'city': address_data.get('city') or '',
-                                'province': address_data.get('province') or '',
-                                'country': address_data.get('country') or '',
-                                'zip_code': address_data.get('zip') or '',  # zip -> zip_code
-                                'phone': address_data.get('phone') or '',
-                                'is_default': address_data.get('default', False),
-                                'store_domain': '7fa66c-ac.myshopify.com'
-                            }
-                        )
-                        address_count += 1
-                        
-            except Exception as e:
-                print(f"Error syncing customer {customer_data.get('id')}: {e}")
+        totals = upsert_pages(client.iter_customers(), upsert_customers, 'customers')
+        print(f"Retrieved {totals['total'] + totals['errors']} customers from Shopify")
         
         print(f"Successfully synced customers")
-        print(f"Created: {created_count}, Updated: {updated_count}, Addresses: {address_count}")
+        print(f"Created: {totals['created']}, Updated: {totals['updated']}, Addresses: {totals.get('addresses', 0)}")
     
     def _sync_products_data(self, client):
         """Sync product data with proper field mapping"""
-        from products.models import ShopifyProduct, ShopifyProductVariant, ShopifyProductImage
-        from django.utils.dateparse import parse_datetime
-        from datetime import datetime
+        from .bulk_upsert import upsert_pages, upsert_products
         
         print("Fetching products from Shopify API...")
-        products_data = client.fetch_all_products()
-        print(f"Retrieved {len(products_data)} products from Shopify")
-        print("Saving to database...")
-        
-        created_count = 0
-        updated_count = 0
-        variant_count = 0
-        image_count = 0
-        
-        for product_data in products_data:
-            try:
-                # Parse timestamps
-                created_at = parse_datetime(product_data.get('createdAt')) if product_data.get('createdAt') else datetime.now()
-                updated_at = parse_datetime(product_data.get('updatedAt')) if product_data.get('updatedAt') else datetime.now()
-                published_at = parse_datetime(product_data.get('publishedAt')) if product_data.get('publishedAt') else None
-                
-                # Create or update product with proper field mapping
-                product, created = ShopifyProduct.objects.update_or_create(
-                    shopify_id=product_data['id'],
-                    defaults={
-                        'title': product_data.get('title', ''),
-                        'description': product_data.get('description', ''),
-                        'vendor': product_data.get('vendor', ''),
-                        'product_type': product_data.get('productType', ''),
-                        'handle': product_data.get('handle', ''),
-                        'status': product_data.get('status', 'ACTIVE'),
-                        'published_at': published_at,
-                        'created_at': created_at,
-                        'updated_at': updated_at,
-                        'tags': product_data.get('tags', []),
-                        'store_domain': '7fa66c-ac.myshopify.com'
-                    }
-                )
-                
-                if created:
-                    created_count += 1
-                else:
-                    updated_count += 1
-                
-                # Save variants (using edges structure)
-                if 'variants' in product_data:
-                    variants_data = product_data['variants']
-                    # Handle both edges and nodes structure
-                    if 'edges' in variants_data:
-                        variant_list = [edge['node'] for edge in variants_data['edges']]
-                    elif 'nodes' in variants_data:
-                        variant_list = variants_data['nodes']
-                    else:
-                        variant_list = []
-                    
-                    for idx, variant_data in enumerate(variant_list, 1):
-                        variant, v_created = ShopifyProductVariant.objects.update_or_create(
-                            product=product,
-                            shopify_id=variant_data.get('id'),
-                            defaults={
-                                'title': variant_data.get('title', 'Default Title'),
-                                'price': variant_data.get('price', '0.00'),
-                                'sku': variant_data.get('sku') or '',  # Handle None SKUs
-                                'position': idx,
-                                'inventory_policy': variant_data.get('inventoryPolicy', 'DENY'),
-                                'compare_at_price': variant_data.get('compareAtPrice'),
-                                'barcode': variant_data.get('barcode', ''),
-                                'created_at': created_at,
-                                'updated_at': updated_at,
-                                'taxable': variant_data.get('taxable', True),
-                                'weight': float(variant_data.get('weight', 0.0)),
-                                'weight_unit': variant_data.get('weightUnit', 'KILOGRAMS'),
-                                'requires_shipping': variant_data.get('requiresShipping', True),
-                                'store_domain': '7fa66c-ac.myshopify.com'
-                            }
-                        )
-                        variant_count += 1
-                        
-                        # Link inventory item to variant
-                        if 'inventoryItem' in variant_data and variant_data['inventoryItem']:
-                            inventory_item_id = variant_data['inventoryItem'].get('id')
-                            if inventory_item_id:
-                                from inventory.models import ShopifyInventoryItem
-                                try:
-                                    inv_item = ShopifyInventoryItem.objects.get(shopify_id=inventory_item_id)
-                                    inv_item.variant = variant
-                                    inv_item.save(update_fields=['variant'])
-                                except ShopifyInventoryItem.DoesNotExist:
-                                    pass
-                
-                # Save images (using edges structure)
-                if 'images' in product_data:
-                    images_data = product_data['images']
-                    # Handle both edges and nodes structure
-                    if 'edges' in images_data:
-                        image_list = [edge['node'] for edge in images_data['edges']]
-                    elif 'nodes' in images_data:
-                        image_list = images_data['nodes']
-                    else:
-                        image_list = []
-                    
-                    for image_data in image_list:
-                        ShopifyProductImage.objects.update_or_create(
-                            shopify_id=image_data.get('id'),
-                            defaults={
-                                'product': product,
-                                'src': image_data.get('src', ''),
-                                'alt_text': image_data.get('altText', ''),
-                                'width': image_data.get('width', 0),
-                                'height': image_data.get('height', 0),
-                                'created_at': created_at,
-                                'updated_at': updated_at,
-                                'store_domain': '7fa66c-ac.myshopify.com'
-                            }
-                        )
-                        image_count += 1
-                        
-            except Exception as e:
-                print(f"Error syncing product {product_data.get('id')}: {e}")
+        totals = upsert_pages(client.iter_products(), upsert_products, 'products')
+        print(f"Retrieved {totals['total'] + totals['errors']} products from Shopify")
         
         print(f"Successfully synced products")
-        print(f"Created: {created_count}, Updated: {updated_count}")
-        print(f"Variants: {variant_count}, Images: {image_count}")
+        print(f"Created: {totals['created']}, Updated: {totals['updated']}")
+        print(f"Variants: {totals.get('variants', 0)}, Images: {totals.get('images', 0)}")
     
     def _sync_orders_data(self, client):
         """Sync order data with proper field mapping"""
-        from orders.models import ShopifyOrder, ShopifyOrderLineItem, ShopifyOrderAddress
-        from django.utils.dateparse import parse_datetime
-        from datetime import datetime
+        from .bulk_upsert import upsert_pages, upsert_orders
         
         print("Fetching orders from Shopify API...")
-        orders_data = client.fetch_all_orders()
-        print(f"Retrieved {len(orders_data)} orders from Shopify")
-        print("Saving to database...")
-        
-        created_count = 0
-        updated_count = 0
-        line_items_count = 0
-        
-        for order_data in orders_data:
-            try:
-                # Parse timestamps
-                created_at = parse_datetime(order_data.get('createdAt')) if order_data.get('createdAt') else datetime.now()
-                updated_at = parse_datetime(order_data.get('updatedAt')) if order_data.get('updatedAt') else datetime.now()
-                processed_at = parse_datetime(order_data.get('processedAt')) if order_data.get('processedAt') else None
-                cancelled_at = parse_datetime(order_data.get('cancelledAt')) if order_data.get('cancelledAt') else None
-                
-                # Get total price
-                total_price_set = order_data.get('totalPriceSet', {})
-                shop_money = total_price_set.get('shopMoney', {})
-                total_price = float(shop_money.get('amount', 0.0))
-                currency = shop_money.get('currencyCode', 'AUD')
-                
-                # Create or update order
-                order, created = ShopifyOrder.objects.update_or_create(
-                    shopify_id=order_data['id'],
-                    defaults={
-                        'customer_email': order_data.get('email') or '',
-                        'name': order_data.get('name', ''),
-                        'order_number': order_data.get('name', '#0').replace('#', '') if order_data.get('name') else '0',
-                        'financial_status': order_data.get('displayFinancialStatus', 'pending').lower(),
-                        'fulfillment_status': order_data.get('displayFulfillmentStatus', 'null').lower() if order_data.get('displayFulfillmentStatus') else 'null',
-                        'total_price': str(total_price),
-                        'subtotal_price': '0.00',
-                        'total_tax': '0.00',
-                        'total_shipping_price': '0.00',
-                        'currency_code': currency,
-                        'processed_at': processed_at,
-                        'created_at': created_at,
-                        'updated_at': updated_at,
-                        'store_domain': '7fa66c-ac.myshopify.com'
-                    }
-                )
-                
-                if created:
-                    created_count += 1
-                else:
-                    updated_count += 1
-                
-                # Save line items
-                line_items = order_data.get('lineItems', {})
-                if isinstance(line_items, dict) and 'edges' in line_items:
-                    for edge in line_items['edges']:
-                        item_data = edge.get('node', {})
-                        
-                        variant_data = item_data.get('variant', {})
-                        product_data = item_data.get('product', {})
-                        
-                        # Look up actual product and variant objects
-                        from products.models import ShopifyProduct, ShopifyProductVariant
-                        product_obj = None
-                        variant_obj = None
-                        
-                        if product_data and product_data.get('id'):
-                            try:
-                                product_obj = ShopifyProduct.objects.get(shopify_id=product_data['id'])
-                            except ShopifyProduct.DoesNotExist:
-                                pass
-                        
-                        if variant_data and variant_data.get('id'):
-                            try:
-                                variant_obj = ShopifyProductVariant.objects.get(shopify_id=variant_data['id'])
-                            except ShopifyProductVariant.DoesNotExist:
-                                pass
-                        
-                        ShopifyOrderLineItem.objects.update_or_create(
-                            order=order,
-                            shopify_id=item_data.get('id'),
-                            defaults={
-                                'title': item_data.get('title', ''),
-                                'quantity': item_data.get('quantity', 1),
-                                'price': variant_data.get('price', '0.00') if variant_data else '0.00',
-                                'sku': variant_data.get('sku', '') if variant_data else '',
-                                'variant_title': variant_data.get('title', '') if variant_data else '',
-                                'product': product_obj,
-                                'variant': variant_obj,
-                                'store_domain': '7fa66c-ac.myshopify.com'
-                            }
-                        )
-                        line_items_count += 1
-                
-                # Save shipping address
-                shipping_addr = order_data.get('shippingAddress')
-                if shipping_addr:
-                    ShopifyOrderAddress.objects.update_or_create(
-                        order=order,
-                        address_type='shipping',
-                        defaults={
-                            'first_name': shipping_addr.get('firstName', ''),
-                            'last_name': shipping_addr.get('lastName', ''),
-                            'address1': shipping_addr.get('address1', ''),
-                            'address2': shipping_addr.get('address2', ''),
-                            'city': shipping_addr.get('city', ''),
-                            'province': shipping_addr.get('province', ''),
-                            'country': shipping_addr.get('country', ''),
-                            'zip_code': shipping_addr.get('zip', ''),
-                            'phone': shipping_addr.get('phone', ''),
-                            'store_domain': '7fa66c-ac.myshopify.com'
-                        }
-                    )
-                        
-            except Exception as e:
-                print(f"Error syncing order {order_data.get('id')}: {e}")
+        totals = upsert_pages(client.iter_orders(), upsert_orders, 'orders')
+        print(f"Retrieved {totals['total'] + totals['errors']} orders from Shopify")
         
         print(f"Successfully synced orders")
-        print(f"Created: {created_count}, Updated: {updated_count}, Line Items: {line_items_count}")
+        print(f"Created: {totals['created']}, Updated: {totals['updated']}, Line Items: {totals.get('line_items', 0)}")
     
     def _sync_inventory_data(self, client):
         """Sync inventory data with proper field mapping"""
-        from inventory.models import ShopifyInventoryItem, ShopifyInventoryLevel, ShopifyLocation
-        from django.utils.dateparse import parse_datetime
-        from datetime import datetime
+        from .bulk_upsert import upsert_pages, upsert_inventory_items
         
         print("Fetching inventory data from Shopify API...")
-        inventory_data = client.fetch_all_inventory_items()
-        print(f"Retrieved {len(inventory_data)} inventory items from Shopify")
-        print("Saving to database...")
-        
-        created_count = 0
-        updated_count = 0
-        level_count = 0
-        location_count = 0
-        
-        for item_data in inventory_data:
-            try:
-                # Parse timestamps
-                created_at = parse_datetime(item_data.get('createdAt')) if item_data.get('createdAt') else datetime.now()
-                updated_at = parse_datetime(item_data.get('updatedAt')) if item_data.get('updatedAt') else datetime.now()
-                
-                # Create or update inventory item
-                item, created = ShopifyInventoryItem.objects.update_or_create(
-                    shopify_id=item_data['id'],
-                    defaults={
-                        'sku': item_data.get('sku', ''),
-                        'tracked': item_data.get('tracked', False),
-                        'requires_shipping': item_data.get('requiresShipping', True),
-                        'cost': item_data.get('unitCost', {}).get('amount', '0.00') if item_data.get('unitCost') else '0.00',
-                        'created_at': created_at,
-                        'updated_at': updated_at,
-                        'store_domain': '7fa66c-ac.myshopify.com'
-                    }
-                )
-                
-                if created:
-                    created_count += 1
-                else:
-                    updated_count += 1
-                
-                # Process inventory levels and locations
-                if 'inventoryLevels' in item_data and 'edges' in item_data['inventoryLevels']:
-                    for edge in item_data['inventoryLevels']['edges']:
-                        level_data = edge['node']
-                        location_data = level_data.get('location', {})
-                        
-                        if location_data and location_data.get('id'):
-                            # Create or update location
-                            location, loc_created = ShopifyLocation.objects.get_or_create(
-                                shopify_id=location_data['id'],
-                                defaults={
-                                    'name': location_data.get('name', ''),
-                                    'active': True,
-                                    'created_at': datetime.now(),
-                                    'updated_at': datetime.now(),
-                                    'store_domain': '7fa66c-ac.myshopify.com'
-                                }
-                            )
-                            if loc_created:
-                                location_count += 1
-                            
-                            # Create or update inventory level
-                            level_updated_at = parse_datetime(level_data.get('updatedAt')) if level_data.get('updatedAt') else datetime.now()
-                            
-                            # Extract available quantity from quantities array
-                            available = 0
-                            quantities = level_data.get('quantities', [])
-                            for qty in quantities:
-                                if qty.get('name') == 'available':
-                                    available = qty.get('quantity', 0)
-                                    break
-                            
-                            ShopifyInventoryLevel.objects.update_or_create(
-                                inventory_item=item,
-                                location=location,
-                                defaults={
-                                    'available': available,
-                                    'updated_at': level_updated_at,
-                                    'store_domain': '7fa66c-ac.myshopify.com'
-                                }
-                            )
-                            level_count += 1
-                        
-            except Exception as e:
-                print(f"Error syncing inventory item {item_data.get('id')}: {e}")
+        totals = upsert_pages(client.iter_inventory_items(), upsert_inventory_items, 'inventory items')
+        print(f"Retrieved {totals['total'] + totals['errors']} inventory items from Shopify")
         
         print(f"Successfully synced inventory")
-        print(f"Created: {created_count}, Updated: {updated_count}")
-        print(f"Locations: {location_count}, Levels: {level_count}")
+        print(f"Created: {totals['created']}, Updated: {totals['updated']}")
+        print(f"Locations: {totals.get('locations', 0)}, Levels: {totals.get('levels', 0)}")
     
     def _sync_shipping_data(self, client):
         """Sync shipping data with proper field mapping"""
@@ -1279,7 +915,7 @@ class ShopifyIntegrationAdminView(admin.ModelAdmin):
 
 
 # Import models
-from .models import ShopifyStore, WebhookEndpoint, SyncOperation, APIRateLimit
+from .models import ShopifyStore, WebhookEndpoint, SyncOperation, APIRateLimit, SyncWatermark, WebhookDelivery, ShopifyPushJob
 
 # Register existing models
 @admin.register(ShopifyStore)
@@ -1316,6 +952,28 @@ class APIRateLimitAdmin(admin.ModelAdmin):
         return f"{obj.current_calls}/{obj.max_calls} ({obj.usage_percentage:.1f}%)"
     usage_display.short_description = "Usage"
 
+
+@admin.register(SyncWatermark)
+class SyncWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('store_domain', 'resource', 'updated_at_watermark', 'last_incremental_sync', 'last_full_sync')
+    list_filter = ('resource',)
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('topic', 'webhook_id', 'resource_id', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'topic')
+    search_fields = ('webhook_id', 'resource_id')
+    readonly_fields = ('received_at', 'processed_at')
+
+
+@admin.register(ShopifyPushJob)
+class ShopifyPushJobAdmin(admin.ModelAdmin):
+    list_display = ('object_repr', 'target', 'operation', 'status', 'attempts', 'requested_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'operation', 'target')
+    search_fields = ('object_repr', 'object_id', 'error_message')
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+
 # Create a separate model for the sync dashboard
 class ShopifyIntegrationDashboard(models.Model):
     """Dummy model for sync dashboard admin"""
@@ -0,0 +1,364 @@
+"""
+Shopify Bulk Operations import
+
+For very large stores a single ``bulkOperationRunQuery`` replaces thousands of
+paginated GraphQL calls: Shopify runs the query server side and publishes the
+result as a JSONL file. The file is streamed line by line, child lines
+(variants, images, line items, ...) are folded back under their parent, and
+the reassembled nodes are yielded in pages shaped like the paginated API
+responses so they feed the same upsert_* functions.
+"""
+
+import json
+import logging
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .enhanced_client import EnhancedShopifyAPIClient
+
+logger = logging.getLogger('shopify_integration')
+
+DEFAULT_POLL_INTERVAL = 5
+DEFAULT_POLL_TIMEOUT = 6 * 60 * 60
+DEFAULT_PAGE_SIZE = 250
+
+FINISHED_STATUSES = ('COMPLETED', 'FAILED', 'CANCELED', 'EXPIRED')
+
+# Connection a child line belongs under, keyed by the child's GID type. Customer
+# addresses are a list field, not a connection, so they arrive inline on the customer line.
+CHILD_CONNECTIONS = {
+    'ProductVariant': 'variants',
+    'ProductImage': 'images',
+    'LineItem': 'lineItems',
+    'InventoryLevel': 'inventoryLevels',
+}
+
+# Bulk queries omit first/after/pageInfo: Shopify paginates server side
+BULK_QUERIES = {
+    'customers': """
+    {
+        customers {
+            edges {
+                node {
+                    id
+                    firstName
+                    lastName
+                    email
+                    phone
+                    createdAt
+                    updatedAt
+                    numberOfOrders
+                    state
+                    verifiedEmail
+                    taxExempt
+                    tags
+                    addresses {
+                        id
+                        firstName
+                        lastName
+                        address1
+                        address2
+                        city
+                        province
+                        country
+                        zip
+                        phone
+                        name
+                        provinceCode
+                        countryCodeV2
+                    }
+                    defaultAddress {
+                        id
+                    }
+                }
+            }
+        }
+    }
+    """,
+    'products': """
+    {
+        products {
+            edges {
+                node {
+                    id
+                    title
+                    handle
+                    description
+                    vendor
+                    productType
+                    status
+                    createdAt
+                    updatedAt
+                    publishedAt
+                    tags
+                    totalInventory
+                    tracksInventory
+                    seo {
+                        title
+                        description
+                    }
+                    variants {
+                        edges {
+                            node {
+                                id
+                                title
+                                sku
+                                price
+                                compareAtPrice
+                                inventoryQuantity
+                                inventoryItem {
+                                    id
+                                    tracked
+                                }
+                            }
+                        }
+                    }
+                    images {
+                        edges {
+                            node {
+                                id
+                                src
+                                altText
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+    """,
+    'orders': """
+    {
+        orders {
+            edges {
+                node {
+                    id
+                    name
+                    email
+                    createdAt
+                    updatedAt
+                    totalPriceSet {
+                        shopMoney {
+                            amount
+                            currencyCode
+                        }
+                    }
+                    displayFulfillmentStatus
+                    displayFinancialStatus
+                    processedAt
+                    tags
+                    note
+                    customer {
+                        id
+                        firstName
+                        lastName
+                        email
+                    }
+                    shippingAddress {
+                        firstName
+                        lastName
+                        address1
+                        city
+                        province
+                        country
+                        zip
+                    }
+                    lineItems {
+                        edges {
+                            node {
+                                id
+                                title
+                                quantity
+                                variant {
+                                    id
+                                    title
+                                    sku
+                                    price
+                                }
+                                product {
+                                    id
+                                    title
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+    """,
+}
+
+RUN_QUERY_MUTATION = """
+mutation RunBulkQuery($query: String!) {
+    bulkOperationRunQuery(query: $query) {
+        bulkOperation {
+            id
+            status
+        }
+        userErrors {
+            field
+            message
+        }
+    }
+}
+""".strip()
+
+OPERATION_STATUS_QUERY = """
+query BulkOperationStatus($id: ID!) {
+    node(id: $id) {
+        ... on BulkOperation {
+            id
+            status
+            errorCode
+            objectCount
+            url
+            partialDataUrl
+        }
+    }
+}
+""".strip()
+
+
+class BulkOperationError(Exception):
+    """A bulk operation could not be started or did not complete"""
+
+
+def _gid_type(gid: str) -> str:
+    """'gid://shopify/ProductVariant/1' → 'ProductVariant'"""
+    parts = gid.split('/')
+    return parts[3] if len(parts) > 4 else ''
+
+
+def reassemble_jsonl(lines: Iterable[Dict]) -> Iterator[Dict]:
+    """
+    Fold child lines back under their parents and yield one complete top-level node at a time
+
+    Shopify writes every child line after its parent and before the next top-level
+    line, so only the node currently being assembled is held in memory. Children are
+    attached as ``{'edges': [{'node': ...}]}`` connections, matching the paginated API.
+    """
+    current = None
+    index: Dict[str, Dict] = {}
+
+    for line in lines:
+        parent_id = line.pop('__parentId', None)
+
+        if parent_id is None:
+            if current is not None:
+                yield current
+            current = line
+            index = {line['id']: line} if 'id' in line else {}
+            continue
+
+        parent = index.get(parent_id)
+        if parent is None:
+            logger.warning(f"Skipping bulk line {line.get('id')} with unknown parent {parent_id}")
+            continue
+
+        gid_type = _gid_type(line.get('id', ''))
+        connection_name = CHILD_CONNECTIONS.get(gid_type, gid_type[:1].lower() + gid_type[1:] + 's')
+        parent.setdefault(connection_name, {'edges': []})['edges'].append({'node': line})
+        if 'id' in line:
+            index[line['id']] = line
+
+    if current is not None:
+        yield current
+
+
+def _pages(nodes: Iterable[Dict], page_size: int) -> Iterator[List[Dict]]:
+    page = []
+    for node in nodes:
+        page.append(node)
+        if len(page) >= page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+class ShopifyBulkOperationImporter:
+    """
+    Runs a bulk query and streams its JSONL result as pages of reassembled nodes
+
+    Usage:
+        importer = ShopifyBulkOperationImporter()
+        upsert_pages(importer.iter_customers(), upsert_customers, 'customers')
+    """
+
+    def __init__(self, client: Optional[EnhancedShopifyAPIClient] = None,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 poll_timeout: float = DEFAULT_POLL_TIMEOUT):
+        self.client = client or EnhancedShopifyAPIClient()
+        self.poll_interval = poll_interval
+        self.poll_timeout = poll_timeout
+
+    def submit(self, query: str) -> str:
+        """Start a bulk query and return the BulkOperation GID"""
+        response = self.client.execute_graphql_query(RUN_QUERY_MUTATION, {'query': query.strip()})
+
+        if 'errors' in response or 'error' in response:
+            raise BulkOperationError(f"bulkOperationRunQuery failed: {response.get('errors') or response.get('error')}")
+
+        payload = response.get('data', {}).get('bulkOperationRunQuery') or {}
+        if payload.get('userErrors'):
+            raise BulkOperationError(f"bulkOperationRunQuery rejected: {payload['userErrors']}")
+
+        operation = payload.get('bulkOperation') or {}
+        if not operation.get('id'):
+            raise BulkOperationError("bulkOperationRunQuery returned no operation")
+
+        logger.info(f"Started bulk operation {operation['id']}")
+        return operation['id']
+
+    def wait(self, operation_id: str) -> Dict:
+        """Poll until the operation finishes and return its final state"""
+        deadline = time.monotonic() + self.poll_timeout
+
+        while True:
+            response = self.client.execute_graphql_query(OPERATION_STATUS_QUERY, {'id': operation_id})
+            if 'errors' in response or 'error' in response:
+                raise BulkOperationError(f"Polling {operation_id} failed: {response.get('errors') or response.get('error')}")
+
+            operation = response.get('data', {}).get('node') or {}
+            status = operation.get('status')
+            logger.info(f"Bulk operation {operation_id}: {status} ({operation.get('objectCount', 0)} objects)")
+
+            if status == 'COMPLETED':
+                return operation
+            if status in FINISHED_STATUSES:
+                raise BulkOperationError(f"Bulk operation {operation_id} {status.lower()}: {operation.get('errorCode')}")
+            if time.monotonic() >= deadline:
+                raise BulkOperationError(f"Timed out waiting for bulk operation {operation_id}")
+
+            time.sleep(self.poll_interval)
+
+    def iter_lines(self, url: str) -> Iterator[Dict]:
+        """Stream a JSONL result file and yield one decoded line at a time"""
+        with self.client.session.get(url, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            for raw in response.iter_lines():
+                if raw:
+                    yield json.loads(raw)
+
+    def iter_nodes(self, query: str) -> Iterator[Dict]:
+        """Run ``query`` as a bulk operation and yield reassembled top-level nodes"""
+        operation = self.wait(self.submit(query))
+
+        if not operation.get('url'):
+            # Completed with no matching objects
+            return
+        yield from reassemble_jsonl(self.iter_lines(operation['url']))
+
+    def iter_pages(self, resource: str, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[List[Dict]]:
+        """Yield pages of reassembled nodes for one of BULK_QUERIES"""
+        return _pages(self.iter_nodes(BULK_QUERIES[resource]), page_size)
+
+    def iter_customers(self, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[List[Dict]]:
+        return self.iter_pages('customers', page_size)
+
+    def iter_products(self, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[List[Dict]]:
+        return self.iter_pages('products', page_size)
+
+    def iter_orders(self, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[List[Dict]]:
+        return self.iter_pages('orders', page_size)
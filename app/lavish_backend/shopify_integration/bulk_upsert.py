@@ -0,0 +1,639 @@
+"""
+Batched upsert layer for Shopify → Django syncs
+
+Replaces per-record update_or_create loops with a prefetch + bulk write per page:
+existing rows are looked up by their Shopify key in chunks, new rows go through
+bulk_create and existing rows through bulk_update, all inside one transaction.
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.db import sqlite_writer
+
+logger = logging.getLogger('shopify_integration')
+
+DEFAULT_STORE_DOMAIN = '7fa66c-ac.myshopify.com'
+DEFAULT_BATCH_SIZE = 500
+
+class UpsertResult:
+    """Outcome of a bulk upsert: counts plus a key → primary key map"""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.pk_map: Dict = {}
+
+    def __repr__(self):
+        return f"<UpsertResult created={self.created} updated={self.updated}>"
+
+
+def _chunks(items: Sequence, size: int) -> Iterable[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _row_key(row: Dict, key_fields: Tuple[str, ...]):
+    if len(key_fields) == 1:
+        return row.get(key_fields[0])
+    return tuple(row.get(field) for field in key_fields)
+
+
+def _fetch_existing(model, keys: List, key_fields: Tuple[str, ...], batch_size: int) -> Dict:
+    """Return {key: pk} for the keys that already exist, querying in chunks"""
+    existing = {}
+    lead_field = key_fields[0]
+
+    for chunk in _chunks(keys, batch_size):
+        if len(key_fields) == 1:
+            lookup = {f'{lead_field}__in': list(chunk)}
+        else:
+            # Composite keys: narrow on the leading column, match the rest in Python
+            lookup = {f'{lead_field}__in': list({key[0] for key in chunk})}
+
+        for values in model.objects.filter(**lookup).values_list('pk', *key_fields):
+            pk, key_values = values[0], values[1:]
+            key = key_values[0] if len(key_fields) == 1 else tuple(key_values)
+            existing[key] = pk
+
+    return existing
+
+
+def bulk_upsert(model, rows: List[Dict], key_fields: Sequence[str] = ('shopify_id',),
+                batch_size: int = DEFAULT_BATCH_SIZE) -> UpsertResult:
+    """
+    Insert or update ``rows`` of ``model`` in bulk.
+
+    Args:
+        model: Django model class
+        rows: List of dicts mapping field attnames (use ``customer_id`` for FKs) to values.
+              Every row must contain the key fields; duplicate keys keep the last row.
+        key_fields: Field(s) identifying a row, e.g. ('shopify_id',) or ('order_id', 'address_type')
+        batch_size: Rows per SELECT/INSERT/UPDATE statement
+
+    Returns:
+        UpsertResult with created/updated counts and a key → pk map for every row
+    """
+    key_fields = tuple(key_fields)
+    result = UpsertResult()
+
+    # Deduplicate by key; rows without a key cannot be matched and are skipped
+    by_key = {}
+    for row in rows:
+        key = _row_key(row, key_fields)
+        if key is None or (isinstance(key, tuple) and None in key):
+            continue
+        by_key[key] = row
+
+    if not by_key:
+        return result
+
+    # auto_now fields are not stamped by bulk_update, so mirror what save() would do
+    now = timezone.now()
+    auto_now_fields = [
+        f.attname for f in model._meta.concrete_fields
+        if getattr(f, 'auto_now', False)
+    ]
+    for row in by_key.values():
+        for attname in auto_now_fields:
+            row.setdefault(attname, now)
+
+    # bulk_update needs field names rather than attnames for relations
+    attname_to_name = {f.attname: f.name for f in model._meta.concrete_fields}
+
+    existing = _fetch_existing(model, list(by_key.keys()), key_fields, batch_size)
+
+    to_create = []
+    # Rows only overwrite the fields they carry, so group updates by field set
+    to_update: Dict[Tuple[str, ...], List] = {}
+    for key, row in by_key.items():
+        obj = model(**row)
+        if key in existing:
+            obj.pk = existing[key]
+            fields = tuple(sorted(attname_to_name.get(f, f) for f in row if f not in key_fields))
+            to_update.setdefault(fields, []).append(obj)
+        else:
+            to_create.append(obj)
+
+    if to_create:
+        create_kwargs = {'batch_size': batch_size}
+        update_field_names = sorted({
+            attname_to_name.get(f, f) for row in by_key.values() for f in row if f not in key_fields
+        })
+        if (len(key_fields) == 1 and update_field_names
+                and connection.features.supports_update_conflicts_with_target):
+            # Guard against rows inserted by a concurrent sync since the prefetch
+            create_kwargs.update(
+                update_conflicts=True,
+                unique_fields=[attname_to_name.get(key_fields[0], key_fields[0])],
+                update_fields=update_field_names,
+            )
+        model.objects.bulk_create(to_create, **create_kwargs)
+        result.created = len(to_create)
+
+    for fields, objs in to_update.items():
+        if fields:
+            model.objects.bulk_update(objs, list(fields), batch_size=batch_size)
+        result.updated += len(objs)
+
+    # bulk_create does not return primary keys on every backend, so resolve them once
+    result.pk_map = dict(existing)
+    if to_create:
+        created_keys = [_row_key(row, key_fields) for row in by_key.values()
+                        if _row_key(row, key_fields) not in existing]
+        result.pk_map.update(_fetch_existing(model, created_keys, key_fields, batch_size))
+
+    return result
+
+
+def _parse_timestamp(value: Optional[str], default=None):
+    parsed = parse_datetime(value) if value else None
+    return parsed or default
+
+
+def _connection_nodes(data: Optional[Dict]) -> List[Dict]:
+    """Return the node list from a GraphQL connection in edges or nodes form"""
+    if not data:
+        return []
+    if isinstance(data, list):
+        return data
+    if 'edges' in data:
+        return [edge['node'] for edge in data['edges'] if edge.get('node')]
+    return data.get('nodes', [])
+
+
+def upsert_pages(pages: Iterable[List[Dict]], upsert, label: str, **kwargs) -> Dict:
+    """
+    Persist each page from a page iterator as soon as it arrives
+
+    Only one page is held in memory, and pages written before a failure stay written.
+
+    Args:
+        pages: Iterator of node lists, e.g. EnhancedShopifyAPIClient.iter_customers()
+        upsert: One of the upsert_* functions below
+        label: Resource name used in log messages
+        **kwargs: Passed through to ``upsert`` (store_domain, batch_size)
+
+    Returns:
+        Summed per-page stats plus 'total' (records written) and 'pages'; when a
+        whole page failed to save, 'failed_ids' lists its node ids
+    """
+    stats = {'total': 0, 'created': 0, 'updated': 0, 'errors': 0, 'pages': 0}
+
+    for page in pages:
+        stats['pages'] += 1
+        try:
+            # Concurrent resource syncs and inbox fetches take turns on the SQLite writer
+            with sqlite_writer():
+                page_stats = upsert(page, **kwargs)
+        except Exception as e:
+            logger.error(f"Error saving {label} page {stats['pages']}: {e}")
+            stats['errors'] += len(page)
+            stats.setdefault('failed_ids', []).extend(node['id'] for node in page if node.get('id'))
+            continue
+
+        for key, value in page_stats.items():
+            stats[key] = stats.get(key, 0) + value
+        stats['total'] += page_stats['created'] + page_stats['updated']
+        logger.info(f"Saved {label} page {stats['pages']}: {stats['total']} written so far")
+
+    return stats
+
+
+# ==================== RESOURCE UPSERTS ====================
+
+def upsert_customers(customers_data: List[Dict], store_domain: Optional[str] = None,
+                     batch_size: int = DEFAULT_BATCH_SIZE) -> Dict:
+    """
+    Upsert one page of GraphQL customer nodes and their addresses in a single transaction
+
+    Returns:
+        Dict with created, updated, addresses and errors counts
+    """
+    from customers.models import ShopifyCustomer, ShopifyCustomerAddress
+
+    store_domain = store_domain or DEFAULT_STORE_DOMAIN
+    stats = {'created': 0, 'updated': 0, 'addresses': 0, 'errors': 0}
+    now = timezone.now()
+    customer_rows = []
+    address_rows_by_customer = {}
+
+    for customer_data in customers_data:
+        try:
+            row = {
+                'shopify_id': customer_data['id'],
+                'email': customer_data.get('email') or '',
+                'first_name': customer_data.get('firstName') or 'N/A',
+                'last_name': customer_data.get('lastName') or 'N/A',
+                'phone': customer_data.get('phone') or '',
+                'state': customer_data.get('state', 'ENABLED'),
+                'verified_email': customer_data.get('verifiedEmail', False),
+                'tax_exempt': customer_data.get('taxExempt', False),
+                'number_of_orders': customer_data.get('numberOfOrders', 0),
+                'tags': customer_data.get('tags', []),
+                'created_at': _parse_timestamp(customer_data.get('createdAt'), now),
+                'updated_at': _parse_timestamp(customer_data.get('updatedAt'), now),
+                'store_domain': store_domain,
+            }
+            # Fields the query did not select are left out so the stored values survive
+            if 'acceptsMarketing' in customer_data:
+                row['accepts_marketing'] = customer_data['acceptsMarketing'] or False
+            if 'marketingOptInLevel' in customer_data:
+                row['marketing_opt_in_level'] = customer_data['marketingOptInLevel'] or ''
+
+            default_id = (customer_data.get('defaultAddress') or {}).get('id')
+            address_rows = []
+            for address_data in customer_data.get('addresses') or []:
+                address_row = {
+                    'shopify_id': address_data.get('id'),
+                    'first_name': address_data.get('firstName') or '',
+                    'last_name': address_data.get('lastName') or '',
+                    'address1': address_data.get('address1') or '',
+                    'address2': address_data.get('address2') or '',
+                    'city': address_data.get('city') or '',
+                    'province': address_data.get('province') or '',
+                    'country': address_data.get('country') or '',
+                    'zip_code': address_data.get('zip') or '',
+                    'phone': address_data.get('phone') or '',
+                    'province_code': address_data.get('provinceCode') or '',
+                    'country_code': address_data.get('countryCodeV2') or '',
+                    'store_domain': store_domain,
+                }
+                if 'company' in address_data:
+                    address_row['company'] = address_data['company'] or ''
+                if 'defaultAddress' in customer_data:
+                    address_row['is_default'] = default_id is not None and address_data.get('id') == default_id
+                address_rows.append(address_row)
+
+            customer_rows.append(row)
+            address_rows_by_customer[customer_data['id']] = address_rows
+        except Exception as e:
+            logger.error(f"Error preparing customer {customer_data.get('id')}: {e}")
+            stats['errors'] += 1
+
+    with transaction.atomic():
+        customers = bulk_upsert(ShopifyCustomer, customer_rows, batch_size=batch_size)
+
+        address_rows = []
+        for customer_shopify_id, rows in address_rows_by_customer.items():
+            for row in rows:
+                row['customer_id'] = customers.pk_map[customer_shopify_id]
+                address_rows.append(row)
+        addresses = bulk_upsert(ShopifyCustomerAddress, address_rows, batch_size=batch_size)
+
+    stats['created'] = customers.created
+    stats['updated'] = customers.updated
+    stats['addresses'] = addresses.created + addresses.updated
+    return stats
+
+
+def upsert_products(products_data: List[Dict], store_domain: Optional[str] = None,
+                    batch_size: int = DEFAULT_BATCH_SIZE) -> Dict:
+    """
+    Upsert one page of GraphQL product nodes with their variants and images
+
+    Variants are also linked to already-synced inventory items in the same pass.
+
+    Returns:
+        Dict with created, updated, variants, images and errors counts
+    """
+    from products.models import ShopifyProduct, ShopifyProductVariant, ShopifyProductImage
+    from inventory.models import ShopifyInventoryItem
+
+    store_domain = store_domain or DEFAULT_STORE_DOMAIN
+    stats = {'created': 0, 'updated': 0, 'variants': 0, 'images': 0, 'errors': 0}
+    now = timezone.now()
+    product_rows = []
+    children = {}
+
+    for product_data in products_data:
+        try:
+            created_at = _parse_timestamp(product_data.get('createdAt'), now)
+            updated_at = _parse_timestamp(product_data.get('updatedAt'), now)
+            seo = product_data.get('seo') or {}
+
+            product_rows.append({
+                'shopify_id': product_data['id'],
+                'title': product_data.get('title', ''),
+                'description': product_data.get('description', ''),
+                'vendor': product_data.get('vendor', ''),
+                'product_type': product_data.get('productType', ''),
+                'handle': product_data.get('handle', ''),
+                'status': product_data.get('status', 'ACTIVE'),
+                'published_at': _parse_timestamp(product_data.get('publishedAt')),
+                'created_at': created_at,
+                'updated_at': updated_at,
+                'tags': product_data.get('tags', []),
+                'seo_title': seo.get('title') or '',
+                'seo_description': seo.get('description') or '',
+                'store_domain': store_domain,
+            })
+
+            variant_rows = []
+            inventory_links = {}
+            for position, variant_data in enumerate(_connection_nodes(product_data.get('variants')), 1):
+                variant_rows.append({
+                    'shopify_id': variant_data.get('id'),
+                    'title': variant_data.get('title', 'Default Title'),
+                    'price': variant_data.get('price', '0.00'),
+                    'sku': variant_data.get('sku') or '',
+                    'position': position,
+                    'inventory_policy': variant_data.get('inventoryPolicy', 'DENY'),
+                    'inventory_quantity': variant_data.get('inventoryQuantity') or 0,
+                    'compare_at_price': variant_data.get('compareAtPrice'),
+                    'barcode': variant_data.get('barcode') or '',
+                    'created_at': created_at,
+                    'updated_at': updated_at,
+                    'taxable': variant_data.get('taxable', True),
+                    'weight': float(variant_data.get('weight', 0.0)),
+                    'weight_unit': variant_data.get('weightUnit', 'KILOGRAMS'),
+                    'requires_shipping': variant_data.get('requiresShipping', True),
+                    'store_domain': store_domain,
+                })
+                inventory_item_id = (variant_data.get('inventoryItem') or {}).get('id')
+                if inventory_item_id and variant_data.get('id'):
+                    inventory_links[inventory_item_id] = variant_data['id']
+
+            image_rows = [
+                {
+                    'shopify_id': image_data.get('id'),
+                    'src': image_data.get('src', ''),
+                    'alt_text': image_data.get('altText') or '',
+                    'width': image_data.get('width', 0),
+                    'height': image_data.get('height', 0),
+                    'created_at': created_at,
+                    'updated_at': updated_at,
+                    'store_domain': store_domain,
+                }
+                for image_data in _connection_nodes(product_data.get('images'))
+            ]
+
+            children[product_data['id']] = (variant_rows, image_rows, inventory_links)
+        except Exception as e:
+            logger.error(f"Error preparing product {product_data.get('id')}: {e}")
+            stats['errors'] += 1
+
+    with transaction.atomic():
+        products = bulk_upsert(ShopifyProduct, product_rows, batch_size=batch_size)
+
+        variant_rows = []
+        image_rows = []
+        inventory_links = {}
+        for product_shopify_id, (variants, images, links) in children.items():
+            product_pk = products.pk_map[product_shopify_id]
+            for row in variants:
+                row['product_id'] = product_pk
+                variant_rows.append(row)
+            for row in images:
+                row['product_id'] = product_pk
+                image_rows.append(row)
+            inventory_links.update(links)
+
+        variants = bulk_upsert(ShopifyProductVariant, variant_rows, batch_size=batch_size)
+        images = bulk_upsert(ShopifyProductImage, image_rows, batch_size=batch_size)
+
+        # Link inventory items to their variants in one UPDATE batch
+        if inventory_links:
+            items = list(ShopifyInventoryItem.objects.filter(shopify_id__in=list(inventory_links)))
+            for item in items:
+                item.variant_id = variants.pk_map.get(inventory_links[item.shopify_id])
+            ShopifyInventoryItem.objects.bulk_update(
+                [item for item in items if item.variant_id], ['variant'], batch_size=batch_size
+            )
+
+    stats['created'] = products.created
+    stats['updated'] = products.updated
+    stats['variants'] = variants.created + variants.updated
+    stats['images'] = images.created + images.updated
+
+    # Bulk writes send no signals; retire the storefront responses built from the old rows
+    from api.response_cache import CATALOG, bump_version
+    bump_version(CATALOG)
+    return stats
+
+
+def upsert_orders(orders_data: List[Dict], store_domain: Optional[str] = None,
+                  batch_size: int = DEFAULT_BATCH_SIZE) -> Dict:
+    """
+    Upsert one page of GraphQL order nodes with line items and shipping addresses
+
+    Product and variant references are resolved with one query per page instead of
+    one lookup per line item.
+
+    Returns:
+        Dict with created, updated, line_items and errors counts
+    """
+    from orders.models import ShopifyOrder, ShopifyOrderLineItem, ShopifyOrderAddress
+    from orders.rollups import collect_order_rollups
+    from products.models import ShopifyProduct, ShopifyProductVariant
+
+    store_domain = store_domain or DEFAULT_STORE_DOMAIN
+    stats = {'created': 0, 'updated': 0, 'line_items': 0, 'errors': 0}
+    now = timezone.now()
+    order_rows = []
+    children = {}
+    product_ids = set()
+    variant_ids = set()
+
+    for order_data in orders_data:
+        try:
+            shop_money = (order_data.get('totalPriceSet') or {}).get('shopMoney') or {}
+            total_price = float(shop_money.get('amount', 0.0))
+
+            order_rows.append({
+                'shopify_id': order_data['id'],
+                'customer_email': order_data.get('email') or '',
+                'name': order_data.get('name', ''),
+                'order_number': order_data.get('name', '#0').replace('#', '') if order_data.get('name') else '0',
+                'financial_status': order_data.get('displayFinancialStatus', 'pending').lower(),
+                'fulfillment_status': order_data.get('displayFulfillmentStatus', 'null').lower() if order_data.get('displayFulfillmentStatus') else 'null',
+                'total_price': str(total_price),
+                'subtotal_price': '0.00',
+                'total_tax': '0.00',
+                'total_shipping_price': '0.00',
+                'currency_code': shop_money.get('currencyCode', 'AUD'),
+                'processed_at': _parse_timestamp(order_data.get('processedAt')),
+                'created_at': _parse_timestamp(order_data.get('createdAt'), now),
+                'updated_at': _parse_timestamp(order_data.get('updatedAt'), now),
+                'store_domain': store_domain,
+            })
+
+            line_item_rows = []
+            for item_data in _connection_nodes(order_data.get('lineItems')):
+                variant_data = item_data.get('variant') or {}
+                product_data = item_data.get('product') or {}
+                if product_data.get('id'):
+                    product_ids.add(product_data['id'])
+                if variant_data.get('id'):
+                    variant_ids.add(variant_data['id'])
+                line_item_rows.append(({
+                    'shopify_id': item_data.get('id'),
+                    'title': item_data.get('title', ''),
+                    'quantity': item_data.get('quantity', 1),
+                    'price': variant_data.get('price', '0.00') if variant_data else '0.00',
+                    'sku': variant_data.get('sku', '') if variant_data else '',
+                    'variant_title': variant_data.get('title', '') if variant_data else '',
+                    'store_domain': store_domain,
+                }, product_data.get('id'), variant_data.get('id')))
+
+            address_row = None
+            shipping_addr = order_data.get('shippingAddress')
+            if shipping_addr:
+                address_row = {
+                    'address_type': 'shipping',
+                    'first_name': shipping_addr.get('firstName', ''),
+                    'last_name': shipping_addr.get('lastName', ''),
+                    'address1': shipping_addr.get('address1', ''),
+                    'address2': shipping_addr.get('address2', ''),
+                    'city': shipping_addr.get('city', ''),
+                    'province': shipping_addr.get('province', ''),
+                    'country': shipping_addr.get('country', ''),
+                    'zip_code': shipping_addr.get('zip', ''),
+                    'phone': shipping_addr.get('phone', ''),
+                    'store_domain': store_domain,
+                }
+
+            children[order_data['id']] = (line_item_rows, address_row)
+        except Exception as e:
+            logger.error(f"Error preparing order {order_data.get('id')}: {e}")
+            stats['errors'] += 1
+
+    # bulk_create/bulk_update send no signals, so refresh the daily rollups of the page's orders here
+    page_orders = ShopifyOrder.objects.filter(shopify_id__in=[row['shopify_id'] for row in order_rows])
+    with transaction.atomic(), collect_order_rollups(page_orders):
+        orders = bulk_upsert(ShopifyOrder, order_rows, batch_size=batch_size)
+
+        product_pks = dict(ShopifyProduct.objects.filter(
+            shopify_id__in=list(product_ids)).values_list('shopify_id', 'pk')) if product_ids else {}
+        variant_pks = dict(ShopifyProductVariant.objects.filter(
+            shopify_id__in=list(variant_ids)).values_list('shopify_id', 'pk')) if variant_ids else {}
+
+        line_item_rows = []
+        address_rows = []
+        for order_shopify_id, (line_items, address_row) in children.items():
+            order_pk = orders.pk_map[order_shopify_id]
+            for row, product_shopify_id, variant_shopify_id in line_items:
+                row['order_id'] = order_pk
+                row['product_id'] = product_pks.get(product_shopify_id)
+                row['variant_id'] = variant_pks.get(variant_shopify_id)
+                line_item_rows.append(row)
+            if address_row:
+                address_row['order_id'] = order_pk
+                address_rows.append(address_row)
+
+        line_items = bulk_upsert(ShopifyOrderLineItem, line_item_rows, batch_size=batch_size)
+        bulk_upsert(ShopifyOrderAddress, address_rows, key_fields=('order_id', 'address_type'),
+                    batch_size=batch_size)
+
+    stats['created'] = orders.created
+    stats['updated'] = orders.updated
+    stats['line_items'] = line_items.created + line_items.updated
+    return stats
+
+
+def upsert_inventory_items(items_data: List[Dict], store_domain: Optional[str] = None,
+                           batch_size: int = DEFAULT_BATCH_SIZE) -> Dict:
+    """
+    Upsert one page of GraphQL inventory item nodes with their locations and levels
+
+    Locations are only created when missing; existing locations keep their details.
+
+    Returns:
+        Dict with created, updated, levels, locations and errors counts
+    """
+    from inventory.models import ShopifyInventoryItem, ShopifyInventoryLevel, ShopifyLocation
+    from products.models import ShopifyProductVariant
+
+    store_domain = store_domain or DEFAULT_STORE_DOMAIN
+    stats = {'created': 0, 'updated': 0, 'levels': 0, 'locations': 0, 'errors': 0}
+    now = timezone.now()
+    item_rows = []
+    level_rows = []
+    location_rows = {}
+    variant_links = {}
+
+    for item_data in items_data:
+        try:
+            unit_cost = item_data.get('unitCost')
+            item_rows.append({
+                'shopify_id': item_data['id'],
+                'sku': item_data.get('sku', ''),
+                'tracked': item_data.get('tracked', False),
+                'requires_shipping': item_data.get('requiresShipping', True),
+                'cost': unit_cost.get('amount', '0.00') if unit_cost else '0.00',
+                'created_at': _parse_timestamp(item_data.get('createdAt'), now),
+                'updated_at': _parse_timestamp(item_data.get('updatedAt'), now),
+                'store_domain': store_domain,
+            })
+            variant_id = (item_data.get('variant') or {}).get('id')
+            if variant_id:
+                variant_links[item_data['id']] = variant_id
+
+            for level_data in _connection_nodes(item_data.get('inventoryLevels')):
+                location_data = level_data.get('location') or {}
+                if not location_data.get('id'):
+                    continue
+
+                location_rows.setdefault(location_data['id'], {
+                    'shopify_id': location_data['id'],
+                    'name': location_data.get('name', ''),
+                    'active': True,
+                    'store_domain': store_domain,
+                })
+
+                available = 0
+                for quantity in level_data.get('quantities', []):
+                    if quantity.get('name') == 'available':
+                        available = quantity.get('quantity', 0)
+                        break
+
+                level_rows.append((item_data['id'], location_data['id'], {
+                    'available': available,
+                    'updated_at': _parse_timestamp(level_data.get('updatedAt'), now),
+                    'store_domain': store_domain,
+                }))
+        except Exception as e:
+            logger.error(f"Error preparing inventory item {item_data.get('id')}: {e}")
+            stats['errors'] += 1
+
+    with transaction.atomic():
+        # Link variants synced earlier, so products and inventory can sync in either order
+        if variant_links:
+            variant_pks = dict(ShopifyProductVariant.objects.filter(
+                shopify_id__in=list(set(variant_links.values()))).values_list('shopify_id', 'pk'))
+            for row in item_rows:
+                variant_pk = variant_pks.get(variant_links.get(row['shopify_id']))
+                if variant_pk:
+                    row['variant_id'] = variant_pk
+
+        items = bulk_upsert(ShopifyInventoryItem, item_rows, batch_size=batch_size)
+
+        location_pks = _fetch_existing(ShopifyLocation, list(location_rows), ('shopify_id',), batch_size)
+        missing = [row for key, row in location_rows.items() if key not in location_pks]
+        if missing:
+            locations = bulk_upsert(ShopifyLocation, missing, batch_size=batch_size)
+            location_pks.update(locations.pk_map)
+            stats['locations'] = locations.created
+
+        rows = []
+        for item_shopify_id, location_shopify_id, row in level_rows:
+            if item_shopify_id not in items.pk_map:
+                continue
+            row['inventory_item_id'] = items.pk_map[item_shopify_id]
+            row['location_id'] = location_pks[location_shopify_id]
+            rows.append(row)
+        levels = bulk_upsert(ShopifyInventoryLevel, rows, key_fields=('inventory_item_id', 'location_id'),
+                             batch_size=batch_size)
+
+    stats['created'] = items.created
+    stats['updated'] = items.updated
+    stats['levels'] = levels.created + levels.updated
+
+    # Bulk writes send no signals; retire the storefront responses built from the old rows
+    from api.response_cache import CATALOG, bump_version
+    bump_version(CATALOG)
+    return stats
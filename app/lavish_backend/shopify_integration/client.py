@@ -1,11 +1,14 @@
 import requests
 import json
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List, Optional, Any
 from django.conf import settings
-from django.utils import timezone
-from .models import ShopifyStore, APIRateLimit, SyncOperation
+from .models import SyncOperation
+from .http_pool import get_session
+from .throttle import (
+    graphql_budget, rest_budget, is_throttled, query_key, settle_graphql, observe_rest_call_limit,
+)
 import logging
 
 logger = logging.getLogger('shopify_integration')
@@ -26,9 +29,13 @@ class ShopifyAPIClient:
         self.graphql_endpoint = f"https://{self.store_domain}/admin/api/{self.api_version}/graphql.json"
         self.rest_endpoint = f"https://{self.store_domain}/admin/api/{self.api_version}"
         
-        # Rate limiting
+        # Rate limiting: buckets are shared with every other client for this store
         self.max_retries = 3
         self.retry_delay = 1  # seconds
+        self.cost_budget = graphql_budget(self.store_domain)
+        self.rest_budget = rest_budget(self.store_domain)
+        # Keep-alive connection pool shared by every Shopify client in this process
+        self.session = get_session('shopify')
         
         logger.info(f"Initialized Shopify API client for {self.store_domain}")
     
@@ -40,37 +47,15 @@ class ShopifyAPIClient:
         }
     
     def _handle_rate_limit(self, response):
-        """Handle rate limiting based on response headers"""
-        if 'X-Shopify-Shop-Api-Call-Limit' in response.headers:
-            call_limit = response.headers['X-Shopify-Shop-Api-Call-Limit']
-            current_calls, max_calls = map(int, call_limit.split('/'))
-            
-            # Update rate limit tracking
-            try:
-                store = ShopifyStore.objects.get(store_domain=self.store_domain)
-                rate_limit, created = APIRateLimit.objects.get_or_create(
-                    store=store,
-                    api_type='rest',
-                    defaults={
-                        'window_start': timezone.now(),
-                        'window_end': timezone.now() + timedelta(seconds=1),
-                    }
-                )
-                rate_limit.current_calls = current_calls
-                rate_limit.max_calls = max_calls
-                rate_limit.is_throttled = current_calls >= max_calls * 0.8  # 80% threshold
-                rate_limit.save()
-                
-                # If approaching limit, add delay
-                if current_calls >= max_calls * 0.8:
-                    time.sleep(0.5)
-                    
-            except ShopifyStore.DoesNotExist:
-                logger.warning(f"Store {self.store_domain} not found in database")
+        """Sync the shared REST bucket from the call-limit header; snapshots are persisted periodically"""
+        observe_rest_call_limit(
+            self.store_domain, self.rest_budget,
+            response.headers.get('X-Shopify-Shop-Api-Call-Limit')
+        )
     
     def execute_graphql_query(self, query: str, variables: Optional[Dict] = None) -> Dict:
         """Execute GraphQL query with enhanced error handling and rate limiting"""
-        # Rate limiting is handled after the request via _handle_rate_limit()
+        # Each request draws its expected cost from the store's shared GraphQL budget
         
         headers = {
             'Content-Type': 'application/json',
@@ -82,22 +67,37 @@ class ShopifyAPIClient:
         if variables:
             payload['variables'] = variables
         
-        try:
-            response = requests.post(
-                self.graphql_endpoint,
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
+        key = query_key(query)
+        
+        for attempt in range(self.max_retries + 1):
+            reserved = self.cost_budget.reserve(key)
             
-            # Update rate limit info
-            self._handle_rate_limit(response)
+            try:
+                response = self.session.post(
+                    self.graphql_endpoint,
+                    headers=headers,
+                    json=payload,
+                    timeout=30
+                )
+            except requests.exceptions.RequestException as e:
+                self.cost_budget.settle(key, reserved, None)
+                logger.error(f"GraphQL request failed: {e}")
+                if hasattr(e, 'response') and e.response is not None:
+                    logger.error(f"Response status: {e.response.status_code}")
+                    logger.error(f"Response body: {e.response.text}")
+                raise
             
             if response.status_code != 200:
+                self.cost_budget.settle(key, reserved, None)
                 logger.error(f"GraphQL request failed: {response.status_code} - {response.text}")
                 return {"error": f"HTTP {response.status_code}: {response.text}"}
             
             result = response.json()
+            settle_graphql(self.store_domain, self.cost_budget, key, reserved, result)
+            
+            if is_throttled(result) and attempt < self.max_retries:
+                logger.warning(f"GraphQL query throttled, retrying (attempt {attempt + 1})")
+                continue
             
             # Check for GraphQL errors
             if 'errors' in result:
@@ -105,13 +105,6 @@ class ShopifyAPIClient:
                 return result
             
             return result
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"GraphQL request failed: {e}")
-            if hasattr(e, 'response') and e.response is not None:
-                logger.error(f"Response status: {e.response.status_code}")
-                logger.error(f"Response body: {e.response.text}")
-            raise
         
         return {'error': 'Max retries exceeded'}
     
@@ -123,7 +116,8 @@ class ShopifyAPIClient:
             try:
                 logger.debug(f"REST {method} attempt {attempt + 1}: {url}")
                 
-                response = requests.request(
+                self.rest_budget.acquire(1)
+                response = self.session.request(
                     method,
                     url,
                     headers=self._get_headers(),
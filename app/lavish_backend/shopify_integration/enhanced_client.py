@@ -6,14 +6,51 @@ Supports real-time data synchronization with pagination and comprehensive error
 import requests
 import json
 import time
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterator, List, Optional, Set, Any
 from django.conf import settings
+from django.db import connections
 from django.utils import timezone
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .http_pool import get_session
+from .throttle import graphql_budget, is_throttled, query_key, settle_graphql
 
 logger = logging.getLogger('shopify_integration')
 
+# Most quantities Shopify accepts in one inventorySetQuantities call
+INVENTORY_SET_QUANTITIES_LIMIT = 250
+
+INVENTORY_SET_QUANTITIES_MUTATION = """
+mutation inventorySetQuantities($input: InventorySetQuantitiesInput!) {
+  inventorySetQuantities(input: $input) {
+    inventoryAdjustmentGroup {
+      id
+      reason
+      changes {
+        name
+        delta
+      }
+    }
+    userErrors {
+      field
+      message
+    }
+  }
+}
+"""
+
+ACCESS_SCOPES_QUERY = """
+query AccessScopes {
+  currentAppInstallation {
+    accessScopes {
+      handle
+    }
+  }
+}
+"""
+
 
 class EnhancedShopifyAPIClient:
     """
@@ -21,12 +58,20 @@ class EnhancedShopifyAPIClient:
     Supports real-time data synchronization with pagination and error handling
     """
     
-    def __init__(self, shop_domain: str = None, access_token: str = None, api_version: str = None):
+    def __init__(self, shop_domain: str = None, access_token: str = None, api_version: str = None,
+                 cost_budget=None, session=None):
         self.shop_domain = shop_domain or settings.SHOPIFY_STORE_URL
         self.access_token = access_token or settings.SHOPIFY_ACCESS_TOKEN
         self.api_version = api_version or settings.SHOPIFY_API_VERSION
         self.base_url = f"https://{self.shop_domain}/admin/api/{self.api_version}"
         self.graphql_endpoint = f"{self.base_url}/graphql.json"
+        # Query-cost bucket shared with every other client for this store
+        self.cost_budget = cost_budget or graphql_budget(self.shop_domain)
+        self.max_throttle_retries = 3
+        # Keep-alive connection pool shared by every Shopify client in this process
+        self.session = session or get_session('shopify')
+        self._primary_location_id = None
+        self._access_scopes = None
         
     def get_headers(self) -> Dict[str, str]:
         """Get headers for Admin API requests"""
@@ -41,39 +86,173 @@ class EnhancedShopifyAPIClient:
         payload = {"query": query}
         if variables:
             payload["variables"] = variables
+        
+        key = query_key(query)
+        
+        for attempt in range(self.max_throttle_retries + 1):
+            reserved = self.cost_budget.reserve(key)
             
-        try:
-            response = requests.post(
-                self.graphql_endpoint,
-                headers=self.get_headers(),
-                json=payload,
-                timeout=30
-            )
+            try:
+                response = self.session.post(
+                    self.graphql_endpoint,
+                    headers=self.get_headers(),
+                    json=payload,
+                    timeout=30
+                )
+            except requests.exceptions.RequestException as e:
+                self.cost_budget.settle(key, reserved, None)
+                logger.error(f"GraphQL request failed: {e}")
+                if hasattr(e, 'response') and e.response is not None:
+                    logger.error(f"Response status: {e.response.status_code}")
+                    logger.error(f"Response body: {e.response.text}")
+                raise
             
             if response.status_code != 200:
+                self.cost_budget.settle(key, reserved, None)
                 logger.error(f"GraphQL request failed: {response.status_code} - {response.text}")
                 return {"error": f"HTTP {response.status_code}: {response.text}"}
             
             result = response.json()
+            settle_graphql(self.shop_domain, self.cost_budget, key, reserved, result)
+            
+            if is_throttled(result) and attempt < self.max_throttle_retries:
+                # The bucket now reflects Shopify's level, so the next reserve waits just long enough
+                logger.warning(f"GraphQL query throttled, retrying (attempt {attempt + 1})")
+                continue
             
             if 'errors' in result:
                 logger.error(f"GraphQL errors: {result['errors']}")
-                return result
             
             return result
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"GraphQL request failed: {e}")
-            if hasattr(e, 'response') and e.response is not None:
-                logger.error(f"Response status: {e.response.status_code}")
-                logger.error(f"Response body: {e.response.text}")
-            raise
+
+    # ==================== PAGINATION ====================
+    
+    def _fetch_page(self, build_query, connection_name: str, first: int, cursor: Optional[str]):
+        """
+        Request one page of a connection and return (nodes, pageInfo)
+
+        Raises ValueError for HTTP failures, GraphQL errors and responses without the
+        connection, so a failed page is never mistaken for the end of the listing.
+        """
+        response = self.execute_graphql_query(build_query(first, cursor))
+
+        if "error" in response:
+            raise ValueError(f"Request failed: {response['error']}")
+        if "errors" in response:
+            raise ValueError(f"GraphQL errors: {response['errors']}")
+
+        connection = (response.get("data") or {}).get(connection_name)
+        if connection is None or "pageInfo" not in connection:
+            raise ValueError(f"Response has no {connection_name} connection")
+        if "nodes" in connection:
+            nodes = connection["nodes"]
+        else:
+            nodes = [edge["node"] for edge in connection.get("edges", [])]
+
+        page_info = connection["pageInfo"]
+        if page_info.get("hasNextPage") and not page_info.get("endCursor"):
+            raise ValueError(f"{connection_name} page reports more pages but no cursor")
+        return nodes, page_info
+    
+    def _iter_pages(self, build_query, connection_name: str, label: str,
+                    limit: Optional[int] = None, page_size: int = 50,
+                    prefetch: bool = True, raise_errors: bool = False) -> Iterator[List[Dict]]:
+        """
+        Yield each page of nodes from a paginated GraphQL connection as soon as it arrives
+        
+        With ``prefetch`` the request for page N+1 is issued on a worker thread before
+        page N is handed to the caller, so parsing and persisting a page overlaps with
+        the network round trip for the next one.
+        
+        Args:
+            build_query: Callable(first, after) returning the GraphQL query string
+            connection_name: Top-level connection in the response data (e.g. 'customers')
+            label: Resource name used in log messages
+            limit: Stop after this many nodes
+            page_size: Nodes requested per page
+            prefetch: Fetch the next page in the background while the caller works
+            raise_errors: Re-raise fetch errors instead of ending iteration quietly, for
+                callers that must know whether every page was seen
+        """
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"shopify-{connection_name}") if prefetch else None
+        
+        def prefetch_page(first, cursor):
+            try:
+                return self._fetch_page(build_query, connection_name, first, cursor)
+            finally:
+                # Settling the query cost may record a rate limit snapshot from this thread
+                connections.close_all()
+        
+        def request(first, cursor):
+            """Return a callable producing (nodes, pageInfo); with prefetch the call is already in flight"""
+            if executor:
+                return executor.submit(prefetch_page, first, cursor).result
+            return lambda: self._fetch_page(build_query, connection_name, first, cursor)
+        
+        page_count = 1
+        retrieved = 0
+        
+        logger.info(f"Starting {label} retrieval...")
+        logger.info(f"Fetching {label} page {page_count}...")
+        pending = request(min(page_size, limit) if limit else page_size, None)
+        
+        try:
+            while pending is not None:
+                try:
+                    nodes, page_info = pending()
+                except Exception as e:
+                    logger.error(f"Error fetching {label} page {page_count}: {e}")
+                    if raise_errors:
+                        raise
+                    return
+                
+                if limit:
+                    nodes = nodes[:limit - retrieved]
+                retrieved += len(nodes)
+                logger.info(f"Retrieved {len(nodes)} {label} from page {page_count}")
+                
+                # Issue the next request before handing this page to the caller
+                pending = None
+                cursor = page_info.get("endCursor")
+                if limit and retrieved >= limit:
+                    logger.info(f"Reached specified limit of {limit} {label}")
+                elif not page_info.get("hasNextPage", False) or not cursor:
+                    logger.info(f"Reached end of {label}")
+                else:
+                    page_count += 1
+                    logger.info(f"Fetching {label} page {page_count}...")
+                    pending = request(min(page_size, limit - retrieved) if limit else page_size, cursor)
+                
+                if nodes:
+                    yield nodes
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+    
+    @staticmethod
+    def _updated_since_search(updated_since: Optional[datetime]) -> Optional[str]:
+        """Shopify search syntax selecting records updated at or after a time"""
+        if not updated_since:
+            return None
+        return f"updated_at:>='{updated_since.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}'"
+    
+    @staticmethod
+    def _search_clause(search: Optional[str]) -> str:
+        return f', query: {json.dumps(search)}' if search else ""
+    
+    def _fetch_all(self, pages: Iterator[List[Dict]], label: str) -> List[Dict]:
+        """Collect every page from an iterator into one list"""
+        all_nodes = [node for page in pages for node in page]
+        logger.info(f"Total {label} retrieved: {len(all_nodes)}")
+        return all_nodes
 
     # ==================== CUSTOMER QUERIES ====================
     
-    def create_customers_query(self, first: int = 50, after: Optional[str] = None) -> str:
-        """Create GraphQL query to fetch customers with pagination"""
+    def create_customers_query(self, first: int = 50, after: Optional[str] = None,
+                               search: Optional[str] = None) -> str:
+        """Create GraphQL query to fetch customers with pagination, optionally filtered by a search string"""
         after_clause = f', after: "{after}"' if after else ""
+        after_clause += self._search_clause(search)
         
         query = f"""
         query CustomerList {{
@@ -128,60 +307,27 @@ class EnhancedShopifyAPIClient:
         """
         return query.strip()
     
+    def iter_customers(self, limit: Optional[int] = None, page_size: int = 50,
+                       prefetch: bool = True, updated_since: Optional[datetime] = None,
+                       raise_errors: bool = False) -> Iterator[List[Dict]]:
+        """Yield customers one GraphQL page at a time, optionally only those updated since a time"""
+        search = self._updated_since_search(updated_since)
+        return self._iter_pages(
+            lambda first, after: self.create_customers_query(first, after, search),
+            'customers', 'customers', limit, page_size, prefetch, raise_errors,
+        )
+    
     def fetch_all_customers(self, limit: Optional[int] = None) -> List[Dict]:
         """Fetch all customers using pagination"""
-        all_customers = []
-        has_next_page = True
-        cursor = None
-        page_count = 0
-        
-        logger.info("Starting customer data retrieval...")
-        
-        while has_next_page:
-            page_count += 1
-            logger.info(f"Fetching customers page {page_count}...")
-            
-            query = self.create_customers_query(50, cursor)
-            
-            try:
-                response = self.execute_graphql_query(query)
-                
-                if "errors" in response:
-                    logger.error(f"GraphQL errors: {response['errors']}")
-                    break
-                
-                customers_data = response.get("data", {}).get("customers", {})
-                customers = customers_data.get("nodes", [])
-                page_info = customers_data.get("pageInfo", {})
-                
-                all_customers.extend(customers)
-                logger.info(f"Retrieved {len(customers)} customers from page {page_count}")
-                
-                # Check if there are more pages
-                has_next_page = page_info.get("hasNextPage", False)
-                cursor = page_info.get("endCursor")
-                
-                # Check if we've reached the limit
-                if limit and len(all_customers) >= limit:
-                    all_customers = all_customers[:limit]
-                    logger.info(f"Reached specified limit of {limit} customers")
-                    break
-                
-                if not has_next_page:
-                    logger.info("Reached end of customer data")
-                    
-            except Exception as e:
-                logger.error(f"Error fetching customers page {page_count}: {e}")
-                break
-        
-        logger.info(f"Total customers retrieved: {len(all_customers)}")
-        return all_customers
+        return self._fetch_all(self.iter_customers(limit=limit), 'customers')
 
     # ==================== PRODUCT QUERIES ====================
     
-    def create_products_query(self, first: int = 50, after: Optional[str] = None) -> str:
-        """Create GraphQL query to fetch products with pagination"""
+    def create_products_query(self, first: int = 50, after: Optional[str] = None,
+                              search: Optional[str] = None) -> str:
+        """Create GraphQL query to fetch products with pagination, optionally filtered by a search string"""
         after_clause = f', after: "{after}"' if after else ""
+        after_clause += self._search_clause(search)
         
         query = f"""
         query GetProducts {{
@@ -239,60 +385,27 @@ class EnhancedShopifyAPIClient:
         """
         return query.strip()
     
+    def iter_products(self, limit: Optional[int] = None, page_size: int = 50,
+                      prefetch: bool = True, updated_since: Optional[datetime] = None,
+                      raise_errors: bool = False) -> Iterator[List[Dict]]:
+        """Yield products one GraphQL page at a time, optionally only those updated since a time"""
+        search = self._updated_since_search(updated_since)
+        return self._iter_pages(
+            lambda first, after: self.create_products_query(first, after, search),
+            'products', 'products', limit, page_size, prefetch, raise_errors,
+        )
+    
     def fetch_all_products(self, limit: Optional[int] = None) -> List[Dict]:
         """Fetch all products using pagination"""
-        all_products = []
-        has_next_page = True
-        cursor = None
-        page_count = 0
-        
-        logger.info("Starting products retrieval...")
-        
-        while has_next_page:
-            page_count += 1
-            logger.info(f"Fetching products page {page_count}...")
-            
-            query = self.create_products_query(50, cursor)
-            
-            try:
-                response = self.execute_graphql_query(query)
-                
-                if "errors" in response:
-                    logger.error(f"GraphQL errors: {response['errors']}")
-                    break
-                
-                products_data = response.get("data", {}).get("products", {})
-                products = products_data.get("nodes", [])
-                page_info = products_data.get("pageInfo", {})
-                
-                all_products.extend(products)
-                logger.info(f"Retrieved {len(products)} products from page {page_count}")
-                
-                # Check if there are more pages
-                has_next_page = page_info.get("hasNextPage", False)
-                cursor = page_info.get("endCursor")
-                
-                # Check if we've reached the limit
-                if limit and len(all_products) >= limit:
-                    all_products = all_products[:limit]
-                    logger.info(f"Reached specified limit of {limit} products")
-                    break
-                
-                if not has_next_page:
-                    logger.info("Reached end of products")
-                    
-            except Exception as e:
-                logger.error(f"Error fetching products page {page_count}: {e}")
-                break
-        
-        logger.info(f"Total products retrieved: {len(all_products)}")
-        return all_products
+        return self._fetch_all(self.iter_products(limit=limit), 'products')
 
     # ==================== ORDER QUERIES ====================
     
-    def create_orders_query(self, first: int = 50, after: Optional[str] = None) -> str:
-        """Create GraphQL query to fetch orders with pagination"""
+    def create_orders_query(self, first: int = 50, after: Optional[str] = None,
+                            search: Optional[str] = None) -> str:
+        """Create GraphQL query to fetch orders with pagination, optionally filtered by a search string"""
         after_clause = f', after: "{after}"' if after else ""
+        after_clause += self._search_clause(search)
         
         query = f"""
         query OrdersList {{
@@ -361,61 +474,27 @@ class EnhancedShopifyAPIClient:
         """
         return query.strip()
     
+    def iter_orders(self, limit: Optional[int] = None, page_size: int = 50,
+                    prefetch: bool = True, updated_since: Optional[datetime] = None,
+                    raise_errors: bool = False) -> Iterator[List[Dict]]:
+        """Yield orders one GraphQL page at a time, optionally only those updated since a time"""
+        search = self._updated_since_search(updated_since)
+        return self._iter_pages(
+            lambda first, after: self.create_orders_query(first, after, search),
+            'orders', 'orders', limit, page_size, prefetch, raise_errors,
+        )
+    
     def fetch_all_orders(self, limit: Optional[int] = None) -> List[Dict]:
         """Fetch all orders using pagination"""
-        all_orders = []
-        has_next_page = True
-        cursor = None
-        page_count = 0
-        
-        logger.info("Starting orders retrieval...")
-        
-        while has_next_page:
-            page_count += 1
-            logger.info(f"Fetching orders page {page_count}...")
-            
-            query = self.create_orders_query(50, cursor)
-            
-            try:
-                response = self.execute_graphql_query(query)
-                
-                if "errors" in response:
-                    logger.error(f"GraphQL errors: {response['errors']}")
-                    break
-                
-                orders_data = response.get("data", {}).get("orders", {})
-                edges = orders_data.get("edges", [])
-                orders = [edge["node"] for edge in edges]
-                page_info = orders_data.get("pageInfo", {})
-                
-                all_orders.extend(orders)
-                logger.info(f"Retrieved {len(orders)} orders from page {page_count}")
-                
-                # Check if there are more pages
-                has_next_page = page_info.get("hasNextPage", False)
-                cursor = page_info.get("endCursor")
-                
-                # Check if we've reached the limit
-                if limit and len(all_orders) >= limit:
-                    all_orders = all_orders[:limit]
-                    logger.info(f"Reached specified limit of {limit} orders")
-                    break
-                
-                if not has_next_page:
-                    logger.info("Reached end of orders")
-                    
-            except Exception as e:
-                logger.error(f"Error fetching orders page {page_count}: {e}")
-                break
-        
-        logger.info(f"Total orders retrieved: {len(all_orders)}")
-        return all_orders
+        return self._fetch_all(self.iter_orders(limit=limit), 'orders')
 
     # ==================== INVENTORY QUERIES ====================
     
-    def create_inventory_items_query(self, first: int = 50, after: Optional[str] = None) -> str:
-        """Create GraphQL query to fetch inventory items with pagination"""
+    def create_inventory_items_query(self, first: int = 50, after: Optional[str] = None,
+                                     search: Optional[str] = None) -> str:
+        """Create GraphQL query to fetch inventory items with pagination, optionally filtered by a search string"""
         after_clause = f', after: "{after}"' if after else ""
+        after_clause += self._search_clause(search)
         
         query = f"""
         query GetInventoryItems {{
@@ -471,55 +550,19 @@ class EnhancedShopifyAPIClient:
         """
         return query.strip()
     
+    def iter_inventory_items(self, limit: Optional[int] = None, page_size: int = 50,
+                             prefetch: bool = True, updated_since: Optional[datetime] = None,
+                             raise_errors: bool = False) -> Iterator[List[Dict]]:
+        """Yield inventory items one GraphQL page at a time, optionally only those updated since a time"""
+        search = self._updated_since_search(updated_since)
+        return self._iter_pages(
+            lambda first, after: self.create_inventory_items_query(first, after, search),
+            'inventoryItems', 'inventory items', limit, page_size, prefetch, raise_errors,
+        )
+    
     def fetch_all_inventory_items(self, limit: Optional[int] = None) -> List[Dict]:
         """Fetch all inventory items using pagination"""
-        all_items = []
-        has_next_page = True
-        cursor = None
-        page_count = 0
-        
-        logger.info("Starting inventory items retrieval...")
-        
-        while has_next_page:
-            page_count += 1
-            logger.info(f"Fetching inventory items page {page_count}...")
-            
-            query = self.create_inventory_items_query(50, cursor)
-            
-            try:
-                response = self.execute_graphql_query(query)
-                
-                if "errors" in response:
-                    logger.error(f"GraphQL errors: {response['errors']}")
-                    break
-                
-                items_data = response.get("data", {}).get("inventoryItems", {})
-                edges = items_data.get("edges", [])
-                items = [edge["node"] for edge in edges]
-                page_info = items_data.get("pageInfo", {})
-                
-                all_items.extend(items)
-                logger.info(f"Retrieved {len(items)} inventory items from page {page_count}")
-                
-                # Check if there are more pages
-                has_next_page = page_info.get("hasNextPage", False)
-                cursor = page_info.get("endCursor")
-                
-                # Check if we've reached the limit
-                if limit and len(all_items) >= limit:
-                    all_items = all_items[:limit]
-                    logger.info(f"Reached specified limit of {limit} inventory items")
-                    break
-                
-                if not has_next_page:
-                    logger.info("Reached end of inventory items")
-                    
-            except Exception as e:
-                logger.error(f"Error fetching inventory items page {page_count}: {e}")
-                break
-        
-        logger.info(f"Total inventory items retrieved: {len(all_items)}")
-        return all_items
+        return self._fetch_all(self.iter_inventory_items(limit=limit), 'inventory items')
     
     def fetch_all_locations(self) -> List[Dict]:
         """Fetch all locations"""
@@ -701,7 +744,17 @@ class EnhancedShopifyAPIClient:
             return connection_test['shop_info']
         else:
             raise Exception(f"Failed to get shop info: {connection_test['message']}")
-    
+
+    def get_access_scopes(self) -> Set[str]:
+        """Access scope handles granted to this app installation; raises if they cannot be read"""
+        if self._access_scopes is None:
+            response = self.execute_graphql_query(ACCESS_SCOPES_QUERY)
+            if "error" in response or "errors" in response:
+                raise ValueError(f"Could not read access scopes: {response.get('error') or response.get('errors')}")
+            installation = (response.get("data") or {}).get("currentAppInstallation") or {}
+            self._access_scopes = {scope["handle"] for scope in installation.get("accessScopes", [])}
+        return self._access_scopes
+
     # ==================== PRODUCT MUTATIONS (Django → Shopify) ====================
     
     def create_product_in_shopify(self, title: str, description: str = "", vendor: str = "", 
@@ -1371,20 +1424,9 @@ class EnhancedShopifyAPIClient:
                 "message": f"Failed to create variant: {e}"
             }
     
-    def update_inventory_quantities(self, inventory_item_id: str, available_quantity: int, location_id: str = None) -> Dict:
-        """
-        Update inventory quantities for a variant using inventorySetQuantities mutation
-        
-        Args:
-            inventory_item_id: Shopify inventory item ID (get from variant.inventoryItem.id)
-            available_quantity: The quantity to set
-            location_id: Location ID (defaults to primary location if not provided)
-            
-        Returns:
-            Dict with success status
-        """
-        # Get primary location if not provided
-        if not location_id:
+    def get_primary_location_id(self) -> Optional[str]:
+        """GID of the store's first location, looked up once per client"""
+        if self._primary_location_id is None:
             location_query = """
             {
               locations(first: 1) {
@@ -1397,61 +1439,60 @@ class EnhancedShopifyAPIClient:
             }
             """
             loc_result = self.execute_graphql_query(location_query)
-            locations = loc_result.get("data", {}).get("locations", {}).get("edges", [])
+            locations = (loc_result.get("data") or {}).get("locations", {}).get("edges", [])
             if locations:
-                location_id = locations[0]["node"]["id"]
-            else:
-                return {
-                    "success": False,
-                    "message": "No location found in Shopify"
-                }
+                self._primary_location_id = locations[0]["node"]["id"]
+        return self._primary_location_id
+    
+    def set_inventory_quantities(self, quantities: List[Dict], reason: str = "correction",
+                                 name: str = "available") -> Dict:
+        """
+        Set many inventory quantities with one inventorySetQuantities mutation
         
-        mutation = """
-        mutation inventorySetQuantities($input: InventorySetQuantitiesInput!) {
-          inventorySetQuantities(input: $input) {
-            inventoryAdjustmentGroup {
-              id
-              reason
-              changes {
-                name
-                delta
-              }
-            }
-            userErrors {
-              field
-              message
-            }
-          }
-        }
+        Args:
+            quantities: Up to INVENTORY_SET_QUANTITIES_LIMIT dicts of inventoryItemId,
+                locationId and quantity
+            reason: Adjustment reason recorded by Shopify
+            name: Quantity name to set
+            
+        Returns:
+            Dict with success status. ``errors`` holds the userErrors; an error
+            whose field is ["input", "quantities", "<index>", ...] belongs to
+            that entry of ``quantities``. Shopify applies nothing when any
+            userError is returned.
         """
+        if len(quantities) > INVENTORY_SET_QUANTITIES_LIMIT:
+            raise ValueError(f"inventorySetQuantities accepts at most {INVENTORY_SET_QUANTITIES_LIMIT} quantities")
         
         variables = {
             "input": {
-                "reason": "correction",
-                "name": "available",
+                "reason": reason,
+                "name": name,
                 "ignoreCompareQuantity": True,
                 "quantities": [
                     {
-                        "inventoryItemId": inventory_item_id,
-                        "locationId": location_id,
-                        "quantity": int(available_quantity)
+                        "inventoryItemId": quantity["inventoryItemId"],
+                        "locationId": quantity["locationId"],
+                        "quantity": int(quantity["quantity"])
                     }
+                    for quantity in quantities
                 ]
             }
         }
         
         try:
-            result = self.execute_graphql_query(mutation, variables)
+            result = self.execute_graphql_query(INVENTORY_SET_QUANTITIES_MUTATION, variables)
             
-            if "errors" in result:
-                logger.error(f"GraphQL errors updating inventory: {result['errors']}")
+            if "errors" in result or "error" in result:
+                errors = result.get("errors") or result.get("error")
+                logger.error(f"GraphQL errors updating inventory: {errors}")
                 return {
                     "success": False,
-                    "errors": result["errors"],
-                    "message": "GraphQL errors occurred"
+                    "errors": [],
+                    "message": f"GraphQL errors occurred: {errors}"
                 }
             
-            inventory_data = result.get("data", {}).get("inventorySetQuantities", {})
+            inventory_data = (result.get("data") or {}).get("inventorySetQuantities") or {}
             user_errors = inventory_data.get("userErrors", [])
             
             if user_errors:
@@ -1472,6 +1513,7 @@ class EnhancedShopifyAPIClient:
             
             return {
                 "success": False,
+                "errors": [],
                 "message": "No adjustment data in response"
             }
             
@@ -1479,10 +1521,37 @@ class EnhancedShopifyAPIClient:
             logger.error(f"Exception updating inventory: {e}")
             return {
                 "success": False,
+                "errors": [],
                 "error": str(e),
                 "message": f"Failed to update inventory: {e}"
             }
     
+    def update_inventory_quantities(self, inventory_item_id: str, available_quantity: int, location_id: str = None) -> Dict:
+        """
+        Update inventory quantities for a variant using inventorySetQuantities mutation
+        
+        Args:
+            inventory_item_id: Shopify inventory item ID (get from variant.inventoryItem.id)
+            available_quantity: The quantity to set
+            location_id: Location ID (defaults to primary location if not provided)
+            
+        Returns:
+            Dict with success status
+        """
+        # Get primary location if not provided
+        location_id = location_id or self.get_primary_location_id()
+        if not location_id:
+            return {
+                "success": False,
+                "message": "No location found in Shopify"
+            }
+        
+        return self.set_inventory_quantities([{
+            "inventoryItemId": inventory_item_id,
+            "locationId": location_id,
+            "quantity": available_quantity,
+        }])
+    
     # ==================== REST API METHODS ====================
     
     def rest_request(self, method: str, endpoint: str, data: Dict = None, params: Dict = None) -> Dict:
@@ -1501,7 +1570,7 @@ class EnhancedShopifyAPIClient:
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
         
         try:
-            response = requests.request(
+            response = self.session.request(
                 method,
                 url,
                 headers=self.get_headers(),
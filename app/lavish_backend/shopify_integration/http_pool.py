@@ -0,0 +1,97 @@
+"""
+Pooled keep-alive HTTP sessions for integration clients
+
+Module-level ``requests.post`` opens a new TCP + TLS connection for every call.
+Clients instead share one ``requests.Session`` per service, whose urllib3 pool
+keeps connections alive per host, asks for gzip responses and retries
+connection failures with backoff. The pool is thread-safe; the sessions never
+store cookies, so sharing them across threads leaks no per-user state.
+"""
+
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Optional
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Host pools kept per session, and keep-alive connections kept per host
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+
+# Retry connection failures for any method (the request never reached the server);
+# only idempotent methods are retried after a gateway error.
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (502, 503, 504)
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def build_retry(retries: int = DEFAULT_RETRIES, backoff_factor: float = DEFAULT_BACKOFF_FACTOR) -> Retry:
+    """Retry policy shared by every pooled session"""
+    return Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=IDEMPOTENT_METHODS,
+        # 429 is handled by the callers' rate limiting, so hand responses back as-is
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+
+
+def build_session(pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                  pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                  retries: int = DEFAULT_RETRIES,
+                  backoff_factor: float = DEFAULT_BACKOFF_FACTOR) -> requests.Session:
+    """Create a keep-alive session with the given per-host pool size and retry policy"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=build_retry(retries, backoff_factor),
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+    })
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def get_session(name: str = 'shopify') -> requests.Session:
+    """
+    The process-wide pooled session for a service ('shopify', 'afterpay', ...)
+
+    Pool sizes can be tuned per service with ``HTTP_POOL_SETTINGS``, e.g.
+    ``{'shopify': {'pool_maxsize': 20}}``.
+    """
+    session = _sessions.get(name)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        if name not in _sessions:
+            options = getattr(settings, 'HTTP_POOL_SETTINGS', {}).get(name, {})
+            _sessions[name] = build_session(**options)
+        return _sessions[name]
+
+
+def close_sessions(name: Optional[str] = None):
+    """Close pooled connections, e.g. after forking worker processes"""
+    with _sessions_lock:
+        names = [name] if name else list(_sessions)
+        for key in names:
+            session = _sessions.pop(key, None)
+            if session is not None:
+                session.close()
@@ -0,0 +1,203 @@
+"""
+Incremental "changed since" Shopify syncs
+
+Each resource keeps an updated_at high-watermark in SyncWatermark. Routine
+syncs only request records with ``updated_at:>=`` the watermark and upsert
+that delta; a periodic full pass re-reads everything and removes local
+records that no longer exist in Shopify, which the delta cannot reveal.
+Both only move the watermark once the last page has been read; orders are
+only removed when the app holds read_all_orders, as Shopify otherwise lists
+just the last 60 days.
+"""
+
+import logging
+from contextlib import nullcontext
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.apps import apps
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .bulk_upsert import (
+    DEFAULT_STORE_DOMAIN, upsert_pages, upsert_customers, upsert_products, upsert_orders, upsert_inventory_items,
+)
+from .models import ShopifyStore, SyncWatermark
+
+logger = logging.getLogger('shopify_integration')
+
+# How often an otherwise incremental sync runs as a full reconcile
+FULL_RECONCILE_INTERVAL = timedelta(hours=24)
+# The next delta starts this long before the last sync began, covering clock skew
+# and records updated while the previous sync was paging
+WATERMARK_OVERLAP = timedelta(minutes=5)
+# A reconcile that would delete more than this share of local records is assumed
+# to be working from an incomplete listing and deletes nothing
+MAX_DELETE_FRACTION = 0.2
+MIN_DELETE_GUARD = 10
+
+RESOURCES = {
+    'customers': {
+        'iterate': 'iter_customers',
+        'upsert': upsert_customers,
+        'label': 'customers',
+        'model': 'customers.ShopifyCustomer',
+    },
+    'products': {
+        'iterate': 'iter_products',
+        'upsert': upsert_products,
+        'label': 'products',
+        'model': 'products.ShopifyProduct',
+    },
+    'orders': {
+        'iterate': 'iter_orders',
+        'upsert': upsert_orders,
+        'label': 'orders',
+        'model': 'orders.ShopifyOrder',
+        # Deletes refresh the daily order rollups once per day rather than once per order
+        'batch_writes': 'orders.rollups.collect_order_rollups',
+        # Without this scope Shopify only lists the last 60 days of orders, so a
+        # reconcile would delete every older order
+        'reconcile_scope': 'read_all_orders',
+    },
+    'inventory': {
+        'iterate': 'iter_inventory_items',
+        'upsert': upsert_inventory_items,
+        'label': 'inventory items',
+        'model': 'inventory.ShopifyInventoryItem',
+    },
+}
+
+
+def _track(pages: Iterable[List[Dict]], seen: Optional[Set[str]], outcome: Dict) -> Iterable[List[Dict]]:
+    """Pass pages through, collecting node ids and recording whether the listing finished"""
+    try:
+        for page in pages:
+            if seen is not None:
+                seen.update(node['id'] for node in page if node.get('id'))
+            yield page
+    except Exception as e:
+        outcome['error'] = str(e)
+        return
+    outcome['complete'] = True
+
+
+def _can_reconcile(client, config: Dict) -> bool:
+    """Whether a full listing of the resource covers every record, so absent ones were deleted"""
+    scope = config.get('reconcile_scope')
+    if not scope:
+        return True
+    try:
+        granted = scope in client.get_access_scopes()
+    except Exception as e:
+        logger.warning(f"Could not confirm the {scope} scope: {e}")
+        return False
+    if not granted:
+        logger.warning(f"Skipping {config['label']} deletes: the listing is partial without the {scope} scope")
+    return granted
+
+
+def _remove_deleted(model, seen: Set[str]) -> int:
+    """Delete Shopify-sourced records absent from a complete listing; returns rows removed"""
+    queryset = model.objects.filter(shopify_id__startswith='gid://shopify/')
+    if any(field.name == 'needs_shopify_push' for field in model._meta.get_fields()):
+        # Local edits waiting to be pushed are never discarded
+        queryset = queryset.filter(needs_shopify_push=False)
+
+    local_ids = set(queryset.values_list('shopify_id', flat=True))
+    stale = list(local_ids - seen)
+    if not stale:
+        return 0
+
+    if len(stale) > max(MIN_DELETE_GUARD, len(local_ids) * MAX_DELETE_FRACTION):
+        logger.warning(
+            f"Reconcile would delete {len(stale)} of {len(local_ids)} {model._meta.verbose_name_plural}; "
+            f"skipping deletes"
+        )
+        return 0
+
+    removed = 0
+    for start in range(0, len(stale), 500):
+        removed += model.objects.filter(shopify_id__in=stale[start:start + 500]).delete()[1].get(model._meta.label, 0)
+    logger.info(f"Removed {removed} {model._meta.verbose_name_plural} deleted in Shopify")
+    return removed
+
+
+def sync_resource(client, resource: str, store_domain: str, limit: Optional[int] = None,
+                  full: Optional[bool] = None, pages: Optional[Iterable[List[Dict]]] = None) -> Dict:
+    """
+    Sync one resource, incrementally when a recent full reconcile exists
+
+    Args:
+        client: EnhancedShopifyAPIClient
+        resource: Key of RESOURCES
+        store_domain: Store the watermark belongs to
+        limit: Sync at most this many records; a limited sync leaves the watermark alone
+        full: Force (True) or skip (False) the full reconcile; by default it runs when
+            no watermark exists or the last one is older than FULL_RECONCILE_INTERVAL
+        pages: Complete listing to use for a full pass instead of paginating,
+            e.g. from a bulk operation
+
+    Returns:
+        upsert_pages stats plus 'mode' ('limited', 'incremental' or 'full'),
+        'complete' (the listing was read to the end; records that failed to
+        save are counted in 'errors') and, after a full pass, 'deleted'
+    """
+    config = RESOURCES[resource]
+    iterate = getattr(client, config['iterate'])
+    store_domain = store_domain or DEFAULT_STORE_DOMAIN
+
+    if limit and pages is None:
+        stats = upsert_pages(iterate(limit=limit), config['upsert'], config['label'], store_domain=store_domain)
+        stats.update(mode='limited', complete=True)
+        return stats
+
+    watermark, _ = SyncWatermark.objects.get_or_create(store_domain=store_domain, resource=resource)
+    started = timezone.now()
+    if pages is not None:
+        full = True
+    elif full is None:
+        full = (watermark.updated_at_watermark is None or watermark.last_full_sync is None
+                or started - watermark.last_full_sync >= FULL_RECONCILE_INTERVAL)
+
+    if full:
+        logger.info(f"Full {config['label']} sync with reconcile")
+        source = pages if pages is not None else iterate(raise_errors=True)
+        seen = set()
+    else:
+        logger.info(f"Incremental {config['label']} sync since {watermark.updated_at_watermark}")
+        source = iterate(updated_since=watermark.updated_at_watermark, raise_errors=True)
+        seen = None
+
+    outcome = {'complete': False}
+    stats = upsert_pages(_track(source, seen, outcome), config['upsert'], config['label'], store_domain=store_domain)
+    stats.update(mode='full' if full else 'incremental', complete=outcome['complete'])
+
+    if stats['errors']:
+        # A record that keeps failing must not hold the whole resource back; it is
+        # written again when it next changes in Shopify or at the next full reconcile
+        failed = stats.get('failed_ids', [])
+        shown = ', '.join(failed[:20]) + (' …' if len(failed) > 20 else '')
+        logger.warning(f"{stats['errors']} {config['label']} failed to save" + (f": {shown}" if failed else ''))
+
+    if not stats['complete']:
+        # Pages already written stay written, but the delta restarts from the old watermark
+        if outcome.get('error'):
+            stats['error'] = outcome['error']
+        logger.warning(f"{config['label'].capitalize()} sync incomplete; watermark not advanced")
+        return stats
+
+    if full:
+        stats['deleted'] = 0
+        if _can_reconcile(client, config):
+            batch = import_string(config['batch_writes'])() if 'batch_writes' in config else nullcontext()
+            with batch:
+                stats['deleted'] = _remove_deleted(apps.get_model(config['model']), seen)
+        watermark.last_full_sync = started
+    else:
+        watermark.last_incremental_sync = started
+    watermark.updated_at_watermark = started - WATERMARK_OVERLAP
+    watermark.save()
+
+    ShopifyStore.objects.filter(store_domain=store_domain).update(last_sync=started)
+    return stats
@@ -0,0 +1,104 @@
+"""
+Django Management Command to benchmark pooled HTTP sessions
+Compares per-request latency of module-level requests calls (new TCP + TLS
+handshake each time) with the shared keep-alive session, against a local HTTPS stub
+"""
+import os
+import socket
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from shopify_integration.http_pool import build_session
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers every POST like a tiny GraphQL response, keeping the connection open"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; don't let Nagle hold the body back
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = b'{"data": {"shop": {"name": "Stub"}}}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-request latency of pooled keep-alive sessions against a local HTTPS stub'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Requests to send per client (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        count = options['requests']
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cert_file = os.path.join(tmp, 'cert.pem')
+            key_file = os.path.join(tmp, 'key.pem')
+            try:
+                subprocess.run(
+                    ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                     '-subj', '/CN=localhost', '-addext', 'subjectAltName=DNS:localhost',
+                     '-keyout', key_file, '-out', cert_file],
+                    check=True, capture_output=True,
+                )
+            except (OSError, subprocess.CalledProcessError) as e:
+                raise CommandError(f'Could not create a self-signed certificate with openssl: {e}')
+
+            server = ThreadingHTTPServer(('localhost', 0), StubHandler)
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(cert_file, key_file)
+            server.socket = context.wrap_socket(server.socket, server_side=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+
+            url = f'https://localhost:{server.server_address[1]}/admin/api/graphql.json'
+            payload = {'query': '{ shop { name } }'}
+
+            try:
+                unpooled = self._time(lambda: requests.post(url, json=payload, verify=cert_file, timeout=10), count)
+                session = build_session()
+                pooled = self._time(lambda: session.post(url, json=payload, verify=cert_file, timeout=10), count)
+                session.close()
+            finally:
+                server.shutdown()
+                server.server_close()
+
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(self.style.SUCCESS(f'HTTPS REQUEST LATENCY ({count} requests each)'))
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(f'Module-level requests.post: {unpooled * 1000:.2f} ms/request')
+        self.stdout.write(f'Pooled keep-alive session:  {pooled * 1000:.2f} ms/request')
+        self.stdout.write(
+            self.style.SUCCESS(f'Saving: {(unpooled - pooled) * 1000:.2f} ms/request ({unpooled / pooled:.1f}x faster)')
+        )
+
+    def _time(self, send, count):
+        """Average seconds per request after one warm-up call"""
+        send().raise_for_status()
+        started = time.perf_counter()
+        for _ in range(count):
+            send().raise_for_status()
+        return (time.perf_counter() - started) / count
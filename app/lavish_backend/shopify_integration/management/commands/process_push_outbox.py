@@ -0,0 +1,50 @@
+"""
+Django Management Command to drain the Shopify push outbox
+Runs admin-queued pushes outside the web process
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from shopify_integration.push_outbox import DEFAULT_BATCH_SIZE, drain_push_outbox
+
+
+class Command(BaseCommand):
+    help = 'Run queued Django → Shopify push jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the outbox once and exit',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the outbox is empty (default: 2)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Worker threads (default: SHOPIFY_PUSH_SETTINGS or 4)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Jobs claimed per batch (default: {DEFAULT_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            totals = drain_push_outbox(batch_size=options['batch_size'], workers=options['workers'])
+            if any(totals.values()):
+                self.stdout.write(
+                    f"Succeeded {totals['succeeded']}, retrying {totals['retrying']}, failed {totals['failed']}, "
+                    f"reclaimed {totals['reclaimed']}"
+                )
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,45 @@
+"""
+Django Management Command to drain the queued Shopify webhooks
+Runs the webhook worker pool outside the web process
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from shopify_integration.webhook_queue import DEFAULT_WORKERS, drain_webhook_queue
+
+
+class Command(BaseCommand):
+    help = 'Process queued Shopify webhook deliveries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue once and exit',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty (default: 2)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=DEFAULT_WORKERS,
+            help=f'Worker threads (default: {DEFAULT_WORKERS})',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            totals = drain_webhook_queue(workers=options['workers'])
+            if any(totals.values()):
+                self.stdout.write(
+                    f"Processed {totals['processed']}, superseded {totals['superseded']}, "
+                    f"retrying {totals['retrying']}, failed {totals['failed']}, "
+                    f"reclaimed {totals['reclaimed']}"
+                )
+            if options['once']:
+                break
+            time.sleep(options['interval'])
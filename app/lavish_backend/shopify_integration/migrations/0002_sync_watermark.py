@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_integration', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('store_domain', models.CharField(help_text='e.g., 7fa66c-ac.myshopify.com', max_length=100)),
+                ('resource', models.CharField(choices=[('customers', 'Customers'), ('products', 'Products'), ('orders', 'Orders'), ('inventory', 'Inventory')], max_length=50)),
+                ('updated_at_watermark', models.DateTimeField(blank=True, null=True)),
+                ('last_incremental_sync', models.DateTimeField(blank=True, null=True)),
+                ('last_full_sync', models.DateTimeField(blank=True, help_text='Last full reconcile, which also removes records deleted in Shopify', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['store_domain', 'resource'],
+                'unique_together': {('store_domain', 'resource')},
+            },
+        ),
+    ]
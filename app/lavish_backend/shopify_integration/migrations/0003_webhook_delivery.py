@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_integration', '0002_sync_watermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('webhook_id', models.CharField(help_text='X-Shopify-Webhook-Id; redeliveries reuse it', max_length=100, unique=True)),
+                ('topic', models.CharField(max_length=100)),
+                ('shop_domain', models.CharField(blank=True, max_length=100)),
+                ('resource_id', models.CharField(blank=True, help_text='Resource the payload describes, used to coalesce updates', max_length=255)),
+                ('payload', models.TextField(help_text='Raw request body')),
+                ('triggered_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed'), ('superseded', 'Superseded'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('error_message', models.TextField(blank=True)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Webhook deliveries',
+                'ordering': ['received_at'],
+                'indexes': [models.Index(fields=['status', 'received_at'], name='shopify_int_status_06cab1_idx'), models.Index(fields=['topic', 'resource_id'], name='shopify_int_topic_cb85af_idx')],
+            },
+        ),
+    ]
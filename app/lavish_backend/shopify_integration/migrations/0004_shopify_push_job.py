@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_integration', '0003_webhook_delivery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopifyPushJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(help_text='Model label, e.g. products.shopifyproduct', max_length=100)),
+                ('object_id', models.CharField(max_length=64)),
+                ('object_repr', models.CharField(blank=True, max_length=255)),
+                ('operation', models.CharField(choices=[('push', 'Create or update'), ('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], default='push', max_length=20)),
+                ('payload', models.JSONField(blank=True, help_text='Details kept for objects that no longer exist locally', null=True)),
+                ('requested_by', models.CharField(blank=True, max_length=150)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('error_message', models.TextField(blank=True)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='shopify_int_status_4c618e_idx'), models.Index(fields=['target', 'object_id'], name='shopify_int_target_ef7b60_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_integration', '0004_shopify_push_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookdelivery',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When a worker started processing it', null=True),
+        ),
+    ]
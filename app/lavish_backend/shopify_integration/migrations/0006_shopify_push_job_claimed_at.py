@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_integration', '0005_webhook_delivery_claimed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shopifypushjob',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When a worker started processing it', null=True),
+        ),
+    ]
@@ -159,3 +159,123 @@ class APIRateLimit(models.Model):
         if self.max_calls == 0:
             return 0
         return (self.current_calls / self.max_calls) * 100
+
+
+class SyncWatermark(models.Model):
+    """Per-resource high-watermark for incremental Shopify syncs"""
+    
+    store_domain = models.CharField(max_length=100, help_text="e.g., 7fa66c-ac.myshopify.com")
+    resource = models.CharField(max_length=50, choices=[
+        ('customers', 'Customers'),
+        ('products', 'Products'),
+        ('orders', 'Orders'),
+        ('inventory', 'Inventory'),
+    ])
+    
+    # Records updated at or after this time are fetched by the next incremental sync
+    updated_at_watermark = models.DateTimeField(null=True, blank=True)
+    
+    # Timing
+    last_incremental_sync = models.DateTimeField(null=True, blank=True)
+    last_full_sync = models.DateTimeField(null=True, blank=True, help_text="Last full reconcile, which also removes records deleted in Shopify")
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['store_domain', 'resource']
+        unique_together = ['store_domain', 'resource']
+    
+    def __str__(self):
+        return f"{self.store_domain} - {self.resource} (since {self.updated_at_watermark})"
+
+
+class WebhookDelivery(models.Model):
+    """Durable queue of received Shopify webhooks, drained by the webhook workers"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('processed', 'Processed'),
+        ('superseded', 'Superseded'),
+        ('failed', 'Failed'),
+    ]
+    
+    # Shopify delivery details
+    webhook_id = models.CharField(max_length=100, unique=True, help_text="X-Shopify-Webhook-Id; redeliveries reuse it")
+    topic = models.CharField(max_length=100)
+    shop_domain = models.CharField(max_length=100, blank=True)
+    resource_id = models.CharField(max_length=255, blank=True, help_text="Resource the payload describes, used to coalesce updates")
+    payload = models.TextField(help_text="Raw request body")
+    triggered_at = models.DateTimeField(null=True, blank=True)
+    
+    # Processing state
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    result = models.JSONField(null=True, blank=True)
+    
+    # Timing
+    received_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True, help_text="When a worker started processing it")
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['received_at']
+        indexes = [
+            models.Index(fields=['status', 'received_at']),
+            models.Index(fields=['topic', 'resource_id']),
+        ]
+        verbose_name_plural = 'Webhook deliveries'
+    
+    def __str__(self):
+        return f"{self.topic} {self.webhook_id} ({self.status})"
+
+
+class ShopifyPushJob(models.Model):
+    """Outbox of Django → Shopify pushes requested from the admin, run by the push workers"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    OPERATION_CHOICES = [
+        ('push', 'Create or update'),
+        ('create', 'Create'),
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+    ]
+    
+    # What to push
+    target = models.CharField(max_length=100, help_text="Model label, e.g. products.shopifyproduct")
+    object_id = models.CharField(max_length=64)
+    object_repr = models.CharField(max_length=255, blank=True)
+    operation = models.CharField(max_length=20, choices=OPERATION_CHOICES, default='push')
+    payload = models.JSONField(null=True, blank=True, help_text="Details kept for objects that no longer exist locally")
+    requested_by = models.CharField(max_length=150, blank=True)
+    
+    # Processing state
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    result = models.JSONField(null=True, blank=True)
+    
+    # Timing
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True, help_text="When a worker started processing it")
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['target', 'object_id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.operation} {self.target} {self.object_id} ({self.status})"
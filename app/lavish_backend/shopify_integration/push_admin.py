@@ -0,0 +1,103 @@
+"""
+Admin support for the Shopify push outbox
+
+ShopifyPushStatusMixin adds a "Shopify Push" column and read-only field
+showing each object's latest push job. Badges of queued and running jobs
+poll a small JSON endpoint, so the change list updates without a reload
+once the worker finishes.
+"""
+from django.contrib import messages
+from django.db.models import CharField, OuterRef, Subquery
+from django.db.models.functions import Cast
+from django.http import JsonResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import ShopifyPushJob
+from .push_outbox import enqueue_pushes, latest_push_jobs
+
+PUSH_STATUS_BADGES = {
+    'pending': ('orange', '⏳ Queued'),
+    'processing': ('#1e88e5', '🔄 Pushing'),
+    'succeeded': ('green', '✅ Pushed'),
+    'failed': ('red', '❌ Failed'),
+}
+
+
+class ShopifyPushStatusMixin:
+    """ModelAdmin mixin queueing Shopify pushes through the outbox and showing their status"""
+
+    class Media:
+        js = ('shopify_integration/js/push_status.js',)
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        latest = ShopifyPushJob.objects.filter(
+            target=self.model._meta.label_lower,
+            object_id=Cast(OuterRef('pk'), CharField()),
+        ).order_by('-created_at', '-pk')
+        return queryset.annotate(
+            push_job_status=Subquery(latest.values('status')[:1]),
+            push_job_error=Subquery(latest.values('error_message')[:1]),
+        )
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        custom_urls = [
+            path('<path:object_id>/push-status/', self.admin_site.admin_view(self.push_status_view),
+                 name='%s_%s_push_status' % info),
+        ]
+        return custom_urls + super().get_urls()
+
+    def push_status_view(self, request, object_id):
+        """Latest push job of one object, polled by the status badges"""
+        if not self.has_view_or_change_permission(request):
+            return JsonResponse({'error': 'Permission denied'}, status=403)
+        job = latest_push_jobs(self.model, [object_id]).get(str(object_id))
+        if job is None:
+            return JsonResponse({'status': None})
+        color, label = PUSH_STATUS_BADGES[job.status]
+        return JsonResponse({
+            'status': job.status,
+            'label': label,
+            'color': color,
+            'error': job.error_message,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        })
+
+    def push_status_badge(self, obj):
+        """Status of the object's latest Shopify push job"""
+        if obj.pk is None:
+            return '-'
+        if hasattr(obj, 'push_job_status'):
+            status, error = obj.push_job_status, obj.push_job_error
+        else:
+            job = latest_push_jobs(self.model, [obj.pk]).get(str(obj.pk))
+            status, error = (job.status, job.error_message) if job else (None, '')
+        if status is None:
+            return '-'
+        color, label = PUSH_STATUS_BADGES[status]
+        url = reverse(
+            'admin:%s_%s_push_status' % (self.model._meta.app_label, self.model._meta.model_name),
+            args=[obj.pk], current_app=self.admin_site.name,
+        )
+        return format_html(
+            '<span class="shopify-push-status" data-status="{}" data-status-url="{}" title="{}" '
+            'style="color: {};">{}</span>',
+            status, url, error or '', color, label
+        )
+    push_status_badge.short_description = "Shopify Push"
+
+    def queue_shopify_push(self, request, objects, operation='push', payload=None):
+        """Queue pushes of ``objects`` and return the number queued"""
+        jobs = enqueue_pushes(objects, operation, requested_by=request.user.get_username(), payload=payload)
+        return len(jobs)
+
+    def queue_shopify_push_action(self, request, queryset, operation, noun):
+        """Bulk action body: queue the selected objects and report it"""
+        count = self.queue_shopify_push(request, queryset, operation)
+        self.message_user(
+            request,
+            f"📤 Queued {count} {noun} for Shopify; see the Shopify Push column for progress",
+            level=messages.SUCCESS,
+        )
@@ -0,0 +1,178 @@
+"""
+Concurrent Django → Shopify push executor
+
+Pending edits (rows with ``needs_shopify_push``) used to be pushed one after
+another, so a backlog took as long as the sum of every round trip. The
+executor pushes them from a bounded pool of worker threads instead. Workers
+share the store's GraphQL cost budget (every EnhancedShopifyAPIClient draws
+from it), so concurrency only fills the time spent waiting on responses and
+never outruns Shopify's rate limit.
+
+Records with the same ordering key form a chain that one worker pushes in
+queryset order, e.g. all addresses of one customer after that customer. Each
+run reports throughput and per-record latency.
+"""
+import logging
+import math
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('shopify_integration')
+
+DEFAULT_PUSH_WORKERS = 4
+
+
+def _push_settings():
+    """Executor defaults, overridable with SHOPIFY_PUSH_SETTINGS"""
+    return getattr(settings, 'SHOPIFY_PUSH_SETTINGS', {})
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+class PushExecutor:
+    """
+    Push records to Shopify from a bounded thread pool
+
+    Usage:
+        executor = PushExecutor(service.push_product_to_shopify)
+        report = executor.run(ShopifyProduct.objects.filter(needs_shopify_push=True))
+
+    Args:
+        push: Callable taking a record and returning a dict with ``success``
+            and ``message``; exceptions count as failures
+        key: Callable giving a record's ordering key; records sharing a key
+            are pushed in order by one worker. Defaults to the primary key.
+        before_chain: Optional callable run with a chain's records before the
+            first is pushed, e.g. to push the parent they depend on. If it
+            raises, every record of the chain fails with its message.
+        workers: Worker threads (default SHOPIFY_PUSH_SETTINGS['workers'] or 4;
+            always 1 on SQLite)
+        label: Plural noun for log lines
+    """
+
+    def __init__(self, push: Callable[[object], Dict], key: Optional[Callable] = None,
+                 before_chain: Optional[Callable[[List], None]] = None, workers: Optional[int] = None,
+                 label: str = 'records'):
+        self.push = push
+        self.key = key or (lambda record: record.pk)
+        self.before_chain = before_chain
+        self.workers = workers or _push_settings().get('workers', DEFAULT_PUSH_WORKERS)
+        self.label = label
+
+    def run(self, records: Iterable) -> Dict:
+        """
+        Push every record and wait for the pool to finish
+
+        Returns:
+            dict: total, successful, failed, results (one (record, result)
+            pair per record, in input order), seconds, records_per_second and
+            latency (p50, p95 and max seconds per record)
+        """
+        records = list(records)
+        started = time.perf_counter()
+
+        chains = {}
+        for record in records:
+            chains.setdefault(self.key(record), []).append(record)
+
+        outcomes = {}
+        latencies = []
+        lock = threading.Lock()
+        work = queue.Queue()
+        for chain in chains.values():
+            work.put(chain)
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        chain = work.get_nowait()
+                    except queue.Empty:
+                        return
+                    for record, result, seconds in self._push_chain(chain):
+                        with lock:
+                            outcomes[id(record)] = result
+                            latencies.append(seconds)
+            finally:
+                # Each worker opened its own database connection
+                connection.close()
+
+        thread_count = min(self.workers, len(chains))
+        if connection.vendor == 'sqlite':
+            # SQLite takes one writer at a time, and pushes write between Shopify calls
+            thread_count = min(thread_count, 1)
+        if thread_count > 1:
+            threads = [
+                threading.Thread(target=worker, name=f'shopify-push-{index}', daemon=True)
+                for index in range(thread_count)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        else:
+            for chain in chains.values():
+                for record, result, seconds in self._push_chain(chain):
+                    outcomes[id(record)] = result
+                    latencies.append(seconds)
+
+        elapsed = time.perf_counter() - started
+        results = [(record, outcomes[id(record)]) for record in records]
+        successful = sum(1 for _, result in results if result.get('success'))
+        report = {
+            'total': len(records),
+            'successful': successful,
+            'failed': len(records) - successful,
+            'results': results,
+            'seconds': elapsed,
+            'records_per_second': len(records) / elapsed if elapsed else 0.0,
+            'latency': {
+                'p50': _percentile(latencies, 0.5),
+                'p95': _percentile(latencies, 0.95),
+                'max': max(latencies, default=0.0),
+            },
+        }
+        logger.info(
+            f"Pushed {successful}/{len(records)} {self.label} in {elapsed:.1f}s "
+            f"({report['records_per_second']:.1f}/s, {thread_count or 0} workers, "
+            f"p95 {report['latency']['p95'] * 1000:.0f} ms per record)"
+        )
+        return report
+
+    def _push_chain(self, chain: List):
+        if self.before_chain is not None:
+            try:
+                self.before_chain(chain)
+            except Exception as e:
+                logger.error(f"Could not prepare {self.label} push: {e}")
+                for record in chain:
+                    yield record, {'success': False, 'message': str(e)}, 0.0
+                return
+
+        for record in chain:
+            started = time.perf_counter()
+            try:
+                result = self.push(record) or {}
+            except Exception as e:
+                logger.error(f"Exception pushing {record!r}: {e}")
+                result = {'success': False, 'message': f"Exception during push: {e}"}
+            yield record, result, time.perf_counter() - started
+
+
+def push_metrics(report: Dict) -> Dict:
+    """Throughput and latency figures of a PushExecutor report, for service results"""
+    return {
+        'seconds': report['seconds'],
+        'records_per_second': report['records_per_second'],
+        'latency': report['latency'],
+    }
@@ -0,0 +1,318 @@
+"""
+Outbox for admin-triggered Django → Shopify pushes
+
+Saving a product, selling plan or subscription in the admin used to push it
+to Shopify inside the POST, so the page took as long as several GraphQL
+round trips and editors tied up web workers. The admin now saves locally and
+records a ShopifyPushJob in the same transaction; once it commits a
+background worker runs the push and the admin shows each object's job
+status.
+
+- A pending job is not duplicated: saving an object again before its push
+  ran reuses the queued job, which reads the object's current state.
+- Jobs of one object run in order on one worker; different objects are
+  pushed concurrently through the PushExecutor.
+- Failures reported by Shopify fail the job with their message. Exceptions
+  (timeouts, connection errors) are retried up to MAX_ATTEMPTS times.
+- Once started, the in-process worker also drains every ``retry_interval``
+  seconds, backing off while the only work left is retrying jobs, so retries
+  and jobs left in processing by a worker that died (reclaimed after
+  CLAIM_TIMEOUT) don't wait for the next save.
+
+Run ``python manage.py process_push_outbox`` to drain the outbox outside the
+web process.
+"""
+
+import json
+import logging
+import threading
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.apps import apps
+from django.db import connection, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ShopifyPushJob
+from .push_executor import PushExecutor, _push_settings
+
+logger = logging.getLogger('shopify_integration')
+
+DEFAULT_BATCH_SIZE = 100
+MAX_ATTEMPTS = 3
+# A job processing for longer than this belongs to a worker that died
+CLAIM_TIMEOUT = timedelta(minutes=10)
+# Seconds between worker drains while idle, doubled up to the maximum while jobs keep retrying
+DEFAULT_RETRY_INTERVAL = 30
+DEFAULT_MAX_RETRY_INTERVAL = 15 * 60
+
+
+# ==================== OPERATIONS ====================
+
+def _push_product(product, job):
+    from products.bidirectional_sync import ProductBidirectionalSync
+    return ProductBidirectionalSync().push_product_to_shopify(product)
+
+
+def _delete_product(product, job):
+    from .enhanced_client import EnhancedShopifyAPIClient
+    return EnhancedShopifyAPIClient().delete_product_in_shopify(job.payload['shopify_id'])
+
+
+def _push_selling_plan(selling_plan, job):
+    from customer_subscriptions.bidirectional_sync import subscription_sync
+
+    result = subscription_sync.create_selling_plan_in_shopify(selling_plan)
+    if result.get('success'):
+        selling_plan.refresh_from_db()
+        result['published_products'] = subscription_sync.publish_selling_plan_products(selling_plan)
+    return result
+
+
+def _push_subscription(subscription, job):
+    from customer_subscriptions.bidirectional_sync import subscription_sync
+
+    if subscription.shopify_id and not subscription.shopify_id.startswith('temp_'):
+        return subscription_sync.update_subscription_in_shopify(subscription)
+    return subscription_sync.create_subscription_in_shopify(subscription)
+
+
+def _create_subscription(subscription, job):
+    from customer_subscriptions.bidirectional_sync import subscription_sync
+    return subscription_sync.create_subscription_in_shopify(subscription)
+
+
+def _update_subscription(subscription, job):
+    from customer_subscriptions.bidirectional_sync import subscription_sync
+    return subscription_sync.update_subscription_in_shopify(subscription)
+
+
+# (model label, operation) -> callable(obj, job) returning a dict with success and message.
+# Delete operations receive None, as the object is gone; they read job.payload instead.
+PUSH_OPERATIONS = {
+    ('products.shopifyproduct', 'push'): _push_product,
+    ('products.shopifyproduct', 'delete'): _delete_product,
+    ('customer_subscriptions.sellingplan', 'push'): _push_selling_plan,
+    ('customer_subscriptions.customersubscription', 'push'): _push_subscription,
+    ('customer_subscriptions.customersubscription', 'create'): _create_subscription,
+    ('customer_subscriptions.customersubscription', 'update'): _update_subscription,
+}
+
+
+# ==================== ENQUEUE ====================
+
+def enqueue_pushes(objects: Iterable, operation: str = 'push', requested_by: str = '',
+                   payload: Optional[Dict] = None) -> List[ShopifyPushJob]:
+    """
+    Queue a Shopify push for each object, reusing jobs still pending
+
+    Call inside the transaction that saved the objects; the worker is woken
+    once it commits.
+
+    Returns:
+        One job per object, in input order
+    """
+    objects = list(objects)
+    if not objects:
+        return []
+
+    target = objects[0]._meta.label_lower
+    if (target, operation) not in PUSH_OPERATIONS:
+        raise ValueError(f"No Shopify push operation '{operation}' for {target}")
+
+    object_ids = [str(obj.pk) for obj in objects]
+    pending = ShopifyPushJob.objects.filter(target=target, object_id__in=object_ids, status='pending')
+    if operation == 'delete':
+        # Queued pushes of a deleted object could only fail
+        pending.exclude(operation='delete').delete()
+
+    existing = {job.object_id: job for job in pending.filter(operation=operation)}
+    new_jobs = [
+        ShopifyPushJob(
+            target=target,
+            object_id=object_id,
+            object_repr=str(obj)[:255],
+            operation=operation,
+            payload=payload,
+            requested_by=requested_by,
+        )
+        for obj, object_id in zip(objects, object_ids) if object_id not in existing
+    ]
+    if new_jobs:
+        ShopifyPushJob.objects.bulk_create(new_jobs)
+        transaction.on_commit(push_worker.wake)
+
+    created = iter(new_jobs)
+    return [existing[object_id] if object_id in existing else next(created) for object_id in object_ids]
+
+
+def enqueue_push(obj, operation: str = 'push', requested_by: str = '', payload: Optional[Dict] = None) -> ShopifyPushJob:
+    """Queue a Shopify push of one object; see enqueue_pushes"""
+    return enqueue_pushes([obj], operation, requested_by, payload)[0]
+
+
+def latest_push_jobs(model, object_ids: Iterable) -> Dict[str, ShopifyPushJob]:
+    """Most recent push job of each object, keyed by object_id"""
+    jobs = ShopifyPushJob.objects.filter(
+        target=model._meta.label_lower, object_id__in=[str(pk) for pk in object_ids]
+    ).order_by('object_id', '-created_at', '-pk')
+    latest = {}
+    for job in jobs:
+        latest.setdefault(job.object_id, job)
+    return latest
+
+
+# ==================== PROCESSING ====================
+
+def _claim(jobs: List[ShopifyPushJob]) -> List[ShopifyPushJob]:
+    """Mark jobs as processing; jobs another worker claimed first are skipped"""
+    claimed = []
+    for job in jobs:
+        if ShopifyPushJob.objects.filter(pk=job.pk, status='pending').update(
+            status='processing', claimed_at=timezone.now()
+        ):
+            claimed.append(job)
+    return claimed
+
+
+def reclaim_stale_jobs(timeout: timedelta = CLAIM_TIMEOUT) -> int:
+    """
+    Return jobs stuck in processing longer than ``timeout`` to the outbox
+
+    The interrupted run counts as an attempt, so a push that keeps killing its
+    worker ends up failed rather than being retried forever.
+
+    Returns:
+        Number of jobs reclaimed
+    """
+    stale = ShopifyPushJob.objects.filter(status='processing').filter(
+        Q(claimed_at__lt=timezone.now() - timeout) | Q(claimed_at__isnull=True)
+    )
+    message = 'Worker stopped while processing'
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS - 1).update(
+        status='failed', attempts=F('attempts') + 1, error_message=message, finished_at=timezone.now()
+    )
+    retrying = stale.update(status='pending', attempts=F('attempts') + 1, error_message=message)
+    if failed or retrying:
+        logger.warning(f"Reclaimed {failed + retrying} Shopify push jobs left processing ({failed} failed)")
+    return failed + retrying
+
+
+def _json_safe(result: Dict) -> Dict:
+    return json.loads(json.dumps(result, default=str))
+
+
+def _run_job(job: ShopifyPushJob) -> Dict:
+    """Run one job and record its outcome"""
+    job.attempts += 1
+    job.started_at = timezone.now()
+    try:
+        operation = PUSH_OPERATIONS.get((job.target, job.operation))
+        if operation is None:
+            result = {'success': False, 'message': f"No Shopify push operation '{job.operation}' for {job.target}"}
+        elif job.operation == 'delete':
+            result = operation(None, job) or {}
+        else:
+            obj = apps.get_model(job.target)._default_manager.filter(pk=job.object_id).first()
+            if obj is None:
+                result = {'success': False, 'message': 'Object no longer exists'}
+            else:
+                result = operation(obj, job) or {}
+    except Exception as e:
+        job.error_message = str(e)
+        job.status = 'failed' if job.attempts >= MAX_ATTEMPTS else 'pending'
+        job.result = None
+        logger.error(f"Shopify {job.operation} of {job.target} {job.object_id} failed (attempt {job.attempts}): {e}")
+        result = {'success': False, 'message': str(e)}
+    else:
+        job.status = 'succeeded' if result.get('success') else 'failed'
+        job.error_message = '' if result.get('success') else result.get('message', 'Unknown error')
+        job.result = _json_safe(result)
+
+    if job.status != 'pending':
+        job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'attempts', 'error_message', 'result', 'started_at', 'finished_at'])
+    return result
+
+
+def drain_push_outbox(batch_size: int = DEFAULT_BATCH_SIZE, workers: Optional[int] = None,
+                      claim_timeout: timedelta = CLAIM_TIMEOUT) -> Dict[str, int]:
+    """
+    Run pending push jobs until the outbox is empty
+
+    Jobs claimed longer than ``claim_timeout`` ago are returned to the outbox first.
+
+    Returns:
+        Counts of succeeded, failed, retrying and reclaimed jobs
+    """
+    totals = {'succeeded': 0, 'failed': 0, 'retrying': 0, 'reclaimed': reclaim_stale_jobs(claim_timeout)}
+    retried = set()
+    if connection.vendor == 'sqlite':
+        # SQLite takes one writer at a time, so parallel workers would only contend
+        workers = 1
+
+    while True:
+        pending = list(ShopifyPushJob.objects.filter(status='pending').exclude(pk__in=retried)[:batch_size])
+        if not pending:
+            return totals
+
+        claimed = _claim(pending)
+        PushExecutor(
+            _run_job,
+            key=lambda job: (job.target, job.object_id),
+            workers=workers,
+            label='outbox jobs',
+        ).run(claimed)
+
+        for job in claimed:
+            totals['retrying' if job.status == 'pending' else job.status] += 1
+        # Retried jobs wait for the next drain rather than spinning in this one
+        retried.update(job.pk for job in claimed if job.status == 'pending')
+
+
+class PushOutboxWorker:
+    """In-process background drainer, woken whenever a push is queued and periodically for retries"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def wake(self):
+        if not _push_settings().get('inline_worker', True):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='shopify-push-outbox', daemon=True)
+                self._thread.start()
+        self._event.set()
+
+    def stop(self):
+        """Let the worker thread exit after its current drain"""
+        self._stopped = True
+        self._event.set()
+
+    def _run(self):
+        options = _push_settings()
+        interval = options.get('retry_interval', DEFAULT_RETRY_INTERVAL)
+        max_interval = options.get('max_retry_interval', DEFAULT_MAX_RETRY_INTERVAL)
+        delay = interval
+        while True:
+            self._event.wait(delay)
+            if self._stopped:
+                return
+            self._event.clear()
+            totals = None
+            try:
+                totals = drain_push_outbox()
+            except Exception as e:
+                logger.error(f"Push outbox worker error: {e}")
+            finally:
+                connections.close_all()
+            # Back off while jobs keep failing; a newly queued push still wakes the worker at once
+            delay = min(delay * 2, max_interval) if totals is None or totals['retrying'] else interval
+
+
+push_worker = PushOutboxWorker()
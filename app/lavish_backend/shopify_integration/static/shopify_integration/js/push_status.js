@@ -0,0 +1,32 @@
+// Refresh Shopify push status badges until their queued and running jobs finish
+(function () {
+    var POLL_MS = 3000;
+    var ACTIVE = ['pending', 'processing'];
+
+    function poll() {
+        var badges = document.querySelectorAll('.shopify-push-status');
+        var active = Array.prototype.filter.call(badges, function (badge) {
+            return ACTIVE.indexOf(badge.getAttribute('data-status')) !== -1;
+        });
+        if (!active.length) {
+            return;
+        }
+        var requests = active.map(function (badge) {
+            return fetch(badge.getAttribute('data-status-url'), {credentials: 'same-origin'})
+                .then(function (response) { return response.json(); })
+                .then(function (job) {
+                    if (!job.status) {
+                        return;
+                    }
+                    badge.setAttribute('data-status', job.status);
+                    badge.textContent = job.label;
+                    badge.style.color = job.color;
+                    badge.title = job.error || '';
+                })
+                .catch(function () {});
+        });
+        Promise.all(requests).then(function () { setTimeout(poll, POLL_MS); });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () { setTimeout(poll, POLL_MS); });
+})();
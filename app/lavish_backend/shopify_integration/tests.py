@@ -1,3 +1,941 @@
-from django.test import TestCase
+"""
+Tests for Shopify integration sync helpers
+"""
 
-# Create your tests here.
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import Mock, patch
+
+from customers.models import ShopifyCustomer, ShopifyCustomerAddress
+from customers.realtime_sync import RealtimeCustomerSyncService
+from orders.realtime_sync import RealtimeOrderSyncService
+from inventory.models import ShopifyInventoryLevel, ShopifyLocation
+from orders.models import ShopifyOrder, ShopifyOrderLineItem, ShopifyOrderAddress
+from products.models import ShopifyProduct, ShopifyProductVariant, ShopifyProductImage
+from products.realtime_sync import RealtimeProductSyncService
+from shopify_integration.bulk_operations import BulkOperationError, ShopifyBulkOperationImporter, reassemble_jsonl
+from shopify_integration.bulk_upsert import (
+    bulk_upsert, upsert_customers, upsert_products, upsert_orders, upsert_inventory_items,
+)
+from shopify_integration.enhanced_client import EnhancedShopifyAPIClient
+from shopify_integration.http_pool import build_session, get_session
+from shopify_integration.incremental_sync import sync_resource
+from shopify_integration.models import APIRateLimit, ShopifyPushJob, ShopifyStore, SyncWatermark, WebhookDelivery
+from shopify_integration.push_executor import PushExecutor
+from shopify_integration import push_outbox
+from shopify_integration.throttle import GraphQLCostBudget, RateLimitRecorder, query_key
+from shopify_integration.views import webhook_handler
+from shopify_integration.webhook_queue import MAX_ATTEMPTS, WebhookQueueWorker, drain_webhook_queue
+
+
+def customer_node(number, email=None):
+    return {
+        'id': f'gid://shopify/Customer/{number}',
+        'firstName': f'First{number}',
+        'lastName': f'Last{number}',
+        'email': email or f'customer{number}@example.com',
+        'createdAt': '2025-01-01T00:00:00Z',
+        'updatedAt': '2025-01-02T00:00:00Z',
+        'numberOfOrders': 1,
+        'tags': ['vip'],
+        'addresses': [{
+            'id': f'gid://shopify/MailingAddress/{number}',
+            'address1': f'{number} Main St',
+            'city': 'Sydney',
+            'country': 'Australia',
+            'zip': '2000',
+        }],
+    }
+
+
+class RecordingEvent(threading.Event):
+    """Event recording the timeout of every wait, for worker backoff tests"""
+
+    def __init__(self):
+        super().__init__()
+        self.timeouts = []
+
+    def wait(self, timeout=None):
+        self.timeouts.append(timeout)
+        return super().wait(timeout)
+
+
+def product_node(number):
+    return {
+        'id': f'gid://shopify/Product/{number}',
+        'title': f'Product {number}',
+        'handle': f'product-{number}',
+        'status': 'ACTIVE',
+        'createdAt': '2025-01-01T00:00:00Z',
+        'updatedAt': '2025-01-02T00:00:00Z',
+        'variants': {'edges': [{'node': {
+            'id': f'gid://shopify/ProductVariant/{number}',
+            'title': 'Default Title',
+            'sku': f'SKU-{number}',
+            'price': '19.95',
+        }}]},
+        'images': {'edges': [{'node': {
+            'id': f'gid://shopify/ProductImage/{number}',
+            'src': f'https://cdn.example.com/{number}.jpg',
+        }}]},
+    }
+
+
+def order_node(number, product_number):
+    return {
+        'id': f'gid://shopify/Order/{number}',
+        'name': f'#{number}',
+        'email': 'buyer@example.com',
+        'createdAt': '2025-01-01T00:00:00Z',
+        'updatedAt': '2025-01-02T00:00:00Z',
+        'displayFinancialStatus': 'PAID',
+        'displayFulfillmentStatus': 'FULFILLED',
+        'totalPriceSet': {'shopMoney': {'amount': '19.95', 'currencyCode': 'AUD'}},
+        'shippingAddress': {'firstName': 'Buyer', 'city': 'Sydney', 'zip': '2000'},
+        'lineItems': {'edges': [{'node': {
+            'id': f'gid://shopify/LineItem/{number}',
+            'title': f'Product {product_number}',
+            'quantity': 2,
+            'variant': {'id': f'gid://shopify/ProductVariant/{product_number}', 'price': '19.95'},
+            'product': {'id': f'gid://shopify/Product/{product_number}'},
+        }}]},
+    }
+
+
+class BulkUpsertTestCase(TestCase):
+    """Batched upsert layer used by the full Shopify syncs"""
+
+    def test_bulk_upsert_counts_and_pk_map(self):
+        rows = [{'shopify_id': f'gid://shopify/Customer/{n}', 'email': f'{n}@example.com'} for n in range(3)]
+        result = bulk_upsert(ShopifyCustomer, rows)
+        self.assertEqual((result.created, result.updated), (3, 0))
+        self.assertEqual(set(result.pk_map), {row['shopify_id'] for row in rows})
+
+        rows = [
+            {'shopify_id': 'gid://shopify/Customer/0', 'email': 'changed@example.com'},
+            {'shopify_id': 'gid://shopify/Customer/9', 'email': 'new@example.com'},
+        ]
+        result = bulk_upsert(ShopifyCustomer, rows)
+        self.assertEqual((result.created, result.updated), (1, 1))
+        self.assertEqual(ShopifyCustomer.objects.get(shopify_id='gid://shopify/Customer/0').email,
+                         'changed@example.com')
+        self.assertEqual(ShopifyCustomer.objects.count(), 4)
+
+    def test_upsert_customers_batches_queries(self):
+        upsert_customers([customer_node(1)])
+
+        page = [customer_node(n) for n in range(1, 101)]
+        with CaptureQueriesContext(connection) as queries:
+            stats = upsert_customers(page)
+
+        # Per-record update_or_create needed several hundred queries for this page
+        self.assertLess(len(queries), 20)
+
+        self.assertEqual(stats['created'], 99)
+        self.assertEqual(stats['updated'], 1)
+        self.assertEqual(stats['addresses'], 100)
+        self.assertEqual(ShopifyCustomer.objects.count(), 100)
+        self.assertEqual(ShopifyCustomerAddress.objects.count(), 100)
+        self.assertFalse(ShopifyCustomerAddress.objects.filter(needs_shopify_push=True).exists())
+
+    def test_upsert_customers_keeps_fields_the_query_does_not_select(self):
+        upsert_customers([customer_node(1)])
+        customer = ShopifyCustomer.objects.get(shopify_id='gid://shopify/Customer/1')
+        ShopifyCustomer.objects.filter(pk=customer.pk).update(accepts_marketing=True)
+        ShopifyCustomerAddress.objects.filter(customer=customer).update(company='Lavish Library')
+
+        node = customer_node(1)
+        node['defaultAddress'] = {'id': 'gid://shopify/MailingAddress/1'}
+        upsert_customers([node])
+
+        customer.refresh_from_db()
+        address = ShopifyCustomerAddress.objects.get(customer=customer)
+        self.assertTrue(customer.accepts_marketing)
+        self.assertEqual(address.company, 'Lavish Library')
+        self.assertTrue(address.is_default)
+
+    def test_upsert_products_and_orders(self):
+        stats = upsert_products([product_node(n) for n in range(1, 6)])
+        self.assertEqual((stats['created'], stats['variants'], stats['images']), (5, 5, 5))
+        self.assertEqual(ShopifyProductVariant.objects.count(), 5)
+        self.assertEqual(ShopifyProductImage.objects.count(), 5)
+
+        stats = upsert_products([product_node(1)])
+        self.assertEqual((stats['created'], stats['updated']), (0, 1))
+        self.assertEqual(ShopifyProduct.objects.count(), 5)
+
+        stats = upsert_orders([order_node(1001, 1), order_node(1002, 2)])
+        self.assertEqual((stats['created'], stats['line_items']), (2, 2))
+        line_item = ShopifyOrderLineItem.objects.get(shopify_id='gid://shopify/LineItem/1001')
+        self.assertEqual(line_item.product.shopify_id, 'gid://shopify/Product/1')
+        self.assertEqual(line_item.variant.shopify_id, 'gid://shopify/ProductVariant/1')
+        self.assertEqual(ShopifyOrderAddress.objects.count(), 2)
+
+        stats = upsert_orders([order_node(1001, 1)])
+        self.assertEqual((stats['created'], stats['updated']), (0, 1))
+        self.assertEqual(ShopifyOrder.objects.get(shopify_id='gid://shopify/Order/1001').financial_status, 'paid')
+        self.assertEqual(ShopifyOrderAddress.objects.count(), 2)
+
+    def test_upsert_inventory_items_creates_locations_once(self):
+        def item_node(number, available):
+            return {
+                'id': f'gid://shopify/InventoryItem/{number}',
+                'sku': f'SKU-{number}',
+                'inventoryLevels': {'edges': [{'node': {
+                    'quantities': [{'name': 'available', 'quantity': available}],
+                    'updatedAt': '2025-01-02T00:00:00Z',
+                    'location': {'id': 'gid://shopify/Location/1', 'name': 'Warehouse'},
+                }}]},
+            }
+
+        stats = upsert_inventory_items([item_node(1, 5), item_node(2, 7)])
+        self.assertEqual((stats['created'], stats['levels'], stats['locations']), (2, 2, 1))
+
+        stats = upsert_inventory_items([item_node(1, 3)])
+        self.assertEqual((stats['updated'], stats['locations']), (1, 0))
+        level = ShopifyInventoryLevel.objects.get(inventory_item__shopify_id='gid://shopify/InventoryItem/1')
+        self.assertEqual(level.available, 3)
+        self.assertFalse(level.needs_shopify_push)
+        self.assertEqual(ShopifyLocation.objects.count(), 1)
+
+
+class PagedFetchTestCase(TestCase):
+    """Page-by-page fetch and persist pipeline"""
+
+    def setUp(self):
+        self.client = EnhancedShopifyAPIClient('test-shop.myshopify.com', 'token', '2024-10')
+        self.pages = [
+            [customer_node(n) for n in range(1, 51)],
+            [customer_node(n) for n in range(51, 71)],
+        ]
+
+    def fake_response(self, query, variables=None):
+        page_number = 1 if 'after:' in query else 0
+        return {'data': {'customers': {
+            'nodes': self.pages[page_number],
+            'pageInfo': {'hasNextPage': page_number == 0, 'endCursor': 'cursor-1'},
+        }}}
+
+    def test_iter_customers_prefetches_next_page_while_caller_works(self):
+        next_page_requested = threading.Event()
+
+        def tracking_response(query, variables=None):
+            if 'after:' in query:
+                next_page_requested.set()
+            return self.fake_response(query, variables)
+
+        with patch.object(self.client, 'execute_graphql_query', side_effect=tracking_response) as query:
+            pages = self.client.iter_customers()
+            self.assertEqual(len(next(pages)), 50)
+            # The second page is in flight before the caller asks for it
+            self.assertTrue(next_page_requested.wait(timeout=2))
+            self.assertEqual(len(next(pages)), 20)
+            self.assertEqual(query.call_count, 2)
+
+        with patch.object(self.client, 'execute_graphql_query', side_effect=self.fake_response) as query:
+            pages = list(self.client.iter_customers(prefetch=False))
+            self.assertEqual([len(page) for page in pages], [50, 20])
+            self.assertEqual(query.call_count, 2)
+
+        with patch.object(self.client, 'execute_graphql_query', side_effect=self.fake_response):
+            self.assertEqual(len(self.client.fetch_all_customers(limit=60)), 60)
+
+    def test_realtime_sync_keeps_pages_written_before_a_failure(self):
+        def failing_response(query, variables=None):
+            if 'after:' in query:
+                raise ConnectionError('connection reset')
+            return self.fake_response(query, variables)
+
+        with patch('customers.realtime_sync.EnhancedShopifyAPIClient', return_value=self.client), \
+                patch.object(self.client, 'execute_graphql_query', side_effect=failing_response):
+            result = RealtimeCustomerSyncService().sync_all_customers()
+
+        self.assertFalse(result['success'])
+        self.assertTrue(result['partial'])
+        self.assertIn('connection reset', result['message'])
+        self.assertEqual(result['stats']['created'], 50)
+        self.assertEqual(ShopifyCustomer.objects.count(), 50)
+
+
+class GraphQLCostBudgetTestCase(TestCase):
+    """Shared query-cost token bucket"""
+
+    def test_settle_refunds_unused_points_and_learns_query_cost(self):
+        budget = GraphQLCostBudget(capacity=1000, restore_rate=50)
+        reserved = budget.reserve('query { customers')
+        self.assertEqual(reserved, 100)
+
+        budget.settle('query { customers', reserved, {'requestedQueryCost': 252, 'actualQueryCost': 40})
+        self.assertGreaterEqual(budget.available, 960)
+        self.assertEqual(budget.reserve('query { customers'), 252)
+
+    def test_query_key_separates_anonymous_queries_but_not_pages(self):
+        shop = '{\n  shop { name }\n}'
+        products = '{\n  products(first: 50) { edges { node { id } } }\n}'
+        self.assertNotEqual(query_key(shop), query_key(products))
+
+        first_page = 'query {\n  customers(first: 50, query: "updated_at:>2024") { nodes { id } }\n}'
+        next_page = 'query {\n    customers(first: 50, after: "abc", query: "updated_at:>2025") { nodes { id } }\n}'
+        later_page = 'query {\n    customers(first: 50, after: "xyz", query: "updated_at:>2025") { nodes { id } }\n}'
+        self.assertEqual(query_key(next_page), query_key(later_page))
+        self.assertNotEqual(query_key(first_page), query_key(next_page))
+
+    def test_acquire_waits_for_points_to_restore(self):
+        budget = GraphQLCostBudget(capacity=100, restore_rate=1000)
+        self.assertEqual(budget.acquire(100), 0)
+        self.assertGreater(budget.acquire(50), 0)
+
+    def test_settle_adopts_reported_throttle_status(self):
+        budget = GraphQLCostBudget()
+        first = budget.reserve('query A')
+        budget.reserve('query B')
+
+        budget.settle('query A', first, {
+            'requestedQueryCost': 100, 'actualQueryCost': 80,
+            'throttleStatus': {'maximumAvailable': 2000.0, 'currentlyAvailable': 1500, 'restoreRate': 100.0},
+        })
+        state = budget.snapshot()
+        self.assertEqual((state['capacity'], state['restore_rate']), (2000.0, 100.0))
+        # Shopify's level, less the reservation still in flight for query B
+        self.assertAlmostEqual(state['available'], 1400, delta=5)
+
+    def test_client_retries_throttled_queries(self):
+        client = EnhancedShopifyAPIClient('throttled-shop.myshopify.com', 'token', '2024-10',
+                                          cost_budget=GraphQLCostBudget(restore_rate=100000))
+        throttled = {
+            'errors': [{'message': 'Throttled', 'extensions': {'code': 'THROTTLED'}}],
+            'extensions': {'cost': {'requestedQueryCost': 50, 'actualQueryCost': None,
+                                    'throttleStatus': {'maximumAvailable': 1000.0, 'currentlyAvailable': 10,
+                                                       'restoreRate': 100000.0}}},
+        }
+        ok = {'data': {'shop': {'name': 'Test'}}}
+        responses = [Mock(status_code=200, json=Mock(return_value=body)) for body in (throttled, ok)]
+
+        with patch.object(client.session, 'post', side_effect=responses) as post:
+            self.assertEqual(client.execute_graphql_query('query { shop { name } }'), ok)
+        self.assertEqual(post.call_count, 2)
+
+    def test_rate_limit_snapshots_are_periodic(self):
+        store = ShopifyStore.objects.create(
+            store_domain='snapshot-shop.myshopify.com', store_name='Test', api_key='key', api_secret='secret',
+            access_token='token',
+        )
+        recorder = RateLimitRecorder(interval=60)
+        budget = GraphQLCostBudget()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(recorder.record(store.store_domain, 'graphql', budget))
+            written = len(queries)
+            for _ in range(50):
+                self.assertFalse(recorder.record(store.store_domain, 'graphql', budget))
+        self.assertEqual(len(queries), written)
+        self.assertEqual(APIRateLimit.objects.filter(store=store, api_type='graphql').count(), 1)
+
+
+# Recorded bulk operation output: children follow their parent with a __parentId
+BULK_PRODUCTS_JSONL = [
+    {'id': 'gid://shopify/Product/1', 'title': 'Product 1', 'handle': 'product-1', 'status': 'ACTIVE',
+     'createdAt': '2025-01-01T00:00:00Z', 'updatedAt': '2025-01-02T00:00:00Z'},
+    {'id': 'gid://shopify/ProductVariant/11', 'title': 'Small', 'sku': 'SKU-11', 'price': '10.00',
+     '__parentId': 'gid://shopify/Product/1'},
+    {'id': 'gid://shopify/ProductVariant/12', 'title': 'Large', 'sku': 'SKU-12', 'price': '12.00',
+     '__parentId': 'gid://shopify/Product/1'},
+    {'id': 'gid://shopify/ProductImage/13', 'src': 'https://cdn.example.com/1.jpg',
+     '__parentId': 'gid://shopify/Product/1'},
+    {'id': 'gid://shopify/Product/2', 'title': 'Product 2', 'handle': 'product-2', 'status': 'DRAFT',
+     'createdAt': '2025-01-01T00:00:00Z', 'updatedAt': '2025-01-02T00:00:00Z'},
+    {'id': 'gid://shopify/ProductVariant/21', 'title': 'Default Title', 'sku': 'SKU-21', 'price': '5.00',
+     '__parentId': 'gid://shopify/Product/2'},
+]
+
+BULK_ORDERS_JSONL = [
+    {'id': 'gid://shopify/Order/1001', 'name': '#1001', 'email': 'buyer@example.com',
+     'createdAt': '2025-01-01T00:00:00Z', 'updatedAt': '2025-01-02T00:00:00Z',
+     'displayFinancialStatus': 'PAID', 'displayFulfillmentStatus': 'UNFULFILLED',
+     'totalPriceSet': {'shopMoney': {'amount': '22.00', 'currencyCode': 'AUD'}}},
+    {'id': 'gid://shopify/LineItem/1', 'title': 'Product 1', 'quantity': 1,
+     'variant': {'id': 'gid://shopify/ProductVariant/11', 'price': '10.00'},
+     'product': {'id': 'gid://shopify/Product/1'}, '__parentId': 'gid://shopify/Order/1001'},
+    {'id': 'gid://shopify/LineItem/2', 'title': 'Product 1', 'quantity': 1,
+     'variant': {'id': 'gid://shopify/ProductVariant/12', 'price': '12.00'},
+     'product': {'id': 'gid://shopify/Product/1'}, '__parentId': 'gid://shopify/Order/1001'},
+]
+
+
+class RecordedJSONLServer:
+    """Local HTTP stand-in for Shopify's bulk operation result storage"""
+
+    def __init__(self, files):
+        bodies = {
+            f'/{name}.jsonl': ''.join(json.dumps(line) + '\n' for line in lines).encode()
+            for name, lines in files.items()
+        }
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = bodies.get(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/jsonl')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class BulkOperationImportTestCase(TestCase):
+    """Bulk operation JSONL import feeding the shared upserts"""
+
+    def setUp(self):
+        self.client = EnhancedShopifyAPIClient('test-shop.myshopify.com', 'token', '2024-10')
+
+    def fake_graphql(self, result_url, polls_before_done=1):
+        polls = []
+
+        def respond(query, variables=None):
+            if 'bulkOperationRunQuery' in query:
+                return {'data': {'bulkOperationRunQuery': {
+                    'bulkOperation': {'id': 'gid://shopify/BulkOperation/1', 'status': 'CREATED'},
+                    'userErrors': [],
+                }}}
+            polls.append(variables['id'])
+            done = len(polls) > polls_before_done
+            return {'data': {'node': {
+                'id': variables['id'],
+                'status': 'COMPLETED' if done else 'RUNNING',
+                'objectCount': '6',
+                'url': result_url if done else None,
+            }}}
+
+        return respond
+
+    def test_reassemble_attaches_children_to_their_parent(self):
+        nodes = list(reassemble_jsonl(dict(line) for line in BULK_PRODUCTS_JSONL))
+        self.assertEqual([node['id'] for node in nodes], ['gid://shopify/Product/1', 'gid://shopify/Product/2'])
+        self.assertEqual(len(nodes[0]['variants']['edges']), 2)
+        self.assertEqual(len(nodes[0]['images']['edges']), 1)
+        self.assertNotIn('__parentId', nodes[0]['variants']['edges'][0]['node'])
+
+    def test_bulk_sync_products_then_orders_from_recorded_jsonl(self):
+        with RecordedJSONLServer({'products': BULK_PRODUCTS_JSONL, 'orders': BULK_ORDERS_JSONL}) as server:
+            with patch('shopify_integration.bulk_operations.time.sleep'), \
+                    patch('products.realtime_sync.EnhancedShopifyAPIClient', return_value=self.client), \
+                    patch.object(self.client, 'execute_graphql_query',
+                                 side_effect=self.fake_graphql(f'{server.url}/products.jsonl')):
+                result = RealtimeProductSyncService().sync_all_products(bulk=True)
+
+            self.assertTrue(result['success'])
+            self.assertEqual((result['stats']['created'], result['stats']['variants']), (2, 3))
+            self.assertEqual(ShopifyProductVariant.objects.filter(product__shopify_id='gid://shopify/Product/1').count(), 2)
+            self.assertEqual(ShopifyProductImage.objects.count(), 1)
+
+            with patch('shopify_integration.bulk_operations.time.sleep'), \
+                    patch('orders.realtime_sync.EnhancedShopifyAPIClient', return_value=self.client), \
+                    patch.object(self.client, 'execute_graphql_query',
+                                 side_effect=self.fake_graphql(f'{server.url}/orders.jsonl')):
+                result = RealtimeOrderSyncService().sync_all_orders(bulk=True)
+
+        self.assertTrue(result['success'])
+        line_item = ShopifyOrderLineItem.objects.get(shopify_id='gid://shopify/LineItem/2')
+        self.assertEqual(line_item.variant.shopify_id, 'gid://shopify/ProductVariant/12')
+        self.assertEqual(ShopifyOrder.objects.get().line_items.count(), 2)
+
+    def test_failed_operation_raises(self):
+        def failed(query, variables=None):
+            if 'bulkOperationRunQuery' in query:
+                return self.fake_graphql(None)(query, variables)
+            return {'data': {'node': {'id': variables['id'], 'status': 'FAILED', 'errorCode': 'TIMEOUT'}}}
+
+        importer = ShopifyBulkOperationImporter(self.client, poll_interval=0)
+        with patch.object(self.client, 'execute_graphql_query', side_effect=failed):
+            with self.assertRaises(BulkOperationError):
+                list(importer.iter_customers())
+
+
+class PooledSessionTestCase(TestCase):
+    """Keep-alive sessions shared by the integration clients"""
+
+    def test_session_reuses_one_connection(self):
+        client_ports = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                client_ports.append(self.client_address[1])
+                self.send_response(200)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        session = build_session()
+        try:
+            for _ in range(5):
+                self.assertEqual(session.get(f'http://127.0.0.1:{server.server_address[1]}/', timeout=5).json(), {})
+        finally:
+            session.close()
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(len(client_ports), 5)
+        self.assertEqual(len(set(client_ports)), 1)
+
+    def test_clients_share_the_process_session(self):
+        first = EnhancedShopifyAPIClient('test-shop.myshopify.com', 'token', '2024-10')
+        second = EnhancedShopifyAPIClient('other-shop.myshopify.com', 'token', '2024-10')
+        self.assertIs(first.session, second.session)
+        self.assertIs(first.session, get_session('shopify'))
+        self.assertIsNot(get_session('afterpay'), get_session('shopify'))
+
+
+class IncrementalSyncTestCase(TestCase):
+    """updated_at watermarks and periodic full reconcile"""
+
+    def setUp(self):
+        self.client = EnhancedShopifyAPIClient('test-shop.myshopify.com', 'token', '2024-10')
+        self.queries = []
+
+    def respond(self, nodes):
+        def fake(query, variables=None):
+            self.queries.append(query)
+            return {'data': {'customers': {'nodes': nodes, 'pageInfo': {'hasNextPage': False}}}}
+        return fake
+
+    def test_first_sync_is_full_then_incremental_from_watermark(self):
+        with patch.object(self.client, 'execute_graphql_query',
+                          side_effect=self.respond([customer_node(n) for n in range(1, 4)])):
+            stats = sync_resource(self.client, 'customers', 'test-shop.myshopify.com')
+        self.assertEqual((stats['mode'], stats['created'], stats['complete']), ('full', 3, True))
+        self.assertNotIn('updated_at', self.queries[-1])
+
+        watermark = SyncWatermark.objects.get(store_domain='test-shop.myshopify.com', resource='customers')
+        self.assertIsNotNone(watermark.last_full_sync)
+
+        with patch.object(self.client, 'execute_graphql_query',
+                          side_effect=self.respond([customer_node(2, email='changed@example.com')])):
+            stats = sync_resource(self.client, 'customers', 'test-shop.myshopify.com')
+        self.assertEqual((stats['mode'], stats['updated']), ('incremental', 1))
+        expected = watermark.updated_at_watermark.strftime('%Y-%m-%dT%H:%M:%SZ')
+        self.assertIn(f"updated_at:>='{expected}'", self.queries[-1])
+        self.assertEqual(ShopifyCustomer.objects.get(shopify_id='gid://shopify/Customer/2').email, 'changed@example.com')
+
+    def test_full_reconcile_removes_deleted_records_but_keeps_pending_pushes(self):
+        with patch.object(self.client, 'execute_graphql_query',
+                          side_effect=self.respond([customer_node(n) for n in range(1, 6)])):
+            sync_resource(self.client, 'customers', 'test-shop.myshopify.com')
+        ShopifyCustomer.objects.filter(shopify_id='gid://shopify/Customer/5').update(needs_shopify_push=True)
+
+        with patch.object(self.client, 'execute_graphql_query',
+                          side_effect=self.respond([customer_node(n) for n in range(1, 4)])):
+            stats = sync_resource(self.client, 'customers', 'test-shop.myshopify.com', full=True)
+
+        self.assertEqual(stats['deleted'], 1)
+        self.assertFalse(ShopifyCustomer.objects.filter(shopify_id='gid://shopify/Customer/4').exists())
+        self.assertTrue(ShopifyCustomer.objects.filter(shopify_id='gid://shopify/Customer/5').exists())
+
+    def test_interrupted_sync_keeps_old_watermark(self):
+        def failing(query, variables=None):
+            raise ConnectionError('connection reset')
+
+        with patch.object(self.client, 'execute_graphql_query', side_effect=failing):
+            stats = sync_resource(self.client, 'customers', 'test-shop.myshopify.com')
+
+        self.assertFalse(stats['complete'])
+        self.assertIsNone(SyncWatermark.objects.get(resource='customers').updated_at_watermark)
+
+    def test_failed_second_page_neither_reconciles_nor_advances_watermark(self):
+        with patch.object(self.client, 'execute_graphql_query',
+                          side_effect=self.respond([customer_node(n) for n in range(1, 21)])):
+            sync_resource(self.client, 'customers', 'test-shop.myshopify.com')
+        watermark = SyncWatermark.objects.get(resource='customers')
+
+        def second_page_fails(query, variables=None):
+            if 'after:' in query:
+                return {'error': 'HTTP 502: Bad Gateway'}
+            return {'data': {'customers': {
+                'nodes': [customer_node(n) for n in range(1, 4)],
+                'pageInfo': {'hasNextPage': True, 'endCursor': 'cursor-1'},
+            }}}
+
+        with patch.object(self.client, 'execute_graphql_query', side_effect=second_page_fails):
+            stats = sync_resource(self.client, 'customers', 'test-shop.myshopify.com', full=True)
+
+        self.assertFalse(stats['complete'])
+        self.assertIn('HTTP 502', stats['error'])
+        self.assertNotIn('deleted', stats)
+        self.assertEqual(ShopifyCustomer.objects.count(), 20)
+        refreshed = SyncWatermark.objects.get(resource='customers')
+        self.assertEqual((refreshed.updated_at_watermark, refreshed.last_full_sync),
+                         (watermark.updated_at_watermark, watermark.last_full_sync))
+
+    def test_record_that_fails_to_save_does_not_hold_back_the_watermark(self):
+        nodes = [customer_node(n) for n in range(1, 4)]
+        nodes[1]['createdAt'] = object()
+
+        with patch.object(self.client, 'execute_graphql_query', side_effect=self.respond(nodes)):
+            stats = sync_resource(self.client, 'customers', 'test-shop.myshopify.com')
+
+        self.assertEqual((stats['complete'], stats['created'], stats['errors']), (True, 2, 1))
+        watermark = SyncWatermark.objects.get(resource='customers')
+        self.assertIsNotNone(watermark.updated_at_watermark)
+        self.assertIsNotNone(watermark.last_full_sync)
+
+    def test_orders_are_only_reconciled_with_read_all_orders(self):
+        orders = [order_node(n, 1) for n in range(1, 13)]
+
+        def respond(scopes, nodes):
+            def fake(query, variables=None):
+                if 'currentAppInstallation' in query:
+                    return {'data': {'currentAppInstallation': {
+                        'accessScopes': [{'handle': handle} for handle in scopes]}}}
+                return {'data': {'orders': {'nodes': nodes, 'pageInfo': {'hasNextPage': False}}}}
+            return fake
+
+        with patch.object(self.client, 'execute_graphql_query', side_effect=respond(['read_orders'], orders)):
+            sync_resource(self.client, 'orders', 'test-shop.myshopify.com')
+        self.assertEqual(ShopifyOrder.objects.count(), 12)
+
+        # Orders older than 60 days are missing from the listing without read_all_orders
+        with patch.object(self.client, 'execute_graphql_query', side_effect=respond(['read_orders'], orders[:11])):
+            stats = sync_resource(self.client, 'orders', 'test-shop.myshopify.com', full=True)
+        self.assertEqual((stats['complete'], stats['deleted']), (True, 0))
+        self.assertEqual(ShopifyOrder.objects.count(), 12)
+
+        self.client = EnhancedShopifyAPIClient('test-shop.myshopify.com', 'token', '2024-10')
+        with patch.object(self.client, 'execute_graphql_query',
+                          side_effect=respond(['read_orders', 'read_all_orders'], orders[:11])):
+            stats = sync_resource(self.client, 'orders', 'test-shop.myshopify.com', full=True)
+        self.assertEqual(stats['deleted'], 1)
+        self.assertFalse(ShopifyOrder.objects.filter(shopify_id='gid://shopify/Order/12').exists())
+
+
+@override_settings(SHOPIFY_API_SECRET='webhook-secret', WEBHOOK_QUEUE_INLINE_WORKER=False)
+class WebhookQueueTestCase(TestCase):
+    """Fast-ack webhook ingestion and queue draining"""
+
+    def post(self, topic, data, webhook_id, secret='webhook-secret', triggered_at=None):
+        body = json.dumps(data).encode()
+        signature = base64.b64encode(hmac.new(secret.encode(), body, hashlib.sha256).digest()).decode()
+        headers = {
+            'HTTP_X_SHOPIFY_TOPIC': topic,
+            'HTTP_X_SHOPIFY_HMAC_SHA256': signature,
+            'HTTP_X_SHOPIFY_WEBHOOK_ID': webhook_id,
+        }
+        if triggered_at:
+            headers['HTTP_X_SHOPIFY_TRIGGERED_AT'] = triggered_at
+        request = RequestFactory().post('/webhook/', data=body, content_type='application/json', **headers)
+        return webhook_handler(request)
+
+    def test_rejects_bad_signature_without_queueing(self):
+        response = self.post('customers/update', {'id': 1}, 'wh-1', secret='wrong')
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(WebhookDelivery.objects.exists())
+
+    def test_redelivery_is_stored_once(self):
+        for _ in range(3):
+            self.assertEqual(self.post('orders/create', {'id': 5}, 'wh-dup').status_code, 200)
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual((delivery.topic, delivery.resource_id, delivery.status), ('orders/create', '5', 'pending'))
+
+    def test_drain_coalesces_updates_to_the_same_resource(self):
+        for n in range(3):
+            self.post('customers/update', {'id': 7, 'note': f'v{n}'}, f'wh-{n}',
+                      triggered_at=f'2025-01-01T00:00:0{n}Z')
+        self.post('customers/update', {'id': 8, 'note': 'other'}, 'wh-other')
+
+        with patch('shopify_integration.client.ShopifyWebhookHandler.handle_webhook', return_value=True) as handle:
+            totals = drain_webhook_queue(workers=1)
+
+        self.assertEqual((totals['processed'], totals['superseded']), (2, 2))
+        notes = [call.args[1]['note'] for call in handle.call_args_list]
+        self.assertEqual(sorted(notes), ['other', 'v2'])
+        self.assertEqual(WebhookDelivery.objects.filter(status='superseded').count(), 2)
+
+    def test_failed_processing_is_retried_then_marked_failed(self):
+        self.post('products/create', {'id': 9}, 'wh-fail')
+
+        with patch('shopify_integration.client.ShopifyWebhookHandler.handle_webhook', return_value=False):
+            totals = drain_webhook_queue(workers=1)
+            self.assertEqual(totals['retrying'], 1)
+            delivery = WebhookDelivery.objects.get()
+            self.assertEqual((delivery.status, delivery.attempts), ('pending', 1))
+
+            for _ in range(MAX_ATTEMPTS - 1):
+                drain_webhook_queue(workers=1)
+
+        delivery.refresh_from_db()
+        self.assertEqual((delivery.status, delivery.attempts), ('failed', MAX_ATTEMPTS))
+
+    def test_deliveries_left_processing_are_reclaimed_after_timeout(self):
+        self.post('products/create', {'id': 10}, 'wh-stuck')
+        self.post('products/create', {'id': 11}, 'wh-running')
+        self.post('products/create', {'id': 12}, 'wh-poison')
+        now = timezone.now()
+        WebhookDelivery.objects.filter(webhook_id='wh-stuck').update(
+            status='processing', claimed_at=now - timedelta(hours=1))
+        WebhookDelivery.objects.filter(webhook_id='wh-running').update(
+            status='processing', claimed_at=now)
+        WebhookDelivery.objects.filter(webhook_id='wh-poison').update(
+            status='processing', claimed_at=now - timedelta(hours=1), attempts=MAX_ATTEMPTS - 1)
+
+        with patch('shopify_integration.client.ShopifyWebhookHandler.handle_webhook', return_value=True) as handle:
+            totals = drain_webhook_queue(workers=1)
+
+        self.assertEqual((totals['reclaimed'], totals['processed']), (2, 1))
+        self.assertEqual([call.args[1]['id'] for call in handle.call_args_list], [10])
+        statuses = dict(WebhookDelivery.objects.values_list('webhook_id', 'status'))
+        self.assertEqual(statuses, {'wh-stuck': 'processed', 'wh-running': 'processing', 'wh-poison': 'failed'})
+        self.assertEqual(WebhookDelivery.objects.get(webhook_id='wh-stuck').attempts, 2)
+
+
+    @override_settings(WEBHOOK_QUEUE_INLINE_WORKER=True, WEBHOOK_QUEUE_RETRY_INTERVAL=0.01,
+                       WEBHOOK_QUEUE_MAX_RETRY_INTERVAL=0.04)
+    def test_worker_retries_periodically_with_backoff(self):
+        """After one wake the worker keeps draining, so retries run without another webhook"""
+        drains = iter([{'retrying': 1}, {'retrying': 1}, {'retrying': 1}, {'retrying': 0}])
+        worker = WebhookQueueWorker()
+        worker._event = RecordingEvent()
+        with patch('shopify_integration.webhook_queue.drain_webhook_queue',
+                   side_effect=lambda **kwargs: next(drains, {'retrying': 0})) as drain:
+            worker.wake()
+            deadline = time.monotonic() + 5
+            while len(worker._event.timeouts) < 6 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            worker.stop()
+            worker._thread.join(timeout=5)
+
+        self.assertFalse(worker._thread.is_alive())
+        self.assertGreaterEqual(drain.call_count, 5)
+        self.assertEqual(worker._event.timeouts[:6], [0.01, 0.02, 0.04, 0.04, 0.01, 0.01])
+
+class PushExecutorTestCase(TestCase):
+    """Test cases for the concurrent push executor"""
+
+    class Record:
+        def __init__(self, pk, parent):
+            self.pk = pk
+            self.parent = parent
+
+    def test_chains_keep_order_while_running_concurrently(self):
+        """Records sharing a key are pushed in order; different keys overlap"""
+        records = [self.Record(pk, parent=pk % 3) for pk in range(12)]
+        pushed = []
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def push(record):
+            with lock:
+                active.append(record.pk)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.remove(record.pk)
+                pushed.append(record)
+            if record.pk == 4:
+                raise ValueError('rejected')
+            return {'success': True}
+
+        prepared = []
+        # The pool only runs on databases that accept concurrent writers
+        with patch.object(connection, 'vendor', 'postgresql'):
+            report = PushExecutor(
+                push, key=lambda record: record.parent, before_chain=lambda chain: prepared.append(chain[0].parent),
+                workers=3,
+            ).run(records)
+
+        for parent in range(3):
+            self.assertEqual([r.pk for r in pushed if r.parent == parent], list(range(parent, 12, 3)))
+        self.assertEqual(sorted(prepared), [0, 1, 2])
+        self.assertGreater(max(peak), 1)
+        self.assertLessEqual(max(peak), 3)
+
+        self.assertEqual(report['total'], 12)
+        self.assertEqual(report['successful'], 11)
+        self.assertEqual([record.pk for record, _ in report['results']], list(range(12)))
+        self.assertIn('rejected', report['results'][4][1]['message'])
+        self.assertGreater(report['records_per_second'], 0)
+        self.assertGreaterEqual(report['latency']['max'], report['latency']['p50'])
+        # Three chains of four 20 ms pushes, well below the 240 ms of a serial run
+        self.assertLess(report['seconds'], 0.2)
+
+    def test_sqlite_pushes_run_one_at_a_time(self):
+        records = [self.Record(pk, parent=pk) for pk in range(4)]
+        threads = set()
+
+        def push(record):
+            threads.add(threading.current_thread().name)
+            return {'success': True}
+
+        with patch.object(connection, 'vendor', 'sqlite'):
+            report = PushExecutor(push, workers=4).run(records)
+
+        self.assertEqual(report['successful'], 4)
+        self.assertEqual(threads, {threading.current_thread().name})
+
+    def test_failed_chain_preparation_fails_its_records(self):
+        """A chain whose parent could not be pushed reports every record as failed"""
+        records = [self.Record(1, parent='a'), self.Record(2, parent='b'), self.Record(3, parent='a')]
+
+        def before_chain(chain):
+            if chain[0].parent == 'a':
+                raise ValueError('Customer push failed')
+
+        report = PushExecutor(
+            lambda record: {'success': True}, key=lambda record: record.parent, before_chain=before_chain, workers=2,
+        ).run(records)
+        self.assertEqual([result['success'] for _, result in report['results']], [False, True, False])
+        self.assertEqual(report['results'][0][1]['message'], 'Customer push failed')
+
+
+class PushOutboxTestCase(TestCase):
+    """Admin pushes queued in the outbox and run by the push worker"""
+
+    def setUp(self):
+        self.product = ShopifyProduct.objects.create(
+            shopify_id='gid://shopify/Product/1', title='Candle', handle='candle', needs_shopify_push=True,
+        )
+
+    def test_pending_jobs_are_reused_until_they_run(self):
+        first = push_outbox.enqueue_push(self.product)
+        self.assertEqual(push_outbox.enqueue_push(self.product).pk, first.pk)
+
+        with patch('products.bidirectional_sync.ProductBidirectionalSync.push_product_to_shopify',
+                   return_value={'success': True, 'message': 'ok'}) as push:
+            totals = push_outbox.drain_push_outbox(workers=1)
+
+        push.assert_called_once()
+        self.assertEqual(push.call_args.args[0].pk, self.product.pk)
+        self.assertEqual(totals, {'succeeded': 1, 'failed': 0, 'retrying': 0, 'reclaimed': 0})
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts, first.result), ('succeeded', 1, {'success': True, 'message': 'ok'}))
+
+        # Once the queued push ran, the next save queues a new one
+        self.assertNotEqual(push_outbox.enqueue_push(self.product).pk, first.pk)
+
+    def test_rejected_pushes_fail_and_exceptions_are_retried(self):
+        rejected = push_outbox.enqueue_push(self.product)
+        with patch('products.bidirectional_sync.ProductBidirectionalSync.push_product_to_shopify',
+                   return_value={'success': False, 'message': 'Title is too long'}):
+            push_outbox.drain_push_outbox(workers=1)
+        rejected.refresh_from_db()
+        self.assertEqual((rejected.status, rejected.error_message), ('failed', 'Title is too long'))
+
+        job = push_outbox.enqueue_push(self.product)
+        with patch('products.bidirectional_sync.ProductBidirectionalSync.push_product_to_shopify',
+                   side_effect=ConnectionError('timed out')):
+            totals = push_outbox.drain_push_outbox(workers=1)
+            self.assertEqual(totals['retrying'], 1)
+            for _ in range(push_outbox.MAX_ATTEMPTS - 1):
+                push_outbox.drain_push_outbox(workers=1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error_message), ('failed', push_outbox.MAX_ATTEMPTS, 'timed out'))
+
+    def test_jobs_left_processing_are_reclaimed_after_timeout(self):
+        stuck, running, poison = (
+            ShopifyPushJob.objects.create(target='products.shopifyproduct', object_id=str(self.product.pk))
+            for _ in range(3)
+        )
+        now = timezone.now()
+        ShopifyPushJob.objects.filter(pk=stuck.pk).update(status='processing', claimed_at=now - timedelta(hours=1))
+        ShopifyPushJob.objects.filter(pk=running.pk).update(status='processing', claimed_at=now)
+        ShopifyPushJob.objects.filter(pk=poison.pk).update(
+            status='processing', claimed_at=now - timedelta(hours=1), attempts=push_outbox.MAX_ATTEMPTS - 1)
+
+        with patch('products.bidirectional_sync.ProductBidirectionalSync.push_product_to_shopify',
+                   return_value={'success': True}) as push:
+            totals = push_outbox.drain_push_outbox(workers=1)
+
+        push.assert_called_once()
+        self.assertEqual((totals['reclaimed'], totals['succeeded']), (2, 1))
+        statuses = {job.pk: (job.status, job.attempts) for job in ShopifyPushJob.objects.all()}
+        self.assertEqual(statuses, {
+            stuck.pk: ('succeeded', 2),
+            running.pk: ('processing', 0),
+            poison.pk: ('failed', push_outbox.MAX_ATTEMPTS),
+        })
+
+    @override_settings(SHOPIFY_PUSH_SETTINGS={'retry_interval': 0.01, 'max_retry_interval': 0.04})
+    def test_worker_retries_periodically_with_backoff(self):
+        """After one wake the worker keeps draining, backing off while jobs retry"""
+        drains = iter([{'retrying': 1}, {'retrying': 1}, {'retrying': 1}, {'retrying': 0}])
+        worker = push_outbox.PushOutboxWorker()
+        worker._event = RecordingEvent()
+        with patch('shopify_integration.push_outbox.drain_push_outbox',
+                   side_effect=lambda: next(drains, {'retrying': 0})) as drain:
+            worker.wake()
+            deadline = time.monotonic() + 5
+            while len(worker._event.timeouts) < 6 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            worker.stop()
+            worker._thread.join(timeout=5)
+
+        self.assertFalse(worker._thread.is_alive())
+        self.assertGreaterEqual(drain.call_count, 5)
+        self.assertEqual(worker._event.timeouts[:6], [0.01, 0.02, 0.04, 0.04, 0.01, 0.01])
+
+    def test_delete_runs_from_the_payload_after_the_object_is_gone(self):
+        push_outbox.enqueue_push(self.product)
+        push_outbox.enqueue_push(self.product, 'delete', payload={'shopify_id': self.product.shopify_id})
+        self.product.delete()
+
+        with patch('shopify_integration.enhanced_client.EnhancedShopifyAPIClient.delete_product_in_shopify',
+                   return_value={'success': True}) as delete:
+            push_outbox.drain_push_outbox(workers=1)
+
+        delete.assert_called_once_with('gid://shopify/Product/1')
+        self.assertEqual(list(ShopifyPushJob.objects.values_list('operation', 'status')), [('delete', 'succeeded')])
+
+    def test_admin_action_queues_instead_of_pushing(self):
+        admin_user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin_user)
+
+        with patch('products.bidirectional_sync.ProductBidirectionalSync.push_product_to_shopify') as push, \
+                self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse('admin:products_shopifyproduct_changelist'), {
+                'action': 'push_to_shopify', '_selected_action': [self.product.pk],
+            })
+        self.assertEqual(response.status_code, 302)
+        push.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+        job = ShopifyPushJob.objects.get()
+        self.assertEqual((job.target, job.object_id, job.requested_by), ('products.shopifyproduct', str(self.product.pk), 'admin'))
+
+        status_url = reverse('admin:products_shopifyproduct_push_status', args=[self.product.pk])
+        self.assertEqual(self.client.get(status_url).json()['status'], 'pending')
+        changelist = self.client.get(reverse('admin:products_shopifyproduct_changelist'))
+        self.assertContains(changelist, f'data-status-url="{status_url}"')
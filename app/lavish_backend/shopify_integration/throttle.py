@@ -0,0 +1,270 @@
+"""
+Shared Shopify API rate limiting
+
+Shopify meters each store with leaky buckets: GraphQL in query-cost points,
+REST in calls. Every client in this process draws from one in-process token
+bucket per store and API type, re-synchronised from what Shopify reports
+(``extensions.cost.throttleStatus`` for GraphQL, ``X-Shopify-Shop-Api-Call-Limit``
+for REST), so concurrent callers run as fast as the bucket allows without
+being throttled. APIRateLimit snapshots are written periodically, not per call.
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.utils import timezone
+
+from core.db import sqlite_writer
+
+logger = logging.getLogger('shopify_integration')
+
+# Standard Shopify plan GraphQL bucket: 1000 points, restored at 50 points/second
+DEFAULT_BUCKET_SIZE = 1000.0
+DEFAULT_RESTORE_RATE = 50.0
+# Cost reserved for a query we have not seen a cost report for yet
+DEFAULT_QUERY_COST = 100.0
+
+# Standard Shopify plan REST bucket: 40 calls, leaking 2 calls/second
+DEFAULT_REST_BUCKET_SIZE = 40.0
+DEFAULT_REST_RESTORE_RATE = 2.0
+
+# Minimum seconds between APIRateLimit rows written per store and API type
+SNAPSHOT_INTERVAL = 60
+
+# Blanked out of query text so cursors and search filters do not split cost estimates
+_STRING_LITERAL = re.compile(r'"(?:[^"\\]|\\.)*"')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class TokenBucket:
+    """Thread-safe token bucket that can be re-synchronised with the server's view"""
+
+    def __init__(self, capacity: float, restore_rate: float):
+        self.capacity = capacity
+        self.restore_rate = restore_rate
+        self.available = capacity
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.restore_rate)
+        self._updated = now
+
+    def acquire(self, cost: float) -> float:
+        """Block until ``cost`` tokens are available and take them; returns seconds waited"""
+        cost = min(cost, self.capacity)
+        waited = 0.0
+
+        with self._condition:
+            while True:
+                self._refill()
+                if self.available >= cost:
+                    self.available -= cost
+                    return waited
+
+                delay = (cost - self.available) / self.restore_rate
+                started = time.monotonic()
+                self._condition.wait(timeout=delay)
+                waited += time.monotonic() - started
+
+    def observe(self, available: float, capacity: Optional[float] = None,
+                restore_rate: Optional[float] = None, in_flight: float = 0.0):
+        """
+        Adopt the server-reported bucket state
+
+        ``in_flight`` tokens taken locally for requests Shopify has not answered yet
+        are kept deducted, since the reported level does not include them.
+        """
+        with self._condition:
+            if capacity:
+                self.capacity = float(capacity)
+            if restore_rate:
+                self.restore_rate = float(restore_rate)
+            self.available = min(self.capacity, float(available)) - in_flight
+            self._updated = time.monotonic()
+            self._condition.notify_all()
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._condition:
+            self._refill()
+            return {'available': self.available, 'capacity': self.capacity, 'restore_rate': self.restore_rate}
+
+
+class GraphQLCostBudget(TokenBucket):
+    """
+    Token bucket of GraphQL query-cost points
+
+    Callers reserve the expected cost of a query before sending it and settle the
+    reservation with the cost Shopify reports in ``extensions.cost`` afterwards.
+    """
+
+    def __init__(self, capacity: float = DEFAULT_BUCKET_SIZE, restore_rate: float = DEFAULT_RESTORE_RATE):
+        super().__init__(capacity, restore_rate)
+        # Last requested cost seen per query shape, used as the next reservation
+        self._estimates: Dict[str, float] = {}
+        self._in_flight = 0.0
+
+    def reserve(self, query_key: str) -> float:
+        """Reserve the expected cost for a query shape and return the amount reserved"""
+        with self._condition:
+            cost = self._estimates.get(query_key, DEFAULT_QUERY_COST)
+        self.acquire(cost)
+        with self._condition:
+            self._in_flight += cost
+        return cost
+
+    def settle(self, query_key: str, reserved: float, cost_info: Optional[Dict]):
+        """
+        Reconcile a reservation with the cost reported by Shopify
+
+        When ``throttleStatus`` is present the bucket adopts Shopify's level, capacity
+        and restore rate; otherwise unused points are refunded and an underestimate
+        is charged.
+        """
+        with self._condition:
+            self._in_flight = max(0.0, self._in_flight - reserved)
+            in_flight = self._in_flight
+
+        if not cost_info:
+            # Nothing reported (e.g. a failed request): return the reservation
+            with self._condition:
+                self._refill()
+                self.available = min(self.capacity, self.available + reserved)
+                self._condition.notify_all()
+            return
+
+        requested = cost_info.get('requestedQueryCost')
+        actual = cost_info.get('actualQueryCost')
+        if actual is None:
+            actual = requested
+
+        with self._condition:
+            if requested is not None:
+                self._estimates[query_key] = float(requested)
+
+        status = cost_info.get('throttleStatus') or {}
+        if status.get('currentlyAvailable') is not None:
+            self.observe(status['currentlyAvailable'], status.get('maximumAvailable'),
+                         status.get('restoreRate'), in_flight=in_flight)
+        elif actual is not None:
+            with self._condition:
+                self._refill()
+                self.available = min(self.capacity, self.available + reserved - float(actual))
+                self._condition.notify_all()
+
+
+class RateLimitRecorder:
+    """Writes APIRateLimit snapshots at most once per interval per store and API type"""
+
+    def __init__(self, interval: float = SNAPSHOT_INTERVAL):
+        self.interval = interval
+        self._last_written: Dict = {}
+        self._lock = threading.Lock()
+
+    def record(self, store_domain: str, api_type: str, bucket: TokenBucket, force: bool = False) -> bool:
+        """Persist the bucket's state if the last snapshot is older than the interval"""
+        key = (store_domain, api_type)
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_written.get(key)
+            if not force and last is not None and now - last < self.interval:
+                return False
+            self._last_written[key] = now
+
+        from .models import ShopifyStore, APIRateLimit
+
+        state = bucket.snapshot()
+        used = max(0, int(state['capacity'] - state['available']))
+        try:
+            store = ShopifyStore.objects.filter(store_domain=store_domain).first()
+            if not store:
+                logger.debug(f"Store {store_domain} not found; rate limit snapshot skipped")
+                return False
+
+            window_start = timezone.now()
+            # Recorded from whichever thread settled the call, e.g. a page prefetch worker
+            with sqlite_writer():
+                APIRateLimit.objects.update_or_create(
+                    store=store,
+                    api_type=api_type,
+                    defaults={
+                        'current_calls': used,
+                        'max_calls': int(state['capacity']),
+                        'window_start': window_start,
+                        'window_end': window_start + timedelta(seconds=self.interval),
+                        'is_throttled': state['available'] < state['capacity'] * 0.2,
+                    },
+                )
+            return True
+        except Exception as e:
+            logger.warning(f"Could not record {api_type} rate limit for {store_domain}: {e}")
+            return False
+
+
+_buckets: Dict = {}
+_buckets_lock = threading.Lock()
+
+rate_limit_recorder = RateLimitRecorder()
+
+
+def graphql_budget(store_domain: str) -> GraphQLCostBudget:
+    """The process-wide GraphQL cost budget for a store"""
+    with _buckets_lock:
+        key = (store_domain, 'graphql')
+        if key not in _buckets:
+            _buckets[key] = GraphQLCostBudget()
+        return _buckets[key]
+
+
+def rest_budget(store_domain: str) -> TokenBucket:
+    """The process-wide REST call bucket for a store"""
+    with _buckets_lock:
+        key = (store_domain, 'rest')
+        if key not in _buckets:
+            _buckets[key] = TokenBucket(DEFAULT_REST_BUCKET_SIZE, DEFAULT_REST_RESTORE_RATE)
+        return _buckets[key]
+
+
+def query_key(query: str) -> str:
+    """
+    Queries of the same shape cost the same, so key estimates on the normalized query text
+
+    String literals such as page cursors and search filters are blanked so every page of
+    a listing shares one estimate, while anonymous queries selecting different fields stay apart.
+    """
+    shape = _WHITESPACE.sub(' ', _STRING_LITERAL.sub('""', query)).strip()
+    return hashlib.sha1(shape.encode('utf-8')).hexdigest()
+
+
+def is_throttled(result: Dict) -> bool:
+    """True when a GraphQL response was rejected for exceeding the cost bucket"""
+    errors = result.get('errors') if isinstance(result, dict) else None
+    if not isinstance(errors, list):
+        return False
+    return any((error.get('extensions') or {}).get('code') == 'THROTTLED' for error in errors if isinstance(error, dict))
+
+
+def settle_graphql(store_domain: str, budget: GraphQLCostBudget, key: str, reserved: float,
+                   result: Optional[Dict]):
+    """Settle a reservation from a GraphQL response body and record a periodic snapshot"""
+    cost_info = (result or {}).get('extensions', {}).get('cost') if isinstance(result, dict) else None
+    budget.settle(key, reserved, cost_info)
+    rate_limit_recorder.record(store_domain, 'graphql', budget)
+
+
+def observe_rest_call_limit(store_domain: str, bucket: TokenBucket, header: Optional[str]):
+    """Sync the REST bucket from an ``X-Shopify-Shop-Api-Call-Limit: used/max`` header"""
+    if not header:
+        return
+    try:
+        used, maximum = (int(part) for part in header.split('/'))
+    except ValueError:
+        return
+    bucket.observe(maximum - used, capacity=maximum)
+    rate_limit_recorder.record(store_domain, 'rest', bucket)
@@ -1,4 +1,3 @@
-import json
 import logging
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
@@ -9,8 +8,9 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from .client import ShopifyAPIClient, ShopifyWebhookHandler
+from .client import ShopifyAPIClient
 from .models import ShopifyStore, SyncOperation
+from .webhook_queue import enqueue_webhook
 from customers.services import CustomerSyncService
 
 logger = logging.getLogger('shopify_integration')
@@ -71,35 +71,14 @@ def sync_data(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 def webhook_handler(request):
-    """Handle Shopify webhooks"""
+    """
+    Handle Shopify webhooks
+    
+    The delivery is verified and queued, then answered straight away; the webhook
+    workers in webhook_queue run ShopifyWebhookHandler on it.
+    """
     try:
-        # Get webhook topic from headers
-        topic = request.META.get('HTTP_X_SHOPIFY_TOPIC')
-        if not topic:
-            return HttpResponse('Missing webhook topic', status=400)
-        
-        # Verify webhook authenticity
-        webhook_handler = ShopifyWebhookHandler()
-        if not webhook_handler.verify_webhook(request):
-            logger.warning('Invalid webhook signature')
-            return HttpResponse('Invalid signature', status=401)
-        
-        # Parse webhook data
-        try:
-            data = json.loads(request.body.decode('utf-8'))
-        except json.JSONDecodeError:
-            return HttpResponse('Invalid JSON', status=400)
-        
-        # Handle webhook
-        success = webhook_handler.handle_webhook(topic, data)
-        
-        if success:
-            logger.info(f'Successfully handled webhook: {topic}')
-            return HttpResponse('OK')
-        else:
-            logger.error(f'Failed to handle webhook: {topic}')
-            return HttpResponse('Processing failed', status=500)
-            
+        return enqueue_webhook(request)
     except Exception as e:
         logger.error(f'Webhook handler error: {e}')
         return HttpResponse('Internal error', status=500)
@@ -0,0 +1,297 @@
+"""
+Asynchronous Shopify webhook ingestion
+
+Receivers only verify the HMAC, store the raw payload as a WebhookDelivery
+keyed by X-Shopify-Webhook-Id and answer 200, so Shopify never times out and
+retries. A worker pool drains the queue: redeliveries are dropped by the unique
+webhook id, and queued updates to the same resource are coalesced so only the
+newest payload is processed. Deliveries left in processing by a worker that
+died are returned to the queue after CLAIM_TIMEOUT.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import F, Q
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import WebhookDelivery
+
+logger = logging.getLogger('shopify_integration')
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_WORKERS = 4
+MAX_ATTEMPTS = 5
+# A delivery processing for longer than this belongs to a worker that died
+CLAIM_TIMEOUT = timedelta(minutes=10)
+# Seconds between worker drains while idle, doubled up to the maximum while deliveries keep retrying
+DEFAULT_RETRY_INTERVAL = 30
+DEFAULT_MAX_RETRY_INTERVAL = 15 * 60
+
+# Topics whose payload is the full current state of the resource: when several are
+# queued for one resource only the newest needs processing
+COALESCE_TOPICS = {
+    'customers/update',
+    'products/update',
+    'orders/updated',
+    'inventory_levels/update',
+    'subscription_contracts/update',
+}
+
+
+def _resource_id(topic: str, data: Dict) -> str:
+    """Identify the resource a payload describes"""
+    if topic.startswith('inventory_levels/'):
+        return f"{data.get('inventory_item_id')}@{data.get('location_id')}"
+    return str(data.get('admin_graphql_api_id') or data.get('id') or '')
+
+
+def enqueue_webhook(request, topic: Optional[str] = None) -> HttpResponse:
+    """
+    Verify and persist one webhook delivery, answering Shopify immediately
+
+    Args:
+        request: The webhook POST
+        topic: Topic for endpoints dedicated to one topic; otherwise X-Shopify-Topic
+    """
+    from .client import ShopifyWebhookHandler
+
+    if not ShopifyWebhookHandler().verify_webhook(request):
+        logger.warning('Invalid webhook signature')
+        return HttpResponse('Invalid signature', status=401)
+
+    topic = topic or request.META.get('HTTP_X_SHOPIFY_TOPIC')
+    if not topic:
+        return HttpResponse('Missing webhook topic', status=400)
+
+    body = request.body.decode('utf-8')
+    try:
+        data = json.loads(body)
+    except json.JSONDecodeError:
+        return HttpResponse('Invalid JSON', status=400)
+
+    # Redeliveries of one event share the webhook id; fall back to the body digest
+    webhook_id = request.META.get('HTTP_X_SHOPIFY_WEBHOOK_ID') or hashlib.sha256(request.body).hexdigest()
+    triggered_at = request.META.get('HTTP_X_SHOPIFY_TRIGGERED_AT')
+
+    WebhookDelivery.objects.bulk_create([WebhookDelivery(
+        webhook_id=webhook_id,
+        topic=topic,
+        shop_domain=request.META.get('HTTP_X_SHOPIFY_SHOP_DOMAIN', ''),
+        resource_id=_resource_id(topic, data) if isinstance(data, dict) else '',
+        payload=body,
+        triggered_at=parse_datetime(triggered_at) if triggered_at else None,
+    )], ignore_conflicts=True)
+
+    transaction.on_commit(webhook_worker.wake)
+    return HttpResponse('OK')
+
+
+def _process_payload(topic: str, data: Dict):
+    """Run the processor for a topic; subscription topics have their own, the rest go to ShopifyWebhookHandler"""
+    from customer_subscriptions.webhooks import WEBHOOK_PROCESSORS
+
+    processor = WEBHOOK_PROCESSORS.get(topic)
+    if processor:
+        return processor(data)
+
+    from .client import ShopifyWebhookHandler
+    if not ShopifyWebhookHandler().handle_webhook(topic, data):
+        raise RuntimeError(f"Handler for {topic} reported failure")
+    return {'status': 'success'}
+
+
+def _claim(deliveries: List[WebhookDelivery]) -> List[WebhookDelivery]:
+    """Mark deliveries as processing; rows another worker claimed first are skipped"""
+    claimed = []
+    for delivery in deliveries:
+        if WebhookDelivery.objects.filter(pk=delivery.pk, status='pending').update(
+            status='processing', claimed_at=timezone.now()
+        ):
+            claimed.append(delivery)
+    return claimed
+
+
+def reclaim_stale_deliveries(timeout: timedelta = CLAIM_TIMEOUT) -> int:
+    """
+    Return deliveries stuck in processing longer than ``timeout`` to the queue
+
+    The interrupted run counts as an attempt, so a payload that keeps killing its
+    worker ends up failed rather than being retried forever.
+
+    Returns:
+        Number of deliveries reclaimed
+    """
+    stale = WebhookDelivery.objects.filter(status='processing').filter(
+        Q(claimed_at__lt=timezone.now() - timeout) | Q(claimed_at__isnull=True)
+    )
+    message = 'Worker stopped while processing'
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS - 1).update(
+        status='failed', attempts=F('attempts') + 1, error_message=message, processed_at=timezone.now()
+    )
+    retrying = stale.update(status='pending', attempts=F('attempts') + 1, error_message=message)
+    if failed or retrying:
+        logger.warning(f"Reclaimed {failed + retrying} webhook deliveries left processing ({failed} failed)")
+    return failed + retrying
+
+
+def _coalesce(deliveries: List[WebhookDelivery]) -> List[List[WebhookDelivery]]:
+    """
+    Group deliveries by resource, keeping arrival order within each group
+
+    For coalescable topics only the newest delivery per resource survives; the rest
+    are marked superseded.
+    """
+    groups: "OrderedDict[str, List[WebhookDelivery]]" = OrderedDict()
+    latest: Dict = {}
+    superseded = []
+
+    for delivery in deliveries:
+        key = delivery.resource_id or f'delivery:{delivery.pk}'
+        if delivery.topic in COALESCE_TOPICS and delivery.resource_id:
+            coalesce_key = (delivery.topic, delivery.resource_id)
+            previous = latest.get(coalesce_key)
+            if previous is not None:
+                newer = (delivery.triggered_at or delivery.received_at) >= (previous.triggered_at or previous.received_at)
+                stale = previous if newer else delivery
+                superseded.append(stale)
+                if not newer:
+                    continue
+                groups[key].remove(previous)
+            latest[coalesce_key] = delivery
+        groups.setdefault(key, []).append(delivery)
+
+    if superseded:
+        WebhookDelivery.objects.filter(pk__in=[d.pk for d in superseded]).update(
+            status='superseded', processed_at=timezone.now()
+        )
+        logger.info(f"Coalesced {len(superseded)} superseded webhook deliveries")
+
+    return [group for group in groups.values() if group]
+
+
+def _process_group(group: List[WebhookDelivery]) -> Dict[str, int]:
+    """Process one resource's deliveries in arrival order"""
+    counts = {'processed': 0, 'failed': 0, 'retrying': 0}
+    for delivery in group:
+        delivery.attempts += 1
+        try:
+            result = _process_payload(delivery.topic, json.loads(delivery.payload))
+        except Exception as e:
+            delivery.error_message = str(e)
+            delivery.status = 'failed' if delivery.attempts >= MAX_ATTEMPTS else 'pending'
+            counts['failed' if delivery.status == 'failed' else 'retrying'] += 1
+            logger.error(f"Webhook {delivery.topic} {delivery.webhook_id} failed (attempt {delivery.attempts}): {e}")
+        else:
+            delivery.status = 'processed'
+            delivery.error_message = ''
+            delivery.result = result if isinstance(result, dict) else {'result': result}
+            delivery.processed_at = timezone.now()
+            counts['processed'] += 1
+        delivery.save(update_fields=['status', 'attempts', 'error_message', 'result', 'processed_at'])
+    return counts
+
+
+def _process_group_in_worker(group: List[WebhookDelivery]) -> Dict[str, int]:
+    try:
+        return _process_group(group)
+    finally:
+        connections.close_all()
+
+
+def drain_webhook_queue(batch_size: int = DEFAULT_BATCH_SIZE, workers: int = DEFAULT_WORKERS,
+                        claim_timeout: timedelta = CLAIM_TIMEOUT) -> Dict[str, int]:
+    """
+    Process pending deliveries until the queue is empty
+
+    Deliveries claimed longer than ``claim_timeout`` ago are returned to the queue first.
+
+    Returns:
+        Counts of processed, superseded, failed, retrying and reclaimed deliveries
+    """
+    totals = {'processed': 0, 'superseded': 0, 'failed': 0, 'retrying': 0,
+              'reclaimed': reclaim_stale_deliveries(claim_timeout)}
+    retried = set()
+    if connection.vendor == 'sqlite':
+        # SQLite takes one writer at a time, so parallel workers would only contend
+        workers = 1
+
+    while True:
+        pending = list(WebhookDelivery.objects.filter(status='pending').exclude(pk__in=retried)[:batch_size])
+        if not pending:
+            return totals
+
+        claimed = _claim(pending)
+        groups = _coalesce(claimed)
+        totals['superseded'] += len(claimed) - sum(len(group) for group in groups)
+
+        if workers > 1 and len(groups) > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='shopify-webhooks') as executor:
+                results = list(executor.map(_process_group_in_worker, groups))
+        else:
+            results = [_process_group(group) for group in groups]
+
+        for counts in results:
+            for key, value in counts.items():
+                totals[key] += value
+        # Failed deliveries wait for the next drain rather than spinning in this one
+        retried.update(d.pk for group in groups for d in group if d.status == 'pending')
+
+
+class WebhookQueueWorker:
+    """In-process background drainer, woken whenever a delivery is queued and periodically for retries"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def wake(self):
+        if not getattr(settings, 'WEBHOOK_QUEUE_INLINE_WORKER', True):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='shopify-webhook-worker', daemon=True)
+                self._thread.start()
+        self._event.set()
+
+    def stop(self):
+        """Let the worker thread exit after its current drain"""
+        self._stopped = True
+        self._event.set()
+
+    def _run(self):
+        interval = getattr(settings, 'WEBHOOK_QUEUE_RETRY_INTERVAL', DEFAULT_RETRY_INTERVAL)
+        max_interval = getattr(settings, 'WEBHOOK_QUEUE_MAX_RETRY_INTERVAL', DEFAULT_MAX_RETRY_INTERVAL)
+        delay = interval
+        while True:
+            self._event.wait(delay)
+            if self._stopped:
+                return
+            self._event.clear()
+            totals = None
+            try:
+                # Each drain also reclaims deliveries left processing by a dead worker
+                totals = drain_webhook_queue(
+                    workers=getattr(settings, 'WEBHOOK_QUEUE_WORKERS', DEFAULT_WORKERS),
+                )
+            except Exception as e:
+                logger.error(f"Webhook worker error: {e}")
+            finally:
+                connections.close_all()
+            # Back off while deliveries keep failing; a new webhook still wakes the worker at once
+            delay = min(delay * 2, max_interval) if totals is None or totals['retrying'] else interval
+
+
+webhook_worker = WebhookQueueWorker()
@@ -0,0 +1,225 @@
+"""
+Skip Analytics Engine
+
+Computes SkipAnalytics rollups per day, week, month and year from
+SubscriptionSkip with grouped aggregate queries: one for the counts, customers
+and money, one for first-time skippers and one for reasons, per period type.
+
+Rollups are refreshed for the periods containing a skip whenever it is
+created, confirmed, cancelled or deleted, along with the period of the
+customer's first other skip, whose new/repeat split the change can move.
+Reports read SkipAnalytics rows instead of scanning the skip table.
+"""
+
+import calendar
+import logging
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DateField, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from customer_subscriptions.models import CustomerSubscription
+
+from .models import SkipAnalytics, SubscriptionSkip
+
+logger = logging.getLogger(__name__)
+
+# SkipAnalytics.period_type -> Trunc kind
+PERIOD_KINDS = {
+    'daily': 'day',
+    'weekly': 'week',
+    'monthly': 'month',
+    'yearly': 'year',
+}
+TOP_REASONS = 5
+# SkipAnalytics columns rewritten when a period is recomputed
+ROLLUP_FIELDS = [
+    'total_skips', 'confirmed_skips', 'cancelled_skips', 'failed_skips',
+    'unique_customers', 'new_skippers', 'repeat_skippers',
+    'revenue_deferred', 'skip_fees_collected', 'top_reasons', 'generated_at',
+]
+
+
+def period_bounds(period_type, day):
+    """
+    First and last date of the period of ``period_type`` containing ``day``
+
+    Weeks start on Monday, as with Django's week truncation.
+    """
+    if period_type == 'daily':
+        return day, day
+    if period_type == 'weekly':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if period_type == 'monthly':
+        return day.replace(day=1), day.replace(day=calendar.monthrange(day.year, day.month)[1])
+    if period_type == 'yearly':
+        return date(day.year, 1, 1), date(day.year, 12, 31)
+    raise ValueError(f"Unknown period type: {period_type}")
+
+
+def _start_of(day):
+    start = datetime.combine(day, time.min)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def _local_date(moment):
+    if settings.USE_TZ and timezone.is_aware(moment):
+        moment = timezone.localtime(moment)
+    return moment.date()
+
+
+def compute_skip_analytics(period_type, start, end):
+    """
+    Recompute the SkipAnalytics rows of every ``period_type`` period between two dates
+
+    Args:
+        period_type: 'daily', 'weekly', 'monthly' or 'yearly'
+        start: A date in the first period to refresh
+        end: A date in the last period to refresh
+
+    Returns:
+        int: Rows written; periods without skips have their row removed
+    """
+    kind = PERIOD_KINDS[period_type]
+    first_start = period_bounds(period_type, start)[0]
+    last_end = period_bounds(period_type, end)[1]
+
+    skips = SubscriptionSkip.objects.filter(
+        created_at__gte=_start_of(first_start),
+        created_at__lt=_start_of(last_end + timedelta(days=1)),
+    ).annotate(period=Trunc('created_at', kind, output_field=DateField()))
+
+    confirmed = Q(status='confirmed')
+    totals = skips.values('period').annotate(
+        total=Count('id'),
+        confirmed=Count('id', filter=confirmed),
+        cancelled=Count('id', filter=Q(status='cancelled')),
+        failed=Count('id', filter=Q(status='failed')),
+        customers=Count('subscription__customer', distinct=True),
+        revenue_deferred=Sum('subscription__total_price', filter=confirmed),
+        fees=Sum('skip_fee_charged', filter=confirmed),
+    ).order_by()
+
+    # A customer is new in the period holding their first skip ever
+    first_skip = SubscriptionSkip.objects.filter(
+        subscription__customer=OuterRef('subscription__customer'),
+    ).values('subscription__customer').annotate(first=Min('created_at')).values('first')
+    new_skippers = dict(
+        skips.filter(created_at=Subquery(first_skip)).values('period').annotate(
+            customers=Count('subscription__customer', distinct=True),
+        ).order_by().values_list('period', 'customers')
+    )
+
+    reasons = {}
+    for row in skips.exclude(reason='').values('period', 'reason').annotate(
+            count=Count('id')).order_by('period', '-count', 'reason'):
+        period_reasons = reasons.setdefault(row['period'], {})
+        if len(period_reasons) < TOP_REASONS:
+            period_reasons[row['reason']] = row['count']
+
+    now = timezone.now()
+    rows = []
+    for row in totals:
+        period_start, period_end = period_bounds(period_type, row['period'])
+        new = new_skippers.get(row['period'], 0)
+        rows.append(SkipAnalytics(
+            period_type=period_type,
+            period_start=period_start,
+            period_end=period_end,
+            total_skips=row['total'],
+            confirmed_skips=row['confirmed'],
+            cancelled_skips=row['cancelled'],
+            failed_skips=row['failed'],
+            unique_customers=row['customers'],
+            new_skippers=new,
+            repeat_skippers=row['customers'] - new,
+            revenue_deferred=row['revenue_deferred'] or 0,
+            skip_fees_collected=row['fees'] or 0,
+            top_reasons=reasons.get(row['period'], {}),
+            generated_at=now,
+        ))
+
+    with transaction.atomic():
+        # Upsert rather than delete and re-insert, so refreshes of the same period
+        # committing concurrently cannot collide on the unique period key
+        SkipAnalytics.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['period_type', 'period_start', 'period_end'],
+            update_fields=ROLLUP_FIELDS,
+        )
+        SkipAnalytics.objects.filter(
+            period_type=period_type, period_start__gte=first_start, period_start__lte=last_end,
+        ).exclude(period_start__in=[row.period_start for row in rows]).delete()
+    return len(rows)
+
+
+def refresh_skip_analytics(moments):
+    """
+    Refresh every period type for the periods containing the given skip times
+
+    Args:
+        moments: Iterable of SubscriptionSkip.created_at values
+    """
+    days = {_local_date(moment) for moment in moments if moment is not None}
+    if not days:
+        return
+    for period_type in PERIOD_KINDS:
+        # Refresh each distinct period once, even when several skips share it
+        for period_start in sorted({period_bounds(period_type, day)[0] for day in days}):
+            compute_skip_analytics(period_type, period_start, period_start)
+
+
+def rebuild_skip_analytics(period_types=None, since=None):
+    """
+    Recompute SkipAnalytics from all skips, or those created on or after ``since``
+
+    Returns:
+        dict: Rows written per period type
+    """
+    bounds = SubscriptionSkip.objects.aggregate(first=Min('created_at'))
+    if bounds['first'] is None:
+        SkipAnalytics.objects.filter(period_type__in=period_types or list(PERIOD_KINDS)).delete()
+        return {}
+
+    start = since or _local_date(bounds['first'])
+    end = timezone.localdate()
+    written = {}
+    for period_type in period_types or PERIOD_KINDS:
+        written[period_type] = compute_skip_analytics(period_type, start, end)
+    logger.info(f"Rebuilt skip analytics: {written}")
+    return written
+
+
+def _first_skip_of(customer_id, exclude_pk=None):
+    """created_at of a customer's earliest skip, leaving out one skip"""
+    skips = SubscriptionSkip.objects.filter(subscription__customer_id=customer_id)
+    if exclude_pk is not None:
+        skips = skips.exclude(pk=exclude_pk)
+    return skips.aggregate(first=Min('created_at'))['first']
+
+
+def skip_changed(skip):
+    """
+    Refresh the analytics of a created, updated or deleted skip once its transaction commits
+
+    Adding or removing a customer's earliest skip also moves them between new
+    and repeat skippers in the period of their next skip, so that period is
+    refreshed too.
+    """
+    created_at = skip.created_at
+    skip_pk = skip.pk
+    customer_id = CustomerSubscription.objects.filter(pk=skip.subscription_id).values_list(
+        'customer_id', flat=True).first()
+
+    def refresh():
+        moments = [created_at]
+        if customer_id is not None:
+            moments.append(_first_skip_of(customer_id, exclude_pk=skip_pk))
+        refresh_skip_analytics(moments)
+
+    transaction.on_commit(refresh)
@@ -0,0 +1,37 @@
+"""
+Management command to backfill SkipAnalytics from the skip history
+
+Usage:
+    python manage.py rebuild_skip_analytics
+    python manage.py rebuild_skip_analytics --period monthly --since 2025-01-01
+"""
+
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from skips.analytics import PERIOD_KINDS, rebuild_skip_analytics
+
+
+class Command(BaseCommand):
+    help = 'Recompute daily, weekly, monthly and yearly skip analytics from SubscriptionSkip'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period',
+            action='append',
+            choices=list(PERIOD_KINDS),
+            help='Period type to rebuild; repeat for several (default: all)',
+        )
+        parser.add_argument(
+            '--since',
+            type=parse_date,
+            help='Only recompute periods from this date (YYYY-MM-DD) onwards',
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_skip_analytics(options['period'], options['since'])
+        if not written:
+            self.stdout.write('No skips recorded; nothing to rebuild')
+            return
+        for period_type, rows in written.items():
+            self.stdout.write(self.style.SUCCESS(f'{period_type}: {rows} period(s) written'))
@@ -1,15 +1,20 @@
 """
 Management command to send skip reminder notifications
 
+Reminders are sent in batches over pooled SMTP sessions; subscriptions already
+reminded about the same order date are skipped, so a rerun only retries failures.
+
 Usage:
     python manage.py send_skip_reminders
     python manage.py send_skip_reminders --days-before 7
+    python manage.py send_skip_reminders --workers 8 -v 2
 """
 
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
-from skips.notification_service import SkipNotificationService
+from email_manager.delivery import SMTPDeliveryEngine
+from skips.notification_service import SkipReminderDispatcher
 from customer_subscriptions.models import CustomerSubscription
 import logging
 
@@ -31,6 +36,11 @@ class Command(BaseCommand):
             action='store_true',
             help='Print what would be sent without actually sending emails',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='SMTP delivery threads (default: EMAIL_DELIVERY_SETTINGS or 4)',
+        )
 
     def handle(self, *args, **options):
         days_before = options['days_before']
@@ -44,12 +54,12 @@ class Command(BaseCommand):
         # Calculate target date
         target_date = timezone.now().date() + timedelta(days=days_before)
         
-        self.stdout.write(f'Looking for subscriptions with next order date: {target_date}')
+        self.stdout.write(f'Looking for subscriptions with next order (billing) date: {target_date}')
         
         # Find active subscriptions with orders coming up
         subscriptions = CustomerSubscription.objects.filter(
             status='ACTIVE',
-            next_order_date=target_date
+            next_billing_date=target_date
         ).select_related('customer')
         
         total_count = subscriptions.count()
@@ -60,44 +70,38 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING('No subscriptions found for reminder'))
             return
         
-        sent_count = 0
-        failed_count = 0
+        verbose = options['verbosity'] >= 2
         
-        for subscription in subscriptions:
-            customer_email = subscription.customer.email if hasattr(subscription, 'customer') else subscription.customer_email
-            customer_name = "Customer"
-            if hasattr(subscription, 'customer') and subscription.customer.first_name:
-                customer_name = f"{subscription.customer.first_name} {subscription.customer.last_name}".strip()
-            
-            self.stdout.write(f'Processing: {customer_name} ({customer_email})')
-            
+        def report(subscription, email, sent, error):
+            # Successful sends are only listed at -v 2; a dry run always lists who would be reminded
+            if sent and not (verbose or dry_run):
+                return
             if dry_run:
-                self.stdout.write(self.style.WARNING(f'  [DRY RUN] Would send reminder to {customer_email}'))
-                sent_count += 1
-                continue
-            
-            try:
-                success = SkipNotificationService.send_skip_reminder_notification(
-                    subscription=subscription,
-                    days_until_cutoff=days_before
-                )
-                
-                if success:
-                    self.stdout.write(self.style.SUCCESS(f'  ✓ Sent reminder to {customer_email}'))
-                    sent_count += 1
-                else:
-                    self.stdout.write(self.style.ERROR(f'  ✗ Failed to send to {customer_email}'))
-                    failed_count += 1
-                    
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'  ✗ Error: {str(e)}'))
-                logger.error(f'Error sending skip reminder to {customer_email}: {str(e)}')
-                failed_count += 1
+                self.stdout.write(self.style.WARNING(f'  [DRY RUN] Would send reminder to {email}'))
+            elif sent:
+                self.stdout.write(self.style.SUCCESS(f'  ✓ Sent reminder to {email}'))
+            else:
+                self.stdout.write(self.style.ERROR(f'  ✗ Failed to send to {email}: {error}'))
+        
+        try:
+            dispatcher = SkipReminderDispatcher(
+                days_until_cutoff=days_before,
+                engine=SMTPDeliveryEngine(workers=options['workers']) if options['workers'] else None,
+            )
+            stats = dispatcher.dispatch(subscriptions, dry_run=dry_run, on_result=report)
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'✗ Error: {str(e)}'))
+            logger.error(f'Error sending skip reminders: {str(e)}', exc_info=True)
+            return
+        
+        sent_count = stats['sent']
+        failed_count = stats['failed'] + stats['no_email']
         
         # Summary
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS('=== Summary ==='))
         self.stdout.write(f'Total subscriptions: {total_count}')
+        self.stdout.write(f"Already reminded for this order date: {stats['already_notified']}")
         self.stdout.write(self.style.SUCCESS(f'Sent: {sent_count}'))
         if failed_count > 0:
             self.stdout.write(self.style.ERROR(f'Failed: {failed_count}'))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer_subscriptions', '0010_alter_sellingplan_shopify_selling_plan_group_id'),
+        ('skips', '0002_alter_skipnotification_subscription_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skipnotification',
+            name='order_date',
+            field=models.DateField(blank=True, help_text='Order date a reminder was sent for; one reminder per order date', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='skipnotification',
+            index=models.Index(fields=['notification_type', 'order_date', 'subscription'], name='skips_skipn_notific_2af83a_idx'),
+        ),
+    ]
@@ -162,6 +162,8 @@ class SkipNotification(models.Model):
     
     recipient_email = models.EmailField(blank=True)
     recipient_phone = models.CharField(max_length=20, blank=True)
+    order_date = models.DateField(null=True, blank=True,
+                                  help_text="Order date a reminder was sent for; one reminder per order date")
     
     subject = models.CharField(max_length=200)
     message = models.TextField()
@@ -178,6 +180,9 @@ class SkipNotification(models.Model):
         verbose_name = 'Skip Notification'
         verbose_name_plural = 'Skip Notifications'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['notification_type', 'order_date', 'subscription']),
+        ]
     
     def __str__(self):
         return f"{self.notification_type} - {self.recipient_email} ({self.sent_at or 'Not sent'})"
@@ -230,3 +235,23 @@ class SkipAnalytics(models.Model):
     
     def __str__(self):
         return f"{self.period_type.title()} Skip Analytics ({self.period_start} to {self.period_end})"
+
+
+# Keep SkipAnalytics current as skips are created, confirmed, cancelled or removed
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+ANALYTICS_FIELDS = {'subscription', 'status', 'reason', 'skip_fee_charged', 'created_at'}
+
+@receiver(post_save, sender=SubscriptionSkip)
+def refresh_skip_analytics_on_save(sender, instance, update_fields=None, **kwargs):
+    """Refresh the skip's periods, skipping saves that only touch sync or admin fields"""
+    if update_fields and not set(update_fields) & ANALYTICS_FIELDS:
+        return
+    from skips.analytics import skip_changed
+    skip_changed(instance)
+
+@receiver(post_delete, sender=SubscriptionSkip)
+def refresh_skip_analytics_on_delete(sender, instance, **kwargs):
+    from skips.analytics import skip_changed
+    skip_changed(instance)
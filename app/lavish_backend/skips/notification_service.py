@@ -13,6 +13,97 @@ from .models import SkipNotification
 logger = logging.getLogger(__name__)
 
 
+# Skip reminder templates, compiled once through the email template cache
+SKIP_REMINDER_SUBJECT = "Reminder: Skip Your Upcoming Subscription Order"
+
+SKIP_REMINDER_TEXT = """{% autoescape off %}Hello {{ customer_name }},
+
+This is a reminder that your next subscription order is scheduled for {{ order_date|date:"F d, Y" }}.
+
+If you need to skip this order, you have {{ days_until_cutoff }} days remaining to make changes.
+
+Need to skip? Log in to your account to manage your subscription.
+
+Thank you!
+
+Best regards,
+Lavish Library Team{% endautoescape %}"""
+
+SKIP_REMINDER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background-color: #ff9800; color: white; padding: 20px; text-align: center; border-radius: 5px 5px 0 0; }
+        .content { background-color: #f9f9f9; padding: 30px; border: 1px solid #ddd; }
+        .alert-box { background-color: #fff3cd; padding: 15px; margin: 20px 0; border-left: 4px solid #ff9800; }
+        .footer { background-color: #f1f1f1; padding: 15px; text-align: center; font-size: 12px; color: #666; border-radius: 0 0 5px 5px; }
+        .button { display: inline-block; padding: 12px 24px; background-color: #ff9800; color: white; text-decoration: none; border-radius: 5px; margin-top: 15px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>⏰ Skip Reminder</h1>
+        </div>
+        <div class="content">
+            <p>Hello {{ customer_name }},</p>
+            
+            <p>This is a friendly reminder about your upcoming subscription order.</p>
+            
+            <div class="alert-box">
+                <p><strong>Next Order Date:</strong> {{ order_date|date:"F d, Y" }}</p>
+                <p><strong>Time Remaining to Skip:</strong> {{ days_until_cutoff }} days</p>
+            </div>
+            
+            <p>If you need to skip this order, please make changes within the next <strong>{{ days_until_cutoff }} days</strong>.</p>
+            
+            <p>Log in to your account to manage your subscription and skip orders as needed.</p>
+            
+            <a href="#" class="button">Manage Subscription</a>
+        </div>
+        <div class="footer">
+            <p>Lavish Library - Your Premium Book Subscription Service</p>
+            <p>If you have any questions, please contact our support team.</p>
+        </div>
+    </div>
+</body>
+</html>"""
+
+# Subscriptions handled per dispatch batch: one dedupe query, one delivery run, one bulk insert
+REMINDER_BATCH_SIZE = 1000
+
+
+def _customer_name(subscription, default="Valued Customer"):
+    customer = getattr(subscription, 'customer', None)
+    if customer is not None and customer.first_name:
+        return f"{customer.first_name} {customer.last_name}".strip()
+    return default
+
+
+def render_skip_reminder(subscription, days_until_cutoff):
+    """
+    Render the skip reminder for one subscription
+    
+    Returns:
+        tuple: (subject, plain_text, html)
+    """
+    from django.template import Context
+    from email_manager.template_cache import template_cache
+    
+    context = Context({
+        'customer_name': _customer_name(subscription),
+        'order_date': subscription.next_billing_date,
+        'days_until_cutoff': days_until_cutoff,
+    })
+    return (
+        SKIP_REMINDER_SUBJECT,
+        template_cache.get_string(SKIP_REMINDER_TEXT).render(context),
+        template_cache.get_string(SKIP_REMINDER_HTML).render(context),
+    )
+
+
 class SkipNotificationService:
     """
     Service for sending skip notifications via email_manager app
@@ -199,71 +290,7 @@ Lavish Library Team
                 logger.error(f"No email found for subscription {subscription.id}")
                 return False
             
-            customer_name = "Valued Customer"
-            if hasattr(subscription, 'customer'):
-                if subscription.customer.first_name:
-                    customer_name = f"{subscription.customer.first_name} {subscription.customer.last_name}".strip()
-            
-            subject = f"Reminder: Skip Your Upcoming {subscription.subscription_name if hasattr(subscription, 'subscription_name') else 'Subscription'} Order"
-            
-            message = f"""
-Hello {customer_name},
-
-This is a reminder that your next subscription order is scheduled for {subscription.next_order_date.strftime('%B %d, %Y')}.
-
-If you need to skip this order, you have {days_until_cutoff} days remaining to make changes.
-
-Need to skip? Log in to your account to manage your subscription.
-
-Thank you!
-
-Best regards,
-Lavish Library Team
-            """.strip()
-            
-            html_message = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <style>
-        body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-        .header {{ background-color: #ff9800; color: white; padding: 20px; text-align: center; border-radius: 5px 5px 0 0; }}
-        .content {{ background-color: #f9f9f9; padding: 30px; border: 1px solid #ddd; }}
-        .alert-box {{ background-color: #fff3cd; padding: 15px; margin: 20px 0; border-left: 4px solid #ff9800; }}
-        .footer {{ background-color: #f1f1f1; padding: 15px; text-align: center; font-size: 12px; color: #666; border-radius: 0 0 5px 5px; }}
-        .button {{ display: inline-block; padding: 12px 24px; background-color: #ff9800; color: white; text-decoration: none; border-radius: 5px; margin-top: 15px; }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>⏰ Skip Reminder</h1>
-        </div>
-        <div class="content">
-            <p>Hello {customer_name},</p>
-            
-            <p>This is a friendly reminder about your upcoming subscription order.</p>
-            
-            <div class="alert-box">
-                <p><strong>Next Order Date:</strong> {subscription.next_order_date.strftime('%B %d, %Y')}</p>
-                <p><strong>Time Remaining to Skip:</strong> {days_until_cutoff} days</p>
-            </div>
-            
-            <p>If you need to skip this order, please make changes within the next <strong>{days_until_cutoff} days</strong>.</p>
-            
-            <p>Log in to your account to manage your subscription and skip orders as needed.</p>
-            
-            <a href="#" class="button">Manage Subscription</a>
-        </div>
-        <div class="footer">
-            <p>Lavish Library - Your Premium Book Subscription Service</p>
-            <p>If you have any questions, please contact our support team.</p>
-        </div>
-    </div>
-</body>
-</html>
-            """.strip()
+            subject, message, html_message = render_skip_reminder(subscription, days_until_cutoff)
             
             config = EmailConfiguration.objects.filter(is_default=True).first()
             from_email = config.default_from_email if config else None
@@ -284,6 +311,7 @@ Lavish Library Team
                 notification_type='skip_reminder',
                 channel='email',
                 recipient_email=recipient_email,
+                order_date=subscription.next_billing_date,
                 subject=subject,
                 message=message,
                 sent_at=timezone.now() if success else None,
@@ -408,3 +436,132 @@ Lavish Library Team
         except Exception as e:
             logger.error(f"Error sending skip limit notification: {str(e)}")
             return False
+
+
+
+class SkipReminderDispatcher:
+    """
+    Sends skip reminders to many subscriptions in batches
+    
+    The email configuration is resolved once, the reminder templates are
+    compiled once, messages go out over pooled SMTP sessions in parallel and
+    each batch's SkipNotification and EmailHistory rows are bulk inserted.
+    Subscriptions already reminded about the same order date are skipped.
+    
+    Usage:
+        stats = SkipReminderDispatcher(days_until_cutoff=7).dispatch(subscriptions)
+    """
+    
+    def __init__(self, days_until_cutoff, config=None, engine=None, batch_size=REMINDER_BATCH_SIZE):
+        from email_manager.delivery import SMTPDeliveryEngine
+        from email_manager.models import EmailConfiguration
+        
+        self.days_until_cutoff = days_until_cutoff
+        self.config = config or EmailConfiguration.get_default()
+        if self.config is None:
+            raise ValueError("No email configuration found for sending")
+        self.engine = engine or SMTPDeliveryEngine()
+        self.batch_size = batch_size
+    
+    def already_notified(self, subscriptions):
+        """IDs of the given subscriptions already reminded about their next order date"""
+        order_dates = {subscription.next_billing_date for subscription in subscriptions}
+        notified = SkipNotification.objects.filter(
+            notification_type='skip_reminder',
+            order_date__in=order_dates,
+            subscription_id__in=[subscription.pk for subscription in subscriptions],
+            delivered=True,
+        ).values_list('subscription_id', 'order_date')
+        by_subscription = {subscription.pk: subscription.next_billing_date for subscription in subscriptions}
+        return {subscription_id for subscription_id, order_date in notified
+                if by_subscription.get(subscription_id) == order_date}
+    
+    def pending(self, subscriptions):
+        """
+        Yield batches of subscriptions that still need a reminder
+        
+        Yields:
+            tuple: (subscriptions to remind, number already reminded)
+        """
+        batch = []
+        for subscription in subscriptions.iterator(chunk_size=self.batch_size):
+            batch.append(subscription)
+            if len(batch) >= self.batch_size:
+                yield self._without_notified(batch)
+                batch = []
+        if batch:
+            yield self._without_notified(batch)
+    
+    def _without_notified(self, batch):
+        notified = self.already_notified(batch)
+        return [subscription for subscription in batch if subscription.pk not in notified], len(notified)
+    
+    def dispatch(self, subscriptions, dry_run=False, on_result=None):
+        """
+        Remind every subscription in a queryset
+        
+        Args:
+            subscriptions: CustomerSubscription queryset, ideally with select_related('customer')
+            dry_run: Only report who would be reminded
+            on_result: Optional callback(subscription, email, sent, error) per recipient
+        
+        Returns:
+            dict: total, already_notified, no_email, sent, failed
+        """
+        from email_manager.delivery import OutgoingEmail, record_history
+        
+        stats = {'total': 0, 'already_notified': 0, 'no_email': 0, 'sent': 0, 'failed': 0}
+        for batch, notified in self.pending(subscriptions):
+            stats['total'] += len(batch) + notified
+            stats['already_notified'] += notified
+            
+            recipients = []
+            for subscription in batch:
+                email = subscription.customer.email if subscription.customer_id else ''
+                if email:
+                    recipients.append((subscription, email))
+                else:
+                    logger.error(f"No email found for subscription {subscription.id}")
+                    stats['no_email'] += 1
+            
+            if dry_run:
+                stats['sent'] += len(recipients)
+                for subscription, email in recipients:
+                    if on_result:
+                        on_result(subscription, email, True, None)
+                continue
+            
+            outgoing = []
+            for subscription, email in recipients:
+                subject, message, html_message = render_skip_reminder(subscription, self.days_until_cutoff)
+                outgoing.append(OutgoingEmail(
+                    self.config, subject, message, [email], html_body=html_message,
+                    email_type='subscription_reminder', related_object=subscription,
+                ))
+            
+            self.engine.deliver(outgoing)
+            
+            now = timezone.now()
+            SkipNotification.objects.bulk_create([
+                SkipNotification(
+                    subscription=subscription,
+                    notification_type='skip_reminder',
+                    channel='email',
+                    recipient_email=email,
+                    order_date=subscription.next_billing_date,
+                    subject=item.subject,
+                    message=item.body,
+                    sent_at=now if item.sent else None,
+                    delivered=item.sent,
+                    error_message='' if item.sent else (item.error or "Failed to send email via email_manager"),
+                )
+                for (subscription, email), item in zip(recipients, outgoing)
+            ], batch_size=self.batch_size)
+            record_history(outgoing)
+            
+            for (subscription, email), item in zip(recipients, outgoing):
+                stats['sent' if item.sent else 'failed'] += 1
+                if on_result:
+                    on_result(subscription, email, item.sent, item.error)
+        
+        return stats
@@ -0,0 +1,216 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from customer_subscriptions.models import CustomerSubscription
+from customers.models import ShopifyCustomer
+from email_manager.delivery import SMTPDeliveryEngine
+from email_manager.models import EmailHistory
+from email_manager.tests import FakeSMTPServer, email_configuration
+
+from .analytics import compute_skip_analytics, rebuild_skip_analytics
+from .models import SkipAnalytics, SkipNotification, SubscriptionSkip
+from .notification_service import SkipReminderDispatcher
+from .views import skip_analytics
+
+
+def moment(year, month, day):
+    return timezone.make_aware(datetime(year, month, day, 12))
+
+
+class SkipAnalyticsTestCase(TestCase):
+    """Test cases for the SkipAnalytics rollups kept current by the skip signals"""
+
+    def setUp(self):
+        self.subscriptions = {}
+        for name in ('ada', 'grace'):
+            customer = ShopifyCustomer.objects.create(shopify_id=f'gid://shopify/Customer/{name}',
+                                                      email=f'{name}@example.com')
+            self.subscriptions[name] = CustomerSubscription.objects.create(
+                customer=customer, total_price=Decimal('40.00'),
+            )
+
+    def skip(self, name, created_at, status='confirmed', reason='travel', fee='0.00'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return SubscriptionSkip.objects.create(
+                subscription=self.subscriptions[name],
+                status=status,
+                reason=reason,
+                skip_fee_charged=Decimal(fee),
+                created_at=created_at,
+                original_order_date=created_at.date(),
+                original_billing_date=created_at.date(),
+                new_order_date=created_at.date(),
+                new_billing_date=created_at.date(),
+            )
+
+    def delete(self, skip):
+        with self.captureOnCommitCallbacks(execute=True):
+            skip.delete()
+
+    def monthly(self, month):
+        return SkipAnalytics.objects.filter(period_type='monthly', period_start=date(2025, month, 1)).first()
+
+    def snapshot(self):
+        return sorted(SkipAnalytics.objects.values_list(
+            'period_type', 'period_start', 'period_end', 'total_skips', 'confirmed_skips', 'cancelled_skips',
+            'unique_customers', 'new_skippers', 'repeat_skippers', 'revenue_deferred', 'skip_fees_collected',
+            'top_reasons',
+        ))
+
+    def test_created_skips_update_every_period_type(self):
+        self.skip('ada', moment(2025, 1, 6), fee='2.50')
+        self.skip('ada', moment(2025, 1, 7), status='cancelled', reason='budget')
+        self.skip('grace', moment(2025, 1, 20))
+
+        january = self.monthly(1)
+        self.assertEqual((january.total_skips, january.confirmed_skips, january.cancelled_skips), (3, 2, 1))
+        self.assertEqual((january.unique_customers, january.new_skippers, january.repeat_skippers), (2, 2, 0))
+        self.assertEqual(january.revenue_deferred, Decimal('80.00'))
+        self.assertEqual(january.skip_fees_collected, Decimal('2.50'))
+        self.assertEqual(january.top_reasons, {'travel': 2, 'budget': 1})
+
+        week = SkipAnalytics.objects.get(period_type='weekly', period_start=date(2025, 1, 6))
+        self.assertEqual((week.period_end, week.total_skips), (date(2025, 1, 12), 2))
+        self.assertEqual(SkipAnalytics.objects.filter(period_type='daily').count(), 3)
+        self.assertEqual(SkipAnalytics.objects.get(period_type='yearly').total_skips, 3)
+
+    def test_deleting_a_first_skip_moves_the_customer_to_their_next_period(self):
+        first = self.skip('ada', moment(2025, 1, 6))
+        self.skip('ada', moment(2025, 2, 10))
+        self.assertEqual((self.monthly(2).new_skippers, self.monthly(2).repeat_skippers), (0, 1))
+
+        self.delete(first)
+
+        self.assertIsNone(self.monthly(1))
+        self.assertEqual((self.monthly(2).new_skippers, self.monthly(2).repeat_skippers), (1, 0))
+        incremental = self.snapshot()
+        rebuild_skip_analytics()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_an_earlier_skip_makes_later_periods_repeat(self):
+        self.skip('grace', moment(2025, 3, 3))
+        self.assertEqual(self.monthly(3).new_skippers, 1)
+
+        self.skip('grace', moment(2025, 1, 15))
+
+        self.assertEqual((self.monthly(1).new_skippers, self.monthly(1).repeat_skippers), (1, 0))
+        self.assertEqual((self.monthly(3).new_skippers, self.monthly(3).repeat_skippers), (0, 1))
+        incremental = self.snapshot()
+        rebuild_skip_analytics()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_recomputing_a_period_updates_its_row_in_place(self):
+        self.skip('ada', moment(2025, 1, 6))
+        row = self.monthly(1)
+
+        # A refresh racing this one may already have written the period
+        SubscriptionSkip.objects.update(status='cancelled')
+        self.assertEqual(compute_skip_analytics('monthly', date(2025, 1, 6), date(2025, 1, 6)), 1)
+
+        self.assertEqual(SkipAnalytics.objects.filter(period_type='monthly').count(), 1)
+        refreshed = self.monthly(1)
+        self.assertEqual((refreshed.pk, refreshed.confirmed_skips, refreshed.cancelled_skips), (row.pk, 0, 1))
+
+
+    def test_analytics_view_rejects_malformed_dates(self):
+        self.skip('ada', moment(2025, 1, 6))
+        staff = Mock(is_staff=True)
+
+        for params in ({'start': 'foo'}, {'end': '2025-13-01'}, {'start': '2025-02-30'}):
+            request = RequestFactory().get('/api/skips/analytics/', params)
+            request.user = staff
+            response = skip_analytics(request)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(b'start and end must be dates', response.content)
+
+        request = RequestFactory().get('/api/skips/analytics/', {'start': '2025-01-01'})
+        request.user = staff
+        self.assertEqual(skip_analytics(request).status_code, 200)
+
+class SkipReminderDispatcherTestCase(TestCase):
+    """Test cases for batched skip reminders sent over pooled SMTP sessions"""
+
+    def setUp(self):
+        email_configuration()
+        self.server = FakeSMTPServer()
+        patcher = patch('email_manager.delivery.get_email_backend', side_effect=self.server.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.order_date = timezone.now().date() + timedelta(days=7)
+        self.subscriptions = [self.subscription(f'reader{n}@example.com') for n in range(5)]
+
+    def subscription(self, email):
+        customer = ShopifyCustomer.objects.create(shopify_id=f'gid://shopify/Customer/{email or "blank"}',
+                                                  email=email, first_name='Reader')
+        return CustomerSubscription.objects.create(customer=customer, total_price=Decimal('40.00'),
+                                                   next_billing_date=self.order_date)
+
+    def queryset(self):
+        return CustomerSubscription.objects.filter(next_billing_date=self.order_date).order_by('pk')
+
+    def dispatch(self, batch_size=1000, **engine_options):
+        engine = SMTPDeliveryEngine(workers=1, connections_per_config=1, **engine_options)
+        return SkipReminderDispatcher(days_until_cutoff=7, engine=engine, batch_size=batch_size).dispatch(
+            self.queryset().select_related('customer'))
+
+    def test_batch_is_sent_over_one_session(self):
+        stats = self.dispatch(messages_per_connection=10)
+
+        self.assertEqual((stats['total'], stats['sent'], stats['failed']), (5, 5, 0))
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual([number for number, _, _ in self.server.sent], [1] * 5)
+        self.assertTrue(self.server.connections[0].closed)
+        self.assertEqual(SkipNotification.objects.filter(delivered=True, order_date=self.order_date).count(), 5)
+        self.assertEqual(EmailHistory.objects.filter(status='success').count(), 5)
+
+    def test_failures_are_recorded_and_retried_on_the_next_run(self):
+        self.server.reject = {'reader2@example.com'}
+        self.subscription('')
+
+        stats = self.dispatch()
+
+        self.assertEqual((stats['total'], stats['sent'], stats['failed'], stats['no_email']), (6, 4, 1, 1))
+        failed = SkipNotification.objects.get(delivered=False)
+        self.assertEqual((failed.recipient_email, failed.sent_at), ('reader2@example.com', None))
+        self.assertIn('No such user', failed.error_message)
+
+        # A rerun skips everyone already reminded about this order date
+        self.server.reject.clear()
+        self.server.sent.clear()
+        stats = self.dispatch()
+        self.assertEqual((stats['already_notified'], stats['sent'], stats['failed']), (4, 1, 0))
+        self.assertEqual([recipient for _, recipient, _ in self.server.sent], ['reader2@example.com'])
+
+    def test_partial_batches_are_deduplicated_and_delivered_separately(self):
+        SkipNotification.objects.create(subscription=self.subscriptions[0], notification_type='skip_reminder',
+                                        recipient_email='reader0@example.com', order_date=self.order_date,
+                                        subject='Reminder', message='Sent earlier', delivered=True)
+        # Reminders about another order date don't count
+        SkipNotification.objects.create(subscription=self.subscriptions[2], notification_type='skip_reminder',
+                                        recipient_email='reader2@example.com',
+                                        order_date=self.order_date - timedelta(days=30),
+                                        subject='Reminder', message='Last month', delivered=True)
+
+        stats = self.dispatch(batch_size=2)
+
+        self.assertEqual((stats['total'], stats['already_notified'], stats['sent']), (5, 1, 4))
+        # Batches of [reader0, reader1], [reader2, reader3], [reader4] each get their own delivery run
+        self.assertEqual([(number, recipient) for number, recipient, _ in self.server.sent], [
+            (1, 'reader1@example.com'), (2, 'reader2@example.com'), (2, 'reader3@example.com'),
+            (3, 'reader4@example.com'),
+        ])
+
+    def test_dry_run_lists_recipients_at_default_verbosity(self):
+        out = StringIO()
+        call_command('send_skip_reminders', '--dry-run', stdout=out)
+
+        output = out.getvalue()
+        for subscription in self.subscriptions:
+            self.assertIn(f'[DRY RUN] Would send reminder to {subscription.customer.email}', output)
+        self.assertEqual((self.server.sent, SkipNotification.objects.count()), ([], 0))
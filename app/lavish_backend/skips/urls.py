@@ -28,4 +28,7 @@ urlpatterns = [
     path('subscriptions/resume/', views.resume_subscription, name='resume_subscription'),
     path('subscriptions/change-frequency/', views.change_subscription_frequency, name='change_subscription_frequency'),
     path('subscriptions/<str:subscription_id>/options/', views.subscription_management_options, name='subscription_management_options'),
+    
+    # Reporting
+    path('analytics/', views.skip_analytics, name='skip_analytics'),
 ]
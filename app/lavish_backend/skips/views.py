@@ -9,6 +9,7 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.db import transaction
 from django.core.exceptions import ValidationError
 from datetime import timedelta
@@ -19,8 +20,10 @@ from customer_subscriptions.models import CustomerSubscription
 from .models import (
     SubscriptionSkip,
     SubscriptionSkipPolicy,
-    SkipNotification
+    SkipNotification,
+    SkipAnalytics
 )
+from .analytics import PERIOD_KINDS
 from .helpers import json_response, error_response
 from .customer_api import (
     cancel_subscription, pause_subscription, resume_subscription, 
@@ -492,6 +495,69 @@ def customer_subscriptions(request):
         return error_response('An error occurred', status=500)
 
 
+@require_http_methods(["GET"])
+def skip_analytics(request):
+    """
+    Skip analytics rollups for dashboards (staff only)
+    
+    GET /api/skips/analytics/?period=monthly&start=2025-01-01&end=2025-12-31
+    
+    period is daily, weekly, monthly (default) or yearly; without dates the
+    most recent 12 periods are returned.
+    """
+    if not request.user.is_staff:
+        return error_response('Staff access required', status=403)
+    
+    try:
+        period_type = request.GET.get('period', 'monthly')
+        if period_type not in PERIOD_KINDS:
+            return error_response(f"period must be one of: {', '.join(PERIOD_KINDS)}")
+        
+        start = parse_date(request.GET['start']) if request.GET.get('start') else None
+        end = parse_date(request.GET['end']) if request.GET.get('end') else None
+        if (request.GET.get('start') and not start) or (request.GET.get('end') and not end):
+            # parse_date returns None for text that is not a date instead of raising
+            raise ValueError('Malformed date')
+        
+        rows = SkipAnalytics.objects.filter(period_type=period_type)
+        if start:
+            rows = rows.filter(period_end__gte=start)
+        if end:
+            rows = rows.filter(period_start__lte=end)
+        rows = rows.order_by('-period_start')
+        if not (start or end):
+            rows = rows[:12]
+        
+        return json_response({
+            'success': True,
+            'period': period_type,
+            'analytics': [
+                {
+                    'period_start': row.period_start.isoformat(),
+                    'period_end': row.period_end.isoformat(),
+                    'total_skips': row.total_skips,
+                    'confirmed_skips': row.confirmed_skips,
+                    'cancelled_skips': row.cancelled_skips,
+                    'failed_skips': row.failed_skips,
+                    'unique_customers': row.unique_customers,
+                    'new_skippers': row.new_skippers,
+                    'repeat_skippers': row.repeat_skippers,
+                    'revenue_deferred': str(row.revenue_deferred),
+                    'skip_fees_collected': str(row.skip_fees_collected),
+                    'top_reasons': row.top_reasons,
+                    'generated_at': row.generated_at.isoformat(),
+                }
+                for row in rows
+            ]
+        })
+        
+    except ValueError:
+        return error_response('start and end must be dates (YYYY-MM-DD)')
+    except Exception as e:
+        logger.error(f'Error loading skip analytics: {str(e)}', exc_info=True)
+        return error_response('An error occurred', status=500)
+
+
 # Health check endpoint
 @require_http_methods(["GET"])
 def health_check(request):